@@ -135,6 +135,17 @@ def create_app() -> Flask:
 
         start_dispatcher_daemon(str(auth_db.path), interval=60)
         start_briefing_scheduler()
+        from .core.rag_sync import resume_document_sync_jobs
+
+        resume_document_sync_jobs()
+        if os.environ.get("KUKANILEA_MAIL_SYNC_SCHEDULER") == "1":
+            from .mail.sync_engine import start_mail_sync_scheduler
+
+            start_mail_sync_scheduler(db_path=app.config["CORE_DB"])
+        if os.environ.get("KUKANILEA_AUTOMATION_DISPATCHER") == "1":
+            from .modules.automation.dispatcher import start_automation_dispatcher
+
+            start_automation_dispatcher(db_path=app.config["CORE_DB"])
 
     manager.set_state(SystemState.INIT, "Loading license state...")
     license_state = load_runtime_license_state(
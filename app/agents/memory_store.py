@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import logging
 import math
@@ -9,14 +10,83 @@ import uuid
 from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, List, Optional, Tuple
 
-from app.ai.embeddings import generate_embedding
+from app.ai.embeddings import generate_embedding, generate_embeddings
+
+from . import vector_index
 
 logger = logging.getLogger("kukanilea.agents.memory_store")
 
+def chunk_content_hash(content: str) -> str:
+    return hashlib.sha256(str(content or "").encode("utf-8")).hexdigest()
+
+
+def ensure_memory_provenance(con: sqlite3.Connection) -> None:
+    """
+    Creates agent_memory_chunks, the indexed provenance of document chunks
+    (doc_id, chunk_index, content hash per agent_memory row), and backfills it
+    from the JSON metadata of existing document_engine rows when first created.
+    """
+    if con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='agent_memory_chunks'"
+    ).fetchone():
+        return
+    if not con.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='agent_memory'"
+    ).fetchone():
+        return
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS agent_memory_chunks(
+          memory_id INTEGER PRIMARY KEY,
+          tenant_id TEXT NOT NULL,
+          doc_id TEXT NOT NULL,
+          chunk_index INTEGER NOT NULL,
+          content_hash TEXT NOT NULL
+        )
+        """
+    )
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS idx_agent_memory_chunks_doc ON agent_memory_chunks(tenant_id, doc_id)"
+    )
+    con.execute(
+        """
+        CREATE TRIGGER IF NOT EXISTS agent_memory_chunks_ad AFTER DELETE ON agent_memory
+        BEGIN
+          DELETE FROM agent_memory_chunks WHERE memory_id = old.id;
+        END
+        """
+    )
+    backfill = []
+    for row in con.execute(
+        "SELECT id, tenant_id, content, metadata FROM agent_memory WHERE agent_role = 'document_engine'"
+    ):
+        try:
+            meta = json.loads(row[3] or "{}")
+        except ValueError:
+            continue
+        if not isinstance(meta, dict) or not meta.get("doc_id"):
+            continue
+        backfill.append(
+            (
+                row[0],
+                row[1],
+                str(meta["doc_id"]),
+                int(meta.get("chunk_index") or 0),
+                chunk_content_hash(row[2]),
+            )
+        )
+    con.executemany(
+        "INSERT OR IGNORE INTO agent_memory_chunks(memory_id, tenant_id, doc_id, chunk_index, content_hash) VALUES (?,?,?,?,?)",
+        backfill,
+    )
+    con.commit()
+
+
 class MemoryManager:
     """
     Manages semantic long-term memory for KUKANILEA agents.
-    Uses SQLite for persistence and Python-based cosine similarity for search.
+    Uses SQLite for persistence and a per-tenant vector index (numpy) for
+    cosine similarity search, with a pure-Python scan as fallback.
     Ensures 100% tenant isolation.
     """
 
@@ -147,6 +217,10 @@ class MemoryManager:
                 payload={"category": category},
             )
             con.commit()
+            if not degraded_embedding and vector_index.available():
+                vector_index.get_index(self.db_path, tenant_id, len(embedding)).add(
+                    cur.lastrowid, embedding
+                )
             return True
         except Exception as e:
             logger.error(f"Failed to store memory in DB: {e}")
@@ -154,15 +228,230 @@ class MemoryManager:
         finally:
             con.close()
 
+    def store_memories(
+        self,
+        tenant_id: str,
+        agent_role: str,
+        items: List[Dict[str, Any]],
+    ) -> List[bool]:
+        """
+        Bulk variant of store_memory for document chunks.
+
+        Each item carries `content` and optionally `metadata`,
+        `importance_score` and `category`. Embeddings are generated in one
+        batched (and cached) call and all rows are written in one transaction.
+        Items whose embedding failed are not stored (False in the result), so
+        the caller can retry exactly those. An item's optional `provenance`
+        ({"doc_id", "chunk_index", "content_hash"}) is recorded in
+        agent_memory_chunks in the same transaction.
+        """
+        if not items:
+            return []
+        try:
+            embeddings = generate_embeddings([str(item.get("content") or "") for item in items])
+        except Exception as exc:
+            logger.warning("Embedding backend unavailable: %s", exc)
+            return [False] * len(items)
+
+        results = [False] * len(items)
+        stored: List[Tuple[int, List[float]]] = []
+        ts = self._utcnow()
+        con = self._get_con()
+        try:
+            if any(item.get("provenance") for item in items):
+                ensure_memory_provenance(con)
+            for pos, (item, embedding) in enumerate(zip(items, embeddings)):
+                if not embedding:
+                    continue
+                vector = [float(v) for v in embedding]
+                category = item.get("category") or "FAKT"
+                cur = con.execute(
+                    """
+                    INSERT INTO agent_memory (tenant_id, timestamp, agent_role, content, embedding, metadata, importance_score, category)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        tenant_id,
+                        ts,
+                        agent_role,
+                        item.get("content") or "",
+                        struct.pack(f"{len(vector)}f", *vector),
+                        json.dumps(dict(item.get("metadata") or {})),
+                        int(item.get("importance_score") or 5),
+                        category,
+                    ),
+                )
+                self._audit_memory_event(
+                    con=con,
+                    tenant_id=tenant_id,
+                    action="write",
+                    memory_id=cur.lastrowid,
+                    actor=agent_role,
+                    payload={"category": category},
+                )
+                provenance = item.get("provenance")
+                if provenance:
+                    con.execute(
+                        """
+                        INSERT OR REPLACE INTO agent_memory_chunks(memory_id, tenant_id, doc_id, chunk_index, content_hash)
+                        VALUES (?, ?, ?, ?, ?)
+                        """,
+                        (
+                            cur.lastrowid,
+                            tenant_id,
+                            str(provenance["doc_id"]),
+                            int(provenance["chunk_index"]),
+                            str(provenance.get("content_hash") or chunk_content_hash(item.get("content"))),
+                        ),
+                    )
+                stored.append((cur.lastrowid, vector))
+                results[pos] = True
+            con.commit()
+        except Exception as e:
+            logger.error(f"Failed to store memories in DB: {e}")
+            return [False] * len(items)
+        finally:
+            con.close()
+        if vector_index.available():
+            for memory_id, vector in stored:
+                vector_index.get_index(self.db_path, tenant_id, len(vector)).add(memory_id, vector)
+        return results
+
+    def document_chunks(self, tenant_id: str, doc_id: str) -> List[Dict[str, Any]]:
+        """Stored chunks of one document (memory_id, chunk_index, content_hash)."""
+        con = self._get_con()
+        try:
+            ensure_memory_provenance(con)
+            rows = con.execute(
+                """
+                SELECT memory_id, chunk_index, content_hash FROM agent_memory_chunks
+                WHERE tenant_id = ? AND doc_id = ?
+                ORDER BY chunk_index
+                """,
+                (tenant_id, doc_id),
+            ).fetchall()
+            return [dict(row) for row in rows]
+        finally:
+            con.close()
+
+    def update_document_chunks(
+        self,
+        tenant_id: str,
+        doc_id: str,
+        *,
+        moved: List[Tuple[int, int]],
+        total_chunks: int,
+        deleted: List[int],
+        actor: str = "document_engine",
+    ) -> None:
+        """
+        Applies a re-index diff: `moved` (memory_id, new chunk_index) rows are
+        relabelled, every remaining chunk gets the new total_chunks, and
+        `deleted` memory ids are removed (with an audit entry each).
+        """
+        con = self._get_con()
+        try:
+            ensure_memory_provenance(con)
+            con.executemany(
+                "UPDATE agent_memory_chunks SET chunk_index = ? WHERE memory_id = ? AND tenant_id = ?",
+                [(index, memory_id, tenant_id) for memory_id, index in moved],
+            )
+            for memory_id in deleted:
+                self._audit_memory_event(
+                    con=con,
+                    tenant_id=tenant_id,
+                    action="delete",
+                    memory_id=memory_id,
+                    actor=actor,
+                    payload={"reason": "document_reindex", "doc_id": doc_id},
+                )
+            con.executemany(
+                "DELETE FROM agent_memory WHERE id = ? AND tenant_id = ?",
+                [(memory_id, tenant_id) for memory_id in deleted],
+            )
+            con.execute(
+                """
+                UPDATE agent_memory
+                SET metadata = json_set(
+                  COALESCE(metadata, '{}'),
+                  '$.chunk_index', (SELECT c.chunk_index FROM agent_memory_chunks c WHERE c.memory_id = agent_memory.id),
+                  '$.total_chunks', ?
+                )
+                WHERE id IN (SELECT memory_id FROM agent_memory_chunks WHERE tenant_id = ? AND doc_id = ?)
+                """,
+                (int(total_chunks), tenant_id, doc_id),
+            )
+            con.commit()
+        finally:
+            con.close()
+        if deleted and vector_index.available():
+            for index in vector_index.loaded_indexes(self.db_path, tenant_id):
+                index.remove(deleted)
+
     def retrieve_context(self, tenant_id: str, query: str, limit: int = 5) -> List[Dict[str, Any]]:
         """
         Retrieves relevant semantic context for a query.
-        Performs Cosine Similarity search on the client side (Python) over the tenant's memories.
+        Performs Cosine Similarity search over the tenant's memories via the
+        vector index, or by scanning all rows when numpy is unavailable.
         """
         query_vec = self._generate_embedding_safe(query)
         if not query_vec:
             return self._retrieve_recent_context(tenant_id=tenant_id, limit=limit)
+        if vector_index.available():
+            return self._retrieve_indexed_context(tenant_id, query_vec, limit)
+        return self._retrieve_scanned_context(tenant_id, query_vec, limit)
+
+    def _retrieve_indexed_context(
+        self, tenant_id: str, query_vec: List[float], limit: int
+    ) -> List[Dict[str, Any]]:
+        con = self._get_con()
+        try:
+            index = vector_index.get_index(self.db_path, tenant_id, len(query_vec))
+            for _attempt in range(2):
+                ranked = index.search(con, query_vec, max(int(limit or 1), 1))
+                if not ranked:
+                    return []
+                ids = [memory_id for memory_id, _ in ranked]
+                placeholders = ",".join("?" for _ in ids)
+                # Absolute Tenant Isolation: hydrate only this tenant's rows
+                rows = {
+                    row["id"]: row
+                    for row in con.execute(
+                        f"""
+                        SELECT id, content, agent_role, metadata, timestamp, importance_score, category
+                        FROM agent_memory WHERE tenant_id = ? AND id IN ({placeholders})
+                        """,
+                        (tenant_id, *ids),
+                    )
+                }
+                if len(rows) == len(ids):
+                    break
+                # Rows were deleted behind the index's back: rebuild and retry.
+                index.mark_stale()
+            results: List[Dict[str, Any]] = []
+            for memory_id, score in ranked:
+                row = rows.get(memory_id)
+                if row is None:
+                    continue
+                results.append({
+                    "content": row["content"],
+                    "role": row["agent_role"],
+                    "metadata": json.loads(row["metadata"]),
+                    "timestamp": row["timestamp"],
+                    "importance_score": row["importance_score"],
+                    "category": row["category"],
+                    "score": score
+                })
+            return results
+        except Exception as e:
+            logger.error(f"Failed to retrieve context: {e}")
+            return []
+        finally:
+            con.close()
 
+    def _retrieve_scanned_context(
+        self, tenant_id: str, query_vec: List[float], limit: int
+    ) -> List[Dict[str, Any]]:
         con = self._get_con()
         try:
             # Absolute Tenant Isolation: Only fetch memories for this tenant
@@ -428,6 +717,11 @@ class MemoryManager:
                 (cutoff_iso,),
             )
             con.commit()
+            if vector_index.available():
+                for tenant in {row["tenant_id"] for row in stale_rows}:
+                    removed = [row["id"] for row in stale_rows if row["tenant_id"] == tenant]
+                    for index in vector_index.loaded_indexes(self.db_path, tenant):
+                        index.remove(removed)
             return len(stale_rows)
         finally:
             con.close()
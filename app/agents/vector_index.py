@@ -0,0 +1,299 @@
+"""
+app/agents/vector_index.py
+Per-tenant embedding matrix for semantic memory search (agent_memory).
+
+Vectors are kept L2-normalised in a contiguous float32 matrix, so cosine
+top-k is one matrix-vector product plus `argpartition`. The matrix is
+persisted next to the auth DB (`<auth_db>.vectors/<tenant>_<dim>/`) and
+memory-mapped on load; rows added since the last snapshot live in a small
+in-RAM delta that is folded into a new snapshot once it grows large enough.
+
+The index catches up incrementally on `agent_memory.id > last_id`, so rows
+inserted elsewhere (other processes, raw SQL) are picked up on the next
+query. Rows deleted through `remove()` are masked out of searches by id and
+dropped from the matrix at the next snapshot; `mark_stale()` rebuilds the
+whole index on next use.
+Requires numpy; without it `available()` is False and callers fall back to
+scanning.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+try:
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    np = None  # type: ignore
+
+logger = logging.getLogger("kukanilea.agents.vector_index")
+
+# Minimum number of delta rows before the snapshot on disk is rewritten; the
+# threshold also grows with the snapshot (10%) to keep rewrites amortised.
+SNAPSHOT_MIN_ROWS = int(os.environ.get("KUKANILEA_MEMORY_INDEX_SNAPSHOT_ROWS", "2048"))
+_LOAD_CHUNK_ROWS = 50_000
+
+
+def available() -> bool:
+    return np is not None
+
+
+def _normalise(mat):
+    norms = np.linalg.norm(mat, axis=1)
+    keep = norms > 0
+    return mat[keep] / norms[keep, None], keep
+
+
+def _top_k(scores, k: int):
+    if scores.shape[0] > k:
+        idx = np.argpartition(-scores, k - 1)[:k]
+    else:
+        idx = np.arange(scores.shape[0])
+    return idx
+
+
+class TenantVectorIndex:
+    def __init__(self, db_path: str, tenant_id: str, dim: int) -> None:
+        self.db_path = str(db_path)
+        self.tenant_id = tenant_id
+        self.dim = int(dim)
+        tenant_key = hashlib.sha256(tenant_id.encode("utf-8")).hexdigest()[:16]
+        db = Path(self.db_path)
+        self.directory = db.with_name(f"{db.name}.vectors") / f"{tenant_key}_{self.dim}"
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._stale = False
+        self._reset()
+
+    def _reset(self) -> None:
+        self._base_ids = np.empty(0, dtype=np.int64)
+        self._base = np.empty((0, self.dim), dtype=np.float32)
+        self._delta_ids = np.empty(0, dtype=np.int64)
+        self._delta = np.empty((0, self.dim), dtype=np.float32)
+        self._delta_n = 0
+        self._last_id = 0
+        # Ids > last_id already appended via add(); skipped during catch-up.
+        self._added_ids: Set[int] = set()
+        self._clear_removed()
+
+    def _clear_removed(self) -> None:
+        # Tombstones: ids deleted via remove() that still sit in base or delta.
+        self._removed: Set[int] = set()
+        self._removed_ids = np.empty(0, dtype=np.int64)
+
+    # -- persistence -----------------------------------------------------
+    def _load_snapshot(self) -> None:
+        meta_fp = self.directory / "meta.json"
+        try:
+            meta = json.loads(meta_fp.read_text(encoding="utf-8"))
+            ids = np.load(self.directory / "ids.npy")
+            vectors = np.load(self.directory / "vectors.npy", mmap_mode="r")
+        except (OSError, ValueError):
+            return
+        if (
+            int(meta.get("dim") or 0) != self.dim
+            or vectors.shape != (ids.shape[0], self.dim)
+            or int(meta.get("rows") or 0) != ids.shape[0]
+        ):
+            return
+        self._base_ids = ids
+        self._base = vectors
+        self._last_id = int(meta.get("last_id") or 0)
+
+    def _write_snapshot(self) -> None:
+        if self._delta_n:
+            ids = np.concatenate([self._base_ids, self._delta_ids[: self._delta_n]])
+            vectors = np.concatenate([self._base, self._delta[: self._delta_n]])
+        else:
+            ids, vectors = self._base_ids, self._base
+        if self._removed:
+            keep = ~np.isin(ids, self._removed_ids)
+            ids, vectors = ids[keep], vectors[keep]
+            self._clear_removed()
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            for name, arr in (("ids.npy", ids), ("vectors.npy", vectors)):
+                tmp = self.directory / f".{name}.tmp"
+                with tmp.open("wb") as fh:
+                    np.save(fh, np.ascontiguousarray(arr))
+                os.replace(tmp, self.directory / name)
+            tmp = self.directory / ".meta.json.tmp"
+            tmp.write_text(
+                json.dumps({"dim": self.dim, "rows": int(ids.shape[0]), "last_id": self._last_id}),
+                encoding="utf-8",
+            )
+            os.replace(tmp, self.directory / "meta.json")
+            vectors = np.load(self.directory / "vectors.npy", mmap_mode="r")
+        except OSError as exc:
+            logger.warning("Memory vector snapshot not written: %s", exc)
+        self._base_ids, self._base = ids, vectors
+        self._delta_ids = np.empty(0, dtype=np.int64)
+        self._delta = np.empty((0, self.dim), dtype=np.float32)
+        self._delta_n = 0
+
+    def _drop_snapshot(self) -> None:
+        for name in ("meta.json", "ids.npy", "vectors.npy"):
+            try:
+                (self.directory / name).unlink()
+            except OSError:
+                pass
+
+    # -- maintenance -------------------------------------------------------
+    def _append(self, ids, vectors) -> None:
+        vectors, keep = _normalise(np.asarray(vectors, dtype=np.float32))
+        ids = np.asarray(ids, dtype=np.int64)[keep]
+        if not ids.shape[0]:
+            return
+        needed = self._delta_n + ids.shape[0]
+        if needed > self._delta.shape[0]:
+            cap = max(needed, 2 * self._delta.shape[0], 256)
+            grown = np.empty((cap, self.dim), dtype=np.float32)
+            grown[: self._delta_n] = self._delta[: self._delta_n]
+            grown_ids = np.empty(cap, dtype=np.int64)
+            grown_ids[: self._delta_n] = self._delta_ids[: self._delta_n]
+            self._delta, self._delta_ids = grown, grown_ids
+        self._delta[self._delta_n : needed] = vectors
+        self._delta_ids[self._delta_n : needed] = ids
+        self._delta_n = needed
+
+    def _catch_up(self, con: sqlite3.Connection) -> None:
+        if not self._loaded or self._stale:
+            removed = self._removed
+            self._reset()
+            if self._stale:
+                self._drop_snapshot()
+            else:
+                # Ids removed before first use may still be in the snapshot.
+                self._load_snapshot()
+                self._mask(removed)
+            self._loaded, self._stale = True, False
+
+        max_id = con.execute(
+            "SELECT COALESCE(MAX(id), 0) FROM agent_memory WHERE tenant_id = ?",
+            (self.tenant_id,),
+        ).fetchone()[0]
+        if int(max_id) < self._last_id:
+            # Rows vanished (DB recreated or truncated): start over.
+            self._reset()
+            self._drop_snapshot()
+        if int(max_id) > self._last_id:
+            self._load_rows(con)
+
+        threshold = max(SNAPSHOT_MIN_ROWS, self._base.shape[0] // 10)
+        if self._delta_n >= threshold or len(self._removed) >= threshold:
+            self._write_snapshot()
+
+    def _load_rows(self, con: sqlite3.Connection) -> None:
+        row_bytes = self.dim * 4
+        cur = con.execute(
+            "SELECT id, embedding FROM agent_memory WHERE tenant_id = ? AND id > ? ORDER BY id",
+            (self.tenant_id, self._last_id),
+        )
+        while True:
+            rows = cur.fetchmany(_LOAD_CHUNK_ROWS)
+            if not rows:
+                break
+            ids: List[int] = []
+            blobs: List[bytes] = []
+            for row_id, blob in rows:
+                if row_id in self._added_ids:
+                    continue
+                if blob is not None and len(blob) == row_bytes:
+                    ids.append(int(row_id))
+                    blobs.append(bytes(blob))
+            if ids:
+                vectors = np.frombuffer(b"".join(blobs), dtype=np.float32).reshape(-1, self.dim)
+                self._append(ids, vectors)
+            self._last_id = max(self._last_id, int(rows[-1][0]))
+        self._added_ids = {i for i in self._added_ids if i > self._last_id}
+
+    def _mask(self, memory_ids: Iterable[int]) -> None:
+        self._removed.update(int(i) for i in memory_ids)
+        self._removed_ids = np.fromiter(sorted(self._removed), dtype=np.int64)
+
+    # -- API -------------------------------------------------------------
+    def add(self, memory_id: int, embedding: Sequence[float]) -> None:
+        """Appends a freshly stored row; only meaningful once the index is loaded."""
+        with self._lock:
+            if not self._loaded or self._stale or int(memory_id) <= self._last_id:
+                return
+            self._append([int(memory_id)], np.asarray([embedding], dtype=np.float32))
+            self._added_ids.add(int(memory_id))
+
+    def remove(self, memory_ids: Iterable[int]) -> None:
+        """Drops deleted rows by id without rebuilding the index."""
+        with self._lock:
+            if not self._stale:
+                self._mask(memory_ids)
+
+    def mark_stale(self) -> None:
+        with self._lock:
+            self._stale = True
+
+    def search(
+        self, con: sqlite3.Connection, query: Sequence[float], k: int
+    ) -> List[Tuple[int, float]]:
+        """Top-k (memory id, cosine score) pairs, best first."""
+        q = np.asarray(query, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        if q.shape != (self.dim,) or norm == 0.0 or k <= 0:
+            return []
+        q = q / norm
+        with self._lock:
+            self._catch_up(con)
+            parts = []
+            for ids, mat in (
+                (self._base_ids, self._base),
+                (self._delta_ids[: self._delta_n], self._delta[: self._delta_n]),
+            ):
+                if not ids.shape[0]:
+                    continue
+                scores = mat @ q
+                if self._removed:
+                    scores[np.isin(ids, self._removed_ids)] = -np.inf
+                idx = _top_k(scores, k)
+                idx = idx[np.isfinite(scores[idx])]
+                parts.append((ids[idx], scores[idx]))
+        if not parts:
+            return []
+        ids = np.concatenate([p[0] for p in parts])
+        scores = np.concatenate([p[1] for p in parts])
+        order = np.lexsort((ids, -scores))[:k]
+        return [(int(ids[i]), float(scores[i])) for i in order]
+
+
+_INDEXES: Dict[Tuple[str, str, int], TenantVectorIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def _key(db_path: str) -> str:
+    try:
+        return str(Path(db_path).resolve())
+    except OSError:
+        return str(db_path)
+
+
+def get_index(db_path: str, tenant_id: str, dim: int) -> TenantVectorIndex:
+    key = (_key(db_path), tenant_id, int(dim))
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None:
+            index = TenantVectorIndex(db_path, tenant_id, dim)
+            _INDEXES[key] = index
+        return index
+
+
+def loaded_indexes(db_path: str, tenant_id: Optional[str] = None) -> List[TenantVectorIndex]:
+    db_key = _key(db_path)
+    with _INDEXES_LOCK:
+        return [
+            index
+            for (key, tenant, _dim), index in _INDEXES.items()
+            if key == db_key and (tenant_id is None or tenant == tenant_id)
+        ]
@@ -0,0 +1,147 @@
+"""
+app/ai/embedding_cache.py
+Content-addressed cache for text embeddings.
+
+Entries are keyed by the SHA-256 of model name and text, so re-indexing a
+document (or any repeated chunk, query or boilerplate) is a lookup instead of
+another round-trip to the embedding backend. Vectors are stored as float32
+blobs in their own SQLite file and trimmed least-recently-used first once the
+cache grows beyond `max_bytes`.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+# Refresh last_used at most this often per entry (keeps hits read-mostly).
+_TOUCH_INTERVAL_SECONDS = 60.0
+
+
+class EmbeddingCache:
+    def __init__(self, path: Path, *, max_bytes: int, enabled: bool = True) -> None:
+        self.path = Path(path)
+        self.max_bytes = max(0, int(max_bytes))
+        self.enabled = bool(enabled) and self.max_bytes > 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0, "puts": 0, "evictions": 0, "errors": 0}
+
+    def _con(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is not None and getattr(self._local, "pid", None) == os.getpid():
+            return con
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(str(self.path), timeout=5.0)
+        con.execute("PRAGMA busy_timeout=5000;")
+        try:
+            con.execute("PRAGMA journal_mode=WAL;")
+        except sqlite3.OperationalError:
+            pass
+        con.execute("PRAGMA synchronous=NORMAL;")
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embedding_cache(
+              cache_key TEXT PRIMARY KEY,
+              vector BLOB NOT NULL,
+              size INTEGER NOT NULL,
+              last_used REAL NOT NULL
+            );
+            """
+        )
+        con.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embedding_cache_lru ON embedding_cache(last_used);"
+        )
+        con.commit()
+        self._local.con = con
+        self._local.pid = os.getpid()
+        return con
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[name] += n
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\x1f{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, List[float]]:
+        keys = list(dict.fromkeys(keys))
+        if not self.enabled or not keys:
+            return {}
+        found: Dict[str, List[float]] = {}
+        try:
+            con = self._con()
+            now = time.time()
+            touch = []
+            for start in range(0, len(keys), 500):
+                part = keys[start : start + 500]
+                placeholders = ",".join("?" for _ in part)
+                for cache_key, blob, last_used in con.execute(
+                    f"SELECT cache_key, vector, last_used FROM embedding_cache WHERE cache_key IN ({placeholders})",
+                    part,
+                ):
+                    found[cache_key] = array("f", bytes(blob)).tolist()
+                    if now - float(last_used) > _TOUCH_INTERVAL_SECONDS:
+                        touch.append((now, cache_key))
+            if touch:
+                con.executemany("UPDATE embedding_cache SET last_used=? WHERE cache_key=?", touch)
+                con.commit()
+        except sqlite3.Error:
+            self._count("errors")
+            return {}
+        self._count("hits", len(found))
+        self._count("misses", len(keys) - len(found))
+        return found
+
+    def put_many(self, entries: Dict[str, List[float]]) -> None:
+        if not self.enabled or not entries:
+            return
+        now = time.time()
+        rows = []
+        for cache_key, vector in entries.items():
+            blob = array("f", vector).tobytes()
+            rows.append((cache_key, blob, len(blob), now))
+        try:
+            con = self._con()
+            con.executemany(
+                "INSERT OR REPLACE INTO embedding_cache(cache_key, vector, size, last_used) VALUES (?,?,?,?)",
+                rows,
+            )
+            con.commit()
+            self._count("puts", len(rows))
+            self._evict(con)
+        except sqlite3.Error:
+            self._count("errors")
+
+    def _evict(self, con: sqlite3.Connection) -> None:
+        total = int(con.execute("SELECT COALESCE(SUM(size), 0) FROM embedding_cache").fetchone()[0])
+        if total <= self.max_bytes:
+            return
+        # Trim to 90% so a full cache does not evict on every put.
+        excess = total - int(self.max_bytes * 0.9)
+        victims = []
+        for cache_key, size in con.execute(
+            "SELECT cache_key, size FROM embedding_cache ORDER BY last_used ASC"
+        ):
+            victims.append((cache_key,))
+            excess -= int(size)
+            if excess <= 0:
+                break
+        con.executemany("DELETE FROM embedding_cache WHERE cache_key=?", victims)
+        con.commit()
+        self._count("evictions", len(victims))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            out: Dict[str, Any] = dict(self._stats)
+        lookups = out["hits"] + out["misses"]
+        out["hit_rate"] = round(out["hits"] / lookups, 4) if lookups else 0.0
+        out["enabled"] = self.enabled
+        out["max_bytes"] = self.max_bytes
+        return out
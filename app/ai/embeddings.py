@@ -2,40 +2,147 @@ from __future__ import annotations
 
 import logging
 import os
-from typing import List, Optional
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
 
 import requests
 
+from app.ai.embedding_cache import EmbeddingCache
+
 logger = logging.getLogger("kukanilea.ai.embeddings")
 
-def generate_embedding(text: str) -> Optional[List[float]]:
-    """
-    Generates a semantic embedding for the given text using local Ollama.
-    Uses 'nomic-embed-text' as a high-performance local default.
-    """
+# Texts per request to Ollama's batch endpoint (/api/embed).
+EMBED_BATCH_SIZE = max(1, int(os.environ.get("KUKANILEA_EMBED_BATCH_SIZE", "32")))
+EMBED_TIMEOUT_SECONDS = float(os.environ.get("KUKANILEA_EMBED_TIMEOUT_SECONDS", "10"))
+# KUKANILEA_EMBED_CACHE=0 (or KUKANILEA_EMBED_CACHE_MAX_MB=0) disables the cache.
+EMBED_CACHE_MAX_MB = int(os.environ.get("KUKANILEA_EMBED_CACHE_MAX_MB", "256"))
+
+_SESSION: Optional[requests.Session] = None
+_CACHE: Optional[EmbeddingCache] = None
+_STATE_LOCK = threading.Lock()
+# Hosts whose Ollama predates /api/embed; they get one request per text.
+_NO_BATCH_HOSTS: set = set()
+
+
+def _endpoint() -> tuple[str, str]:
     host = os.environ.get("OLLAMA_HOST", "http://127.0.0.1:11434").rstrip("/")
     model = os.environ.get("OLLAMA_EMBED_MODEL", "nomic-embed-text")
+    return host, model
+
+
+def _session() -> requests.Session:
+    """One pooled HTTP session for all embedding calls (keep-alive)."""
+    global _SESSION
+    with _STATE_LOCK:
+        if _SESSION is None:
+            _SESSION = requests.Session()
+            _SESSION.headers.update({"Accept": "application/json"})
+        return _SESSION
+
+
+def embedding_cache() -> EmbeddingCache:
+    global _CACHE
+    with _STATE_LOCK:
+        if _CACHE is None:
+            from app.config import Config
+
+            enabled = os.environ.get("KUKANILEA_EMBED_CACHE", "1").strip().lower() not in (
+                "0",
+                "false",
+                "no",
+                "off",
+            )
+            _CACHE = EmbeddingCache(
+                Path(Config.USER_DATA_ROOT) / "embedding_cache.sqlite3",
+                max_bytes=EMBED_CACHE_MAX_MB * 1024 * 1024,
+                enabled=enabled,
+            )
+        return _CACHE
+
+
+def _as_vector(value) -> Optional[List[float]]:
+    if not isinstance(value, list) or not value:
+        return None
+    try:
+        return [float(x) for x in value]
+    except (TypeError, ValueError):
+        return None
 
-    url = f"{host}/api/embeddings"
-    payload = {
-        "model": model,
-        "prompt": text
-    }
 
+def _embed_one(host: str, model: str, text: str) -> Optional[List[float]]:
     try:
-        resp = requests.post(
-            url,
-            json=payload,
-            timeout=10.0,
-            headers={"Accept": "application/json"},
+        resp = _session().post(
+            f"{host}/api/embeddings",
+            json={"model": model, "prompt": text},
+            timeout=EMBED_TIMEOUT_SECONDS,
         )
         resp.raise_for_status()
         res_json = resp.json()
         if isinstance(res_json, dict):
-            embedding = res_json.get("embedding")
-            if isinstance(embedding, list):
-                return [float(x) for x in embedding]
+            return _as_vector(res_json.get("embedding"))
     except Exception as e:
         logger.error(f"Failed to generate embedding via Ollama: {e}")
-
     return None
+
+
+def _embed_batch(host: str, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+    if host not in _NO_BATCH_HOSTS:
+        try:
+            resp = _session().post(
+                f"{host}/api/embed",
+                json={"model": model, "input": texts},
+                timeout=EMBED_TIMEOUT_SECONDS * max(1, len(texts) // 8),
+            )
+            if resp.status_code == 404:
+                _NO_BATCH_HOSTS.add(host)
+            else:
+                resp.raise_for_status()
+                res_json = resp.json()
+                vectors = res_json.get("embeddings") if isinstance(res_json, dict) else None
+                if isinstance(vectors, list) and len(vectors) == len(texts):
+                    return [_as_vector(v) for v in vectors]
+        except requests.ConnectionError as e:
+            # Backend down: per-text fallback would only repeat the failure.
+            logger.error(f"Failed to generate embeddings via Ollama: {e}")
+            return [None] * len(texts)
+        except Exception as e:
+            logger.warning(f"Batch embedding failed, retrying per text: {e}")
+    return [_embed_one(host, model, text) for text in texts]
+
+
+def generate_embeddings(texts: Sequence[str]) -> List[Optional[List[float]]]:
+    """
+    Embeddings for many texts, in input order (None where the backend failed).
+
+    Cached vectors are returned without a request; the rest is deduplicated and
+    sent in batches of EMBED_BATCH_SIZE over a pooled HTTP session.
+    """
+    host, model = _endpoint()
+    cache = embedding_cache()
+    keys = [EmbeddingCache.make_key(model, text) for text in texts]
+    found: Dict[str, Optional[List[float]]] = dict(cache.get_many(keys))
+
+    missing: Dict[str, str] = {}
+    for key, text in zip(keys, texts):
+        if key not in found:
+            missing.setdefault(key, text)
+    pending = list(missing.items())
+    fresh: Dict[str, List[float]] = {}
+    for start in range(0, len(pending), EMBED_BATCH_SIZE):
+        part = pending[start : start + EMBED_BATCH_SIZE]
+        vectors = _embed_batch(host, model, [text for _, text in part])
+        for (key, _), vector in zip(part, vectors):
+            found[key] = vector
+            if vector:
+                fresh[key] = vector
+    cache.put_many(fresh)
+    return [found.get(key) for key in keys]
+
+
+def generate_embedding(text: str) -> Optional[List[float]]:
+    """
+    Generates a semantic embedding for the given text using local Ollama.
+    Uses 'nomic-embed-text' as a high-performance local default.
+    """
+    return generate_embeddings([text])[0]
@@ -9,16 +9,26 @@ import json
 import logging
 import sqlite3
 import threading
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
 from app.config import Config
+from app.eventlog.checkpoints import (
+    CHECKPOINT_INTERVAL,
+    ensure_checkpoint_schema,
+    latest_checkpoint,
+    record_checkpoints,
+    throughput,
+)
 
 logger = logging.getLogger("kukanilea.audit")
 _VAULT_LOCK = threading.Lock()
 
 GENESIS_HASH = "KUKANILEA_GENESIS_v2.0_2026"
+CHECKPOINT_CHAIN = "evidence_vault"
+_VERIFY_CHUNK_ROWS = 2000
 
 class AuditVault:
     def __init__(self, db_path: Optional[Path] = None):
@@ -72,6 +82,7 @@ class AuditVault:
                         SELECT RAISE(FAIL, 'Forensic vault entries are immutable and cannot be modified.');
                     END;
                 """)
+                ensure_checkpoint_schema(con)
                 con.commit()
             finally:
                 con.close()
@@ -135,36 +146,88 @@ class AuditVault:
         finally:
             con.close()
 
-    def verify_chain(self) -> Tuple[bool, List[Dict[str, Any]]]:
+    def verify_chain(self, full: bool = False) -> Tuple[bool, List[Dict[str, Any]]]:
         """
-        Walks the entire chain and verifies cryptographic integrity.
+        Verifies cryptographic integrity of the chain.
         Returns (success, errors).
         """
+        report = self.verify_report(full=full)
+        return report["ok"], report["errors"]
+
+    def verify_report(self, full: bool = False) -> Dict[str, Any]:
+        """
+        Walks the chain from the newest trusted checkpoint (from genesis if
+        there is none or `full` is set), streaming rows instead of loading the
+        table. Records new signed checkpoints while the chain is intact and
+        reports errors plus verification throughput.
+        """
+        started = time.perf_counter()
         con = self._db()
-        errors = []
+        errors: List[Dict[str, Any]] = []
+        report: Dict[str, Any] = {"full": bool(full), "resumed_from": 0, "rows_verified": 0, "checkpoint": None}
         try:
-            rows = con.execute("SELECT * FROM evidence_vault ORDER BY id ASC").fetchall()
-            expected_prev = GENESIS_HASH
-
-            for row in rows:
-                # Re-calculate hash
-                data_vector = f"{row['created_at']}|{row['doc_id']}|{row['tenant_id']}|{row['metadata_hash']}|{row['payload_json']}|{row['prev_hash']}"
-                calculated = self._calculate_hash(data_vector)
-
-                # Check 1: Prev hash match
-                if row["prev_hash"] != expected_prev:
-                    errors.append({"id": row["id"], "error": "Prev-Hash Mismatch (Chain broken)"})
-
-                # Check 2: Node hash match
-                if row["node_hash"] != calculated:
-                    errors.append({"id": row["id"], "error": "Node-Hash Mismatch (Data tampered)"})
-
-                expected_prev = row["node_hash"]
-
-            return (len(errors) == 0, errors)
+            after_id, expected_prev = 0, GENESIS_HASH
+            checkpoint = None if full else latest_checkpoint(con, CHECKPOINT_CHAIN)
+            if checkpoint:
+                cp_id, cp_hash = checkpoint
+                row = con.execute("SELECT node_hash FROM evidence_vault WHERE id=?", (cp_id,)).fetchone()
+                if row is not None and row["node_hash"] == cp_hash:
+                    after_id, expected_prev = checkpoint
+                    report["resumed_from"] = cp_id
+                else:
+                    # Checkpointed row was rewritten: walk everything to list the damage.
+                    errors.append({"id": cp_id, "error": "Checkpoint Mismatch (Chain rewritten)"})
+
+            cur = con.execute(
+                """
+                SELECT id, created_at, doc_id, tenant_id, metadata_hash, payload_json, prev_hash, node_hash
+                FROM evidence_vault WHERE id > ? ORDER BY id ASC
+                """,
+                (after_id,)
+            )
+            intact = not errors
+            last_intact: Optional[Tuple[int, str]] = None
+            points: List[Tuple[int, str]] = []
+            while True:
+                rows = cur.fetchmany(_VERIFY_CHUNK_ROWS)
+                if not rows:
+                    break
+                for row in rows:
+                    # Re-calculate hash
+                    data_vector = f"{row['created_at']}|{row['doc_id']}|{row['tenant_id']}|{row['metadata_hash']}|{row['payload_json']}|{row['prev_hash']}"
+                    calculated = self._calculate_hash(data_vector)
+                    found = len(errors)
+
+                    # Check 1: Prev hash match
+                    if row["prev_hash"] != expected_prev:
+                        errors.append({"id": row["id"], "error": "Prev-Hash Mismatch (Chain broken)"})
+
+                    # Check 2: Node hash match
+                    if row["node_hash"] != calculated:
+                        errors.append({"id": row["id"], "error": "Node-Hash Mismatch (Data tampered)"})
+
+                    expected_prev = row["node_hash"]
+                    report["rows_verified"] += 1
+                    intact = intact and len(errors) == found
+                    if intact and report["rows_verified"] % CHECKPOINT_INTERVAL == 0:
+                        points.append((row["id"], row["node_hash"]))
+                    elif intact:
+                        last_intact = (row["id"], row["node_hash"])
+
+            if last_intact and (not points or points[-1][0] < last_intact[0]):
+                points.append(last_intact)
+            if points:
+                report["checkpoint"] = record_checkpoints(con, CHECKPOINT_CHAIN, points)
+                con.commit()
         finally:
             con.close()
 
+        elapsed = time.perf_counter() - started
+        report.update(ok=len(errors) == 0, errors=errors)
+        report["duration_ms"] = round(elapsed * 1000, 2)
+        report["rows_per_second"] = throughput(report["rows_verified"], elapsed)
+        return report
+
 # Global singleton
 vault = AuditVault()
 
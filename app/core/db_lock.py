@@ -0,0 +1,136 @@
+"""
+app/core/db_lock.py
+Reader/writer coordination for the core SQLite store.
+
+The DB runs in WAL mode and every thread has its own (pooled) connection, so
+readers see a consistent snapshot without any process-wide lock and never
+block writers. Only writers are serialised here, because SQLite allows a single
+writer at a time and letting them queue on a Python lock is cheaper than
+spinning on SQLITE_BUSY.
+
+`with _DB_LOCK:` keeps its old meaning (exclusive, re-entrant) for existing
+call sites; read-only paths use `with _DB_LOCK.read():`.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+
+class DBLock:
+    """Re-entrant writer lock with shared (non-blocking) readers and wait metrics."""
+
+    def __init__(self, *, shared_reads: bool = True) -> None:
+        self.shared_reads = bool(shared_reads)
+        self._writer = threading.RLock()
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._active_readers = 0
+        self._stats: Dict[str, float] = {
+            "write_acquisitions": 0,
+            "write_contended": 0,
+            "write_wait_ms_total": 0.0,
+            "write_wait_ms_max": 0.0,
+            "write_hold_ms_total": 0.0,
+            "write_hold_ms_max": 0.0,
+            "read_acquisitions": 0,
+            "read_hold_ms_total": 0.0,
+            "read_peak_concurrent": 0,
+        }
+
+    # -- writer side (RLock compatible) ----------------------------------
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        depth = getattr(self._local, "write_depth", 0)
+        if depth:
+            self._writer.acquire()
+            self._local.write_depth = depth + 1
+            return True
+
+        started = time.perf_counter()
+        contended = not self._writer.acquire(blocking=False)
+        if contended:
+            if not blocking:
+                return False
+            if not self._writer.acquire(timeout=timeout):
+                return False
+        acquired = time.perf_counter()
+        self._local.write_depth = 1
+        self._local.write_since = acquired
+        wait_ms = (acquired - started) * 1000.0
+        with self._stats_lock:
+            self._stats["write_acquisitions"] += 1
+            if contended:
+                self._stats["write_contended"] += 1
+            self._stats["write_wait_ms_total"] += wait_ms
+            if wait_ms > self._stats["write_wait_ms_max"]:
+                self._stats["write_wait_ms_max"] = wait_ms
+        return True
+
+    def release(self) -> None:
+        depth = getattr(self._local, "write_depth", 0) - 1
+        self._local.write_depth = max(depth, 0)
+        if depth <= 0:
+            hold_ms = (time.perf_counter() - self._local.write_since) * 1000.0
+            with self._stats_lock:
+                self._stats["write_hold_ms_total"] += hold_ms
+                if hold_ms > self._stats["write_hold_ms_max"]:
+                    self._stats["write_hold_ms_max"] = hold_ms
+        self._writer.release()
+
+    def __enter__(self) -> "DBLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *_exc: Any) -> None:
+        self.release()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self:
+            yield
+
+    # -- reader side -----------------------------------------------------
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        """Read-only section; runs concurrently with other readers and the writer."""
+        if not self.shared_reads:
+            with self:
+                yield
+            return
+
+        started = time.perf_counter()
+        with self._stats_lock:
+            self._active_readers += 1
+            self._stats["read_acquisitions"] += 1
+            if self._active_readers > self._stats["read_peak_concurrent"]:
+                self._stats["read_peak_concurrent"] = self._active_readers
+        try:
+            yield
+        finally:
+            with self._stats_lock:
+                self._active_readers -= 1
+                self._stats["read_hold_ms_total"] += (
+                    time.perf_counter() - started
+                ) * 1000.0
+
+    # -- metrics ---------------------------------------------------------
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            out: Dict[str, Any] = dict(self._stats)
+            out["active_readers"] = self._active_readers
+        writes = out["write_acquisitions"]
+        out["write_wait_ms_avg"] = (
+            round(out["write_wait_ms_total"] / writes, 3) if writes else 0.0
+        )
+        for key in (
+            "write_wait_ms_total",
+            "write_wait_ms_max",
+            "write_hold_ms_total",
+            "write_hold_ms_max",
+            "read_hold_ms_total",
+        ):
+            out[key] = round(out[key], 3)
+        out["shared_reads"] = self.shared_reads
+        return out
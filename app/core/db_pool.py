@@ -0,0 +1,195 @@
+"""
+app/core/db_pool.py
+Per-thread SQLite connection pool for the core document store.
+
+Connections are opened by the caller-supplied opener (which applies the
+PRAGMAs once) and handed out again to the same thread for the same DB path,
+so page cache and mmap survive between requests. Callers keep the usual
+`con = _db(); try: ... finally: con.close()` pattern: close() on a pooled
+connection rolls back any open transaction and returns it to the pool.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3 connection whose close() returns it to its pool."""
+
+    _pool: Optional["ConnectionPool"] = None
+    _pool_key: str = ""
+    _pool_file_id: Optional[Tuple[int, int]] = None
+    _pool_checked_out: bool = False
+    _pool_last_used: float = 0.0
+
+    def close(self) -> None:
+        pool = self._pool
+        if pool is None or not self._pool_checked_out:
+            super().close()
+            return
+        pool.release(self)
+
+    def close_physically(self) -> None:
+        self._pool = None
+        super().close()
+
+
+def _file_id(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (int(st.st_dev), int(st.st_ino))
+
+
+class ConnectionPool:
+    """
+    One idle connection per (thread, DB path).
+
+    A checked-in connection is reused by the next acquire() on the same thread
+    unless it was idle longer than `max_idle_seconds`, fails its health check
+    (`SELECT 1`) or the DB file was replaced (different inode, e.g. restore).
+    """
+
+    def __init__(self, *, max_idle_seconds: float = 300.0, enabled: bool = True) -> None:
+        self.max_idle_seconds = float(max_idle_seconds)
+        self.enabled = bool(enabled)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all: "weakref.WeakSet[PooledConnection]" = weakref.WeakSet()
+        self._generation = 0
+        self._stats: Dict[str, float] = {
+            "hits": 0,
+            "misses": 0,
+            "evicted_idle": 0,
+            "evicted_unhealthy": 0,
+            "discarded": 0,
+            "acquire_ms_total": 0.0,
+            "open_ms_total": 0.0,
+        }
+
+    # -- internals -------------------------------------------------------
+    def _slots(self) -> Dict[str, PooledConnection]:
+        slots = getattr(self._local, "slots", None)
+        if slots is None or getattr(self._local, "generation", -1) != self._generation:
+            slots = {}
+            self._local.slots = slots
+            self._local.generation = self._generation
+        return slots
+
+    def _bump(self, key: str, value: float = 1) -> None:
+        with self._lock:
+            self._stats[key] += value
+
+    def _drop(self, con: PooledConnection) -> None:
+        with self._lock:
+            self._all.discard(con)
+        con.close_physically()
+
+    def _healthy(self, con: PooledConnection, key: str) -> bool:
+        if con._pool_file_id is not None and _file_id(key) != con._pool_file_id:
+            return False
+        try:
+            con.execute("SELECT 1").fetchone()
+        except sqlite3.Error:
+            return False
+        return True
+
+    # -- API -------------------------------------------------------------
+    def acquire(
+        self, key: str, opener: Callable[[], sqlite3.Connection]
+    ) -> sqlite3.Connection:
+        """Returns a connection for DB path `key`; opener must use PooledConnection."""
+        started = time.perf_counter()
+        if not self.enabled:
+            return opener()
+
+        slots = self._slots()
+        con = slots.pop(key, None)
+        if con is not None:
+            idle = time.monotonic() - con._pool_last_used
+            if idle > self.max_idle_seconds:
+                self._bump("evicted_idle")
+                self._drop(con)
+                con = None
+            elif not self._healthy(con, key):
+                self._bump("evicted_unhealthy")
+                self._drop(con)
+                con = None
+
+        if con is not None:
+            con.row_factory = sqlite3.Row
+            self._bump("hits")
+        else:
+            opened_at = time.perf_counter()
+            raw = opener()
+            if not isinstance(raw, PooledConnection):
+                return raw
+            con = raw
+            con._pool = self
+            con._pool_key = key
+            con._pool_file_id = _file_id(key)
+            with self._lock:
+                self._all.add(con)
+                self._stats["misses"] += 1
+                self._stats["open_ms_total"] += (time.perf_counter() - opened_at) * 1000.0
+
+        con._pool_checked_out = True
+        self._bump("acquire_ms_total", (time.perf_counter() - started) * 1000.0)
+        return con
+
+    def release(self, con: PooledConnection) -> None:
+        con._pool_checked_out = False
+        try:
+            if con.in_transaction:
+                con.rollback()
+        except sqlite3.Error:
+            self._bump("discarded")
+            self._drop(con)
+            return
+        slots = self._slots()
+        if con._pool_key in slots or not self.enabled:
+            # Nested use on this thread: keep one idle connection per path.
+            self._bump("discarded")
+            self._drop(con)
+            return
+        con._pool_last_used = time.monotonic()
+        slots[con._pool_key] = con
+
+    def clear(self) -> int:
+        """Closes every idle connection of every thread; checked-out ones close on release."""
+        with self._lock:
+            self._generation += 1
+            conns = list(self._all)
+        closed = 0
+        for con in conns:
+            if con._pool_checked_out:
+                # Released after the generation bump -> lands in a fresh slot map
+                # of its thread; make sure it is dropped instead.
+                con._pool = None
+                continue
+            try:
+                self._drop(con)
+                closed += 1
+            except sqlite3.Error:
+                continue
+        return closed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            conns = list(self._all)
+        total = out["hits"] + out["misses"]
+        out["open_connections"] = len(conns)
+        out["in_use"] = sum(1 for c in conns if c._pool_checked_out)
+        out["hit_ratio"] = round(out["hits"] / total, 4) if total else 0.0
+        out["acquire_ms_total"] = round(out["acquire_ms_total"], 3)
+        out["open_ms_total"] = round(out["open_ms_total"], 3)
+        out["max_idle_seconds"] = self.max_idle_seconds
+        out["enabled"] = self.enabled
+        return out
@@ -0,0 +1,175 @@
+"""
+app/core/extraction_cache.py
+Content-addressed cache for text extraction / OCR results.
+
+Entries are keyed by the SHA-256 of the file bytes plus a fingerprint of the
+extractor (version, OCR language/DPI/page limit, force_ocr ...), so renamed or
+re-uploaded copies of the same document are a lookup instead of another OCR
+run. The cache lives in its own SQLite file next to the core DB (WAL, safe for
+the indexer's worker processes) and is trimmed least-recently-used first once
+it grows beyond `max_bytes`.
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+# Refresh last_used at most this often per entry (keeps hits read-mostly).
+_TOUCH_INTERVAL_SECONDS = 60.0
+
+
+class ExtractionCache:
+    """Size-bounded LRU store of (text, used_ocr) per content hash + extractor fingerprint."""
+
+    def __init__(self, path: Path, *, max_bytes: int, enabled: bool = True) -> None:
+        self.path = Path(path)
+        self.max_bytes = max(0, int(max_bytes))
+        self.enabled = bool(enabled) and self.max_bytes > 0
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "hits": 0,
+            "misses": 0,
+            "puts": 0,
+            "evictions": 0,
+            "errors": 0,
+        }
+
+    # -- connection ----------------------------------------------------
+    def _con(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        # A forked worker must not reuse the parent's handle.
+        if con is not None and getattr(self._local, "pid", None) == os.getpid():
+            return con
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(str(self.path), timeout=5.0)
+        con.execute("PRAGMA busy_timeout=5000;")
+        try:
+            con.execute("PRAGMA journal_mode=WAL;")
+        except sqlite3.OperationalError:
+            pass
+        con.execute("PRAGMA synchronous=NORMAL;")
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS extract_cache(
+              cache_key TEXT PRIMARY KEY,
+              text TEXT NOT NULL,
+              used_ocr INTEGER NOT NULL,
+              size INTEGER NOT NULL,
+              created_at REAL NOT NULL,
+              last_used REAL NOT NULL
+            );
+            """
+        )
+        con.execute(
+            "CREATE INDEX IF NOT EXISTS idx_extract_cache_lru ON extract_cache(last_used);"
+        )
+        con.commit()
+        self._local.con = con
+        self._local.pid = os.getpid()
+        return con
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[name] += n
+
+    @staticmethod
+    def make_key(content_sha256: str, fingerprint: str) -> str:
+        return f"{content_sha256}:{fingerprint}"
+
+    # -- API -------------------------------------------------------------
+    def get(self, key: str) -> Optional[Tuple[str, bool]]:
+        if not self.enabled:
+            return None
+        try:
+            con = self._con()
+            row = con.execute(
+                "SELECT text, used_ocr, last_used FROM extract_cache WHERE cache_key=?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                self._count("misses")
+                return None
+            now = time.time()
+            if now - float(row[2]) > _TOUCH_INTERVAL_SECONDS:
+                con.execute(
+                    "UPDATE extract_cache SET last_used=? WHERE cache_key=?", (now, key)
+                )
+                con.commit()
+        except sqlite3.Error:
+            self._count("errors")
+            return None
+        self._count("hits")
+        return str(row[0]), bool(row[1])
+
+    def put(self, key: str, text: str, used_ocr: bool) -> None:
+        if not self.enabled:
+            return
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            con = self._con()
+            con.execute(
+                """
+                INSERT OR REPLACE INTO extract_cache(
+                  cache_key, text, used_ocr, size, created_at, last_used
+                ) VALUES (?,?,?,?,?,?)
+                """,
+                (key, text, 1 if used_ocr else 0, size, now, now),
+            )
+            con.commit()
+            self._count("puts")
+            self._evict(con)
+        except sqlite3.Error:
+            self._count("errors")
+
+    def _evict(self, con: sqlite3.Connection) -> None:
+        total = int(con.execute("SELECT COALESCE(SUM(size), 0) FROM extract_cache").fetchone()[0])
+        if total <= self.max_bytes:
+            return
+        # Trim to 90% so a full cache does not evict on every put.
+        excess = total - int(self.max_bytes * 0.9)
+        victims = []
+        for cache_key, size in con.execute(
+            "SELECT cache_key, size FROM extract_cache ORDER BY last_used ASC"
+        ):
+            victims.append((cache_key,))
+            excess -= int(size)
+            if excess <= 0:
+                break
+        con.executemany("DELETE FROM extract_cache WHERE cache_key=?", victims)
+        con.commit()
+        self._count("evictions", len(victims))
+
+    def clear(self) -> None:
+        try:
+            con = self._con()
+            con.execute("DELETE FROM extract_cache")
+            con.commit()
+        except sqlite3.Error:
+            self._count("errors")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            out: Dict[str, Any] = dict(self._stats)
+        lookups = out["hits"] + out["misses"]
+        out["hit_rate"] = round(out["hits"] / lookups, 4) if lookups else 0.0
+        out["enabled"] = self.enabled
+        out["max_bytes"] = self.max_bytes
+        out["entries"] = 0
+        out["bytes"] = 0
+        if self.enabled:
+            try:
+                row = self._con().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM extract_cache"
+                ).fetchone()
+                out["entries"], out["bytes"] = int(row[0]), int(row[1])
+            except sqlite3.Error:
+                pass
+        return out
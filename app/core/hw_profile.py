@@ -1,7 +1,12 @@
+import os
 import platform
 
 import psutil
 
+# Rough resident size of one OCR worker (rasterised page + tesseract).
+OCR_WORKER_RAM_GB = 1.0
+OCR_MAX_WORKERS = 8
+
 
 def get_hardware_profile():
     """
@@ -13,6 +18,7 @@ def get_hardware_profile():
 
     profile = {
         "ram_gb": round(total_ram_gb, 2),
+        "cpu_count": os.cpu_count() or 1,
         "os": os_info,
         "recommended_model": "llama3.2:3b",  # Default safe bet
     }
@@ -33,5 +39,20 @@ def get_hardware_profile():
     return profile
 
 
+def ocr_worker_limit(profile=None):
+    """
+    Number of parallel OCR processes this machine can afford: one core stays
+    free for the web server and every worker needs about OCR_WORKER_RAM_GB.
+    KUKANILEA_OCR_WORKERS overrides the estimate.
+    """
+    override = os.environ.get("KUKANILEA_OCR_WORKERS", "").strip()
+    if override.isdigit():
+        return max(1, int(override))
+    profile = profile or get_hardware_profile()
+    by_cpu = int(profile.get("cpu_count") or 1) - 1
+    by_ram = int(float(profile.get("ram_gb") or 0) // (2 * OCR_WORKER_RAM_GB))
+    return max(1, min(by_cpu, by_ram, OCR_MAX_WORKERS))
+
+
 if __name__ == "__main__":
     print(get_hardware_profile())
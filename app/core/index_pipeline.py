@@ -0,0 +1,654 @@
+"""
+app/core/index_pipeline.py
+Parallel, resumable full-vault indexer.
+
+Stages:
+  discovery (sorted walk) -> hashing (thread pool) -> extraction/OCR (process pool)
+  -> single writer thread committing via core.index_upsert_documents.
+
+A checkpoint (last fully written path per vault root) is persisted in the core DB
+so an interrupted run resumes behind the last committed window instead of
+rehashing the whole vault. Files whose (size, mtime_ns, inode) match the
+`file_manifest` row of an indexed document are skipped without being opened;
+`verify_fraction` re-hashes a random sample of those anyway.
+"""
+from __future__ import annotations
+
+import contextvars
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from app.core import logic as core
+
+logger = logging.getLogger("kukanilea.index_pipeline")
+
+HASH_CHUNK_SIZE = 1024 * 1024
+DEFAULT_BATCH_SIZE = int(os.environ.get("KUKANILEA_INDEX_BATCH_SIZE", "64") or 64)
+DEFAULT_WORKERS = int(
+    os.environ.get("KUKANILEA_INDEX_WORKERS", "")
+    or max(1, min(4, (os.cpu_count() or 2) - 1))
+)
+# Windows that may be extracting while the writer catches up (per worker).
+MAX_INFLIGHT_WINDOWS_PER_WORKER = 2
+
+_SKIP_REASONS = ("unsupported_ext", "already_indexed", "no_text", "parse_failed")
+
+_PROGRESS_LOCK = threading.Lock()
+_LAST_PROGRESS: Dict[str, Any] = {}
+
+
+# ============================================================
+# Stage helpers
+# ============================================================
+def sha256_file(fp: Path, chunk_size: int = HASH_CHUNK_SIZE) -> Tuple[str, int]:
+    """Streams a file through SHA-256 without loading it fully into memory."""
+    h = hashlib.sha256()
+    size = 0
+    with open(fp, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            h.update(chunk)
+    return h.hexdigest(), size
+
+
+def iter_vault_files(base: Path, after: Optional[str] = None) -> Iterator[Path]:
+    """
+    Yields files below `base` in a stable lexicographic order (files and
+    directories interleaved by name), optionally starting behind `after`
+    (a path relative to `base`, as stored in the checkpoint).
+    """
+    after_parts = tuple(Path(after).parts) if after else None
+
+    def _walk(directory: Path, rel: Tuple[str, ...]) -> Iterator[Path]:
+        try:
+            entries = sorted(os.scandir(directory), key=lambda e: e.name)
+        except OSError:
+            return
+        for entry in entries:
+            parts = rel + (entry.name,)
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                is_file = not is_dir and entry.is_file()
+            except OSError:
+                continue
+            if after_parts is not None:
+                # Entire subtree already behind the checkpoint.
+                if is_dir and parts < after_parts[: len(parts)]:
+                    continue
+                if is_file and parts <= after_parts:
+                    continue
+            if is_dir:
+                yield from _walk(Path(entry.path), parts)
+            elif is_file:
+                yield Path(entry.path)
+
+    yield from _walk(Path(base), ())
+
+
+def _chunked(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch: List[Any] = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _extract_for_index(path: str, content_sha256: str = "") -> Dict[str, Any]:
+    """Process-pool worker: text extraction/OCR plus the CPU-bound heuristics."""
+    fp = Path(path)
+    text, used_ocr = core._extract_text(fp, content_sha256=content_sha256)
+    if not text or len(text.strip()) < 3:
+        return {"text": "", "used_ocr": False}
+    best_date, _ = core._find_dates(text)
+    return {
+        "text": text,
+        "used_ocr": bool(used_ocr),
+        "doctype": core._detect_doctype(text, fp.name),
+        "doc_date": best_date or "",
+    }
+
+
+def _path_metadata(fp: Path) -> Optional[Dict[str, str]]:
+    """Tenant/kdnr/object folder from the vault layout (None if tenant is required but missing)."""
+    tenant = core._effective_tenant(core._infer_tenant_from_path(fp))
+    if core.TENANT_REQUIRE and not tenant:
+        return None
+    kdnr_raw = ""
+    object_folder = ""
+    for part in reversed(fp.parts):
+        m = re.match(r"^(\d{3,})[\s_]+", part)
+        if m:
+            kdnr_raw = m.group(1)
+            object_folder = part
+            break
+    return {
+        "tenant": tenant,
+        "kdnr": core._tenant_prefix_kdnr(tenant, kdnr_raw) if kdnr_raw else "",
+        "object_folder": (
+            core._tenant_object_folder_tag(tenant, object_folder) if object_folder else ""
+        ),
+    }
+
+
+# ============================================================
+# Progress
+# ============================================================
+class IndexProgress:
+    """Thread-safe counters for one indexing run."""
+
+    def __init__(self, base_path: Path, resumed_from: str = "") -> None:
+        self._lock = threading.Lock()
+        self.base_path = str(base_path)
+        self.resumed_from = resumed_from
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+        self.state = "running"
+        self.discovered = 0
+        self.hashed = 0
+        self.bytes_hashed = 0
+        self.extracted = 0
+        self.indexed = 0
+        self.errors = 0
+        self.manifest_hits = 0
+        self.manifest_verified = 0
+        self.manifest_mismatches = 0
+        self.checkpoint = resumed_from
+        self.skipped_by_reason: Dict[str, int] = {k: 0 for k in _SKIP_REASONS}
+
+    def add(self, **counters: int) -> None:
+        with self._lock:
+            for key, value in counters.items():
+                setattr(self, key, getattr(self, key) + int(value))
+
+    def skip(self, reason: str, n: int = 1) -> None:
+        with self._lock:
+            self.skipped_by_reason[reason] = self.skipped_by_reason.get(reason, 0) + n
+
+    def set(self, **values: Any) -> None:
+        with self._lock:
+            for key, value in values.items():
+                setattr(self, key, value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            end = self.finished_at if self.finished_at is not None else time.monotonic()
+            elapsed = max(end - self.started_at, 1e-9)
+            return {
+                "state": self.state,
+                "base_path": self.base_path,
+                "resumed_from": self.resumed_from,
+                "checkpoint": self.checkpoint,
+                "discovered": self.discovered,
+                "hashed": self.hashed,
+                "extracted": self.extracted,
+                "indexed": self.indexed,
+                "skipped": sum(self.skipped_by_reason.values()),
+                "errors": self.errors,
+                "manifest_hits": self.manifest_hits,
+                "manifest_verified": self.manifest_verified,
+                "manifest_mismatches": self.manifest_mismatches,
+                "skipped_by_reason": dict(self.skipped_by_reason),
+                "elapsed_s": round(elapsed, 3),
+                "files_per_s": round(self.discovered / elapsed, 2),
+                "indexed_per_s": round(self.indexed / elapsed, 2),
+                "mb_hashed_per_s": round(self.bytes_hashed / elapsed / (1024 * 1024), 2),
+            }
+
+
+def current_progress() -> Dict[str, Any]:
+    """Snapshot of the running (or most recent) indexing run in this process."""
+    with _PROGRESS_LOCK:
+        return dict(_LAST_PROGRESS)
+
+
+def _publish(progress: IndexProgress, callback: Optional[Callable[[Dict[str, Any]], None]]) -> None:
+    snap = progress.snapshot()
+    with _PROGRESS_LOCK:
+        _LAST_PROGRESS.clear()
+        _LAST_PROGRESS.update(snap)
+    if callback is not None:
+        try:
+            callback(snap)
+        except Exception as exc:
+            logger.warning("Index progress callback failed: %s", exc)
+
+
+# ============================================================
+# Checkpoints (core DB: index_checkpoints)
+# ============================================================
+def _checkpoint_key(base: Path) -> str:
+    return str(Path(base).resolve())
+
+
+def load_checkpoint(base: Path) -> Optional[Dict[str, Any]]:
+    with core._DB_LOCK:
+        con = core._db()
+        try:
+            row = con.execute(
+                "SELECT * FROM index_checkpoints WHERE base_path=?",
+                (_checkpoint_key(base),),
+            ).fetchone()
+            return dict(row) if row else None
+        finally:
+            con.close()
+
+
+def save_checkpoint(
+    base: Path, *, last_path: str, status: str, counters: Dict[str, Any]
+) -> None:
+    now = core._now_iso()
+    with core._DB_LOCK:
+        con = core._db()
+        try:
+            con.execute(
+                """
+                INSERT INTO index_checkpoints(base_path, last_path, status, counters_json, started_at, updated_at)
+                VALUES (?,?,?,?,?,?)
+                ON CONFLICT(base_path) DO UPDATE SET
+                    last_path=excluded.last_path,
+                    status=excluded.status,
+                    counters_json=excluded.counters_json,
+                    updated_at=excluded.updated_at
+                """,
+                (
+                    _checkpoint_key(base),
+                    last_path,
+                    status,
+                    json.dumps(counters, ensure_ascii=False),
+                    now,
+                    now,
+                ),
+            )
+            con.commit()
+        finally:
+            con.close()
+
+
+def record_manifest(entries: List[Tuple[str, Tuple[int, int, int], str]]) -> None:
+    if not entries:
+        return
+    with core._DB_LOCK:
+        con = core._db()
+        try:
+            core._manifest_record(con, entries)
+            con.commit()
+        finally:
+            con.close()
+
+
+def clear_checkpoint(base: Path) -> None:
+    with core._DB_LOCK:
+        con = core._db()
+        try:
+            con.execute(
+                "DELETE FROM index_checkpoints WHERE base_path=?", (_checkpoint_key(base),)
+            )
+            con.commit()
+        finally:
+            con.close()
+
+
+# ============================================================
+# Writer
+# ============================================================
+@dataclass
+class _Checkpoint:
+    rel_path: str
+
+
+@dataclass
+class _Window:
+    last_rel_path: str
+    jobs: List[Tuple[Dict[str, Any], Future]] = field(default_factory=list)
+
+    def done(self) -> bool:
+        return all(fut.done() for _, fut in self.jobs)
+
+
+class _BatchWriter(threading.Thread):
+    """Single consumer that owns all DB writes of a run."""
+
+    def __init__(self, indexer: "VaultIndexer") -> None:
+        super().__init__(name="kukanilea-index-writer", daemon=True)
+        self.indexer = indexer
+        self.q: "queue.Queue[Any]" = queue.Queue(maxsize=max(4, indexer.batch_size * 4))
+        self.failure: Optional[BaseException] = None
+        self._pending: List[Tuple[Dict[str, Any], Tuple[int, int, int]]] = []
+        # Keep the caller's bind_request_db_path() binding inside the writer thread.
+        self._ctx = contextvars.copy_context()
+
+    def run(self) -> None:
+        self._ctx.run(self._consume)
+
+    def _consume(self) -> None:
+        try:
+            while True:
+                item = self.q.get()
+                if item is None:
+                    self._flush()
+                    return
+                if isinstance(item, _Checkpoint):
+                    self._flush()
+                    self.indexer._commit_checkpoint(item.rel_path)
+                    continue
+                self._pending.append(item)
+                if len(self._pending) >= self.indexer.batch_size:
+                    self._flush()
+        except BaseException as exc:  # surfaced by VaultIndexer.run
+            self.failure = exc
+            # Keep draining so producers never block on a dead writer.
+            while True:
+                try:
+                    if self.q.get(timeout=0.1) is None:
+                        return
+                except queue.Empty:
+                    continue
+
+    def _flush(self) -> None:
+        batch, self._pending = self._pending, []
+        progress = self.indexer.progress
+        written: List[Tuple[str, Tuple[int, int, int], str]] = []
+        try:
+            core.index_upsert_documents([doc for doc, _ in batch], batch_size=len(batch) or 1)
+            written = [(doc["file_path"], stat, doc["doc_id"]) for doc, stat in batch]
+        except Exception as exc:
+            # One bad document must not cost the whole batch: retry one by one.
+            logger.warning("Batched index write failed, retrying per document: %s", exc)
+            for doc, stat in batch:
+                try:
+                    core.index_upsert_documents([doc])
+                    written.append((doc["file_path"], stat, doc["doc_id"]))
+                except Exception as exc_one:
+                    logger.warning("Index write failed for %s: %s", doc.get("file_name"), exc_one)
+                    progress.add(errors=1)
+                    progress.skip("parse_failed")
+        progress.add(indexed=len(written))
+        if written:
+            record_manifest(written)
+        if batch:
+            _publish(progress, self.indexer.on_progress)
+
+
+# ============================================================
+# Engine
+# ============================================================
+class VaultIndexer:
+    """
+    Full-vault indexing engine behind `index_run_full`.
+
+    `workers <= 1` runs extraction inline (no process pool), which keeps small
+    vaults and tests free of process start-up costs.
+    """
+
+    def __init__(
+        self,
+        base_path: Path,
+        *,
+        workers: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        resume: bool = True,
+        note: str = "indexed_by_full_scan",
+        verify_fraction: Optional[float] = None,
+        on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ) -> None:
+        self.base = Path(base_path)
+        self.workers = max(1, int(workers if workers is not None else DEFAULT_WORKERS))
+        self.batch_size = max(1, int(batch_size or DEFAULT_BATCH_SIZE))
+        self.resume = bool(resume)
+        self.note = note
+        self.verify_fraction = verify_fraction
+        self.on_progress = on_progress
+        self.progress = IndexProgress(self.base)
+        self._stop = threading.Event()
+        self._seen_doc_ids: Set[str] = set()
+        self._extract_pool: Optional[ProcessPoolExecutor] = None
+
+    def stop(self) -> None:
+        """Requests a graceful stop; the checkpoint keeps everything written so far."""
+        self._stop.set()
+
+    # -- checkpointing -------------------------------------------------
+    def _commit_checkpoint(self, rel_path: str) -> None:
+        self.progress.set(checkpoint=rel_path)
+        save_checkpoint(
+            self.base,
+            last_path=rel_path,
+            status="running",
+            counters=self.progress.snapshot(),
+        )
+
+    # -- stages ----------------------------------------------------------
+    def _submit_extract(self, path: str, content_sha256: str) -> Future:
+        if self._extract_pool is not None:
+            return self._extract_pool.submit(_extract_for_index, path, content_sha256)
+        fut: Future = Future()
+        try:
+            fut.set_result(_extract_for_index(path, content_sha256))
+        except Exception as exc:
+            fut.set_exception(exc)
+        return fut
+
+    def _hash_one(self, fp: Path) -> Optional[str]:
+        try:
+            doc_id, size = sha256_file(fp)
+        except Exception:
+            return None
+        self.progress.add(hashed=1, bytes_hashed=size)
+        return doc_id
+
+    def _manifest_rows(self, paths: List[str]) -> Dict[str, Tuple[Tuple[int, int, int], str]]:
+        with core._DB_LOCK:
+            con = core._db()
+            try:
+                return core._manifest_lookup(con, paths)
+            finally:
+                con.close()
+
+    def _known_doc_ids(self, doc_ids: List[str]) -> Set[str]:
+        if not doc_ids:
+            return set()
+        placeholders = ",".join("?" for _ in doc_ids)
+        with core._DB_LOCK:
+            con = core._db()
+            try:
+                rows = con.execute(  # nosec B608
+                    f"SELECT doc_id FROM docs WHERE doc_id IN ({placeholders})",
+                    tuple(doc_ids),
+                ).fetchall()
+            finally:
+                con.close()
+        return {str(r["doc_id"]) for r in rows}
+
+    def _prepare_window(self, window: List[Path], hash_pool: ThreadPoolExecutor) -> _Window:
+        progress = self.progress
+        progress.add(discovered=len(window))
+        out = _Window(last_rel_path=str(window[-1].relative_to(self.base)))
+
+        candidates = [fp for fp in window if fp.suffix.lower() in core.SUPPORTED_EXT]
+        if len(candidates) < len(window):
+            progress.skip("unsupported_ext", len(window) - len(candidates))
+
+        manifest = self._manifest_rows([str(fp) for fp in candidates])
+        # (path, stat, doc_id expected from the manifest when re-verifying)
+        to_hash: List[Tuple[Path, Tuple[int, int, int], Optional[str]]] = []
+        for fp in candidates:
+            try:
+                stat = core._manifest_stat(fp)
+            except OSError:
+                progress.skip("parse_failed")
+                continue
+            entry = manifest.get(str(fp))
+            if entry and entry[0] == stat:
+                if not core._manifest_should_verify(self.verify_fraction):
+                    progress.add(manifest_hits=1)
+                    progress.skip("already_indexed")
+                    self._seen_doc_ids.add(entry[1])
+                    continue
+                to_hash.append((fp, stat, entry[1]))
+            else:
+                to_hash.append((fp, stat, None))
+
+        hashed = list(hash_pool.map(self._hash_one, [fp for fp, _, _ in to_hash]))
+        known = self._known_doc_ids(sorted({d for d in hashed if d}))
+        unchanged: List[Tuple[str, Tuple[int, int, int], str]] = []
+        for (fp, stat, expected), doc_id in zip(to_hash, hashed):
+            if not doc_id:
+                progress.skip("parse_failed")
+                continue
+            if expected is not None:
+                progress.add(manifest_verified=1)
+                if doc_id != expected:
+                    progress.add(manifest_mismatches=1)
+                    logger.warning("Manifest mismatch (unchanged stat, new content): %s", fp)
+            if doc_id in known or doc_id in self._seen_doc_ids:
+                progress.skip("already_indexed")
+                unchanged.append((str(fp), stat, doc_id))
+                continue
+            meta = _path_metadata(fp)
+            if meta is None:
+                progress.skip("parse_failed")
+                continue
+            self._seen_doc_ids.add(doc_id)
+            job = {"doc_id": doc_id, "path": fp, "stat": stat, **meta}
+            out.jobs.append((job, self._submit_extract(str(fp), doc_id)))
+        record_manifest(unchanged)
+        return out
+
+    def _drain(self, window: _Window, writer: _BatchWriter) -> None:
+        for job, fut in window.jobs:
+            try:
+                res = fut.result()
+            except Exception as exc:
+                logger.warning("Extraction failed for %s: %s", job["path"].name, exc)
+                self.progress.add(errors=1)
+                self.progress.skip("parse_failed")
+                continue
+            self.progress.add(extracted=1)
+            if not res.get("text"):
+                self.progress.skip("no_text")
+                continue
+            fp: Path = job["path"]
+            doc_date = res.get("doc_date") or ""
+            doc = {
+                "doc_id": job["doc_id"],
+                "group_key": core._compute_group_key(
+                    job["kdnr"], res["doctype"], doc_date, fp.name
+                ),
+                "kdnr": job["kdnr"],
+                "object_folder": job["object_folder"],
+                "doctype": res["doctype"],
+                "doc_date": doc_date,
+                "file_name": fp.name,
+                "file_path": str(fp),
+                "extracted_text": res["text"],
+                "used_ocr": bool(res.get("used_ocr")),
+                "note": self.note,
+                "tenant_id": job["tenant"],
+            }
+            writer.q.put((doc, job["stat"]))
+        writer.q.put(_Checkpoint(window.last_rel_path))
+
+    # -- run ---------------------------------------------------------------
+    def run(self) -> Dict[str, Any]:
+        after = ""
+        if self.resume:
+            cp = load_checkpoint(self.base)
+            if cp and cp.get("status") == "running":
+                after = str(cp.get("last_path") or "")
+        self.progress = IndexProgress(self.base, resumed_from=after)
+        _publish(self.progress, self.on_progress)
+
+        writer = _BatchWriter(self)
+        writer.start()
+        if self.workers > 1:
+            self._extract_pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        max_inflight = self.workers * MAX_INFLIGHT_WINDOWS_PER_WORKER
+        inflight: Deque[_Window] = deque()
+        completed = False
+        try:
+            with ThreadPoolExecutor(
+                max_workers=min(8, self.workers * 2), thread_name_prefix="kukanilea-index-hash"
+            ) as hash_pool:
+                for window in _chunked(iter_vault_files(self.base, after or None), self.batch_size):
+                    if self._stop.is_set() or writer.failure is not None:
+                        break
+                    inflight.append(self._prepare_window(window, hash_pool))
+                    while inflight and (len(inflight) > max_inflight or inflight[0].done()):
+                        self._drain(inflight.popleft(), writer)
+                while inflight:
+                    self._drain(inflight.popleft(), writer)
+            completed = not self._stop.is_set()
+        finally:
+            writer.q.put(None)
+            writer.join()
+            if self._extract_pool is not None:
+                self._extract_pool.shutdown(wait=True, cancel_futures=True)
+                self._extract_pool = None
+
+        if writer.failure is not None:
+            self.progress.set(state="failed", finished_at=time.monotonic())
+            _publish(self.progress, self.on_progress)
+            raise writer.failure
+
+        state = "done" if completed else "stopped"
+        self.progress.set(state=state, finished_at=time.monotonic())
+        snap = self.progress.snapshot()
+        save_checkpoint(
+            self.base,
+            last_path="" if completed else snap["checkpoint"],
+            status=state if completed else "running",
+            counters=snap,
+        )
+        _publish(self.progress, self.on_progress)
+        return snap
+
+
+def run_full_index(
+    base_path: Path,
+    *,
+    workers: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    resume: bool = True,
+    verify_fraction: Optional[float] = None,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    return VaultIndexer(
+        base_path,
+        workers=workers,
+        batch_size=batch_size,
+        resume=resume,
+        verify_fraction=verify_fraction,
+        on_progress=on_progress,
+    ).run()
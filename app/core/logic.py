@@ -19,30 +19,42 @@ Hinweis:
 """
 
 from __future__ import annotations
-from app.core.audit import vault_store_evidence
 
 import base64
 import csv
 import hashlib
 import hmac
 import io
+import itertools
 import json
+import logging
 import os
+import random
 import re
 import sqlite3
 import threading
 import time
 import unicodedata
 import zipfile
+from collections import OrderedDict
 from contextvars import ContextVar
 from datetime import UTC, date, datetime, timedelta, timezone
 from difflib import SequenceMatcher
 from email import policy
 from email.parser import BytesParser
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
+from app.core import ocr_engine
+from app.core.audit import vault_store_evidence
+from app.core.db_lock import DBLock
+from app.core.db_pool import ConnectionPool, PooledConnection
+from app.core.extraction_cache import ExtractionCache
 from app.core.gewerke_profiles import get_active_profile
+from app.core.pending_store import PendingStore
+from app.core.render_cache import RenderCache
+
+logger = logging.getLogger("kukanilea.core")
 
 # Optional libs
 try:
@@ -174,16 +186,42 @@ SUPPORTED_EXT = {
     ".mp3",
 }
 
+# Stat manifest: fraction of unchanged files whose hash is re-verified anyway
+# ("paranoid" mode, 0 = trust size/mtime/inode completely).
+INDEX_VERIFY_FRACTION = float(_env("INDEX_VERIFY_FRACTION", "0") or 0)
+
 # OCR / Extraction limits
 OCR_MAX_PAGES = 20
+OCR_LANG = "deu+eng"
+OCR_DPI = 250
+# Pages read through the PDF text layer before a document counts as scanned.
+PDF_TEXT_PROBE_PAGES = 2
+# Upload analysis stops OCR once doctype, date and kdnr are recognisable.
+OCR_EARLY_EXIT = _env_bool("OCR_EARLY_EXIT", "1")
 MIN_TEXT_LEN_BEFORE_OCR = 5 # Lower threshold as requested
 MAX_PREVIEW_LEN = 1200
 
+# Bump whenever _extract_text can return different text for the same bytes;
+# it is part of every extraction cache key.
+EXTRACTOR_VERSION = 1
+EXTRACT_CACHE_PATH = _KUK_DATA_ROOT / _env("EXTRACT_CACHE_FILENAME", "extract_cache.sqlite3")
+EXTRACT_CACHE_MAX_MB = int(_env("EXTRACT_CACHE_MAX_MB", "512") or 0)
+
+# Visualizer: default page raster DPI, the zoom levels a client may request,
+# pages rendered ahead when an upload lands in pending, and the render cache.
+VISUALIZER_DPI = 130
+VISUALIZER_DPI_LEVELS = (72, 130, 200)
+VISUALIZER_PRERENDER_PAGES = int(_env("VISUALIZER_PRERENDER_PAGES", "2") or 0)
+VISUALIZER_CACHE_DIR = _KUK_DATA_ROOT / _env("VISUALIZER_CACHE_DIRNAME", "visualizer_cache")
+VISUALIZER_CACHE_MAX_MB = int(_env("VISUALIZER_CACHE_MAX_MB", "256") or 0)
+# Bump when the payload layout changes; part of every cached payload key.
+VISUALIZER_PAYLOAD_VERSION = 2
+
 
 def _db_find_customer_by_name_in_text(text: str, tenant_id: str) -> Optional[Dict[str, Any]]:
     tenant_id = _effective_tenant(tenant_id) or _effective_tenant(TENANT_DEFAULT) or "default"
     if not text or len(text) < 20: return None
-    with _DB_LOCK:
+    with _DB_LOCK.read():
         con = _db()
         try:
             rows = con.execute("SELECT * FROM customers WHERE tenant_id=?", (tenant_id,)).fetchall()
@@ -201,6 +239,11 @@ DEFAULT_DUP_SIM_THRESHOLD = 0.93
 # Assistant search result size
 ASSISTANT_DEFAULT_LIMIT = 50
 
+# assistant_suggest: trigram-index shortlist that is fuzzy-ranked, and the
+# number of cached suggestion queries per tenant.
+SUGGEST_SHORTLIST = 200
+SUGGEST_CACHE_PER_TENANT = 256
+
 # Extraction size guards (prevent huge RAM / DB bloat)
 MAX_EXTRACT_CHARS = 200_000
 MAX_CSV_ROWS = 2000
@@ -237,6 +280,14 @@ def _sha256_bytes(b: bytes) -> str:
     return h.hexdigest()
 
 
+def _sha256_file(fp: Path, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(fp, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
 def _read_bytes(fp: Path) -> bytes:
     with open(fp, "rb") as f:
         return f.read()
@@ -486,10 +537,20 @@ def parse_excel_like_date(s: Any) -> str:
 
 
 # ============================================================
-# PENDING / DONE store (JSON files)
+# PENDING store (SQLite, see app.core.pending_store) / DONE store (JSON files)
 # ============================================================
-def _pending_path(token: str) -> Path:
-    return PENDING_DIR / f"{token}.json"
+_PENDING_STORES: Dict[str, PendingStore] = {}
+_PENDING_STORES_LOCK = threading.Lock()
+
+
+def _pending_store() -> PendingStore:
+    # Keyed by directory so a re-pointed PENDING_DIR (tests, data-root switch) gets its own DB.
+    key = str(PENDING_DIR)
+    store = _PENDING_STORES.get(key)
+    if store is None:
+        with _PENDING_STORES_LOCK:
+            store = _PENDING_STORES.setdefault(key, PendingStore(PENDING_DIR))
+    return store
 
 
 def _done_path(token: str) -> Path:
@@ -497,34 +558,35 @@ def _done_path(token: str) -> Path:
 
 
 def read_pending(token: str) -> Optional[Dict[str, Any]]:
-    fp = _pending_path(token)
-    if not fp.exists():
+    try:
+        return _pending_store().read(token)
+    except sqlite3.Error:
         return None
+
+
+def read_pending_progress(token: str) -> Optional[Dict[str, Any]]:
+    """status/progress/progress_phase/error of a pending job without its payload."""
     try:
-        return json.loads(fp.read_text(encoding="utf-8"))
-    except Exception:
+        return _pending_store().read_progress(token)
+    except sqlite3.Error:
         return None
 
 
 def write_pending(token: str, payload: Dict[str, Any]) -> None:
-    fp = _pending_path(token)
-    _atomic_write_text(
-        fp, json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8"
-    )
+    _pending_store().write(token, payload)
 
 
 def delete_pending(token: str) -> None:
-    fp = _pending_path(token)
     try:
-        fp.unlink()
-    except Exception:
+        _pending_store().delete(token)
+    except sqlite3.Error:
         pass
 
 
 def list_recent_docs(tenant_id: str = "", limit: int = 10) -> List[Dict[str, Any]]:
     tenant_id = _effective_tenant(tenant_id) or _effective_tenant(TENANT_DEFAULT) or "default"
     out: List[Dict[str, Any]] = []
-    with _DB_LOCK:
+    with _DB_LOCK.read():
         con = _db()
         try:
             rows = con.execute(  # nosec B608
@@ -547,21 +609,21 @@ def list_recent_docs(tenant_id: str = "", limit: int = 10) -> List[Dict[str, Any
 
 
 def list_pending(username: Optional[str] = None) -> List[Dict[str, Any]]:
-    out: List[Dict[str, Any]] = []
-    PENDING_DIR.mkdir(parents=True, exist_ok=True)
-    for fp in sorted(
-        PENDING_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True
-    ):
-        try:
-            j = json.loads(fp.read_text(encoding="utf-8"))
-            # Privacy: Only show own documents. Admin/Dev could bypass this in UI logic if needed.
-            if username and j.get("owner") and j.get("owner") != username:
-                continue
-            j["_token"] = fp.stem
-            out.append(j)
-        except Exception:
-            continue
-    return out
+    """
+    Pending jobs, newest first. Privacy: only own (or unowned) documents when a
+    username is given. Items omit extracted_text/preview; use read_pending.
+    """
+    try:
+        return _pending_store().list(owner=username)
+    except sqlite3.Error:
+        return []
+
+
+def count_pending(username: Optional[str] = None) -> int:
+    try:
+        return _pending_store().count(owner=username)
+    except sqlite3.Error:
+        return 0
 
 
 def write_done(token: str, payload: Dict[str, Any]) -> None:
@@ -584,7 +646,9 @@ def read_done(token: str) -> Optional[Dict[str, Any]]:
 # ============================================================
 # SQLITE DB
 # ============================================================
-_DB_LOCK = threading.RLock()
+# Writers are serialised, readers run on WAL snapshots (KUKANILEA_DB_SHARED_READS=0
+# makes reads exclusive again).
+_DB_LOCK = DBLock(shared_reads=_env_bool("DB_SHARED_READS", "1"))
 _FTS5_AVAILABLE: Optional[bool] = None
 
 
@@ -595,6 +659,11 @@ _INDEX_WARMUP_THREAD: Optional[threading.Thread] = None
 _REQUEST_DB_PATH: ContextVar[Optional[Path]] = ContextVar(
     "kukanilea_request_db_path", default=None
 )
+# Per-thread connection reuse for _db(); KUKANILEA_DB_POOL=0 restores open-per-call.
+_DB_POOL = ConnectionPool(
+    max_idle_seconds=float(_env("DB_POOL_MAX_IDLE_SECONDS", "300") or 300),
+    enabled=_env_bool("DB_POOL", "1"),
+)
 
 
 def bind_request_db_path(path: Optional[Path]) -> None:
@@ -605,8 +674,20 @@ def bind_request_db_path(path: Optional[Path]) -> None:
 def _active_db_path() -> Path:
     return _REQUEST_DB_PATH.get() or DB_PATH
 
-def _open_db_connection(*, configure_wal: bool = False) -> sqlite3.Connection:
-    con = sqlite3.connect(str(_active_db_path()), timeout=5.0)
+def _open_db_connection(
+    *, configure_wal: bool = False, pooled: bool = False
+) -> sqlite3.Connection:
+    if pooled:
+        # check_same_thread=False only so the pool can close idle handles from
+        # another thread; a pooled connection is never used by two threads.
+        con = sqlite3.connect(
+            str(_active_db_path()),
+            timeout=5.0,
+            factory=PooledConnection,
+            check_same_thread=False,
+        )
+    else:
+        con = sqlite3.connect(str(_active_db_path()), timeout=5.0)
     con.row_factory = sqlite3.Row
     con.execute("PRAGMA busy_timeout=5000;")
     if configure_wal:
@@ -632,7 +713,22 @@ def _db() -> sqlite3.Connection:
                 db_init()
                 _DB_INITIALIZED_PATHS.add(db_key)
 
-    return _open_db_connection()
+    return _DB_POOL.acquire(db_key, lambda: _open_db_connection(pooled=True))
+
+
+def db_pool_stats() -> Dict[str, Any]:
+    """Hit/miss/eviction counters and acquire/open timings of the core DB pool."""
+    return _DB_POOL.stats()
+
+
+def db_lock_stats() -> Dict[str, Any]:
+    """Writer wait/hold times and reader concurrency of the core DB lock."""
+    return _DB_LOCK.stats()
+
+
+def close_db_pool() -> int:
+    """Closes all idle pooled core DB connections (e.g. before replacing the DB file)."""
+    return _DB_POOL.clear()
 
 
 def _table_exists(con: sqlite3.Connection, name: str) -> bool:
@@ -1080,6 +1176,35 @@ def db_init() -> None:
                 "CREATE INDEX IF NOT EXISTS idx_docs_index_tokens ON docs_index(tokens);"
             )
 
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS file_manifest(
+                  file_path TEXT PRIMARY KEY,
+                  size INTEGER NOT NULL,
+                  mtime_ns INTEGER NOT NULL,
+                  inode INTEGER NOT NULL,
+                  doc_id TEXT NOT NULL,
+                  verified_at TEXT NOT NULL
+                );
+                """
+            )
+            con.execute(
+                "CREATE INDEX IF NOT EXISTS idx_file_manifest_doc ON file_manifest(doc_id);"
+            )
+
+            con.execute(
+                """
+                CREATE TABLE IF NOT EXISTS index_checkpoints(
+                  base_path TEXT PRIMARY KEY,
+                  last_path TEXT NOT NULL DEFAULT '',
+                  status TEXT NOT NULL,
+                  counters_json TEXT,
+                  started_at TEXT NOT NULL,
+                  updated_at TEXT NOT NULL
+                );
+                """
+            )
+
             if _has_fts5(con):
                 con.execute(
                     """
@@ -1098,6 +1223,8 @@ def db_init() -> None:
                     """
                 )
 
+                _suggest_index_init(con)
+
             row = con.execute("PRAGMA user_version").fetchone()
             cur_ver = int(row[0] if row else 0)
             if cur_ver < SCHEMA_VERSION:
@@ -1211,7 +1338,7 @@ def rbac_get_user_roles(username: str) -> List[str]:
     username = normalize_component(username).lower()
     if not username:
         return []
-    with _DB_LOCK:
+    with _DB_LOCK.read():
         con = _db()
         try:
             rows = con.execute(
@@ -1339,7 +1466,7 @@ def task_list(
     status = normalize_component(status).upper()
     limit = max(1, min(int(limit), 2000))
 
-    with _DB_LOCK:
+    with _DB_LOCK.read():
         con = _db()
         try:
             rows = con.execute(
@@ -1477,7 +1604,7 @@ def time_project_list(
 ) -> List[Dict[str, Any]]:
     tenant_id = _time_tenant(tenant_id)
     status = normalize_component(status).upper() or "ACTIVE"
-    with _DB_LOCK:
+    with _DB_LOCK.read():
         con = _db()
         try:
             rows = con.execute(
@@ -1582,7 +1709,7 @@ def time_entry_start(
 
 def time_entry_get(*, tenant_id: str, entry_id: int) -> Optional[Dict[str, Any]]:
     tenant_id = _time_tenant(tenant_id)
-    with _DB_LOCK:
+    with _DB_LOCK.read():
         con = _db()
         try:
             row = con.execute(
@@ -1805,7 +1932,7 @@ def time_entries_list(
     user_filter = user or ""
     start_filter = start_at or ""
     end_filter = end_at or ""
-    with _DB_LOCK:
+    with _DB_LOCK.read():
         con = _db()
         try:
             rows = con.execute(
@@ -1997,7 +2124,7 @@ def time_absence_create(
 def time_absences_export_csv(*, tenant_id: str, user: Optional[str] = None) -> str:
     tenant_id = _time_tenant(tenant_id)
     user = normalize_component(user or "").lower()
-    with _DB_LOCK:
+    with _DB_LOCK.read():
         con = _db()
         try:
             if user:
@@ -2332,13 +2459,29 @@ def detect_object_duplicates_for_kdnr(
 # ============================================================
 # EXTRACTION / OCR
 # ============================================================
-def _extract_pdf_text(fp: Path) -> str:
+# KUKANILEA_EXTRACT_CACHE=0 (or EXTRACT_CACHE_MAX_MB=0) disables the cache.
+EXTRACT_CACHE = ExtractionCache(
+    EXTRACT_CACHE_PATH,
+    max_bytes=EXTRACT_CACHE_MAX_MB * 1024 * 1024,
+    enabled=_env_bool("EXTRACT_CACHE", "1"),
+)
+
+
+def _extract_pdf_text(fp: Path, *, probe: bool = False) -> str:
+    """
+    Text layer of the first OCR_MAX_PAGES pages. With probe=True the pass
+    stops when the first PDF_TEXT_PROBE_PAGES pages carry no text; only use
+    that when OCR is going to run on the document anyway.
+    """
     if PdfReader is None:
         return ""
     try:
         reader = PdfReader(str(fp))
         texts: List[str] = []
-        for page in reader.pages[: max(1, OCR_MAX_PAGES)]:
+        for i, page in enumerate(reader.pages[: max(1, OCR_MAX_PAGES)]):
+            # No text layer on the first pages: a scan, go straight to OCR.
+            if probe and i >= PDF_TEXT_PROBE_PAGES and not texts:
+                break
             try:
                 t = page.extract_text() or ""
                 if t:
@@ -2350,20 +2493,23 @@ def _extract_pdf_text(fp: Path) -> str:
         return ""
 
 
-def _ocr_pdf(fp: Path) -> str:
-    if fitz is None or pytesseract is None or Image is None:
-        return ""
+def _ocr_pdf(
+    fp: Path,
+    *,
+    on_page: Optional[Callable[[int, int], None]] = None,
+    stop_when: Optional[Callable[[str], bool]] = None,
+) -> str:
+    """Page-parallel OCR (app.core.ocr_engine), capped at OCR_MAX_PAGES."""
     try:
-        doc = fitz.open(str(fp))
-        texts: List[str] = []
-        for i in range(min(len(doc), OCR_MAX_PAGES)):
-            page = doc.load_page(i)
-            pix = page.get_pixmap(dpi=250)
-            img = Image.open(io.BytesIO(pix.tobytes("png")))
-            txt = pytesseract.image_to_string(img, lang="deu+eng")
-            if txt:
-                texts.append(txt)
-        return "\n".join(texts).strip()
+        result = ocr_engine.ocr_pdf(
+            fp,
+            max_pages=OCR_MAX_PAGES,
+            dpi=OCR_DPI,
+            lang=OCR_LANG,
+            on_page=on_page,
+            stop_when=stop_when,
+        )
+        return result.text
     except Exception:
         return ""
 
@@ -2373,7 +2519,7 @@ def _ocr_image(fp: Path) -> str:
         return ""
     try:
         img = Image.open(str(fp))
-        txt = pytesseract.image_to_string(img, lang="deu+eng")
+        txt = pytesseract.image_to_string(img, lang=OCR_LANG)
         return (txt or "").strip()
     except Exception:
         return ""
@@ -2786,11 +2932,73 @@ def build_visualizer_payload(fp: Path, page: int = 0, sheet: str = "", force_ocr
     return payload
 
 
-def _extract_text(fp: Path, force_ocr: bool = False) -> Tuple[str, bool]:
+_IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp", ".webp")
+# Only formats that may go through OCR are worth hashing for the cache.
+_EXTRACT_CACHED_EXTS = (".pdf", *_IMAGE_EXTS)
+
+
+def _extract_cache_fingerprint(ext: str, force_ocr: bool) -> str:
+    ocr_ready = ocr_engine.ocr_available()
+    return (
+        f"v{EXTRACTOR_VERSION}{ext}:ocr={int(ocr_ready)}:{OCR_LANG}@{OCR_DPI}"
+        f":p{OCR_MAX_PAGES}:min{MIN_TEXT_LEN_BEFORE_OCR}:clip{MAX_EXTRACT_CHARS}"
+        f":force={int(bool(force_ocr))}:pdf={int(PdfReader is not None)}"
+    )
+
+
+def _extract_text(
+    fp: Path,
+    force_ocr: bool = False,
+    *,
+    content_sha256: str = "",
+    on_ocr_page: Optional[Callable[[int, int], None]] = None,
+    ocr_stop_when: Optional[Callable[[str], bool]] = None,
+) -> Tuple[str, bool]:
     """
     Returns (text, used_ocr)
+
+    PDFs and images are served from the extraction cache when the same bytes
+    were extracted before with the same settings. Pass content_sha256 if the
+    caller already hashed the file. on_ocr_page/ocr_stop_when are handed to the
+    page-parallel PDF OCR (see app.core.ocr_engine.ocr_pdf); a run that stopped
+    early is not cached.
     """
     ext = fp.suffix.lower()
+    stopped = [False]
+    stop_when = None
+    if ocr_stop_when is not None:
+
+        def stop_when(text: str) -> bool:
+            stopped[0] = bool(ocr_stop_when(text))
+            return stopped[0]
+
+    ocr_opts = {"on_page": on_ocr_page, "stop_when": stop_when}
+    if ext not in _EXTRACT_CACHED_EXTS or not EXTRACT_CACHE.enabled:
+        return _extract_text_uncached(fp, force_ocr=force_ocr, ocr_opts=ocr_opts)
+    try:
+        digest = content_sha256 or _sha256_file(fp)
+    except OSError:
+        return _extract_text_uncached(fp, force_ocr=force_ocr, ocr_opts=ocr_opts)
+    key = EXTRACT_CACHE.make_key(digest, _extract_cache_fingerprint(ext, force_ocr))
+    hit = EXTRACT_CACHE.get(key)
+    if hit is not None:
+        return hit
+    text, used_ocr = _extract_text_uncached(fp, force_ocr=force_ocr, ocr_opts=ocr_opts)
+    if text and not stopped[0]:
+        # Empty results are not cached: they are usually a transient OCR failure.
+        EXTRACT_CACHE.put(key, text, used_ocr)
+    return text, used_ocr
+
+
+def extract_cache_stats() -> Dict[str, Any]:
+    """Hit/miss/eviction counters and size of the extraction cache."""
+    return EXTRACT_CACHE.stats()
+
+
+def _extract_text_uncached(
+    fp: Path, force_ocr: bool = False, ocr_opts: Optional[Dict[str, Any]] = None
+) -> Tuple[str, bool]:
+    ext = fp.suffix.lower()
 
     if ext == ".txt":
         try:
@@ -2840,21 +3048,118 @@ def _extract_text(fp: Path, force_ocr: bool = False) -> Tuple[str, bool]:
         return _clip_text(t), False
 
     if ext == ".pdf":
-        t = _extract_pdf_text(fp)
+        probe = ocr_engine.ocr_available()
+        t = _extract_pdf_text(fp, probe=probe)
         if not force_ocr and len(t) >= MIN_TEXT_LEN_BEFORE_OCR:
             return _clip_text(t), False
-        o = _ocr_pdf(fp)
+        o = _ocr_pdf(fp, **(ocr_opts or {}))
         if o:
             return _clip_text(o), True
+        if probe and not t:
+            # OCR came back empty: fall back to the full text-layer pass.
+            t = _extract_pdf_text(fp)
         return _clip_text(t), False
 
-    if ext in (".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp", ".webp"):
+    if ext in _IMAGE_EXTS:
         o = _ocr_image(fp)
         return _clip_text(o), True if o else False
 
     return "", False
 
 
+# KUKANILEA_VISUALIZER_CACHE=0 (or VISUALIZER_CACHE_MAX_MB=0) disables the cache.
+RENDER_CACHE = RenderCache(
+    VISUALIZER_CACHE_DIR,
+    max_bytes=VISUALIZER_CACHE_MAX_MB * 1024 * 1024,
+    enabled=_env_bool("VISUALIZER_CACHE", "1"),
+)
+_VISUALIZER_HASHES: "OrderedDict[Tuple[str, int, int, int], str]" = OrderedDict()
+_VISUALIZER_HASHES_LOCK = threading.Lock()
+
+
+def _visualizer_file_hash(fp: Path) -> str:
+    """Content SHA-256, memoised per (path, size, mtime_ns, inode)."""
+    st = fp.stat()
+    sig = (str(fp), int(st.st_size), int(st.st_mtime_ns), int(st.st_ino))
+    with _VISUALIZER_HASHES_LOCK:
+        digest = _VISUALIZER_HASHES.get(sig)
+        if digest is not None:
+            _VISUALIZER_HASHES.move_to_end(sig)
+            return digest
+    digest = _sha256_file(fp)
+    with _VISUALIZER_HASHES_LOCK:
+        _VISUALIZER_HASHES[sig] = digest
+        while len(_VISUALIZER_HASHES) > 1024:
+            _VISUALIZER_HASHES.popitem(last=False)
+    return digest
+
+
+def _visualizer_dpi(dpi: Optional[int]) -> int:
+    """Snaps a requested DPI to the nearest level of VISUALIZER_DPI_LEVELS."""
+    if not dpi:
+        return VISUALIZER_DPI
+    return min(VISUALIZER_DPI_LEVELS, key=lambda level: abs(level - int(dpi)))
+
+
+def visualizer_page_key(fp: Path, *, page: int = 0, dpi: Optional[int] = None) -> str:
+    """Cache key (and HTTP ETag) of a rendered PDF page."""
+    return RENDER_CACHE.make_key(
+        "page", _visualizer_file_hash(Path(fp)), max(0, int(page)), _visualizer_dpi(dpi)
+    )
+
+
+def render_visualizer_page(
+    fp: Path, *, page: int = 0, dpi: Optional[int] = None
+) -> Tuple[bytes, str]:
+    """
+    PNG of one PDF page plus its cache key; served from the render cache when
+    the same bytes/page/DPI were rendered before.
+    """
+    target = Path(fp)
+    if not target.exists():
+        raise FileNotFoundError(target)
+    if target.suffix.lower() != ".pdf" or fitz is None:
+        raise ValueError("page_render_unavailable")
+    key = visualizer_page_key(target, page=page, dpi=dpi)
+    png = RENDER_CACHE.get(key, ".png")
+    if png is not None:
+        return png, key
+    doc = fitz.open(str(target))
+    try:
+        if len(doc) <= 0:
+            raise ValueError("page_render_unavailable")
+        index = max(0, min(int(page), len(doc) - 1))
+        png = doc.load_page(index).get_pixmap(dpi=_visualizer_dpi(dpi)).tobytes("png")
+    finally:
+        doc.close()
+    RENDER_CACHE.put(key, ".png", png)
+    return png, key
+
+
+def prerender_visualizer_pages(fp: Path, pages: Optional[int] = None) -> int:
+    """Warms the render cache for the first pages of a PDF; returns pages rendered."""
+    target = Path(fp)
+    count = VISUALIZER_PRERENDER_PAGES if pages is None else int(pages)
+    if count <= 0 or target.suffix.lower() != ".pdf" or fitz is None:
+        return 0
+    done = 0
+    try:
+        for i in range(count):
+            payload = build_visualizer_payload(target, page=i)
+            page_info = payload.get("page") or {}
+            if int(page_info.get("index", -1)) != i:
+                break
+            render_visualizer_page(target, page=i)
+            done += 1
+    except Exception as exc:
+        logger.warning("Visualizer pre-render failed for %s: %s", target.name, exc)
+    return done
+
+
+def visualizer_cache_stats() -> Dict[str, Any]:
+    return RENDER_CACHE.stats()
+
+
 def _visualizer_base_meta(fp: Path) -> Dict[str, Any]:
     return {
         "file": {
@@ -3006,8 +3311,6 @@ def _visualizer_pdf_payload(fp: Path, *, page: int = 0, force_ocr: bool = False)
 
     index = max(0, min(int(page), len(doc) - 1))
     pdf_page = doc.load_page(index)
-    pix = pdf_page.get_pixmap(dpi=130)
-    image_b64 = base64.b64encode(pix.tobytes("png")).decode("utf-8")
 
     ocr_boxes: List[Dict[str, Any]] = []
     try:
@@ -3034,10 +3337,12 @@ def _visualizer_pdf_payload(fp: Path, *, page: int = 0, force_ocr: bool = False)
     payload.update(
         {
             "kind": "pdf",
+            # The raster is served separately (render_visualizer_page), keyed by image_key.
             "page": {
                 "index": index,
                 "count": len(doc),
-                "image_b64": image_b64,
+                "dpi": VISUALIZER_DPI,
+                "image_key": visualizer_page_key(fp, page=index),
             },
             "text": {"content": _clip_text(pdf_page.get_text("text"), 12_000)},
             "layers": {
@@ -3068,6 +3373,23 @@ def build_visualizer_payload(
         raise FileNotFoundError(target)
 
     ext = target.suffix.lower()
+    key = RENDER_CACHE.make_key(
+        "payload",
+        VISUALIZER_PAYLOAD_VERSION,
+        _visualizer_file_hash(target),
+        ext,
+        max(0, int(page)) if ext == ".pdf" else 0,
+        sheet if ext == ".xlsx" else "",
+        int(bool(force_ocr)),
+    )
+    cached = RENDER_CACHE.get(key, ".json")
+    if cached is not None:
+        payload = json.loads(cached.decode("utf-8"))
+        payload["file"] = _visualizer_base_meta(target)["file"]
+        payload["perf"] = _visualizer_perf(started_at)
+        payload["perf"]["cache_hit"] = True
+        return payload
+
     if ext == ".pdf":
         payload = _visualizer_pdf_payload(target, page=page, force_ocr=force_ocr)
     elif ext == ".csv":
@@ -3077,6 +3399,7 @@ def build_visualizer_payload(
     else:
         payload = _visualizer_text_payload(target, force_ocr=force_ocr)
 
+    RENDER_CACHE.put(key, ".json", json.dumps(payload, ensure_ascii=False).encode("utf-8"))
     payload["perf"] = _visualizer_perf(started_at)
     return payload
 
@@ -3296,12 +3619,14 @@ def extract_entities(text: str) -> List[Dict[str, Any]]:
     return entities
 
 
-def _store_entities(
-    con: sqlite3.Connection, tenant_id: str, doc_id: str, text: str
-) -> None:
+def _entity_rows(
+    tenant_id: str, doc_id: str, text: str, created_at: str = ""
+) -> List[Tuple[Any, ...]]:
     entities = extract_entities(text)
     if not entities:
-        return
+        return []
+    created_at = created_at or _now_iso()
+    rows: List[Tuple[Any, ...]] = []
     seen = set()
     for ent in entities:
         value = str(ent.get("value", "") or "")
@@ -3312,11 +3637,7 @@ def _store_entities(
         if key in seen:
             continue
         seen.add(key)
-        con.execute(
-            """
-            INSERT INTO entities(tenant_id, doc_id, entity_type, value, norm_value, meta_json, created_at)
-            VALUES (?,?,?,?,?,?,?)
-            """,
+        rows.append(
             (
                 tenant_id,
                 doc_id,
@@ -3324,9 +3645,24 @@ def _store_entities(
                 value,
                 norm,
                 json.dumps(ent.get("meta", {})),
-                _now_iso(),
-            ),
+                created_at,
+            )
         )
+    return rows
+
+
+_ENTITY_INSERT_SQL = """
+    INSERT INTO entities(tenant_id, doc_id, entity_type, value, norm_value, meta_json, created_at)
+    VALUES (?,?,?,?,?,?,?)
+"""
+
+
+def _store_entities(
+    con: sqlite3.Connection, tenant_id: str, doc_id: str, text: str
+) -> None:
+    rows = _entity_rows(tenant_id, doc_id, text)
+    if rows:
+        con.executemany(_ENTITY_INSERT_SQL, rows)
 
 
 # ============================================================
@@ -3375,10 +3711,15 @@ def _index_extract_fields(text: str, file_name: str) -> Dict[str, str]:
     }
 
 
-def _index_put(con: sqlite3.Connection, row: Dict[str, Any]) -> None:
-    doc_id = str(row.get("doc_id", "") or "")
-    if not doc_id:
-        return
+_INDEX_INSERT_SQL = """
+    INSERT INTO docs_index(
+        doc_id, tenant_id, kdnr, doctype, customer_name, address,
+        doc_date, doc_number, file_name, file_path, tokens, snippet, updated_at
+    ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
+"""
+
+
+def _index_row(row: Dict[str, Any]) -> Tuple[Any, ...]:
     tokens = _index_tokens(
         " ".join(
             [
@@ -3393,32 +3734,57 @@ def _index_put(con: sqlite3.Connection, row: Dict[str, Any]) -> None:
         ),
         extra=[row.get("doc_date", "")],
     )
-    con.execute("DELETE FROM docs_index WHERE doc_id = ?", (doc_id,))
-    con.execute(
-        """
-        INSERT INTO docs_index(
-            doc_id, tenant_id, kdnr, doctype, customer_name, address,
-            doc_date, doc_number, file_name, file_path, tokens, snippet, updated_at
-        ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)
-        """,
-        (
-            doc_id,
-            str(row.get("tenant_id", "") or ""),
-            str(row.get("kdnr", "") or ""),
-            str(row.get("doctype", "") or ""),
-            str(row.get("customer_name", "") or ""),
-            str(row.get("address", "") or ""),
-            str(row.get("doc_date", "") or ""),
-            str(row.get("doc_number", "") or ""),
-            str(row.get("file_name", "") or ""),
-            str(row.get("file_path", "") or ""),
-            tokens,
-            _clip_text(str(row.get("snippet", "") or ""), 240),
-            _now_iso(),
-        ),
+    return (
+        str(row.get("doc_id", "") or ""),
+        str(row.get("tenant_id", "") or ""),
+        str(row.get("kdnr", "") or ""),
+        str(row.get("doctype", "") or ""),
+        str(row.get("customer_name", "") or ""),
+        str(row.get("address", "") or ""),
+        str(row.get("doc_date", "") or ""),
+        str(row.get("doc_number", "") or ""),
+        str(row.get("file_name", "") or ""),
+        str(row.get("file_path", "") or ""),
+        tokens,
+        _clip_text(str(row.get("snippet", "") or ""), 240),
+        _now_iso(),
     )
 
 
+def _index_put(con: sqlite3.Connection, row: Dict[str, Any]) -> None:
+    doc_id = str(row.get("doc_id", "") or "")
+    if not doc_id:
+        return
+    con.execute("DELETE FROM docs_index WHERE doc_id = ?", (doc_id,))
+    con.execute(_INDEX_INSERT_SQL, _index_row(row))
+
+
+_FTS_INSERT_SQL = """
+    INSERT INTO docs_fts(doc_id, tenant_id, kdnr, doctype, doc_date, file_name, file_path, content)
+    VALUES (?,?,?,?,?,?,?,?)
+"""
+_FTS_INSERT_LEGACY_SQL = """
+    INSERT INTO docs_fts(doc_id, kdnr, doctype, doc_date, file_name, file_path, content)
+    VALUES (?,?,?,?,?,?,?)
+"""
+
+
+def _fts_row(row: Dict[str, Any], *, with_tenant: bool = True) -> Tuple[Any, ...]:
+    values = [
+        str(row.get("doc_id", "") or ""),
+        str(row.get("tenant_id", "") or ""),
+        str(row.get("kdnr", "") or ""),
+        str(row.get("doctype", "") or ""),
+        str(row.get("doc_date", "") or ""),
+        str(row.get("file_name", "") or ""),
+        str(row.get("file_path", "") or ""),
+        _clip_text(str(row.get("content", "") or ""), MAX_EXTRACT_CHARS),
+    ]
+    if not with_tenant:
+        del values[1]
+    return tuple(values)
+
+
 def _fts_put(con: sqlite3.Connection, row: Dict[str, Any]) -> None:
     if not (_has_fts5(con) and _table_exists(con, "docs_fts")):
         return
@@ -3429,38 +3795,68 @@ def _fts_put(con: sqlite3.Connection, row: Dict[str, Any]) -> None:
 
     con.execute("DELETE FROM docs_fts WHERE doc_id = ?", (doc_id,))
     if _column_exists(con, "docs_fts", "tenant_id"):
-        con.execute(
-            """
-            INSERT INTO docs_fts(doc_id, tenant_id, kdnr, doctype, doc_date, file_name, file_path, content)
-            VALUES (?,?,?,?,?,?,?,?)
-            """,
-            (
-                doc_id,
-                str(row.get("tenant_id", "") or ""),
-                str(row.get("kdnr", "") or ""),
-                str(row.get("doctype", "") or ""),
-                str(row.get("doc_date", "") or ""),
-                str(row.get("file_name", "") or ""),
-                str(row.get("file_path", "") or ""),
-                _clip_text(str(row.get("content", "") or ""), MAX_EXTRACT_CHARS),
-            ),
-        )
+        con.execute(_FTS_INSERT_SQL, _fts_row(row))
     else:
-        con.execute(
-            """
-            INSERT INTO docs_fts(doc_id, kdnr, doctype, doc_date, file_name, file_path, content)
-            VALUES (?,?,?,?,?,?,?)
+        con.execute(_FTS_INSERT_LEGACY_SQL, _fts_row(row, with_tenant=False))
+
+
+def _manifest_stat(fp: Path) -> Tuple[int, int, int]:
+    st = fp.stat()
+    return int(st.st_size), int(st.st_mtime_ns), int(st.st_ino)
+
+
+def _manifest_lookup(
+    con: sqlite3.Connection, paths: List[str]
+) -> Dict[str, Tuple[Tuple[int, int, int], str]]:
+    """path -> ((size, mtime_ns, inode), doc_id) for manifest rows whose doc still exists."""
+    out: Dict[str, Tuple[Tuple[int, int, int], str]] = {}
+    for i in range(0, len(paths), 500):
+        chunk = paths[i : i + 500]
+        placeholders = ",".join("?" for _ in chunk)
+        rows = con.execute(  # nosec B608
+            f"""
+            SELECT m.file_path, m.size, m.mtime_ns, m.inode, m.doc_id
+            FROM file_manifest m
+            JOIN docs d ON d.doc_id = m.doc_id
+            WHERE m.file_path IN ({placeholders})
             """,
-            (
-                doc_id,
-                str(row.get("kdnr", "") or ""),
-                str(row.get("doctype", "") or ""),
-                str(row.get("doc_date", "") or ""),
-                str(row.get("file_name", "") or ""),
-                str(row.get("file_path", "") or ""),
-                _clip_text(str(row.get("content", "") or ""), MAX_EXTRACT_CHARS),
-            ),
-        )
+            tuple(chunk),
+        ).fetchall()
+        for r in rows:
+            out[str(r["file_path"])] = (
+                (int(r["size"]), int(r["mtime_ns"]), int(r["inode"])),
+                str(r["doc_id"]),
+            )
+    return out
+
+
+def _manifest_record(
+    con: sqlite3.Connection, entries: List[Tuple[str, Tuple[int, int, int], str]]
+) -> None:
+    """entries: (path, (size, mtime_ns, inode), doc_id)."""
+    if not entries:
+        return
+    now = _now_iso()
+    con.executemany(
+        """
+        INSERT INTO file_manifest(file_path, size, mtime_ns, inode, doc_id, verified_at)
+        VALUES (?,?,?,?,?,?)
+        ON CONFLICT(file_path) DO UPDATE SET
+            size=excluded.size,
+            mtime_ns=excluded.mtime_ns,
+            inode=excluded.inode,
+            doc_id=excluded.doc_id,
+            verified_at=excluded.verified_at
+        """,
+        [(path, st[0], st[1], st[2], doc_id, now) for path, st, doc_id in entries],
+    )
+
+
+def _manifest_should_verify(verify_fraction: Optional[float] = None) -> bool:
+    fraction = INDEX_VERIFY_FRACTION if verify_fraction is None else verify_fraction
+    if fraction <= 0:
+        return False
+    return fraction >= 1 or random.random() < fraction  # nosec B311
 
 
 def _compute_group_key(kdnr: str, doctype: str, doc_date: str, file_name: str) -> str:
@@ -3474,6 +3870,180 @@ def _compute_group_key(kdnr: str, doctype: str, doc_date: str, file_name: str) -
     return _sha256_bytes(raw.encode("utf-8"))
 
 
+# Documents per transaction for index_upsert_documents.
+INDEX_WRITE_BATCH_SIZE = int(_env("INDEX_WRITE_BATCH_SIZE", "200") or 200)
+
+_DOC_INSERT_SQL = """
+    INSERT OR IGNORE INTO docs(doc_id, group_key, tenant_id, kdnr, object_folder, doctype, doc_date, created_at)
+    VALUES (?,?,?,?,?,?,?,?)
+"""
+_VERSION_INSERT_SQL = """
+    INSERT INTO versions(doc_id, version_no, bytes_sha256, file_name, file_path, extracted_text, used_ocr, note, created_at, tenant_id, data_hash, previous_hash)
+    VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
+"""
+
+
+def _index_doc(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Normalizes one index_upsert_document() argument set."""
+    out = {
+        "doc_id": str(doc["doc_id"]),
+        "group_key": str(doc.get("group_key", "") or ""),
+        "kdnr": str(doc.get("kdnr", "") or ""),
+        "object_folder": str(doc.get("object_folder", "") or ""),
+        "doctype": str(doc.get("doctype", "") or ""),
+        "doc_date": str(doc.get("doc_date", "") or ""),
+        "file_name": str(doc.get("file_name", "") or ""),
+        "file_path": str(doc.get("file_path", "") or ""),
+        "extracted_text": str(doc.get("extracted_text", "") or ""),
+        "used_ocr": bool(doc.get("used_ocr")),
+        "note": str(doc.get("note", "") or ""),
+    }
+    out["tenant_id"] = (
+        _effective_tenant(doc.get("tenant_id", ""))
+        or _effective_tenant(TENANT_DEFAULT)
+        or "default"
+    )
+    return out
+
+
+def _version_heads(
+    con: sqlite3.Connection, doc_ids: List[str]
+) -> Dict[str, Tuple[int, str]]:
+    """doc_id -> (latest version_no, its data_hash)."""
+    heads: Dict[str, Tuple[int, str]] = {}
+    for i in range(0, len(doc_ids), 500):
+        chunk = doc_ids[i : i + 500]
+        placeholders = ",".join("?" for _ in chunk)
+        rows = con.execute(  # nosec B608
+            f"""
+            SELECT doc_id, MAX(version_no) AS mx, data_hash
+            FROM versions WHERE doc_id IN ({placeholders})
+            GROUP BY doc_id
+            """,
+            tuple(chunk),
+        ).fetchall()
+        for r in rows:
+            heads[str(r["doc_id"])] = (int(r["mx"] or 0), str(r["data_hash"] or ""))
+    return heads
+
+
+def _index_write_batch(con: sqlite3.Connection, docs: List[Dict[str, Any]]) -> None:
+    """
+    Writes normalized documents (see _index_doc) into docs, versions, docs_fts,
+    docs_index and entities using one executemany per table. Caller commits.
+    """
+    if not docs:
+        return
+    ts_now = _now_iso()
+    doc_ids = list(dict.fromkeys(d["doc_id"] for d in docs))
+
+    con.executemany(
+        _DOC_INSERT_SQL,
+        [
+            (
+                d["doc_id"],
+                d["group_key"],
+                d["tenant_id"],
+                d["kdnr"],
+                d["object_folder"],
+                d["doctype"],
+                d["doc_date"],
+                ts_now,
+            )
+            for d in docs
+        ],
+    )
+
+    heads = _version_heads(con, doc_ids)
+    version_rows: List[Tuple[Any, ...]] = []
+    for d in docs:
+        mx, prev_hash = heads.get(d["doc_id"], (0, ""))
+        version_no = mx + 1
+        # Calculate version hash (GoBD Immutable Ledger A3/A7)
+        # We include: doc_id, version_no, content hash, metadata and prev_hash
+        record_str = f"{d['doc_id']}|{version_no}|{d['doc_id']}|{d['file_name']}|{d['file_path']}|{d['used_ocr']}|{ts_now}|{d['tenant_id']}|{prev_hash}"
+        data_hash = hashlib.sha256(record_str.encode("utf-8")).hexdigest()
+        heads[d["doc_id"]] = (version_no, data_hash)
+        version_rows.append(
+            (
+                d["doc_id"],
+                version_no,
+                d["doc_id"],
+                d["file_name"],
+                d["file_path"],
+                _clip_text(d["extracted_text"], MAX_EXTRACT_CHARS),
+                1 if d["used_ocr"] else 0,
+                d["note"],
+                ts_now,
+                d["tenant_id"],
+                data_hash,
+                prev_hash,
+            )
+        )
+    con.executemany(_VERSION_INSERT_SQL, version_rows)
+
+    # Search rows reflect the latest write per doc_id.
+    latest = {d["doc_id"]: d for d in docs}
+    search_rows = [
+        {
+            "doc_id": d["doc_id"],
+            "tenant_id": d["tenant_id"],
+            "kdnr": d["kdnr"],
+            "doctype": d["doctype"],
+            "doc_date": d["doc_date"],
+            "file_name": d["file_name"],
+            "file_path": d["file_path"],
+            "content": d["extracted_text"],
+            "snippet": d["extracted_text"],
+        }
+        for d in latest.values()
+    ]
+    placeholders = ",".join("?" for _ in doc_ids)
+    if _has_fts5(con) and _table_exists(con, "docs_fts"):
+        with_tenant = _column_exists(con, "docs_fts", "tenant_id")
+        con.execute(  # nosec B608
+            f"DELETE FROM docs_fts WHERE doc_id IN ({placeholders})", tuple(doc_ids)
+        )
+        con.executemany(
+            _FTS_INSERT_SQL if with_tenant else _FTS_INSERT_LEGACY_SQL,
+            [_fts_row(r, with_tenant=with_tenant) for r in search_rows],
+        )
+    con.execute(  # nosec B608
+        f"DELETE FROM docs_index WHERE doc_id IN ({placeholders})", tuple(doc_ids)
+    )
+    con.executemany(
+        _INDEX_INSERT_SQL,
+        [
+            _index_row(
+                {**r, **_index_extract_fields(r["content"], r["file_name"])}
+            )
+            for r in search_rows
+        ],
+    )
+
+    entity_rows: List[Tuple[Any, ...]] = []
+    for d in docs:
+        entity_rows.extend(
+            _entity_rows(d["tenant_id"], d["doc_id"], d["extracted_text"], ts_now)
+        )
+    if entity_rows:
+        con.executemany(_ENTITY_INSERT_SQL, entity_rows)
+
+
+def _rag_sync_kwargs(d: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "tenant_id": d["tenant_id"],
+        "doc_id": d["doc_id"],
+        "file_name": d["file_name"],
+        "text": d["extracted_text"],
+        "metadata": {
+            "kdnr": d["kdnr"],
+            "doctype": d["doctype"],
+            "doc_date": d["doc_date"],
+        },
+    }
+
+
 def index_upsert_document(
     *,
     doc_id: str,
@@ -3489,115 +4059,101 @@ def index_upsert_document(
     note: str = "",
     tenant_id: str = "",
 ) -> None:
-    tenant_id = (
-        _effective_tenant(tenant_id) or _effective_tenant(TENANT_DEFAULT) or "default"
+    doc = _index_doc(
+        {
+            "doc_id": doc_id,
+            "group_key": group_key,
+            "kdnr": kdnr,
+            "object_folder": object_folder,
+            "doctype": doctype,
+            "doc_date": doc_date,
+            "file_name": file_name,
+            "file_path": file_path,
+            "extracted_text": extracted_text,
+            "used_ocr": used_ocr,
+            "note": note,
+            "tenant_id": tenant_id,
+        }
     )
     with _DB_LOCK:
         con = _db()
         try:
-            exists = con.execute(
-                "SELECT doc_id FROM docs WHERE doc_id=?", (doc_id,)
-            ).fetchone()
-            if not exists:
-                con.execute(
-                    "INSERT INTO docs(doc_id, group_key, tenant_id, kdnr, object_folder, doctype, doc_date, created_at) VALUES (?,?,?,?,?,?,?,?)",
-                    (
-                        doc_id,
-                        group_key,
-                        tenant_id,
-                        kdnr,
-                        object_folder,
-                        doctype,
-                        doc_date or "",
-                        _now_iso(),
-                    ),
-                )
+            _index_write_batch(con, [doc])
+            con.commit()
+        finally:
+            con.close()
 
-            row = con.execute(
-                "SELECT MAX(version_no) AS mx, data_hash FROM versions WHERE doc_id=? GROUP BY doc_id ORDER BY version_no DESC LIMIT 1", 
-                (doc_id,)
-            ).fetchone()
-            mx = int(row["mx"] or 0) if row else 0
-            prev_hash = str(row["data_hash"]) if row and row["data_hash"] else ""
-            version_no = mx + 1
-            ts_now = _now_iso()
+    # RAG Sync: embeddings are generated by the background queue, not inline.
+    _schedule_rag_sync([doc], defer=True)
 
-            # Calculate version hash (GoBD Immutable Ledger A3/A7)
-            # We include: doc_id, version_no, content hash, metadata and prev_hash
-            record_str = f"{doc_id}|{version_no}|{doc_id}|{file_name}|{file_path}|{used_ocr}|{ts_now}|{tenant_id}|{prev_hash}"
-            data_hash = hashlib.sha256(record_str.encode("utf-8")).hexdigest()
 
-            con.execute(
-                """
-                INSERT INTO versions(doc_id, version_no, bytes_sha256, file_name, file_path, extracted_text, used_ocr, note, created_at, tenant_id, data_hash, previous_hash)
-                VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
-                """,
-                (
-                    doc_id,
-                    version_no,
-                    doc_id,
-                    file_name,
-                    file_path,
-                    _clip_text(extracted_text, MAX_EXTRACT_CHARS),
-                    1 if used_ocr else 0,
-                    note,
-                    ts_now,
-                    tenant_id,
-                    data_hash,
-                    prev_hash,
-                ),
-            )
+def index_upsert_documents(
+    docs: Iterable[Dict[str, Any]],
+    *,
+    batch_size: Optional[int] = None,
+    defer_rag_sync: bool = True,
+) -> int:
+    """
+    Bulk variant of index_upsert_document for imports and full scans.
 
-            _fts_put(
-                con,
-                {
-                    "doc_id": doc_id,
-                    "tenant_id": tenant_id,
-                    "kdnr": kdnr,
-                    "doctype": doctype,
-                    "doc_date": doc_date or "",
-                    "file_name": file_name,
-                    "file_path": file_path,
-                    "content": extracted_text or "",
-                },
-            )
-            extra = _index_extract_fields(extracted_text or "", file_name)
-            _index_put(
-                con,
-                {
-                    "doc_id": doc_id,
-                    "tenant_id": tenant_id,
-                    "kdnr": kdnr,
-                    "doctype": doctype,
-                    "doc_date": doc_date or "",
-                    "file_name": file_name,
-                    "file_path": file_path,
-                    "content": extracted_text or "",
-                    "snippet": extracted_text or "",
-                    **extra,
-                },
-            )
-            _store_entities(con, tenant_id, doc_id, extracted_text)
-            con.commit()
-        finally:
-            con.close()
+    Each item carries the keyword arguments of index_upsert_document. Documents
+    are written `batch_size` at a time in one transaction on a single
+    connection (one executemany per table), and RAG sync is handed to the
+    background queue in app.core.rag_sync unless defer_rag_sync=False.
+    Returns the number of documents written.
+    """
+    size = max(1, int(batch_size or INDEX_WRITE_BATCH_SIZE))
+    written = 0
+    synced: List[Dict[str, Any]] = []
+    items = iter(docs)
 
-    # RAG Sync: Process in background or after commit to semantic memory
     try:
-        from app.core.rag_sync import sync_document_to_memory
-        sync_document_to_memory(
-            tenant_id=tenant_id,
-            doc_id=doc_id,
-            file_name=file_name,
-            text=extracted_text,
-            metadata={
-                "kdnr": kdnr,
-                "doctype": doctype,
-                "doc_date": doc_date
-            }
-        )
+        while True:
+            # Materialise the batch first: `docs` may be a lazy iterable doing
+            # real work, which must not run under the writer lock.
+            batch = [_index_doc(item) for item in itertools.islice(items, size)]
+            if not batch:
+                break
+            with _DB_LOCK:
+                con = _db()
+                try:
+                    _index_write_batch(con, batch)
+                    con.commit()
+                except Exception:
+                    con.rollback()
+                    raise
+                finally:
+                    con.close()
+            written += len(batch)
+            synced.extend(batch)
+    finally:
+        # Committed batches are synced even if a later batch failed.
+        _schedule_rag_sync(synced, defer=defer_rag_sync)
+    return written
+
+
+def _schedule_rag_sync(docs: List[Dict[str, Any]], *, defer: bool) -> None:
+    if not docs:
+        return
+    try:
+        from app.core.rag_sync import enqueue_document_sync, sync_document_to_memory
     except Exception as e:
-        logger.error(f"RAG Sync failed for {doc_id}: {e}")
+        logger.error(f"RAG Sync unavailable: {e}")
+        return
+    for d in docs:
+        try:
+            if defer:
+                enqueue_document_sync(**_rag_sync_kwargs(d))
+            else:
+                sync_document_to_memory(**_rag_sync_kwargs(d))
+        except Exception as e:
+            logger.error(f"RAG Sync failed for {d['doc_id']}: {e}")
+
+
+# Per-hit version count as part of the search statement itself (idx_versions_doc).
+_VERSION_COUNT_COL = (
+    "(SELECT COUNT(*) FROM versions v WHERE v.doc_id=d.doc_id) AS version_count"
+)
 
 
 def assistant_search(
@@ -3624,7 +4180,7 @@ def assistant_search(
     if not query:
         return []
 
-    with _DB_LOCK:
+    with _DB_LOCK.read():
         con = _db()
         try:
             use_fts = _has_fts5(con) and _table_exists(con, "docs_fts")
@@ -3635,25 +4191,29 @@ def assistant_search(
                 q = " OR ".join(tokens) if tokens else query
 
                 if kdnr_in:
-                    rows = con.execute(
-                        """
+                    rows = con.execute(  # nosec B608
+                        f"""
                         SELECT f.doc_id, d.kdnr, d.doctype, d.doc_date, f.file_name, f.file_path,
-                               snippet(docs_fts, 7, '', '', ' … ', 12) AS snip
+                               snippet(docs_fts, 7, '', '', ' … ', 12) AS snip,
+                               {_VERSION_COUNT_COL}
                         FROM docs_fts f
                         JOIN docs d ON d.doc_id=f.doc_id
                         WHERE docs_fts MATCH ? AND d.kdnr=? AND d.tenant_id=?
+                        ORDER BY bm25(docs_fts)
                         LIMIT ?
                         """,
                         (q, kdnr_in, tenant_id, int(limit)),
                     ).fetchall()
                 else:
-                    rows = con.execute(
-                        """
+                    rows = con.execute(  # nosec B608
+                        f"""
                         SELECT f.doc_id, d.kdnr, d.doctype, d.doc_date, f.file_name, f.file_path,
-                               snippet(docs_fts, 7, '', '', ' … ', 12) AS snip
+                               snippet(docs_fts, 7, '', '', ' … ', 12) AS snip,
+                               {_VERSION_COUNT_COL}
                         FROM docs_fts f
                         JOIN docs d ON d.doc_id=f.doc_id
                         WHERE docs_fts MATCH ? AND d.tenant_id=?
+                        ORDER BY bm25(docs_fts)
                         LIMIT ?
                         """,
                         (q, tenant_id, int(limit)),
@@ -3664,10 +4224,11 @@ def assistant_search(
                 tokens = [t for t in re.split(r"\s+", query) if t]
                 like = f"%{_norm_for_match(query)}%"
                 if kdnr_in:
-                    rows = con.execute(
-                        """
+                    rows = con.execute(  # nosec B608
+                        f"""
                         SELECT d.doc_id, d.kdnr, d.doctype, d.doc_date,
-                               x.file_name, x.file_path, x.snippet AS snip
+                               x.file_name, x.file_path, x.snippet AS snip,
+                               {_VERSION_COUNT_COL}
                         FROM docs d
                         JOIN docs_index x ON x.doc_id=d.doc_id
                         WHERE d.kdnr=? AND x.tenant_id=?
@@ -3677,10 +4238,11 @@ def assistant_search(
                         (kdnr_in, tenant_id, like, int(limit)),
                     ).fetchall()
                 else:
-                    rows = con.execute(
-                        """
+                    rows = con.execute(  # nosec B608
+                        f"""
                         SELECT d.doc_id, d.kdnr, d.doctype, d.doc_date,
-                               x.file_name, x.file_path, x.snippet AS snip
+                               x.file_name, x.file_path, x.snippet AS snip,
+                               {_VERSION_COUNT_COL}
                         FROM docs d
                         JOIN docs_index x ON x.doc_id=d.doc_id
                         WHERE x.tenant_id=?
@@ -3693,10 +4255,11 @@ def assistant_search(
                 if not rows and tokens:
                     for tok in tokens[:3]:
                         like_tok = f"%{_norm_for_match(tok)}%"
-                        rows = con.execute(
-                            """
+                        rows = con.execute(  # nosec B608
+                            f"""
                             SELECT d.doc_id, d.kdnr, d.doctype, d.doc_date,
-                                   x.file_name, x.file_path, x.snippet AS snip
+                                   x.file_name, x.file_path, x.snippet AS snip,
+                                   {_VERSION_COUNT_COL}
                             FROM docs d
                             JOIN docs_index x ON x.doc_id=d.doc_id
                             WHERE x.tenant_id=? AND x.tokens LIKE ?
@@ -3710,10 +4273,6 @@ def assistant_search(
             out: List[Dict[str, Any]] = []
             for r in rows:
                 doc_id = str(r["doc_id"])
-                vc = con.execute(
-                    "SELECT COUNT(*) AS c FROM versions WHERE doc_id=?", (doc_id,)
-                ).fetchone()
-                version_count = int(vc["c"] or 0) if vc else 0
                 out.append(
                     {
                         "doc_id": doc_id,
@@ -3723,7 +4282,7 @@ def assistant_search(
                         "doc_date": str(r["doc_date"] or ""),
                         "file_name": str(r["file_name"] or ""),
                         "file_path": str(r["file_path"] or ""),
-                        "version_count": version_count,
+                        "version_count": int(r["version_count"] or 0),
                         "note": "",
                         "preview": str(r["snip"] or ""),
                     }
@@ -3733,6 +4292,173 @@ def assistant_search(
             con.close()
 
 
+# ============================================================
+# SUGGESTION INDEX
+# ============================================================
+# suggest_terms holds the distinct docs_index values per tenant with a reference
+# count; suggest_fts is a trigram index over it. Both are maintained by triggers
+# on docs_index, so every writer (including UPDATEs from other modules and
+# cascading deletes) keeps them current. suggest_state.generation changes with
+# each docs_index write of a tenant and invalidates the cached suggestions.
+_SUGGEST_FIELDS = ("customer_name", "kdnr", "doctype", "doc_number", "file_name")
+
+
+def _suggest_add_sql(ref: str) -> str:
+    parts = [
+        f"""
+        INSERT INTO suggest_terms(tenant_id, term, refs)
+        SELECT {ref}.tenant_id, trim({ref}.{col}), 1
+        WHERE trim(coalesce({ref}.{col}, '')) <> ''
+        ON CONFLICT(tenant_id, term) DO UPDATE SET refs = refs + 1;
+        """
+        for col in _SUGGEST_FIELDS
+    ]
+    parts.append(
+        f"""
+        INSERT INTO suggest_state(tenant_id, generation) VALUES ({ref}.tenant_id, 1)
+        ON CONFLICT(tenant_id) DO UPDATE SET generation = generation + 1;
+        """
+    )
+    return "".join(parts)
+
+
+def _suggest_remove_sql(ref: str) -> str:
+    parts = [
+        f"""
+        UPDATE suggest_terms SET refs = refs - 1
+        WHERE tenant_id = {ref}.tenant_id AND term = trim({ref}.{col});
+        """
+        for col in _SUGGEST_FIELDS
+    ]
+    terms = ", ".join(f"trim(coalesce({ref}.{col}, ''))" for col in _SUGGEST_FIELDS)
+    parts.append(
+        f"""
+        DELETE FROM suggest_terms
+        WHERE tenant_id = {ref}.tenant_id AND refs <= 0 AND term IN ({terms});
+        INSERT INTO suggest_state(tenant_id, generation) VALUES ({ref}.tenant_id, 1)
+        ON CONFLICT(tenant_id) DO UPDATE SET generation = generation + 1;
+        """
+    )
+    return "".join(parts)
+
+
+def _suggest_index_init(con: sqlite3.Connection) -> None:
+    """Creates the trigram suggestion index (needs FTS5 with the trigram tokenizer)."""
+    fresh = not _table_exists(con, "suggest_terms")
+    try:
+        con.execute(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS suggest_fts
+            USING fts5(term, content='suggest_terms', content_rowid='id', tokenize='trigram');
+            """
+        )
+    except sqlite3.OperationalError:
+        return  # SQLite < 3.34: assistant_suggest keeps the full-scan path
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS suggest_terms(
+          id INTEGER PRIMARY KEY,
+          tenant_id TEXT NOT NULL,
+          term TEXT NOT NULL,
+          refs INTEGER NOT NULL DEFAULT 0,
+          UNIQUE(tenant_id, term)
+        );
+        """
+    )
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS suggest_state(
+          tenant_id TEXT PRIMARY KEY,
+          generation INTEGER NOT NULL DEFAULT 0
+        );
+        """
+    )
+    triggers = (
+        """
+        CREATE TRIGGER IF NOT EXISTS suggest_terms_ai AFTER INSERT ON suggest_terms BEGIN
+          INSERT INTO suggest_fts(rowid, term) VALUES (new.id, new.term);
+        END;
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS suggest_terms_ad AFTER DELETE ON suggest_terms BEGIN
+          INSERT INTO suggest_fts(suggest_fts, rowid, term) VALUES ('delete', old.id, old.term);
+        END;
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS docs_index_suggest_ai AFTER INSERT ON docs_index BEGIN
+          {_suggest_add_sql("new")}
+        END;
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS docs_index_suggest_ad AFTER DELETE ON docs_index BEGIN
+          {_suggest_remove_sql("old")}
+        END;
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS docs_index_suggest_au
+        AFTER UPDATE OF tenant_id, {", ".join(_SUGGEST_FIELDS)} ON docs_index BEGIN
+          {_suggest_remove_sql("old")}
+          {_suggest_add_sql("new")}
+        END;
+        """,
+    )
+    for sql in triggers:
+        con.execute(sql)
+    if fresh:
+        # Backfill from rows indexed before the suggestion index existed.
+        values = " UNION ALL ".join(
+            f"SELECT tenant_id, trim({col}) AS term FROM docs_index"
+            for col in _SUGGEST_FIELDS
+        )
+        con.execute(  # nosec B608
+            f"""
+            INSERT INTO suggest_terms(tenant_id, term, refs)
+            SELECT tenant_id, term, COUNT(*) FROM ({values})
+            WHERE term IS NOT NULL AND term <> ''
+            GROUP BY tenant_id, term
+            """
+        )
+
+
+_SUGGEST_CACHE: Dict[Tuple[str, str], Tuple[int, "OrderedDict[Tuple[str, int], List[str]]"]] = {}
+_SUGGEST_CACHE_LOCK = threading.Lock()
+
+
+def _suggest_fts_query(query: str) -> str:
+    """OR-query over the query's trigrams, so misspelt input still shares most grams."""
+    text = query.casefold()
+    grams = list(dict.fromkeys(text[i : i + 3] for i in range(len(text) - 2)))
+    return " OR ".join('"' + g.replace('"', '""') + '"' for g in grams[:32])
+
+
+def _suggest_candidates(con: sqlite3.Connection, tenant_id: str, query: str) -> List[str]:
+    fts_query = _suggest_fts_query(query)
+    if fts_query:
+        rows = con.execute(
+            """
+            SELECT s.term
+            FROM suggest_fts f
+            JOIN suggest_terms s ON s.id = f.rowid
+            WHERE suggest_fts MATCH ? AND s.tenant_id = ?
+            ORDER BY f.rank
+            LIMIT ?
+            """,
+            (fts_query, tenant_id, SUGGEST_SHORTLIST),
+        ).fetchall()
+    else:
+        # Shorter than one trigram: plain prefix match.
+        like = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        rows = con.execute(
+            """
+            SELECT term FROM suggest_terms
+            WHERE tenant_id = ? AND term LIKE ? ESCAPE '\\'
+            LIMIT ?
+            """,
+            (tenant_id, like + "%", SUGGEST_SHORTLIST),
+        ).fetchall()
+    return [str(r["term"]) for r in rows]
+
+
 def assistant_suggest(query: str, tenant_id: str = "", limit: int = 3) -> List[str]:
     try:
         from rapidfuzz import fuzz, process  # type: ignore
@@ -3746,37 +4472,82 @@ def assistant_suggest(query: str, tenant_id: str = "", limit: int = 3) -> List[s
     if not query:
         return []
 
-    with _DB_LOCK:
+    cache_key = (str(_active_db_path()), tenant_id)
+    query_key = (query, int(limit))
+    with _DB_LOCK.read():
         con = _db()
         try:
-            if not _table_exists(con, "docs_index"):
+            if _table_exists(con, "suggest_fts"):
+                row = con.execute(
+                    "SELECT generation FROM suggest_state WHERE tenant_id=?",
+                    (tenant_id,),
+                ).fetchone()
+                generation = int(row["generation"]) if row else 0
+                with _SUGGEST_CACHE_LOCK:
+                    cached = _SUGGEST_CACHE.get(cache_key)
+                    if cached and cached[0] == generation and query_key in cached[1]:
+                        cached[1].move_to_end(query_key)
+                        return list(cached[1][query_key])
+                candidates = set(_suggest_candidates(con, tenant_id, query))
+            elif _table_exists(con, "docs_index"):
+                generation = None
+                rows = con.execute(
+                    """
+                    SELECT customer_name, kdnr, doctype, doc_number, file_name
+                    FROM docs_index
+                    WHERE tenant_id=?
+                    """,
+                    (tenant_id,),
+                ).fetchall()
+                candidates = set()
+                for r in rows:
+                    for key in _SUGGEST_FIELDS:
+                        val = str(r[key] or "").strip()
+                        if val:
+                            candidates.add(val)
+            else:
                 return []
-            rows = con.execute(
-                """
-                SELECT customer_name, kdnr, doctype, doc_number, file_name
-                FROM docs_index
-                WHERE tenant_id=?
-                """,
-                (tenant_id,),
-            ).fetchall()
         finally:
             con.close()
 
-    candidates = set()
-    for r in rows:
-        for key in ("customer_name", "kdnr", "doctype", "doc_number", "file_name"):
-            val = str(r[key] or "").strip()
-            if val:
-                candidates.add(val)
     if not candidates:
         return []
     matches = process.extract(
         query, list(candidates), scorer=fuzz.partial_ratio, limit=limit
     )
-    return [m[0] for m in matches if m[1] >= 70]
-
-
-def index_run_full(base_path: Optional[Path] = None) -> Dict[str, Any]:
+    out = [m[0] for m in matches if m[1] >= 70]
+
+    if generation is not None:
+        with _SUGGEST_CACHE_LOCK:
+            cached = _SUGGEST_CACHE.get(cache_key)
+            if not cached or cached[0] != generation:
+                cached = (generation, OrderedDict())
+                _SUGGEST_CACHE[cache_key] = cached
+            cached[1][query_key] = out
+            while len(cached[1]) > SUGGEST_CACHE_PER_TENANT:
+                cached[1].popitem(last=False)
+    return list(out)
+
+
+def index_run_full(
+    base_path: Optional[Path] = None,
+    *,
+    workers: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    resume: bool = True,
+    verify_fraction: Optional[float] = None,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Indexes every supported file below base_path (default: BASE_PATH).
+
+    Runs the pipelined engine from `app.core.index_pipeline`: sorted discovery,
+    streamed hashing, extraction/OCR on a process pool and a single batched
+    writer. An interrupted run resumes from its persisted checkpoint unless
+    resume=False. Files unchanged according to the stat manifest are not
+    opened; verify_fraction (default INDEX_VERIFY_FRACTION) re-hashes a sample
+    of them. `on_progress` receives counter snapshots after each batch.
+    """
     base = Path(base_path) if base_path else BASE_PATH
     if not base.exists():
         return {
@@ -3792,115 +4563,42 @@ def index_run_full(base_path: Optional[Path] = None) -> Dict[str, Any]:
             },
         }
 
-    indexed = 0
-    skipped = 0
-    errors = 0
-
-    skipped_by_reason = {
-        "unsupported_ext": 0,
-        "already_indexed": 0,
-        "no_text": 0,
-        "parse_failed": 0,
-    }
+    from app.core.index_pipeline import run_full_index
 
+    errors = 0
     try:
-        for fp in base.rglob("*"):
-            if not fp.is_file():
-                continue
-
-            ext = fp.suffix.lower()
-            if ext not in SUPPORTED_EXT:
-                skipped += 1
-                skipped_by_reason["unsupported_ext"] += 1
-                continue
-
-            try:
-                b = _read_bytes(fp)
-                doc_id = _sha256_bytes(b)
-
-                with _DB_LOCK:
-                    con = _db()
-                    try:
-                        exists = con.execute(
-                            "SELECT doc_id FROM docs WHERE doc_id=?", (doc_id,)
-                        ).fetchone()
-                    finally:
-                        con.close()
-
-                if exists:
-                    skipped += 1
-                    skipped_by_reason["already_indexed"] += 1
-                    continue
-
-                file_name = fp.name
-
-                tenant = _effective_tenant(_infer_tenant_from_path(fp))
-
-                kdnr_raw = ""
-                object_folder = ""
-                for part in reversed(fp.parts):
-                    m = re.match(r"^(\d{3,})[\s_]+", part)
-                    if m:
-                        kdnr_raw = m.group(1)
-                        object_folder = part
-                        break
-
-                if TENANT_REQUIRE and not tenant:
-                    skipped += 1
-                    skipped_by_reason["parse_failed"] += 1
-                    continue
-
-                kdnr_idx = _tenant_prefix_kdnr(tenant, kdnr_raw) if kdnr_raw else ""
-                object_folder_tag = (
-                    _tenant_object_folder_tag(tenant, object_folder)
-                    if object_folder
-                    else ""
-                )
-
-                text, used_ocr = _extract_text(fp)
-                if not text or len(text.strip()) < 3:
-                    skipped += 1
-                    skipped_by_reason["no_text"] += 1
-                    continue
-
-                doctype = _detect_doctype(text, file_name)
-                best_date, _ = _find_dates(text)
-                group_key = _compute_group_key(kdnr_idx, doctype, best_date, file_name)
-
-                index_upsert_document(
-                    doc_id=doc_id,
-                    group_key=group_key,
-                    kdnr=kdnr_idx,
-                    object_folder=object_folder_tag,
-                    doctype=doctype,
-                    doc_date=best_date or "",
-                    file_name=file_name,
-                    file_path=str(fp),
-                    extracted_text=text,
-                    used_ocr=used_ocr,
-                    note="indexed_by_full_scan",
-                    tenant_id=tenant,
-                )
-                indexed += 1
-
-            except Exception:
-                skipped += 1
-                skipped_by_reason["parse_failed"] += 1
-                continue
+        snap = run_full_index(
+            base,
+            workers=workers,
+            batch_size=batch_size,
+            resume=resume,
+            verify_fraction=verify_fraction,
+            on_progress=on_progress,
+        )
+    except Exception as exc:
+        logger.error(f"index_run_full failed for {base}: {exc}")
+        from app.core.index_pipeline import current_progress
 
-    except Exception:
-        errors += 1
+        snap = current_progress()
+        errors = 1
 
     return {
         "ok": True,
-        "indexed": indexed,
-        "skipped": skipped,
-        "errors": errors,
-        "skipped_by_reason": skipped_by_reason,
+        "indexed": int(snap.get("indexed", 0)),
+        "skipped": int(snap.get("skipped", 0)),
+        "errors": int(snap.get("errors", 0)) + errors,
+        "skipped_by_reason": dict(snap.get("skipped_by_reason") or {}),
+        "progress": snap,
     }
 
 
-def import_run(*, import_root: Path, user: str = "", role: str = "") -> Dict[str, Any]:
+def import_run(
+    *,
+    import_root: Path,
+    user: str = "",
+    role: str = "",
+    verify_fraction: Optional[float] = None,
+) -> Dict[str, Any]:
     root = Path(import_root)
     if not root.exists():
         return {
@@ -3920,6 +4618,52 @@ def import_run(*, import_root: Path, user: str = "", role: str = "") -> Dict[str
         "no_text": 0,
         "parse_failed": 0,
     }
+    # (document, stat) awaiting one batched index transaction
+    pending: List[Tuple[Dict[str, Any], Tuple[int, int, int]]] = []
+
+    def _flush_pending() -> None:
+        nonlocal indexed, errors
+        if not pending:
+            return
+        batch = list(pending)
+        pending.clear()
+        try:
+            index_upsert_documents([doc for doc, _ in batch])
+            written = batch
+        except Exception as exc:
+            # One bad document must not cost the whole batch: retry one by one.
+            logger.warning(f"Batched import write failed, retrying per document: {exc}")
+            written = []
+            for doc, st in batch:
+                try:
+                    index_upsert_document(**doc)
+                    written.append((doc, st))
+                except Exception as exc_one:
+                    logger.warning(f"Import write failed for {doc['file_path']}: {exc_one}")
+                    errors += 1
+                    skipped_by_reason["parse_failed"] += 1
+        if not written:
+            return
+        with _DB_LOCK:
+            con = _db()
+            try:
+                _manifest_record(
+                    con, [(doc["file_path"], st, doc["doc_id"]) for doc, st in written]
+                )
+                con.commit()
+            finally:
+                con.close()
+        indexed += len(written)
+        for doc, _ in written:
+            if callable(audit_log):
+                audit_log(
+                    user=user or "system",
+                    role=role or "SYSTEM",
+                    action="import_file",
+                    target=doc["doc_id"],
+                    meta={"path": doc["file_path"], "root": str(root)},
+                    tenant_id=doc["tenant_id"],
+                )
 
     for fp in root.rglob("*"):
         if not fp.is_file():
@@ -3932,6 +4676,22 @@ def import_run(*, import_root: Path, user: str = "", role: str = "") -> Dict[str
             continue
 
         try:
+            stat = _manifest_stat(fp)
+            with _DB_LOCK:
+                con = _db()
+                try:
+                    entry = _manifest_lookup(con, [str(fp)]).get(str(fp))
+                finally:
+                    con.close()
+            if (
+                entry
+                and entry[0] == stat
+                and not _manifest_should_verify(verify_fraction)
+            ):
+                skipped += 1
+                skipped_by_reason["already_indexed"] += 1
+                continue
+
             b = _read_bytes(fp)
             doc_id = _sha256_bytes(b)
 
@@ -3942,6 +4702,9 @@ def import_run(*, import_root: Path, user: str = "", role: str = "") -> Dict[str
                         "SELECT 1 FROM versions WHERE doc_id=? AND file_path=? LIMIT 1",
                         (doc_id, str(fp)),
                     ).fetchone()
+                    if exists:
+                        _manifest_record(con, [(str(fp), stat, doc_id)])
+                        con.commit()
                 finally:
                     con.close()
 
@@ -3971,7 +4734,7 @@ def import_run(*, import_root: Path, user: str = "", role: str = "") -> Dict[str
                 else ""
             )
 
-            text, used_ocr = _extract_text(fp)
+            text, used_ocr = _extract_text(fp, content_sha256=doc_id)
             if not text or len(text.strip()) < 3:
                 skipped += 1
                 skipped_by_reason["no_text"] += 1
@@ -3981,35 +4744,33 @@ def import_run(*, import_root: Path, user: str = "", role: str = "") -> Dict[str
             best_date, _ = _find_dates(text)
             group_key = _compute_group_key(kdnr_idx, doctype, best_date, fp.name)
 
-            index_upsert_document(
-                doc_id=doc_id,
-                group_key=group_key,
-                kdnr=kdnr_idx,
-                object_folder=object_folder_tag,
-                doctype=doctype,
-                doc_date=best_date or "",
-                file_name=fp.name,
-                file_path=str(fp),
-                extracted_text=text,
-                used_ocr=used_ocr,
-                note="import_run",
-                tenant_id=tenant,
-            )
-            indexed += 1
-            if callable(audit_log):
-                audit_log(
-                    user=user or "system",
-                    role=role or "SYSTEM",
-                    action="import_file",
-                    target=doc_id,
-                    meta={"path": str(fp), "root": str(root)},
-                    tenant_id=tenant,
+            pending.append(
+                (
+                    {
+                        "doc_id": doc_id,
+                        "group_key": group_key,
+                        "kdnr": kdnr_idx,
+                        "object_folder": object_folder_tag,
+                        "doctype": doctype,
+                        "doc_date": best_date or "",
+                        "file_name": fp.name,
+                        "file_path": str(fp),
+                        "extracted_text": text,
+                        "used_ocr": used_ocr,
+                        "note": "import_run",
+                        "tenant_id": tenant,
+                    },
+                    stat,
                 )
+            )
+            if len(pending) >= INDEX_WRITE_BATCH_SIZE:
+                _flush_pending()
         except Exception:
             errors += 1
             skipped_by_reason["parse_failed"] += 1
             continue
 
+    _flush_pending()
     return {
         "ok": True,
         "indexed": indexed,
@@ -4030,7 +4791,7 @@ def index_rebuild(base_path: Optional[Path] = None) -> Dict[str, Any]:
             con.commit()
         finally:
             con.close()
-    return index_run_full(base_path=base_path)
+    return index_run_full(base_path=base_path, resume=False)
 
 
 def sync_customers_from_hierarchy() -> None:
@@ -4080,7 +4841,7 @@ def index_warmup(tenant_id: str = "") -> Dict[str, Any]:
         _start_index_warmup_thread_if_needed()
 
     tenant_id = normalize_component(tenant_id)
-    with _DB_LOCK:
+    with _DB_LOCK.read():
         con = _db()
         try:
             fts_enabled = _has_fts5(con)
@@ -4127,7 +4888,7 @@ def _start_index_warmup_thread_if_needed() -> bool:
 
 
 def get_db_info() -> Dict[str, Any]:
-    with _DB_LOCK:
+    with _DB_LOCK.read():
         con = _db()
         try:
             row = con.execute("PRAGMA user_version").fetchone()
@@ -4140,6 +4901,8 @@ def get_db_info() -> Dict[str, Any]:
                 "path": str(DB_PATH),
                 "schema_version": schema_version,
                 "tenants": tenants,
+                "pool": db_pool_stats(),
+                "lock": db_lock_stats(),
             }
         finally:
             con.close()
@@ -4169,7 +4932,7 @@ def get_health_stats(tenant_id: str = "") -> Dict[str, Any]:
     tenant_id = (
         _effective_tenant(tenant_id) or _effective_tenant(TENANT_DEFAULT) or "default"
     )
-    with _DB_LOCK:
+    with _DB_LOCK.read():
         con = _db()
         try:
             fts_enabled = _has_fts5(con) and _table_exists(con, "docs_fts")
@@ -4200,7 +4963,7 @@ def get_health_stats(tenant_id: str = "") -> Dict[str, Any]:
 def audit_list(*, tenant_id: str = "", limit: int = 200) -> List[Dict[str, Any]]:
     tenant_id = normalize_component(tenant_id)
     limit = max(1, min(int(limit), 2000))
-    with _DB_LOCK:
+    with _DB_LOCK.read():
         con = _db()
         try:
             if _column_exists(con, "audit", "tenant_id"):
@@ -4225,8 +4988,7 @@ def analyze_to_pending(src: Path, owner: str = "", force_ocr: bool = False) -> s
     PENDING_DIR.mkdir(parents=True, exist_ok=True)
     
     # Limit: Max 10 items per user in queue
-    current = list_pending(username=owner)
-    if len(current) >= 10:
+    if count_pending(username=owner) >= 10:
         raise RuntimeError("Warteschlange voll (Max. 10 Dokumente). Bitte erst bestehende Dokumente archivieren.")
 
     src = Path(src)
@@ -4271,10 +5033,7 @@ def start_background_analysis(src: Path) -> str:
 
 
 def _set_progress(token: str, p: float, phase: str) -> None:
-    d = read_pending(token) or {}
-    d["progress"] = float(max(0.0, min(100.0, p)))
-    d["progress_phase"] = phase
-    write_pending(token, d)
+    _pending_store().set_progress(token, float(max(0.0, min(100.0, p))), phase)
 
 
 def _ai_refine_analysis(text: str, filename: str, tenant_id: str = "") -> Dict[str, Any]:
@@ -4321,6 +5080,22 @@ JSON:"""
     return {}
 
 
+_KDNR_LABEL_RE = re.compile(r"(kunden[\s\-]*nr\.?|kdnr\.?)\s*[:#]?\s*\d{3,}", re.IGNORECASE)
+
+
+def _analysis_text_sufficient(text: str, filename: str) -> bool:
+    """True once doctype, a date and a customer number can be read from text."""
+    if len(text) < 200:
+        return False
+    if _detect_doctype(text, filename) == "SONSTIGES":
+        return False
+    best_date, _ = _find_dates(text)
+    if not best_date:
+        return False
+    # Only an explicitly labelled number counts; bare digit runs keep OCR going.
+    return bool(_KDNR_LABEL_RE.search(text))
+
+
 def _analyze_worker(token: str) -> None:
     try:
         d = read_pending(token)
@@ -4336,6 +5111,7 @@ def _analyze_worker(token: str) -> None:
             return
 
         _set_progress(token, 5.0, "Datei lesen…")
+        doc_id = ""
         try:
             b = _read_bytes(src)
             doc_id = _sha256_bytes(b)
@@ -4352,8 +5128,21 @@ def _analyze_worker(token: str) -> None:
         d = read_pending(token) or {}
         force_ocr = d.get("force_ocr", False)
         
+        def _on_ocr_page(done: int, total: int) -> None:
+            _set_progress(token, 18.0 + 20.0 * done / max(1, total), f"OCR Seite {done}/{total}…")
+
         try:
-            text, used_ocr = _extract_text(src, force_ocr=force_ocr)
+            text, used_ocr = _extract_text(
+                src,
+                force_ocr=force_ocr,
+                content_sha256=doc_id,
+                on_ocr_page=_on_ocr_page,
+                ocr_stop_when=(
+                    (lambda t: _analysis_text_sufficient(t, src.name))
+                    if OCR_EARLY_EXIT
+                    else None
+                ),
+            )
         except Exception as exc:
             from app.core.upload_pipeline import write_dead_letter_marker
 
@@ -4424,6 +5213,9 @@ def _analyze_worker(token: str) -> None:
         d["progress_phase"] = "Bereit"
         write_pending(token, d)
 
+        # The review screen usually opens the visualizer next.
+        prerender_visualizer_pages(src)
+
     except Exception as e:
         d = read_pending(token) or {}
         d["status"] = "ERROR"
@@ -4528,7 +5320,7 @@ def _db_latest_version_path_for_doc(doc_id: str, tenant_id: str = "") -> str:
     if not doc_id:
         return ""
     tenant_id = _effective_tenant(tenant_id) or _effective_tenant(TENANT_DEFAULT) or ""
-    with _DB_LOCK:
+    with _DB_LOCK.read():
         con = _db()
         try:
             has_version_no = _column_exists(con, "versions", "version_no")
@@ -4617,7 +5409,7 @@ def db_path_for_doc(doc_id: str, tenant_id: str = "") -> str:
     if not doc_id:
         return ""
     tenant_id = _effective_tenant(tenant_id) or _effective_tenant(TENANT_DEFAULT) or ""
-    with _DB_LOCK:
+    with _DB_LOCK.read():
         con = _db()
         try:
             if _column_exists(con, "versions", "tenant_id"):
@@ -4687,7 +5479,7 @@ def db_lookup_customer(tenant_id: str, kdnr: str) -> Optional[Dict[str, Any]]:
     tenant_id = (
         _effective_tenant(tenant_id) or _effective_tenant(TENANT_DEFAULT) or "default"
     )
-    with _DB_LOCK:
+    with _DB_LOCK.read():
         con = _db()
         try:
             r = con.execute(
@@ -4699,7 +5491,7 @@ def db_lookup_customer(tenant_id: str, kdnr: str) -> Optional[Dict[str, Any]]:
 
 
 def _db_has_doc(doc_id: str) -> bool:
-    with _DB_LOCK:
+    with _DB_LOCK.read():
         con = _db()
         try:
             r = con.execute(
@@ -4852,7 +5644,7 @@ def process_with_answers(src: Path, answers: Dict[str, Any]) -> Tuple[Path, Path
     group_key = _compute_group_key(kdnr_idx, doctype, doc_date, target.name)
 
     note = ""
-    with _DB_LOCK:
+    with _DB_LOCK.read():
         con = _db()
         try:
             g = con.execute(
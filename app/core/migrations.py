@@ -11,7 +11,7 @@ from pathlib import Path
 logger = logging.getLogger("kukanilea.migrations")
 
 # Current target schema version
-CURRENT_SCHEMA_VERSION = 7
+CURRENT_SCHEMA_VERSION = 9
 
 
 def _ensure_migration_targets(conn: sqlite3.Connection) -> None:
@@ -392,6 +392,25 @@ def run_migrations(db_path: Path):
             conn.commit()
             logger.info("Migrated to version 7 (Knowledge Memory audit trail)")
 
+        if current_version < 8:
+            if _table_exists(conn, "agent_memory"):
+                from app.agents.memory_store import ensure_memory_provenance
+
+                ensure_memory_provenance(conn)
+            _set_user_version(conn, 8)
+            conn.commit()
+            logger.info("Migrated to version 8 (indexed document chunk provenance)")
+
+        if current_version < 9:
+            if _table_exists(conn, "events"):
+                from app.eventlog.core import ensure_event_tenant_index
+
+                backfilled = ensure_event_tenant_index(conn)
+                logger.info(f"Backfilled tenant_id for {backfilled} events")
+            _set_user_version(conn, 9)
+            conn.commit()
+            logger.info("Migrated to version 9 (tenant-indexed event log)")
+
         # Always-on drift guard (idempotent)
         _ensure_migration_targets(conn)
         if _get_user_version(conn) < CURRENT_SCHEMA_VERSION:
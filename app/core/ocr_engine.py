@@ -0,0 +1,204 @@
+"""
+app/core/ocr_engine.py
+Page-parallel OCR for scanned PDFs.
+
+Pages are rasterised and recognised in a shared spawn-based process pool sized
+by `hw_profile.ocr_worker_limit()`. Results are reassembled in page order; the
+caller is told about every finished page (`on_page`) and may stop the run as
+soon as the text recognised so far is good enough (`stop_when`), in which case
+pages that have not started yet are cancelled.
+
+Inside worker processes (e.g. the vault indexer's extraction pool) and for
+single-page documents the pages are processed inline on the calling thread.
+"""
+from __future__ import annotations
+
+import atexit
+import io
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+try:
+    import fitz  # type: ignore
+except Exception:
+    fitz = None
+
+try:
+    import pytesseract  # type: ignore
+except Exception:
+    pytesseract = None
+
+try:
+    from PIL import Image  # type: ignore
+except Exception:
+    Image = None
+
+logger = logging.getLogger("kukanilea.ocr_engine")
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_WORKERS = 0
+_POOL_LOCK = threading.Lock()
+
+
+@dataclass
+class OcrResult:
+    text: str
+    pages_done: int
+    pages_total: int
+    complete: bool
+
+
+def ocr_available() -> bool:
+    return fitz is not None and pytesseract is not None and Image is not None
+
+
+def ocr_workers() -> int:
+    try:
+        from app.core.hw_profile import ocr_worker_limit
+
+        return ocr_worker_limit()
+    except Exception:
+        return 1
+
+
+def _ocr_page(path: str, index: int, dpi: int, lang: str) -> str:
+    """Pool worker: rasterise one page and run tesseract on it."""
+    doc = fitz.open(path)
+    try:
+        pix = doc.load_page(index).get_pixmap(dpi=dpi)
+        img = Image.open(io.BytesIO(pix.tobytes("png")))
+        return (pytesseract.image_to_string(img, lang=lang) or "").strip()
+    finally:
+        doc.close()
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    global _POOL, _POOL_WORKERS
+    with _POOL_LOCK:
+        if _POOL is None or _POOL_WORKERS != workers:
+            if _POOL is not None:
+                _POOL.shutdown(wait=False, cancel_futures=True)
+            _POOL = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _POOL_WORKERS = workers
+        return _POOL
+
+
+def shutdown() -> None:
+    """Stops the shared OCR pool (idle workers exit, queued pages are dropped)."""
+    global _POOL, _POOL_WORKERS
+    with _POOL_LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=False, cancel_futures=True)
+        _POOL = None
+        _POOL_WORKERS = 0
+
+
+atexit.register(shutdown)
+
+
+def ocr_pdf(
+    fp: Path,
+    *,
+    max_pages: int,
+    dpi: int,
+    lang: str,
+    workers: Optional[int] = None,
+    on_page: Optional[Callable[[int, int], None]] = None,
+    stop_when: Optional[Callable[[str], bool]] = None,
+) -> OcrResult:
+    """
+    OCRs up to `max_pages` pages of a PDF.
+
+    on_page(done, total) is called after every recognised page. stop_when(text)
+    receives the text of all pages recognised so far *in page order* whenever
+    that prefix grows; returning True ends the run early (complete=False).
+    """
+    if not ocr_available():
+        return OcrResult("", 0, 0, True)
+    doc = fitz.open(str(fp))
+    try:
+        total = min(len(doc), max(1, int(max_pages)))
+    finally:
+        doc.close()
+    if total <= 0:
+        return OcrResult("", 0, 0, True)
+
+    n = max(1, int(workers if workers is not None else ocr_workers()))
+    inline = n <= 1 or total <= 1 or multiprocessing.parent_process() is not None
+    texts: Dict[int, str] = {}
+    state = {"prefix": 0}
+
+    def _record(index: int, text: str) -> bool:
+        texts[index] = text
+        if on_page is not None:
+            on_page(len(texts), total)
+        if stop_when is None:
+            return False
+        grown = False
+        while state["prefix"] in texts:
+            state["prefix"] += 1
+            grown = True
+        return grown and bool(stop_when(_join(texts, state["prefix"])))
+
+    if not inline:
+        try:
+            return _ocr_parallel(fp, total, n, dpi, lang, texts, _record)
+        except BrokenProcessPool:
+            logger.warning("OCR pool broke, continuing inline for %s", fp.name)
+            shutdown()
+
+    for i in range(total):
+        if i in texts:
+            continue
+        try:
+            text = _ocr_page(str(fp), i, dpi, lang)
+        except Exception:
+            text = ""
+        if _record(i, text):
+            return OcrResult(_join(texts, total), len(texts), total, False)
+    return OcrResult(_join(texts, total), len(texts), total, True)
+
+
+def _ocr_parallel(
+    fp: Path,
+    total: int,
+    workers: int,
+    dpi: int,
+    lang: str,
+    texts: Dict[int, str],
+    record: Callable[[int, str], bool],
+) -> OcrResult:
+    pool = _pool(workers)
+    pending: Dict[Future, int] = {
+        pool.submit(_ocr_page, str(fp), i, dpi, lang): i for i in range(total)
+    }
+    try:
+        while pending:
+            done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+            for fut in done:
+                index = pending.pop(fut)
+                try:
+                    text = fut.result()
+                except BrokenProcessPool:
+                    raise
+                except Exception:
+                    text = ""
+                if record(index, text):
+                    return OcrResult(_join(texts, total), len(texts), total, False)
+    finally:
+        for fut in pending:
+            fut.cancel()
+    return OcrResult(_join(texts, total), len(texts), total, True)
+
+
+def _join(texts: Dict[int, str], upto: int) -> str:
+    parts: List[str] = [texts[i] for i in range(upto) if texts.get(i)]
+    return "\n".join(parts).strip()
@@ -0,0 +1,243 @@
+"""
+app/core/pending_store.py
+SQLite-backed store for upload-analysis jobs ("pending" documents).
+
+One row per token keeps the small, frequently polled fields (status, progress,
+phase, error, owner) in their own columns, so a progress update is a single
+row UPDATE and `/api/progress` reads one row. Everything else of the payload
+lives in `meta_json`; large values (full extracted text, base64 thumbnail) are
+stored once in `pending_blobs` and only rewritten when their content changes.
+Listing is an indexed query that does not load the blobs.
+
+Legacy `<token>.json` files found in the pending directory are imported on
+first use.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Payload keys kept out of meta_json and list results.
+BLOB_FIELDS = ("extracted_text", "preview")
+_COLUMN_FIELDS = ("owner", "status", "progress", "progress_phase", "error")
+
+
+class PendingStore:
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+        self.path = self.directory / "pending.sqlite3"
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    # -- connection ----------------------------------------------------
+    def _con(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is not None and getattr(self._local, "pid", None) == os.getpid():
+            return con
+        self.directory.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(str(self.path), timeout=5.0, isolation_level=None)
+        con.row_factory = sqlite3.Row
+        con.execute("PRAGMA busy_timeout=5000;")
+        try:
+            con.execute("PRAGMA journal_mode=WAL;")
+        except sqlite3.OperationalError:
+            pass
+        con.execute("PRAGMA synchronous=NORMAL;")
+        self._local.con = con
+        self._local.pid = os.getpid()
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self._init_schema(con)
+                    self._import_legacy_files(con)
+                    self._initialized = True
+        return con
+
+    def _init_schema(self, con: sqlite3.Connection) -> None:
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pending_jobs(
+              token TEXT PRIMARY KEY,
+              owner TEXT NOT NULL DEFAULT '',
+              status TEXT NOT NULL DEFAULT '',
+              progress REAL NOT NULL DEFAULT 0,
+              progress_phase TEXT NOT NULL DEFAULT '',
+              error TEXT NOT NULL DEFAULT '',
+              meta_json TEXT NOT NULL DEFAULT '{}',
+              updated_at REAL NOT NULL
+            );
+            """
+        )
+        con.execute(
+            "CREATE INDEX IF NOT EXISTS idx_pending_jobs_updated ON pending_jobs(updated_at);"
+        )
+        con.execute(
+            "CREATE INDEX IF NOT EXISTS idx_pending_jobs_owner ON pending_jobs(owner, updated_at);"
+        )
+        con.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pending_blobs(
+              token TEXT NOT NULL,
+              name TEXT NOT NULL,
+              sha256 TEXT NOT NULL,
+              value TEXT NOT NULL,
+              PRIMARY KEY(token, name)
+            );
+            """
+        )
+
+    def _import_legacy_files(self, con: sqlite3.Connection) -> None:
+        for fp in self.directory.glob("*.json"):
+            try:
+                payload = json.loads(fp.read_text(encoding="utf-8"))
+                mtime = fp.stat().st_mtime
+            except Exception:
+                continue
+            if not isinstance(payload, dict):
+                continue
+            self._write(con, fp.stem, payload, updated_at=mtime)
+            try:
+                fp.unlink()
+            except OSError:
+                pass
+
+    # -- API -------------------------------------------------------------
+    def read(self, token: str) -> Optional[Dict[str, Any]]:
+        con = self._con()
+        row = con.execute("SELECT * FROM pending_jobs WHERE token=?", (token,)).fetchone()
+        if row is None:
+            return None
+        payload = self._row_payload(row)
+        for b in con.execute(
+            "SELECT name, value FROM pending_blobs WHERE token=?", (token,)
+        ):
+            payload[b["name"]] = b["value"]
+        return payload
+
+    def read_progress(self, token: str) -> Optional[Dict[str, Any]]:
+        """Status/progress columns only (what progress polling needs)."""
+        row = self._con().execute(
+            "SELECT owner, status, progress, progress_phase, error FROM pending_jobs WHERE token=?",
+            (token,),
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def write(self, token: str, payload: Dict[str, Any]) -> None:
+        self._write(self._con(), token, payload, updated_at=time.time())
+
+    def _write(
+        self, con: sqlite3.Connection, token: str, payload: Dict[str, Any], *, updated_at: float
+    ) -> None:
+        meta = {
+            k: v for k, v in payload.items() if k not in BLOB_FIELDS and k not in _COLUMN_FIELDS
+        }
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            con.execute(
+                """
+                INSERT INTO pending_jobs(
+                  token, owner, status, progress, progress_phase, error, meta_json, updated_at
+                ) VALUES (?,?,?,?,?,?,?,?)
+                ON CONFLICT(token) DO UPDATE SET
+                  owner=excluded.owner, status=excluded.status, progress=excluded.progress,
+                  progress_phase=excluded.progress_phase, error=excluded.error,
+                  meta_json=excluded.meta_json, updated_at=excluded.updated_at
+                """,
+                (
+                    token,
+                    str(payload.get("owner") or ""),
+                    str(payload.get("status") or ""),
+                    float(payload.get("progress") or 0.0),
+                    str(payload.get("progress_phase") or ""),
+                    str(payload.get("error") or ""),
+                    json.dumps(meta, ensure_ascii=False),
+                    updated_at,
+                ),
+            )
+            for name in BLOB_FIELDS:
+                value = payload.get(name)
+                if value is None:
+                    con.execute(
+                        "DELETE FROM pending_blobs WHERE token=? AND name=?", (token, name)
+                    )
+                    continue
+                value = str(value)
+                digest = hashlib.sha256(value.encode("utf-8")).hexdigest()
+                con.execute(
+                    """
+                    INSERT INTO pending_blobs(token, name, sha256, value) VALUES (?,?,?,?)
+                    ON CONFLICT(token, name) DO UPDATE SET
+                      sha256=excluded.sha256, value=excluded.value
+                    WHERE pending_blobs.sha256 <> excluded.sha256
+                    """,
+                    (token, name, digest, value),
+                )
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+
+    def set_progress(self, token: str, progress: float, phase: str) -> bool:
+        cur = self._con().execute(
+            "UPDATE pending_jobs SET progress=?, progress_phase=?, updated_at=? WHERE token=?",
+            (float(progress), phase, time.time(), token),
+        )
+        return cur.rowcount > 0
+
+    def delete(self, token: str) -> None:
+        con = self._con()
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            con.execute("DELETE FROM pending_blobs WHERE token=?", (token,))
+            con.execute("DELETE FROM pending_jobs WHERE token=?", (token,))
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+
+    def list(self, owner: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Newest first, without BLOB_FIELDS; unowned jobs are visible to everyone."""
+        if owner:
+            rows = self._con().execute(
+                """
+                SELECT * FROM pending_jobs WHERE owner IN (?, '')
+                ORDER BY updated_at DESC
+                """,
+                (owner,),
+            ).fetchall()
+        else:
+            rows = self._con().execute(
+                "SELECT * FROM pending_jobs ORDER BY updated_at DESC"
+            ).fetchall()
+        out = []
+        for row in rows:
+            payload = self._row_payload(row)
+            payload["_token"] = row["token"]
+            out.append(payload)
+        return out
+
+    def count(self, owner: Optional[str] = None) -> int:
+        if owner:
+            row = self._con().execute(
+                "SELECT COUNT(*) FROM pending_jobs WHERE owner IN (?, '')", (owner,)
+            ).fetchone()
+        else:
+            row = self._con().execute("SELECT COUNT(*) FROM pending_jobs").fetchone()
+        return int(row[0])
+
+    @staticmethod
+    def _row_payload(row: sqlite3.Row) -> Dict[str, Any]:
+        try:
+            payload = json.loads(row["meta_json"] or "{}")
+        except ValueError:
+            payload = {}
+        for key in _COLUMN_FIELDS:
+            payload[key] = row[key]
+        return payload
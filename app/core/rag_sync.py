@@ -1,10 +1,12 @@
 from __future__ import annotations
 
 import hashlib
+import json
 import logging
 import os
 import sqlite3
 import threading
+import time
 from collections import Counter
 from datetime import datetime
 from pathlib import Path
@@ -15,8 +17,9 @@ try:
 except Exception:  # pragma: no cover
     fcntl = None
 
-from app.agents.memory_store import MemoryManager
+from app.agents.memory_store import MemoryManager, chunk_content_hash
 from app.config import Config
+from app.core.task_queue import BackgroundTaskQueue
 from app.core.upload_pipeline import (
     collect_manual_corrections,
     compute_layout_hash,
@@ -27,6 +30,12 @@ from app.core.upload_pipeline import (
 logger = logging.getLogger("kukanilea.rag_sync")
 
 _SYNC_LOCK = threading.RLock()
+RAG_SYNC_WORKERS = max(1, int(os.environ.get("KUKANILEA_RAG_SYNC_WORKERS", "1")))
+RAG_SYNC_QUEUE_MAX = max(1, int(os.environ.get("KUKANILEA_RAG_SYNC_QUEUE_MAX", "64")))
+RAG_SYNC_MAX_ATTEMPTS = max(1, int(os.environ.get("KUKANILEA_RAG_SYNC_MAX_ATTEMPTS", "4")))
+RAG_SYNC_RETRY_BASE_SECONDS = float(os.environ.get("KUKANILEA_RAG_SYNC_RETRY_BASE_SECONDS", "5"))
+# Chunks per store_memories call (one embedding batch + one transaction).
+RAG_SYNC_STORE_BATCH = 64
 _MAX_MEMORY_BYTES = 100 * 1024
 _KEEP_MEMORY_BYTES = 50 * 1024
 
@@ -173,29 +182,171 @@ def _write_rag_sync_dlq(tenant_id: str, doc_id: str, file_name: str, chunk_index
         },
     )
 
+# Gear table for content-defined cuts: the rolling hash below only depends on
+# the last 32 characters, so cut points move with the text, not with offsets.
+_GEAR = tuple(
+    int.from_bytes(hashlib.sha256(bytes([i])).digest()[:4], "big") for i in range(256)
+)
+# High bits: they mix the whole 32-character window, the low bits only the
+# last few characters.
+_CDC_MASK = 0xF8000000
+
+
+def _chunk_bounds(text: str, chunk_size: int, overlap: int) -> List[tuple[int, int]]:
+    """
+    Splits text into segments that end at content-defined points: after a
+    blank line, before a Markdown heading, or at whitespace where the rolling
+    hash hits the mask. Segments are at least a quarter chunk long; if no
+    boundary shows up, they are cut at the last whitespace or at the limit.
+    """
+    text_len = len(text)
+    min_len = max(1, chunk_size // 4)
+    bounds: List[tuple[int, int]] = []
+    start = 0
+    last_ws = -1
+    h = 0
+    for i, ch in enumerate(text):
+        h = ((h << 1) + _GEAR[ord(ch) & 0xFF]) & 0xFFFFFFFF
+        seg_len = i + 1 - start
+        limit = max(min_len, chunk_size - (overlap if bounds else 0))
+        cut = -1
+        if ch.isspace():
+            paragraph = ch == "\n" and (
+                (i > 0 and text[i - 1] == "\n")
+                or (i + 1 < text_len and text[i + 1] == "#")
+            )
+            if seg_len >= min_len and (paragraph or (h & _CDC_MASK) == 0):
+                cut = i + 1
+            else:
+                last_ws = i + 1
+        if cut < 0 and seg_len >= limit:
+            cut = last_ws if last_ws > start + min_len else i + 1
+        if cut >= 0:
+            bounds.append((start, cut))
+            start = cut
+            last_ws = -1
+    if start < text_len:
+        bounds.append((start, text_len))
+    return bounds
+
+
 def chunk_text(text: str, chunk_size: int = 800, overlap: int = 100) -> List[str]:
     """
-    Lightweight text chunking with overlap.
-    Ensures semantic context is preserved across chunks.
+    Content-anchored text chunking with overlap.
+
+    Chunk boundaries follow paragraphs, headings and content-defined cuts
+    instead of fixed offsets, so an edit only changes the chunks around it
+    and re-syncs keep the content hashes of the rest. Each chunk after the
+    first repeats up to `overlap` characters of its predecessor for context.
     """
     if not text:
         return []
 
     chunks = []
-    start = 0
-    text_len = len(text)
+    prev_start = 0
+    for start, end in _chunk_bounds(text, chunk_size, overlap):
+        chunks.append(text[max(prev_start, start - overlap) if chunks else start : end])
+        prev_start = start
+    return chunks
 
-    while start < text_len:
-        end = start + chunk_size
-        chunk = text[start:end]
-        chunks.append(chunk)
+def _plan_document_sync(
+    manager: MemoryManager, tenant_id: str, doc_id: str, chunks: List[str]
+) -> List[int]:
+    """
+    Chunk-level dedupe against agent_memory_chunks: stored chunks whose
+    content hash reappears are kept (relabelled if their position moved),
+    the rest are deleted. Returns the indices of chunks that need embedding.
+    """
+    all_indices = list(range(len(chunks)))
+    try:
+        existing = manager.document_chunks(tenant_id, doc_id)
+    except Exception as e:
+        logger.warning(f"RAG-SYNC: Duplicate check failed for {doc_id}: {e}")
+        # Continue anyway, better to have duplicates than missing memory
+        return all_indices
+    if not existing:
+        return all_indices
+
+    by_hash: Dict[str, List[Dict[str, Any]]] = {}
+    for row in existing:
+        by_hash.setdefault(row["content_hash"], []).append(row)
+    needed: List[int] = []
+    moved: List[tuple[int, int]] = []
+    for i, chunk in enumerate(chunks):
+        candidates = by_hash.get(chunk_content_hash(chunk))
+        if not candidates:
+            needed.append(i)
+            continue
+        row = candidates.pop(0)
+        if int(row["chunk_index"]) != i:
+            moved.append((int(row["memory_id"]), i))
+    deleted = [int(row["memory_id"]) for rows in by_hash.values() for row in rows]
+
+    if not needed and not moved and not deleted:
+        logger.info(f"RAG-SYNC: Document {doc_id} already exists in memory. Skipping sync.")
+        return []
+    if moved or deleted or len(existing) != len(chunks):
+        manager.update_document_chunks(
+            tenant_id, doc_id, moved=moved, total_chunks=len(chunks), deleted=deleted
+        )
+    logger.info(
+        "RAG-SYNC: Re-index diff (doc_ref=%s new=%s moved=%s deleted=%s)",
+        _redact_ref(doc_id),
+        len(needed),
+        len(moved),
+        len(deleted),
+    )
+    return needed
 
-        if end >= text_len:
-            break
 
-        start += (chunk_size - overlap)
+def _store_chunks(
+    manager: MemoryManager,
+    *,
+    tenant_id: str,
+    doc_id: str,
+    file_name: str,
+    chunks: List[str],
+    indices: List[int],
+    metadata: Optional[Dict[str, Any]],
+) -> tuple[int, List[int]]:
+    """Stores chunks[i] for i in indices in batches; returns (stored, failed indices)."""
+    stored_count = 0
+    failed: List[int] = []
+    for start in range(0, len(indices), RAG_SYNC_STORE_BATCH):
+        batch = indices[start : start + RAG_SYNC_STORE_BATCH]
+        items = []
+        for i in batch:
+            chunk_meta = (metadata or {}).copy()
+            chunk_meta.update({
+                "doc_id": doc_id,
+                "file_name": file_name,
+                "chunk_index": i,
+                "total_chunks": len(chunks),
+                "type": "document_snippet"
+            })
+            items.append({
+                "content": chunks[i],
+                "metadata": chunk_meta,
+                "provenance": {
+                    "doc_id": doc_id,
+                    "chunk_index": i,
+                    "content_hash": chunk_content_hash(chunks[i]),
+                },
+            })
+        try:
+            results = manager.store_memories(
+                tenant_id=tenant_id, agent_role="document_engine", items=items
+            )
+        except Exception as exc:
+            logger.warning("RAG-SYNC: Chunk store crashed for doc=%s: %s", doc_id, exc)
+            results = [False] * len(batch)
+        for i, ok in zip(batch, results):
+            if ok:
+                stored_count += 1
+            else:
+                failed.append(i)
+    return stored_count, failed
 
-    return chunks
 
 def sync_document_to_memory(
     tenant_id: str,
@@ -207,75 +358,256 @@ def sync_document_to_memory(
     """
     Chunks the document text and stores it in the semantic memory (agent_memory).
     Enables RAG capabilities for uploaded documents.
+
+    Synchronous single attempt: chunks that fail are written to the RAG DLQ.
+    enqueue_document_sync is the retrying, non-blocking variant.
     """
     if not text or len(text.strip()) < 10:
         return 0
-        
-    auth_db_path = str(Config.AUTH_DB)
-    
-    # 1. Duplicate Check: Skip if this doc_id already has document_snippet chunks
-    try:
-        conn = sqlite3.connect(auth_db_path)
-        res = conn.execute(
-            "SELECT COUNT(*) FROM agent_memory WHERE tenant_id = ? AND agent_role = 'document_engine' AND json_extract(metadata, '$.doc_id') = ?",
-            (tenant_id, doc_id)
-        ).fetchone()
-        if res and res[0] > 0:
-            logger.info(f"RAG-SYNC: Document {doc_id} already exists in memory. Skipping sync.")
-            conn.close()
-            return 0
-        conn.close()
-    except Exception as e:
-        logger.warning(f"RAG-SYNC: Duplicate check failed for {doc_id}: {e}")
-        # Continue anyway, better to have duplicates than missing memory
-    
-    # 2. Initialize Memory Manager
-    manager = MemoryManager(auth_db_path)
-    
-    # 3. Chunk text
+
+    manager = MemoryManager(str(Config.AUTH_DB))
     chunks = chunk_text(text)
+    indices = _plan_document_sync(manager, tenant_id, doc_id, chunks)
+    if not indices:
+        return 0
     logger.info(
         "RAG-SYNC: Syncing document chunks (tenant_ref=%s doc_ref=%s chunks=%s)",
         _redact_ref(tenant_id),
         _redact_ref(doc_id),
-        len(chunks),
+        len(indices),
     )
-    
-    # 4. Store each chunk
-    stored_count = 0
-    for i, chunk in enumerate(chunks):
-        chunk_meta = (metadata or {}).copy()
-        chunk_meta.update({
-            "doc_id": doc_id,
-            "file_name": file_name,
-            "chunk_index": i,
-            "total_chunks": len(chunks),
-            "type": "document_snippet"
-        })
+    stored_count, failed = _store_chunks(
+        manager,
+        tenant_id=tenant_id,
+        doc_id=doc_id,
+        file_name=file_name,
+        chunks=chunks,
+        indices=indices,
+        metadata=metadata,
+    )
+    for i in failed:
+        _write_rag_sync_dlq(
+            tenant_id=tenant_id,
+            doc_id=doc_id,
+            file_name=file_name,
+            chunk_index=i,
+            reason="embedding_or_storage_failed",
+        )
+    return stored_count
 
-        try:
-            success = manager.store_memory(
-                tenant_id=tenant_id,
-                agent_role="document_engine",
-                content=chunk,
-                metadata=chunk_meta
+_DOC_SYNC_QUEUE: Optional[BackgroundTaskQueue] = None
+_DOC_SYNC_QUEUE_LOCK = threading.Lock()
+# Retries waiting on their backoff timer (not yet back in the queue), by job id.
+_DOC_SYNC_RETRIES: Dict[int, threading.Timer] = {}
+# Job databases whose persisted jobs were already resumed in this process.
+_DOC_SYNC_RESUMED: set[str] = set()
+
+
+def _doc_sync_queue() -> BackgroundTaskQueue:
+    global _DOC_SYNC_QUEUE
+    with _DOC_SYNC_QUEUE_LOCK:
+        if _DOC_SYNC_QUEUE is None:
+            _DOC_SYNC_QUEUE = BackgroundTaskQueue(
+                num_workers=RAG_SYNC_WORKERS, maxsize=RAG_SYNC_QUEUE_MAX
             )
-        except Exception as exc:
-            logger.warning("RAG-SYNC: Chunk store crashed for doc=%s idx=%s: %s", doc_id, i, exc)
-            success = False
-
-        if success:
-            stored_count += 1
-        else:
-            _write_rag_sync_dlq(
-                tenant_id=tenant_id,
-                doc_id=doc_id,
-                file_name=file_name,
-                chunk_index=i,
-                reason="embedding_or_storage_failed",
+            _DOC_SYNC_QUEUE.start()
+        return _DOC_SYNC_QUEUE
+
+
+def _doc_sync_jobs_db() -> sqlite3.Connection:
+    """
+    Pending document syncs live in rag_sync_jobs (auth DB) until they finish
+    or are dead-lettered, so a restart does not lose them.
+    """
+    con = sqlite3.connect(str(Config.AUTH_DB), timeout=30)
+    con.row_factory = sqlite3.Row
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS rag_sync_jobs(
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          tenant_id TEXT NOT NULL,
+          doc_id TEXT NOT NULL,
+          file_name TEXT NOT NULL,
+          text TEXT NOT NULL,
+          metadata TEXT,
+          attempt INTEGER NOT NULL DEFAULT 0,
+          next_attempt_at REAL NOT NULL DEFAULT 0,
+          created_at TEXT NOT NULL
+        )
+        """
+    )
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS idx_rag_sync_jobs_doc ON rag_sync_jobs(tenant_id, doc_id)"
+    )
+    return con
+
+
+def _finish_document_sync_job(job_id: int) -> None:
+    con = _doc_sync_jobs_db()
+    try:
+        con.execute("DELETE FROM rag_sync_jobs WHERE id=?", (job_id,))
+        con.commit()
+    finally:
+        con.close()
+
+
+def _schedule_document_sync_job(job_id: int, delay: float) -> None:
+    if delay <= 0:
+        _doc_sync_queue().submit(_run_document_sync_job, job_id)
+        return
+
+    def _resubmit() -> None:
+        _doc_sync_queue().submit(_run_document_sync_job, job_id)
+        with _DOC_SYNC_QUEUE_LOCK:
+            _DOC_SYNC_RETRIES.pop(job_id, None)
+
+    timer = threading.Timer(delay, _resubmit)
+    timer.daemon = True
+    with _DOC_SYNC_QUEUE_LOCK:
+        _DOC_SYNC_RETRIES[job_id] = timer
+    timer.start()
+
+
+def _run_document_sync_job(job_id: int) -> None:
+    con = _doc_sync_jobs_db()
+    try:
+        job = con.execute("SELECT * FROM rag_sync_jobs WHERE id=?", (job_id,)).fetchone()
+    finally:
+        con.close()
+    if job is None:
+        # Finished, or superseded by a newer sync of the same document.
+        return
+    tenant_id = str(job["tenant_id"])
+    doc_id = str(job["doc_id"])
+    file_name = str(job["file_name"])
+    metadata = json.loads(job["metadata"]) if job["metadata"] else None
+
+    # Every attempt re-plans against what is stored now: chunks that landed
+    # on an earlier attempt are kept, and the diff always matches this text.
+    manager = MemoryManager(str(Config.AUTH_DB))
+    chunks = chunk_text(str(job["text"]))
+    indices = _plan_document_sync(manager, tenant_id, doc_id, chunks)
+    failed: List[int] = []
+    if indices:
+        _stored, failed = _store_chunks(
+            manager,
+            tenant_id=tenant_id,
+            doc_id=doc_id,
+            file_name=file_name,
+            chunks=chunks,
+            indices=indices,
+            metadata=metadata,
+        )
+    attempt = int(job["attempt"]) + 1
+    if failed and attempt < RAG_SYNC_MAX_ATTEMPTS:
+        delay = RAG_SYNC_RETRY_BASE_SECONDS * (2 ** (attempt - 1))
+        con = _doc_sync_jobs_db()
+        try:
+            con.execute(
+                "UPDATE rag_sync_jobs SET attempt=?, next_attempt_at=? WHERE id=?",
+                (attempt, time.time() + delay, job_id),
             )
+            con.commit()
+        finally:
+            con.close()
+        _schedule_document_sync_job(job_id, delay)
+        return
+    for i in failed:
+        _write_rag_sync_dlq(
+            tenant_id=tenant_id,
+            doc_id=doc_id,
+            file_name=file_name,
+            chunk_index=i,
+            reason="embedding_or_storage_failed",
+        )
+    _finish_document_sync_job(job_id)
+
+
+def resume_document_sync_jobs() -> int:
+    """
+    Re-queues document syncs persisted by an earlier process, keeping the
+    remaining backoff of jobs that were waiting on a retry. Runs once per
+    job database and process; returns how many jobs were resumed.
+    """
+    key = str(Path(Config.AUTH_DB).resolve())
+    with _DOC_SYNC_QUEUE_LOCK:
+        if key in _DOC_SYNC_RESUMED:
+            return 0
+        _DOC_SYNC_RESUMED.add(key)
+    con = _doc_sync_jobs_db()
+    try:
+        rows = con.execute(
+            "SELECT id, next_attempt_at FROM rag_sync_jobs ORDER BY id"
+        ).fetchall()
+    finally:
+        con.close()
+    now = time.time()
+    for row in rows:
+        _schedule_document_sync_job(int(row["id"]), float(row["next_attempt_at"]) - now)
+    return len(rows)
+
+
+def enqueue_document_sync(
+    tenant_id: str,
+    doc_id: str,
+    file_name: str,
+    text: str,
+    metadata: Optional[Dict[str, Any]] = None,
+) -> None:
+    """
+    Queues a document for background RAG sync so indexing does not wait on
+    embeddings. The job is persisted first and replaces any older job for
+    the same document. The queue is bounded (submit blocks when it is full);
+    failing attempts are retried with exponential backoff, and only chunks
+    still failing after RAG_SYNC_MAX_ATTEMPTS end up in the RAG DLQ.
+    """
+    if not text or len(text.strip()) < 10:
+        return
+    resume_document_sync_jobs()
+    con = _doc_sync_jobs_db()
+    try:
+        con.execute(
+            "DELETE FROM rag_sync_jobs WHERE tenant_id=? AND doc_id=?",
+            (tenant_id, doc_id),
+        )
+        cur = con.execute(
+            """
+            INSERT INTO rag_sync_jobs(tenant_id, doc_id, file_name, text, metadata, created_at)
+            VALUES (?,?,?,?,?,?)
+            """,
+            (
+                tenant_id,
+                doc_id,
+                file_name,
+                text,
+                json.dumps(metadata, default=str) if metadata else None,
+                datetime.now().isoformat(timespec="seconds"),
+            ),
+        )
+        job_id = int(cur.lastrowid)
+        con.commit()
+    finally:
+        con.close()
+    _schedule_document_sync_job(job_id, 0)
+
+
+def wait_for_document_sync(timeout: float = 60.0) -> bool:
+    """Blocks until queued document syncs (incl. pending retries) are done."""
+    deadline = time.monotonic() + timeout
+    while True:
+        with _DOC_SYNC_QUEUE_LOCK:
+            sync_queue = _DOC_SYNC_QUEUE
+        remaining = deadline - time.monotonic()
+        if sync_queue is not None and not sync_queue.wait_idle(max(remaining, 0.0)):
+            return False
+        with _DOC_SYNC_QUEUE_LOCK:
+            retrying = bool(_DOC_SYNC_RETRIES)
+        if not retrying:
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
 
-    return stored_count
 
 def learn_from_correction(
     tenant_id: str,
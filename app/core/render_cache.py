@@ -0,0 +1,124 @@
+"""
+app/core/render_cache.py
+Disk-backed LRU cache for visualizer renders (page PNGs and JSON payloads).
+
+Entries are plain files `<key><suffix>` in one directory; the key is derived
+from the content hash of the source file plus the render parameters, so it
+doubles as the HTTP ETag. A hit refreshes the file's mtime, and once the
+directory grows beyond `max_bytes` the least recently used files are removed.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+class RenderCache:
+    def __init__(self, directory: Path, *, max_bytes: int, enabled: bool = True) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max(0, int(max_bytes))
+        self.enabled = bool(enabled) and self.max_bytes > 0
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+        self._stats: Dict[str, int] = {"hits": 0, "misses": 0, "puts": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        raw = "\x1f".join(str(p) for p in parts)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:40]
+
+    def _path(self, key: str, suffix: str) -> Path:
+        return self.directory / f"{key}{suffix}"
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[name] += n
+
+    def get(self, key: str, suffix: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        fp = self._path(key, suffix)
+        try:
+            data = fp.read_bytes()
+        except OSError:
+            self._count("misses")
+            return None
+        try:
+            os.utime(fp, None)
+        except OSError:
+            pass
+        self._count("hits")
+        return data
+
+    def put(self, key: str, suffix: str, data: bytes) -> None:
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fp = self._path(key, suffix)
+        tmp = fp.with_name(f"{fp.name}.tmp_{os.getpid()}_{time.time_ns()}")
+        try:
+            tmp.write_bytes(data)
+            tmp.replace(fp)
+        except OSError:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+            return
+        self._count("puts")
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_size()
+            else:
+                self._total_bytes += len(data)
+            over = self._total_bytes > self.max_bytes
+        if over:
+            self._evict()
+
+    def _scan_size(self) -> int:
+        total = 0
+        for entry in os.scandir(self.directory):
+            try:
+                total += entry.stat().st_size
+            except OSError:
+                continue
+        return total
+
+    def _evict(self) -> None:
+        """Drops least recently used files until the cache is at 90% of max_bytes."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        with self._lock:
+            self._total_bytes = total
+            self._stats["evictions"] += removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+        lookups = out["hits"] + out["misses"]
+        out["hit_rate"] = round(out["hits"] / lookups, 4) if lookups else 0.0
+        out["enabled"] = self.enabled
+        out["max_bytes"] = self.max_bytes
+        return out
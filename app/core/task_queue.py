@@ -10,8 +10,9 @@ from typing import Callable, Any, Dict
 logger = logging.getLogger("kukanilea.task_queue")
 
 class BackgroundTaskQueue:
-    def __init__(self, num_workers: int = 4):
-        self.q = queue.Queue()
+    def __init__(self, num_workers: int = 4, maxsize: int = 0):
+        # maxsize > 0 bounds the backlog: submit() then blocks (backpressure).
+        self.q = queue.Queue(maxsize=maxsize)
         self.workers = []
         self.num_workers = num_workers
         self._stop_event = threading.Event()
@@ -39,6 +40,13 @@ class BackgroundTaskQueue:
     def submit(self, func: Callable, *args, **kwargs):
         self.q.put((func, args, kwargs))
 
+    def wait_idle(self, timeout: float = 30.0) -> bool:
+        """Waits until every submitted task has finished; False on timeout."""
+        with self.q.all_tasks_done:
+            return self.q.all_tasks_done.wait_for(
+                lambda: not self.q.unfinished_tasks, timeout=timeout
+            )
+
     def _worker_loop(self):
         while not self._stop_event.is_set():
             try:
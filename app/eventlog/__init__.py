@@ -4,12 +4,14 @@ from .core import (
     event_get_history,
     event_hash,
     event_verify_chain,
+    event_verify_report,
 )
 
 __all__ = [
     "event_hash",
     "event_append",
     "event_verify_chain",
+    "event_verify_report",
     "event_get_history",
     "ensure_eventlog_schema",
 ]
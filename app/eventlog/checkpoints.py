@@ -0,0 +1,104 @@
+"""
+app/eventlog/checkpoints.py
+Signed verification checkpoints for hash chains (event log, evidence vault).
+
+A checkpoint stores the id and hash of the last row that passed a
+verification, signed with an HMAC over (chain, id, hash). The next run
+resumes after the newest checkpoint whose signature is valid and whose row
+still carries the recorded hash, so its cost follows the rows appended since
+rather than the age of the log. Checkpoints with a bad signature (forged, or
+written under another key) are ignored.
+
+The key is KUKANILEA_CHAIN_CHECKPOINT_KEY, falling back to the app secret.
+Dev setups without KUKANILEA_SECRET get a fresh secret per process, so their
+checkpoints are only trusted by the process that wrote them.
+"""
+from __future__ import annotations
+
+import hashlib
+import hmac
+import os
+import sqlite3
+from datetime import UTC, datetime
+
+from app.config import Config
+
+# A checkpoint is written every this many verified rows (and at the end).
+CHECKPOINT_INTERVAL = max(1, int(os.environ.get("KUKANILEA_CHAIN_CHECKPOINT_ROWS", "10000")))
+# Checkpoints kept per chain; older ones are pruned when new ones are written.
+CHECKPOINT_KEEP = 64
+
+
+def _key() -> bytes:
+    key = os.environ.get("KUKANILEA_CHAIN_CHECKPOINT_KEY", "").strip() or str(Config.SECRET_KEY)
+    return key.encode("utf-8")
+
+
+def sign_checkpoint(chain: str, row_id: int, row_hash: str) -> str:
+    msg = f"{chain}|{int(row_id)}|{row_hash}".encode("utf-8")
+    return hmac.new(_key(), msg, hashlib.sha256).hexdigest()
+
+
+def ensure_checkpoint_schema(con: sqlite3.Connection) -> None:
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS chain_checkpoints(
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          chain TEXT NOT NULL,
+          row_id INTEGER NOT NULL,
+          row_hash TEXT NOT NULL,
+          created_at TEXT NOT NULL,
+          signature TEXT NOT NULL,
+          UNIQUE(chain, row_id)
+        )
+        """
+    )
+
+
+def latest_checkpoint(con: sqlite3.Connection, chain: str) -> tuple[int, str] | None:
+    """Newest checkpoint of `chain` with a valid signature, as (row_id, row_hash)."""
+    rows = con.execute(
+        """
+        SELECT row_id, row_hash, signature FROM chain_checkpoints
+        WHERE chain=? ORDER BY row_id DESC
+        """,
+        (chain,),
+    )
+    for row_id, row_hash, signature in rows:
+        expected = sign_checkpoint(chain, int(row_id), str(row_hash))
+        if hmac.compare_digest(expected, str(signature or "")):
+            return int(row_id), str(row_hash)
+    return None
+
+
+def record_checkpoints(
+    con: sqlite3.Connection, chain: str, points: list[tuple[int, str]]
+) -> int | None:
+    """Stores verified (row_id, row_hash) points; returns the newest row id written."""
+    if not points:
+        return None
+    now = datetime.now(UTC).isoformat(timespec="seconds").replace("+00:00", "Z")
+    con.executemany(
+        """
+        INSERT OR REPLACE INTO chain_checkpoints(chain, row_id, row_hash, created_at, signature)
+        VALUES (?,?,?,?,?)
+        """,
+        [
+            (chain, int(row_id), row_hash, now, sign_checkpoint(chain, row_id, row_hash))
+            for row_id, row_hash in points
+        ],
+    )
+    con.execute(
+        """
+        DELETE FROM chain_checkpoints
+        WHERE chain=? AND row_id NOT IN (
+          SELECT row_id FROM chain_checkpoints WHERE chain=? ORDER BY row_id DESC LIMIT ?
+        )
+        """,
+        (chain, chain, CHECKPOINT_KEEP),
+    )
+    return max(int(row_id) for row_id, _ in points)
+
+
+def throughput(rows: int, seconds: float) -> float:
+    return round(rows / seconds, 1) if seconds > 0 else float(rows)
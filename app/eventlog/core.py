@@ -2,7 +2,11 @@ from __future__ import annotations
 
 import hashlib
 import json
+import multiprocessing
+import os
 import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import UTC, datetime
 from pathlib import Path
 from typing import Any
@@ -11,7 +15,22 @@ from flask import current_app, has_app_context
 
 from app.config import Config
 
+from .checkpoints import (
+    CHECKPOINT_INTERVAL,
+    ensure_checkpoint_schema,
+    latest_checkpoint,
+    record_checkpoints,
+    throughput,
+)
+
 GENESIS_HASH = "0" * 64
+CHECKPOINT_CHAIN = "events"
+# Worker processes for segment-parallel verification (1 = sequential).
+VERIFY_WORKERS = max(1, int(os.environ.get("KUKANILEA_EVENTLOG_VERIFY_WORKERS", "1")))
+# Segments smaller than this are not worth a worker process.
+_PARALLEL_MIN_ROWS = 50_000
+_VERIFY_CHUNK_ROWS = 2_000
+_VERIFY_COLUMNS = "id, ts, event_type, entity_type, entity_id, payload_json, prev_hash, hash"
 EVENT_FIELDS = (
     "id",
     "ts",
@@ -63,18 +82,55 @@ def ensure_eventlog_schema() -> None:
               entity_id INTEGER NOT NULL,
               payload_json TEXT NOT NULL,
               prev_hash TEXT NOT NULL,
-              hash TEXT NOT NULL UNIQUE
+              hash TEXT NOT NULL UNIQUE,
+              tenant_id TEXT
             )
             """
         )
         con.execute(
             "CREATE INDEX IF NOT EXISTS idx_events_entity ON events(entity_type, entity_id, id DESC)"
         )
+        ensure_event_tenant_index(con)
+        ensure_checkpoint_schema(con)
         con.commit()
     finally:
         con.close()
 
 
+def _payload_tenant(payload: dict[str, Any]) -> str:
+    return str((payload or {}).get("tenant_id") or "").strip()
+
+
+def ensure_event_tenant_index(con: sqlite3.Connection) -> int:
+    """
+    Adds the indexed tenant_id projection to an events table created without
+    it and backfills rows that lack it. Returns the number of rows backfilled.
+
+    tenant_id mirrors payload_json.tenant_id ('' for tenant-less events); it
+    is not part of the hash, the payload it is derived from is.
+    """
+    columns = {str(row[1]) for row in con.execute("PRAGMA table_info(events)")}
+    if not columns:
+        return 0
+    if "tenant_id" not in columns:
+        con.execute("ALTER TABLE events ADD COLUMN tenant_id TEXT")
+    con.execute("CREATE INDEX IF NOT EXISTS idx_events_tenant ON events(tenant_id, id)")
+    if con.execute("SELECT 1 FROM events WHERE tenant_id IS NULL LIMIT 1").fetchone() is None:
+        return 0
+    cur = con.execute(
+        """
+        UPDATE events
+        SET tenant_id = CASE
+          WHEN json_valid(payload_json)
+            THEN TRIM(COALESCE(CAST(json_extract(payload_json, '$.tenant_id') AS TEXT), ''))
+          ELSE ''
+        END
+        WHERE tenant_id IS NULL
+        """
+    )
+    return int(cur.rowcount or 0)
+
+
 def event_hash(
     prev_hash: str,
     ts: str,
@@ -119,15 +175,17 @@ def event_append(
     try:
         if owns_connection:
             db.execute("BEGIN IMMEDIATE")
+        else:
+            ensure_event_tenant_index(db)
         row = db.execute("SELECT hash FROM events ORDER BY id DESC LIMIT 1").fetchone()
         prev = str(row["hash"]) if row else GENESIS_HASH
         hsh = event_hash(prev, ts, ev_type, ent_type, ent_id, payload_json)
         cur = db.execute(
             """
-            INSERT INTO events(ts, event_type, entity_type, entity_id, payload_json, prev_hash, hash)
-            VALUES (?,?,?,?,?,?,?)
+            INSERT INTO events(ts, event_type, entity_type, entity_id, payload_json, prev_hash, hash, tenant_id)
+            VALUES (?,?,?,?,?,?,?,?)
             """,
-            (ts, ev_type, ent_type, ent_id, payload_json, prev, hsh),
+            (ts, ev_type, ent_type, ent_id, payload_json, prev, hsh, _payload_tenant(payload)),
         )
         if owns_connection:
             db.commit()
@@ -137,43 +195,175 @@ def event_append(
             db.close()
 
 
-def event_verify_chain(
-    *, con: sqlite3.Connection | None = None
-) -> tuple[bool, int | None, str | None]:
+def _event_error(row: Any, prev: str) -> str | None:
+    if not row[1]:
+        return "missing_ts"
+    if not row[2] or not row[3]:
+        return "missing_event_fields"
+    if row[4] <= 0:
+        return "invalid_entity_id"
+    prev_hash = str(row[6] or "")
+    if prev_hash != prev:
+        return "prev_hash_mismatch"
+    calc = event_hash(
+        prev_hash,
+        str(row[1] or ""),
+        str(row[2] or ""),
+        str(row[3] or ""),
+        int(row[4] or 0),
+        str(row[5] or ""),
+    )
+    if calc != str(row[7] or ""):
+        return "hash_mismatch"
+    return None
+
+
+def _verify_rows(
+    db: sqlite3.Connection, after_id: int, upto_id: int, prev: str
+) -> dict[str, Any]:
+    """Streams events in (after_id, upto_id] and checks them against `prev`."""
+    cur = db.execute(
+        f"SELECT {_VERIFY_COLUMNS} FROM events WHERE id > ? AND id <= ? ORDER BY id ASC",
+        (int(after_id), int(upto_id)),
+    )
+    count = 0
+    points: list[tuple[int, str]] = []
+    while True:
+        rows = cur.fetchmany(_VERIFY_CHUNK_ROWS)
+        if not rows:
+            break
+        for row in rows:
+            rid = int(row[0])
+            reason = _event_error(row, prev)
+            if reason:
+                return {"ok": False, "first_bad_id": rid, "reason": reason, "rows": count,
+                        "last_hash": prev, "points": points}
+            prev = str(row[7])
+            count += 1
+            if count % CHECKPOINT_INTERVAL == 0:
+                points.append((rid, prev))
+    return {"ok": True, "first_bad_id": None, "reason": None, "rows": count,
+            "last_hash": prev, "points": points}
+
+
+def _verify_segment(db_path: str, after_id: int, upto_id: int, prev: str) -> dict[str, Any]:
+    con = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=30)
+    try:
+        return _verify_rows(con, after_id, upto_id, prev)
+    finally:
+        con.close()
+
+
+def _verify_parallel(
+    db: sqlite3.Connection, after_id: int, upto_id: int, prev: str, segments: int
+) -> list[dict[str, Any]]:
+    # Each segment starts from the stored hash of the row before it; that row
+    # is checked by the previous segment, so the results chain up exactly as
+    # a sequential walk would.
+    bounds = [after_id + (upto_id - after_id) * i // segments for i in range(segments + 1)]
+    jobs = []
+    for lo, hi in zip(bounds, bounds[1:]):
+        row = db.execute(
+            "SELECT hash FROM events WHERE id <= ? AND id > ? ORDER BY id DESC LIMIT 1",
+            (lo, after_id),
+        ).fetchone()
+        jobs.append((lo, hi, str(row[0]) if row else prev))
+    with ProcessPoolExecutor(
+        max_workers=segments, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+        futures = [
+            pool.submit(_verify_segment, str(_core_db_path()), lo, hi, seg_prev)
+            for lo, hi, seg_prev in jobs
+        ]
+        return [f.result() for f in futures]
+
+
+def event_verify_report(
+    *,
+    con: sqlite3.Connection | None = None,
+    full: bool = False,
+    workers: int | None = None,
+) -> dict[str, Any]:
+    """
+    Verifies the chain and reports how: rows checked, where it resumed and
+    the throughput. Resumes after the newest trusted checkpoint unless `full`;
+    with `workers` > 1 large ranges are split into segments checked in worker
+    processes (only when the connection is owned, i.e. the DB path is known).
+    """
     ensure_eventlog_schema()
+    started = time.perf_counter()
     owns_connection = con is None
     db = con or _connect()
+    report: dict[str, Any] = {
+        "ok": True,
+        "first_bad_id": None,
+        "reason": None,
+        "full": bool(full),
+        "resumed_from": 0,
+        "last_id": 0,
+        "rows_verified": 0,
+        "segments": 1,
+        "checkpoint": None,
+    }
     try:
-        rows = db.execute("SELECT * FROM events ORDER BY id ASC").fetchall()
+        after_id, prev = 0, GENESIS_HASH
+        checkpoint = None if full else latest_checkpoint(db, CHECKPOINT_CHAIN)
+        if checkpoint is not None:
+            cp_id, cp_hash = checkpoint
+            row = db.execute("SELECT hash FROM events WHERE id=?", (cp_id,)).fetchone()
+            if row is None or str(row[0]) != cp_hash:
+                report.update(ok=False, first_bad_id=cp_id, reason="checkpoint_mismatch")
+            else:
+                after_id, prev = cp_id, cp_hash
+                report["resumed_from"] = cp_id
+
+        if report["ok"]:
+            upto_id, pending = db.execute(
+                "SELECT COALESCE(MAX(id), 0), COUNT(*) FROM events WHERE id > ?", (after_id,)
+            ).fetchone()
+            upto_id = max(int(upto_id), after_id)
+            segments = 1
+            if owns_connection:
+                segments = max(1, min(workers or VERIFY_WORKERS, int(pending) // _PARALLEL_MIN_ROWS))
+            if segments > 1:
+                results = _verify_parallel(db, after_id, upto_id, prev, segments)
+            else:
+                results = [_verify_rows(db, after_id, upto_id, prev)]
+            report["segments"] = segments
+
+            points: list[tuple[int, str]] = []
+            for result in results:
+                report["rows_verified"] += result["rows"]
+                points.extend(result["points"])
+                if not result["ok"]:
+                    report.update(ok=False, first_bad_id=result["first_bad_id"], reason=result["reason"])
+                    break
+                prev = result["last_hash"]
+            if report["ok"]:
+                report["last_id"] = upto_id
+                if upto_id > after_id:
+                    points.append((upto_id, prev))
+            if owns_connection and points:
+                report["checkpoint"] = record_checkpoints(db, CHECKPOINT_CHAIN, points)
+                db.commit()
     finally:
         if owns_connection:
             db.close()
 
-    prev = GENESIS_HASH
-    for row in rows:
-        rid = int(row["id"])
-        if not row["ts"]:
-            return False, rid, "missing_ts"
-        if not row["event_type"] or not row["entity_type"]:
-            return False, rid, "missing_event_fields"
-        if row["entity_id"] <= 0:
-            return False, rid, "invalid_entity_id"
-        prev_hash = str(row["prev_hash"] or "")
-        if prev_hash != prev:
-            return False, rid, "prev_hash_mismatch"
-        calc = event_hash(
-            prev_hash,
-            str(row["ts"] or ""),
-            str(row["event_type"] or ""),
-            str(row["entity_type"] or ""),
-            int(row["entity_id"] or 0),
-            str(row["payload_json"] or ""),
-        )
-        stored = str(row["hash"] or "")
-        if calc != stored:
-            return False, rid, "hash_mismatch"
-        prev = stored
-    return True, None, None
+    elapsed = time.perf_counter() - started
+    report["duration_ms"] = round(elapsed * 1000, 2)
+    report["rows_per_second"] = throughput(report["rows_verified"], elapsed)
+    return report
+
+
+def event_verify_chain(
+    *,
+    con: sqlite3.Connection | None = None,
+    full: bool = False,
+    workers: int | None = None,
+) -> tuple[bool, int | None, str | None]:
+    report = event_verify_report(con=con, full=full, workers=workers)
+    return report["ok"], report["first_bad_id"], report["reason"]
 
 
 def event_get_history(entity_type: str, entity_id: int, limit: int = 50) -> list[dict]:
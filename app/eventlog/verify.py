@@ -1,14 +1,30 @@
 from __future__ import annotations
 
-from .core import event_verify_chain
+import argparse
 
+from .core import event_verify_report
 
-def main() -> int:
-    ok, first_bad_id, reason = event_verify_chain()
-    if ok:
-        print("eventlog: OK")
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Verify the event log hash chain.")
+    parser.add_argument(
+        "--full", action="store_true", help="ignore checkpoints and verify from genesis"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="parallel segment workers")
+    args = parser.parse_args(argv)
+
+    report = event_verify_report(full=args.full, workers=args.workers)
+    stats = (
+        f"rows={report['rows_verified']} resumed_from={report['resumed_from']} "
+        f"rows_per_second={report['rows_per_second']}"
+    )
+    if report["ok"]:
+        print(f"eventlog: OK {stats}")
         return 0
-    print(f"eventlog: BROKEN first_bad_id={first_bad_id} reason={reason}")
+    print(
+        f"eventlog: BROKEN first_bad_id={report['first_bad_id']} "
+        f"reason={report['reason']} {stats}"
+    )
     return 1
 
 
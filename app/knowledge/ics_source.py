@@ -1170,6 +1170,12 @@ def knowledge_ics_sources_list(
 
 MANUAL_EVENT_SCHEMA = "calendar_manual_event.v1"
 MANUAL_SOURCE_PREFIX = "calendar_manual:"
+# Manual event occurrences are materialised this far ahead of now; a query
+# reaching beyond the materialised horizon rebuilds the tenant's occurrences.
+OCCURRENCE_HORIZON_DAYS = max(
+    30, int(os.environ.get("KUKANILEA_CALENDAR_OCCURRENCE_HORIZON_DAYS", "730"))
+)
+_OCCURRENCE_FLOOR = datetime.min.replace(tzinfo=UTC)
 
 
 def _parse_iso_datetime(value: str | None) -> datetime | None:
@@ -1381,7 +1387,7 @@ def _expand_manual_event_occurrences(
             current_end = _month_add(current_end, interval)
         else:
             break
-        if current_start > range_end and not freq:
+        if current_start > range_end:
             break
 
     return out
@@ -1425,13 +1431,295 @@ def _read_manual_events(tenant_id: str, owner_user_id: str | None = None) -> lis
 
     out: list[dict[str, Any]] = []
     for row in rows:
-        event = _deserialize_manual_event(row["body"])
-        if not event:
-            continue
-        event["chunk_id"] = str(row["chunk_id"])
-        event["owner_user_id"] = _clean_text(str(row["owner_user_id"] or event.get("owner_user_id", "")), 120)
-        event["source_ref"] = str(row["source_ref"])
-        out.append(event)
+        event = _manual_event_from_row(row)
+        if event:
+            out.append(event)
+    return out
+
+
+def _manual_event_from_row(row: sqlite3.Row | dict[str, Any]) -> dict[str, Any] | None:
+    event = _deserialize_manual_event(row["body"])
+    if not event:
+        return None
+    event["chunk_id"] = str(row["chunk_id"])
+    event["owner_user_id"] = _clean_text(str(row["owner_user_id"] or event.get("owner_user_id", "")), 120)
+    event["source_ref"] = str(row["source_ref"])
+    return event
+
+
+def _occurrence_key(dt: datetime, *, ceil: bool = False) -> str:
+    """Sortable UTC key as stored in knowledge_calendar_occurrences (whole seconds)."""
+    current = dt.astimezone(UTC)
+    if ceil and current.microsecond:
+        current += timedelta(seconds=1)
+    return current.replace(microsecond=0).isoformat(timespec="seconds")
+
+
+def _ensure_occurrence_schema(con: sqlite3.Connection) -> None:
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS knowledge_calendar_occurrences(
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          tenant_id TEXT NOT NULL,
+          event_id TEXT NOT NULL,
+          occurrence_start TEXT NOT NULL,
+          occurrence_end TEXT NOT NULL,
+          remind_at TEXT NOT NULL,
+          kind TEXT NOT NULL,
+          owner_user_id TEXT NOT NULL DEFAULT '',
+          title TEXT NOT NULL,
+          all_day INTEGER NOT NULL DEFAULT 0,
+          location TEXT NOT NULL DEFAULT '',
+          notes TEXT NOT NULL DEFAULT '',
+          reminder_minutes INTEGER NOT NULL DEFAULT 0
+        )
+        """
+    )
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS idx_calendar_occ_tenant_start "
+        "ON knowledge_calendar_occurrences(tenant_id, occurrence_start)"
+    )
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS idx_calendar_occ_tenant_remind "
+        "ON knowledge_calendar_occurrences(tenant_id, remind_at)"
+    )
+    con.execute(
+        "CREATE INDEX IF NOT EXISTS idx_calendar_occ_tenant_event "
+        "ON knowledge_calendar_occurrences(tenant_id, event_id)"
+    )
+    # horizon_end: occurrences starting up to here are materialised.
+    # max_span_seconds: longest occurrence, bounds range scans on the start index.
+    con.execute(
+        """
+        CREATE TABLE IF NOT EXISTS knowledge_calendar_occurrence_state(
+          tenant_id TEXT PRIMARY KEY,
+          horizon_end TEXT NOT NULL,
+          max_span_seconds INTEGER NOT NULL DEFAULT 0,
+          rebuilt_at TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _insert_event_occurrences(
+    con: sqlite3.Connection, tenant_id: str, event: dict[str, Any], horizon_end: datetime
+) -> int:
+    """Materialises the event's occurrences up to the horizon; returns the longest span (s)."""
+    rows = []
+    max_span = 0
+    reminder = max(0, min(int(event.get("reminder_minutes", 0) or 0), 10080))
+    for occ in _expand_manual_event_occurrences(
+        event, range_start=_OCCURRENCE_FLOOR, range_end=horizon_end
+    ):
+        start = datetime.fromisoformat(occ["occurrence_start"])
+        end = datetime.fromisoformat(occ["occurrence_end"])
+        max_span = max(max_span, int((end - start).total_seconds()))
+        rows.append(
+            (
+                tenant_id,
+                str(event.get("event_id") or ""),
+                _occurrence_key(start),
+                _occurrence_key(end),
+                _occurrence_key(start - timedelta(minutes=reminder)),
+                _normalize_kind(event.get("kind")),
+                str(event.get("owner_user_id") or ""),
+                str(event.get("title") or ""),
+                1 if int(event.get("all_day", 0) or 0) else 0,
+                str(event.get("location") or ""),
+                str(event.get("notes") or ""),
+                reminder,
+            )
+        )
+    con.executemany(
+        """
+        INSERT INTO knowledge_calendar_occurrences(
+          tenant_id, event_id, occurrence_start, occurrence_end, remind_at, kind,
+          owner_user_id, title, all_day, location, notes, reminder_minutes
+        ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
+        """,
+        rows,
+    )
+    return max_span
+
+
+def _replace_event_occurrences(
+    con: sqlite3.Connection, tenant_id: str, event_id: str, event: dict[str, Any] | None
+) -> None:
+    """
+    Keeps one event's occurrences in step with its chunk (same transaction).
+
+    Tenants that were never materialised are left alone; their first
+    calendar query builds the whole index.
+    """
+    _ensure_occurrence_schema(con)
+    con.execute(
+        "DELETE FROM knowledge_calendar_occurrences WHERE tenant_id=? AND event_id=?",
+        (tenant_id, event_id),
+    )
+    state = con.execute(
+        "SELECT horizon_end FROM knowledge_calendar_occurrence_state WHERE tenant_id=?",
+        (tenant_id,),
+    ).fetchone()
+    if event is None or state is None:
+        return
+    horizon_end = _parse_iso_datetime(str(state["horizon_end"])) or datetime.now(UTC)
+    span = _insert_event_occurrences(con, tenant_id, event, horizon_end)
+    con.execute(
+        """
+        UPDATE knowledge_calendar_occurrence_state
+        SET max_span_seconds=MAX(max_span_seconds, ?) WHERE tenant_id=?
+        """,
+        (span, tenant_id),
+    )
+
+
+def _rebuild_occurrences(con: sqlite3.Connection, tenant_id: str, horizon_end: datetime) -> None:
+    _ensure_occurrence_schema(con)
+    try:
+        rows = con.execute(
+            """
+            SELECT chunk_id, owner_user_id, source_ref, body
+            FROM knowledge_chunks
+            WHERE tenant_id=? AND source_type='calendar' AND source_ref LIKE ?
+            """,
+            (tenant_id, f"{MANUAL_SOURCE_PREFIX}%"),
+        ).fetchall()
+    except sqlite3.OperationalError as exc:
+        if "no such table" not in str(exc).lower():
+            raise
+        rows = []
+    con.execute("DELETE FROM knowledge_calendar_occurrences WHERE tenant_id=?", (tenant_id,))
+    max_span = 0
+    for row in rows:
+        event = _manual_event_from_row(row)
+        if event:
+            max_span = max(max_span, _insert_event_occurrences(con, tenant_id, event, horizon_end))
+    con.execute(
+        """
+        INSERT OR REPLACE INTO knowledge_calendar_occurrence_state(
+          tenant_id, horizon_end, max_span_seconds, rebuilt_at
+        ) VALUES (?,?,?,?)
+        """,
+        (tenant_id, _occurrence_key(horizon_end), max_span, _now_iso()),
+    )
+
+
+def _occurrence_state(tenant_id: str, until: datetime) -> int | None:
+    """
+    Makes sure occurrences starting up to `until` are materialised.
+
+    Returns the tenant's longest occurrence span in seconds, or None when
+    the index cannot be used (read-only instance, unwritable database), in
+    which case callers expand the events in Python.
+    """
+    state = None
+    with legacy_core._DB_LOCK:  # type: ignore[attr-defined]
+        con = _db()
+        try:
+            state = con.execute(
+                """
+                SELECT horizon_end, max_span_seconds
+                FROM knowledge_calendar_occurrence_state WHERE tenant_id=?
+                """,
+                (tenant_id,),
+            ).fetchone()
+        except sqlite3.OperationalError:
+            state = None
+        finally:
+            con.close()
+    if state is not None and str(state["horizon_end"]) >= _occurrence_key(until, ceil=True):
+        return int(state["max_span_seconds"] or 0)
+    if _is_read_only():
+        return None
+    horizon_end = max(until, datetime.now(UTC) + timedelta(days=OCCURRENCE_HORIZON_DAYS))
+
+    def _tx(con: sqlite3.Connection) -> int:
+        _rebuild_occurrences(con, tenant_id, horizon_end)
+        row = con.execute(
+            "SELECT max_span_seconds FROM knowledge_calendar_occurrence_state WHERE tenant_id=?",
+            (tenant_id,),
+        ).fetchone()
+        return int(row["max_span_seconds"] or 0) if row else 0
+
+    try:
+        return int(_run_write_txn(_tx))
+    except sqlite3.Error:
+        return None
+
+
+def _manual_occurrence_item(row: sqlite3.Row | dict[str, Any]) -> dict[str, Any]:
+    return {
+        "source": "manual",
+        "event_id": row["event_id"],
+        "title": row["title"],
+        "kind": _normalize_kind(row["kind"]),
+        "all_day": bool(int(row["all_day"] or 0)),
+        "start_at": row["occurrence_start"],
+        "end_at": row["occurrence_end"],
+        "location": row["location"] or "",
+        "notes": row["notes"] or "",
+        "owner_user_id": row["owner_user_id"] or "",
+        "reminder_minutes": int(row["reminder_minutes"] or 0),
+    }
+
+
+def _indexed_manual_occurrences(
+    tenant_id: str,
+    *,
+    range_start: datetime,
+    range_end: datetime,
+    wanted: set[str],
+    owner_user_id: str | None,
+) -> list[dict[str, Any]] | None:
+    max_span = _occurrence_state(tenant_id, range_end)
+    if max_span is None:
+        return None
+    sql = """
+        SELECT event_id, title, kind, all_day, occurrence_start, occurrence_end,
+               location, notes, owner_user_id, reminder_minutes
+        FROM knowledge_calendar_occurrences
+        WHERE tenant_id=? AND occurrence_start >= ? AND occurrence_start <= ?
+          AND occurrence_end >= ?
+    """
+    params: list[Any] = [
+        tenant_id,
+        _occurrence_key(range_start - timedelta(seconds=max_span)),
+        _occurrence_key(range_end),
+        _occurrence_key(range_start, ceil=True),
+    ]
+    if owner_user_id:
+        sql += " AND owner_user_id=?"
+        params.append(owner_user_id)
+    if wanted:
+        sql += f" AND kind IN ({','.join('?' for _ in wanted)})"
+        params.extend(sorted(wanted))
+    sql += " ORDER BY occurrence_start, title"
+    with legacy_core._DB_LOCK:  # type: ignore[attr-defined]
+        con = _db()
+        try:
+            rows = con.execute(sql, params).fetchall()  # nosec B608
+        except sqlite3.OperationalError:
+            return None
+        finally:
+            con.close()
+    return [_manual_occurrence_item(row) for row in rows]
+
+
+def _expanded_manual_occurrences(
+    tenant_id: str,
+    *,
+    range_start: datetime,
+    range_end: datetime,
+    wanted: set[str],
+    owner_user_id: str | None,
+) -> list[dict[str, Any]]:
+    out: list[dict[str, Any]] = []
+    for event in _read_manual_events(tenant_id, owner_user_id=owner_user_id):
+        occ = _expand_manual_event_occurrences(event, range_start=range_start, range_end=range_end)
+        for item in occ:
+            if wanted and _normalize_kind(item.get("kind")) not in wanted:
+                continue
+            out.append(_manual_occurrence_item(item))
     return out
 
 
@@ -1525,6 +1813,19 @@ def knowledge_calendar_event_create(
         ).fetchone()
         if row:
             _upsert_fts_chunk(con, int(row["id"]), t, body, f"calendar,manual,{_normalize_kind(kind)}")
+        _replace_event_occurrences(
+            con,
+            tenant,
+            event_id,
+            _manual_event_from_row(
+                {
+                    "chunk_id": chunk_id,
+                    "owner_user_id": actor_user_id,
+                    "source_ref": source_ref,
+                    "body": body,
+                }
+            ),
+        )
 
         event_append(
             event_type="calendar_manual_event_created",
@@ -1588,7 +1889,7 @@ def knowledge_calendar_event_update(
     def _tx(con: sqlite3.Connection) -> dict[str, Any]:
         row = con.execute(
             """
-            SELECT chunk_id, body
+            SELECT chunk_id, owner_user_id, source_ref, body
             FROM knowledge_chunks
             WHERE tenant_id=? AND source_type='calendar' AND source_ref=?
             ORDER BY updated_at DESC, created_at DESC, id DESC
@@ -1657,6 +1958,12 @@ def knowledge_calendar_event_update(
                 source_ref,
             ),
         )
+        _replace_event_occurrences(
+            con,
+            tenant,
+            _clean_text(event_id, 64),
+            _manual_event_from_row({**dict(row), "body": body}),
+        )
 
         event_append(
             event_type="calendar_manual_event_updated",
@@ -1714,6 +2021,7 @@ def knowledge_calendar_event_delete(
             "DELETE FROM knowledge_chunks WHERE tenant_id=? AND source_type='calendar' AND source_ref=?",
             (tenant, source_ref),
         )
+        _replace_event_occurrences(con, tenant, _clean_text(event_id, 64), None)
 
         event_append(
             event_type="calendar_manual_event_deleted",
@@ -1795,27 +2103,22 @@ def knowledge_calendar_events_list(
     out: list[dict[str, Any]] = []
 
     if include_manual:
-        for event in _read_manual_events(tenant, owner_user_id=owner_user_id):
-            occ = _expand_manual_event_occurrences(event, range_start=range_start, range_end=range_end)
-            for item in occ:
-                kind = _normalize_kind(item.get("kind"))
-                if wanted and kind not in wanted:
-                    continue
-                out.append(
-                    {
-                        "source": "manual",
-                        "event_id": item.get("event_id"),
-                        "title": item.get("title"),
-                        "kind": kind,
-                        "all_day": bool(int(item.get("all_day", 0) or 0)),
-                        "start_at": item.get("occurrence_start"),
-                        "end_at": item.get("occurrence_end"),
-                        "location": item.get("location", ""),
-                        "notes": item.get("notes", ""),
-                        "owner_user_id": item.get("owner_user_id", ""),
-                        "reminder_minutes": int(item.get("reminder_minutes", 0) or 0),
-                    }
-                )
+        manual = _indexed_manual_occurrences(
+            tenant,
+            range_start=range_start,
+            range_end=range_end,
+            wanted=wanted,
+            owner_user_id=owner_user_id,
+        )
+        if manual is None:
+            manual = _expanded_manual_occurrences(
+                tenant,
+                range_start=range_start,
+                range_end=range_end,
+                wanted=wanted,
+                owner_user_id=owner_user_id,
+            )
+        out.extend(manual)
 
     if include_deadlines:
         for d in _read_ocr_deadline_events(tenant):
@@ -1882,6 +2185,46 @@ def knowledge_calendar_events_list(
     return out
 
 
+def _indexed_manual_reminders(
+    tenant_id: str,
+    *,
+    now: datetime,
+    horizon: datetime,
+    owner_user_id: str | None,
+) -> list[dict[str, Any]] | None:
+    if _occurrence_state(tenant_id, horizon) is None:
+        return None
+    sql = """
+        SELECT event_id, title, occurrence_start, remind_at, kind
+        FROM knowledge_calendar_occurrences
+        WHERE tenant_id=? AND remind_at >= ? AND remind_at <= ? AND occurrence_start <= ?
+    """
+    horizon_key = _occurrence_key(horizon)
+    params: list[Any] = [tenant_id, _occurrence_key(now, ceil=True), horizon_key, horizon_key]
+    if owner_user_id:
+        sql += " AND owner_user_id=?"
+        params.append(owner_user_id)
+    with legacy_core._DB_LOCK:  # type: ignore[attr-defined]
+        con = _db()
+        try:
+            rows = con.execute(sql + " ORDER BY remind_at", params).fetchall()  # nosec B608
+        except sqlite3.OperationalError:
+            return None
+        finally:
+            con.close()
+    return [
+        {
+            "event_id": row["event_id"],
+            "title": row["title"],
+            "start_at": row["occurrence_start"],
+            "remind_at": row["remind_at"],
+            "kind": _normalize_kind(row["kind"]),
+            "source": "manual",
+        }
+        for row in rows
+    ]
+
+
 def knowledge_calendar_reminders_due(
     tenant_id: str,
     *,
@@ -1893,17 +2236,21 @@ def knowledge_calendar_reminders_due(
     if not now:
         raise ValueError("validation_error")
     horizon = now + timedelta(minutes=max(1, min(int(within_minutes), 10080)))
+    tenant = _tenant(tenant_id)
 
+    due: list[dict[str, Any]] = []
+    manual = _indexed_manual_reminders(
+        tenant, now=now, horizon=horizon, owner_user_id=owner_user_id
+    )
     events = knowledge_calendar_events_list(
         tenant_id,
         start_iso=(now - timedelta(days=2)).isoformat(timespec="seconds"),
         end_iso=horizon.isoformat(timespec="seconds"),
-        include_manual=True,
+        include_manual=manual is None,
         include_deadlines=True,
         owner_user_id=owner_user_id,
     )
-
-    due: list[dict[str, Any]] = []
+    due.extend(manual or [])
     for ev in events:
         start_dt = _parse_iso_datetime(str(ev.get("start_at", "")))
         if not start_dt:
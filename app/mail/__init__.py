@@ -62,7 +62,11 @@ from .postfach_store import (
     list_drafts_for_thread as postfach_list_drafts_for_thread,
 )
 from .postfach_store import list_threads as postfach_list_threads
+from .postfach_store import mark_thread_read as postfach_mark_thread_read
 from .postfach_store import oauth_token_expired as postfach_oauth_token_expired
+from .postfach_store import (
+    resume_pending_attachment_scans as postfach_resume_pending_attachment_scans,
+)
 from .postfach_store import safety_check_draft as postfach_safety_check_draft
 from .postfach_store import save_oauth_token as postfach_save_oauth_token
 from .postfach_store import search_messages as postfach_search_messages
@@ -73,7 +77,15 @@ from .postfach_store import (
     update_account_sync_report as postfach_update_account_sync_report,
 )
 from .sync_engine import MailSyncEngine as postfach_mail_sync_engine
+from .sync_engine import MailSyncScheduler as postfach_mail_sync_scheduler
+from .sync_engine import mail_sync_status as postfach_mail_sync_status
 from .sync_engine import run_background_loop as postfach_run_background_loop
+from .sync_engine import (
+    start_mail_sync_scheduler as postfach_start_mail_sync_scheduler,
+)
+from .sync_engine import (
+    stop_mail_sync_scheduler as postfach_stop_mail_sync_scheduler,
+)
 from .sync_engine import sync_all_accounts as postfach_sync_all_accounts
 
 __all__ = [
@@ -92,6 +104,7 @@ __all__ = [
     "postfach_list_accounts",
     "postfach_sync_account",
     "postfach_get_thread",
+    "postfach_mark_thread_read",
     "postfach_list_threads",
     "postfach_create_draft",
     "postfach_get_draft",
@@ -122,8 +135,13 @@ __all__ = [
     "postfach_update_account_sync_report",
     "postfach_safety_check_draft",
     "postfach_ingest_message_attachments",
+    "postfach_resume_pending_attachment_scans",
     "postfach_link_thread_customers_by_email",
     "postfach_sync_all_accounts",
     "postfach_run_background_loop",
     "postfach_mail_sync_engine",
+    "postfach_mail_sync_scheduler",
+    "postfach_start_mail_sync_scheduler",
+    "postfach_stop_mail_sync_scheduler",
+    "postfach_mail_sync_status",
 ]
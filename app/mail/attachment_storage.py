@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import binascii
+import hashlib
+import os
+import sqlite3
+import threading
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+_DECODE_CHUNK_CHARS = 256 * 1024
+
+
+class AttachmentTooLarge(Exception):
+    pass
+
+
+class StorageLedger:
+    """
+    Bytes and file counts of stored mail attachments per tenant.
+
+    Kept in `<root>/ledger.sqlite3` next to the tenant directories, so a quota
+    check is a single-row read instead of a walk over the attachment tree. A
+    tenant's row is seeded once from the files already on disk; afterwards
+    every write and removal adjusts it.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+        self.path = self.root / "ledger.sqlite3"
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _con(self) -> sqlite3.Connection:
+        self.root.mkdir(parents=True, exist_ok=True)
+        con = sqlite3.connect(str(self.path), timeout=30, isolation_level=None)
+        con.execute("PRAGMA busy_timeout=30000;")
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    con.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS tenant_usage(
+                          tenant_key TEXT PRIMARY KEY,
+                          bytes_used INTEGER NOT NULL DEFAULT 0,
+                          files INTEGER NOT NULL DEFAULT 0
+                        )
+                        """
+                    )
+                    self._initialized = True
+        return con
+
+    def _seed(self, con: sqlite3.Connection, tenant_key: str) -> None:
+        if con.execute(
+            "SELECT 1 FROM tenant_usage WHERE tenant_key=?", (tenant_key,)
+        ).fetchone():
+            return
+        total = 0
+        files = 0
+        tenant_dir = self.root / tenant_key
+        if tenant_dir.is_dir():
+            for path in tenant_dir.rglob("*"):
+                try:
+                    if path.is_file():
+                        total += path.stat().st_size
+                        files += 1
+                except OSError:
+                    continue
+        con.execute(
+            "INSERT OR IGNORE INTO tenant_usage(tenant_key, bytes_used, files) VALUES (?,?,?)",
+            (tenant_key, total, files),
+        )
+
+    def usage(self, tenant_key: str) -> dict[str, int]:
+        con = self._con()
+        try:
+            self._seed(con, tenant_key)
+            row = con.execute(
+                "SELECT bytes_used, files FROM tenant_usage WHERE tenant_key=?",
+                (tenant_key,),
+            ).fetchone()
+            return {"bytes_used": int(row[0]), "files": int(row[1])}
+        finally:
+            con.close()
+
+    def reserve(self, tenant_key: str, nbytes: int, quota_bytes: int) -> bool:
+        """Atomically books `nbytes` if the tenant stays within `quota_bytes`."""
+        con = self._con()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            try:
+                self._seed(con, tenant_key)
+                cur = con.execute(
+                    """
+                    UPDATE tenant_usage SET bytes_used = bytes_used + ?
+                    WHERE tenant_key=? AND bytes_used + ? <= ?
+                    """,
+                    (int(nbytes), tenant_key, int(nbytes), int(quota_bytes)),
+                )
+                con.execute("COMMIT")
+            except BaseException:
+                con.execute("ROLLBACK")
+                raise
+            return int(cur.rowcount or 0) > 0
+        finally:
+            con.close()
+
+    def adjust(self, tenant_key: str, delta_bytes: int, delta_files: int = 0) -> None:
+        if not delta_bytes and not delta_files:
+            return
+        con = self._con()
+        try:
+            self._seed(con, tenant_key)
+            con.execute(
+                """
+                UPDATE tenant_usage
+                SET bytes_used = MAX(bytes_used + ?, 0), files = MAX(files + ?, 0)
+                WHERE tenant_key=?
+                """,
+                (int(delta_bytes), int(delta_files), tenant_key),
+            )
+        finally:
+            con.close()
+
+
+_LEDGERS: dict[str, StorageLedger] = {}
+_LEDGERS_LOCK = threading.Lock()
+
+
+def storage_ledger(root: Path) -> StorageLedger:
+    key = str(Path(root).resolve())
+    with _LEDGERS_LOCK:
+        ledger = _LEDGERS.get(key)
+        if ledger is None:
+            ledger = StorageLedger(Path(root))
+            _LEDGERS[key] = ledger
+        return ledger
+
+
+def estimated_part_size(part: Any) -> int:
+    """Decoded size of a MIME leaf part, estimated from its encoded payload."""
+    raw = part.get_payload(decode=False)
+    if not isinstance(raw, str):
+        return 0
+    cte = str(part.get("content-transfer-encoding") or "").strip().lower()
+    if cte == "base64":
+        stripped = len(raw) - sum(raw.count(ch) for ch in "\r\n \t")
+        tail = raw.rstrip()
+        padding = 2 if tail.endswith("==") else 1 if tail.endswith("=") else 0
+        return max(0, stripped * 3 // 4 - padding)
+    return len(raw)
+
+
+def _iter_decoded(part: Any) -> Iterator[bytes]:
+    raw = part.get_payload(decode=False)
+    cte = str(part.get("content-transfer-encoding") or "").strip().lower()
+    if not isinstance(raw, str) or cte != "base64":
+        # Non-base64 attachments are rare and small; decode them in one go.
+        yield bytes(part.get_payload(decode=True) or b"")
+        return
+    carry = ""
+    for start in range(0, len(raw), _DECODE_CHUNK_CHARS):
+        chunk = carry + "".join(raw[start : start + _DECODE_CHUNK_CHARS].split())
+        cut = len(chunk) - len(chunk) % 4
+        carry = chunk[cut:]
+        if cut:
+            yield binascii.a2b_base64(chunk[:cut])
+    carry = carry.rstrip("=")
+    if carry:
+        yield binascii.a2b_base64(carry + "=" * (-len(carry) % 4))
+
+
+def write_attachment(
+    attachment: dict[str, Any], target: Path, *, max_bytes: int
+) -> tuple[int, str]:
+    """
+    Writes an attachment to `target` and returns (size, sha256).
+
+    A MIME `part` is decoded chunk-wise straight to disk; legacy callers may
+    pass the decoded `content_bytes` instead. Raises AttachmentTooLarge (and
+    removes the partial file) once more than `max_bytes` have been written.
+    """
+    part = attachment.get("part")
+    chunks: Iterator[bytes] | list[bytes]
+    if part is not None:
+        chunks = _iter_decoded(part)
+    else:
+        chunks = [bytes(attachment.get("content_bytes") or b"")]
+    digest = hashlib.sha256()
+    size = 0
+    tmp = target.with_name(f".{target.name}.part")
+    try:
+        with tmp.open("wb") as fh:
+            for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise AttachmentTooLarge(size)
+                digest.update(chunk)
+                fh.write(chunk)
+        os.replace(tmp, target)
+    except BaseException:
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        raise
+    return size, digest.hexdigest()
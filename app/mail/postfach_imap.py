@@ -3,15 +3,17 @@ from __future__ import annotations
 import hashlib
 import imaplib
 import os
+import re
 import ssl
 import time
 import base64
 from datetime import UTC, datetime
 from email import message_from_bytes, policy
 from email.utils import getaddresses, parsedate_to_datetime
-from typing import Any
+from typing import Any, Callable
 
 from . import postfach_oauth as oauth
+from .attachment_storage import estimated_part_size
 from . import postfach_store as store
 
 
@@ -53,13 +55,14 @@ def _extract_body_and_attachments(msg) -> tuple[str, list[dict[str, Any]]]:
             is_attachment = disp == "attachment" or bool(filename)
 
             if is_attachment:
-                payload = part.get_payload(decode=True) or b""
+                # The part is decoded chunk-wise by the attachment store; only
+                # its estimated size is computed here.
                 attachments.append(
                     {
                         "filename": filename or f"attachment_{idx:03d}.bin",
                         "mime_type": ctype,
-                        "size_bytes": len(payload),
-                        "content_bytes": bytes(payload),
+                        "size_bytes": estimated_part_size(part),
+                        "part": part,
                     }
                 )
                 continue
@@ -269,6 +272,198 @@ def _resolve_auth(
     }
 
 
+def _login(imap, auth: dict[str, Any]) -> None:
+    username = str(auth.get("username") or "")
+    if str(auth.get("kind") or "") == "password":
+        imap.login(username, str(auth.get("password") or ""))
+    else:
+        xoauth = oauth.xoauth2_auth_string(username, str(auth.get("access_token") or ""))
+        xoauth_raw = base64.b64decode(xoauth.encode("ascii"))
+        imap.authenticate("XOAUTH2", lambda _: xoauth_raw)
+
+
+def run_tenant_automation(db_path, *, tenant_id: str) -> dict[str, Any]:
+    """
+    Runs the eventlog automation for the tenant; never raises.
+
+    With the automation dispatcher running for this database the tenant is
+    only queued there instead of being processed inline.
+    """
+    try:
+        from app.modules.automation.dispatcher import running_automation_dispatcher
+        from app.modules.automation.runner import process_events_for_tenant
+
+        dispatcher = running_automation_dispatcher(db_path)
+        if dispatcher is not None:
+            dispatcher.notify(tenant_id)
+            return {"ok": True, "reason": "queued", "processed": 0, "matched": 0}
+        return process_events_for_tenant(
+            tenant_id=tenant_id,
+            db_path=db_path,
+            source="eventlog",
+        )
+    except Exception:
+        return {"ok": False, "reason": "automation_runner_failed"}
+
+
+def wait_for_new_mail(
+    db_path,
+    *,
+    tenant_id: str,
+    account_id: str,
+    timeout_seconds: float = 300.0,
+    on_idle: Callable[[], None] | None = None,
+) -> str:
+    """
+    Blocks in IMAP IDLE on the account's INBOX until the server announces new
+    mail or `timeout_seconds` pass. `on_idle` is called once the server has
+    accepted the IDLE command.
+
+    Returns "new_mail", "timeout", "unsupported" (server lacks IDLE) or
+    "error". The connection is closed in every case.
+    """
+    account = store.get_account(db_path, tenant_id, account_id)
+    if not account:
+        return "error"
+    auth = _resolve_auth(db_path, tenant_id=tenant_id, account=account)
+    if not bool(auth.get("ok")):
+        return "error"
+    try:
+        imap = connect(account)
+    except Exception:
+        return "error"
+    try:
+        _login(imap, auth)
+        if "IDLE" not in tuple(imap.capabilities or ()):
+            return "unsupported"
+        status, _data = imap.select("INBOX", readonly=True)
+        if status != "OK":
+            return "error"
+        tag = imap._new_tag()  # noqa: SLF001 - imaplib has no public IDLE API
+        imap.send(tag + b" IDLE\r\n")
+        if not imap.readline().startswith(b"+"):
+            return "unsupported"
+        if on_idle is not None:
+            on_idle()
+        imap.sock.settimeout(max(1.0, float(timeout_seconds)))
+        try:
+            while True:
+                line = imap.readline()
+                if not line:
+                    return "error"
+                if line.startswith(b"*") and line.rstrip().endswith(b"EXISTS"):
+                    return "new_mail"
+        except (TimeoutError, OSError):
+            return "timeout"
+    except Exception:
+        return "error"
+    finally:
+        # IDLE is never terminated with DONE/LOGOUT; the socket is simply dropped.
+        try:
+            imap.shutdown()
+        except Exception:
+            pass
+
+
+SYNC_MAX_LIMIT = max(1, int(os.environ.get("KUKANILEA_MAIL_SYNC_MAX_LIMIT", "200")))
+FETCH_BATCH_SIZE = max(1, int(os.environ.get("KUKANILEA_MAIL_FETCH_BATCH_SIZE", "50")))
+
+_FETCH_UID_RE = re.compile(rb"UID (\d+)")
+_SYNC_PHASES = ("search", "fetch_headers", "fetch_bodies", "parse", "store", "attachments")
+
+
+def _uid_set(uids: list[str]) -> str:
+    """Compresses sorted numeric UIDs into an IMAP sequence set ("1:3,7,9:10")."""
+    ranges: list[str] = []
+    start = prev = None
+    for raw in uids:
+        uid = int(raw)
+        if prev is not None and uid == prev + 1:
+            prev = uid
+            continue
+        if start is not None:
+            ranges.append(str(start) if start == prev else f"{start}:{prev}")
+        start = prev = uid
+    if start is not None:
+        ranges.append(str(start) if start == prev else f"{start}:{prev}")
+    return ",".join(ranges)
+
+
+def _search_uids(imap, cursor: str) -> tuple[str, list[str]]:
+    """
+    UIDs above the cursor, ascending. The range is searched server-side;
+    `n:*` always matches the highest UID, so the result is filtered once more.
+    """
+    if cursor.isdigit():
+        status, data = imap.uid("search", None, f"UID {int(cursor) + 1}:*")
+    else:
+        status, data = imap.uid("search", None, "ALL")
+    if status != "OK":
+        return status, []
+    raw = data[0].decode("utf-8", errors="ignore").split() if data and data[0] else []
+    uids = [uid for uid in raw if uid.isdigit()]
+    if cursor.isdigit():
+        uids = [uid for uid in uids if int(uid) > int(cursor)]
+    return status, sorted(uids, key=int)
+
+
+def _fetch_batch(imap, uids: list[str], items: str) -> dict[str, bytes]:
+    """One `UID FETCH` for the whole batch (with retries); maps UID to literal."""
+    data = None
+    status = "NO"
+    for attempt in range(3):
+        status, data = imap.uid("fetch", _uid_set(uids), items)
+        if status == "OK" and data:
+            break
+        time.sleep(0.2 * (2**attempt))
+    if status != "OK" or not data:
+        return {}
+    out: dict[str, bytes] = {}
+    for part in data:
+        if not (
+            isinstance(part, tuple)
+            and len(part) >= 2
+            and isinstance(part[1], (bytes, bytearray))
+        ):
+            continue
+        match = _FETCH_UID_RE.search(bytes(part[0] or b""))
+        if match:
+            out[match.group(1).decode("ascii")] = bytes(part[1])
+    if not out and len(uids) == 1:
+        # Some servers omit UID in the response when only one message was asked for.
+        for part in data:
+            if isinstance(part, tuple) and len(part) >= 2 and part[1]:
+                out[uids[0]] = bytes(part[1])
+                break
+    return out
+
+
+def _message_id_from_headers(raw_headers: bytes) -> str:
+    msg = message_from_bytes(raw_headers, policy=policy.default)
+    return str(msg.get("message-id") or "").strip()
+
+
+def _store_single_message(
+    db_path, *, tenant_id: str, account_id: str, item: dict[str, Any]
+) -> dict[str, Any]:
+    """Stores one `store_messages` item on its own; the result carries `linked` too."""
+    fields = {k: v for k, v in item.items() if k != "link_emails"}
+    result = store.store_message(
+        db_path, tenant_id=tenant_id, account_id=account_id, **fields
+    )
+    result["linked"] = 0
+    thread_id = str(result.get("thread_id") or "")
+    if thread_id and item.get("link_emails"):
+        link_result = store.link_thread_customers_by_email(
+            db_path,
+            tenant_id=tenant_id,
+            thread_id=thread_id,
+            emails=list(item["link_emails"]),
+        )
+        result["linked"] = int(link_result.get("linked") or 0)
+    return result
+
+
 def sync_account(
     db_path,
     *,
@@ -277,7 +472,21 @@ def sync_account(
     limit: int = 50,
     since: str | None = None,
     auto_download_attachments: bool = True,
+    headers_first: bool = True,
+    run_automation: bool = True,
 ) -> dict[str, Any]:
+    """
+    Imports new INBOX messages above the account's UID cursor.
+
+    UIDs are searched as a server-side range and fetched in batches of
+    FETCH_BATCH_SIZE. With `headers_first`, each batch first fetches only the
+    Message-ID headers so bodies of already stored messages are never
+    downloaded. Every batch is written to SQLite in one transaction. Per-phase
+    wall-clock timings are reported in `timings_ms`.
+
+    `run_automation=False` skips the automation run at the end; the sync
+    scheduler uses it to run automation once per tenant after a sync wave.
+    """
     store.ensure_postfach_schema(db_path)
     if not store.email_encryption_ready():
         return {"ok": False, "reason": "email_encryption_key_missing", "imported": 0}
@@ -303,8 +512,7 @@ def sync_account(
             "imported": 0,
         }
 
-    username = str(auth.get("username") or "")
-    lim = max(1, min(int(limit or 50), 200))
+    lim = max(1, min(int(limit or 50), SYNC_MAX_LIMIT))
 
     cursor = str(since or account.get("sync_cursor") or "").strip()
     imported = 0
@@ -313,21 +521,21 @@ def sync_account(
     failures = 0
     last_uid = cursor
     attachments_processed = 0
-    attachments_accepted = 0
     attachments_rejected = 0
-    attachments_quarantined = 0
+    attachments_pending = 0
     customer_links_created = 0
+    timings = {phase: 0.0 for phase in _SYNC_PHASES}
+    t_start = time.perf_counter()
+
+    def _timings_ms() -> dict[str, int]:
+        out = {phase: int(round(v * 1000)) for phase, v in timings.items()}
+        out["total"] = int(round((time.perf_counter() - t_start) * 1000))
+        return out
 
     try:
         with connect(account) as imap:
-            if str(auth.get("kind") or "") == "password":
-                imap.login(username, str(auth.get("password") or ""))
-            else:
-                xoauth = oauth.xoauth2_auth_string(
-                    username, str(auth.get("access_token") or "")
-                )
-                xoauth_raw = base64.b64decode(xoauth.encode("ascii"))
-                imap.authenticate("XOAUTH2", lambda _: xoauth_raw)
+            _login(imap, auth)
+            timings["connect"] = time.perf_counter() - t_start
 
             sel_status, _sel_data = imap.select("INBOX", readonly=True)
             if sel_status != "OK":
@@ -347,7 +555,9 @@ def sync_account(
                     "duplicates": 0,
                 }
 
-            status, data = imap.uid("search", None, "ALL")
+            t0 = time.perf_counter()
+            status, candidate_uids = _search_uids(imap, cursor)
+            timings["search"] += time.perf_counter() - t0
             if status != "OK":
                 store.update_account_sync_report(
                     db_path,
@@ -365,78 +575,125 @@ def sync_account(
                     "duplicates": duplicates,
                 }
 
-            all_uids = data[0].decode("utf-8", errors="ignore").split() if data else []
-            if cursor.isdigit():
-                candidate_uids = [
-                    uid for uid in all_uids if uid.isdigit() and int(uid) > int(cursor)
-                ]
-            else:
-                candidate_uids = all_uids
             uids = candidate_uids[-lim:]
 
-            for uid in uids:
-                fetched += 1
-                try:
-                    msg_data = None
-                    f_status = "NO"
-                    for attempt in range(3):
-                        f_status, msg_data = imap.uid("fetch", uid, "(RFC822)")
-                        if f_status == "OK" and msg_data:
-                            break
-                        time.sleep(0.2 * (2**attempt))
-                    if f_status != "OK" or not msg_data:
-                        failures += 1
-                        continue
+            for start in range(0, len(uids), FETCH_BATCH_SIZE):
+                batch = uids[start : start + FETCH_BATCH_SIZE]
+                fetched += len(batch)
 
-                    raw_bytes = b""
-                    for part in msg_data:
-                        if (
-                            isinstance(part, tuple)
-                            and len(part) >= 2
-                            and isinstance(part[1], (bytes, bytearray))
-                        ):
-                            raw_bytes = bytes(part[1])
-                            break
+                known: set[str] = set()
+                if headers_first:
+                    t0 = time.perf_counter()
+                    headers = _fetch_batch(
+                        imap, batch, "(UID BODY.PEEK[HEADER.FIELDS (MESSAGE-ID)])"
+                    )
+                    timings["fetch_headers"] += time.perf_counter() - t0
+                    header_ids = {
+                        uid: _message_id_from_headers(raw) for uid, raw in headers.items()
+                    }
+                    stored = store.existing_message_id_headers(
+                        db_path,
+                        tenant_id=tenant_id,
+                        account_id=account_id,
+                        message_id_headers=list(header_ids.values()),
+                    )
+                    known = {uid for uid, mid in header_ids.items() if mid and mid in stored}
+                    duplicates += len(known)
+
+                wanted = [uid for uid in batch if uid not in known]
+                bodies: dict[str, bytes] = {}
+                if wanted:
+                    t0 = time.perf_counter()
+                    bodies = _fetch_batch(imap, wanted, "(UID BODY.PEEK[])")
+                    timings["fetch_bodies"] += time.perf_counter() - t0
+
+                t0 = time.perf_counter()
+                items: list[dict[str, Any]] = []
+                item_attachments: list[list[dict[str, Any]]] = []
+                item_uids: list[str] = []
+                for uid in wanted:
+                    raw_bytes = bodies.get(uid) or b""
                     if not raw_bytes:
                         failures += 1
                         continue
-
-                    msg = message_from_bytes(raw_bytes, policy=policy.default)
-                    body_raw, attachments = _extract_body_and_attachments(msg)
-                    message_id_header = str(msg.get("message-id") or "").strip() or None
-                    if not message_id_header:
+                    try:
+                        msg = message_from_bytes(raw_bytes, policy=policy.default)
+                        body_raw, attachments = _extract_body_and_attachments(msg)
                         message_id_header = (
-                            "<"
-                            + hashlib.sha256(raw_bytes).hexdigest()[:32]
-                            + "@postfach.local>"
+                            str(msg.get("message-id") or "").strip() or None
                         )
-                    in_reply_to = str(msg.get("in-reply-to") or "").strip() or None
-                    references_header = str(msg.get("references") or "").strip() or None
+                        if not message_id_header:
+                            message_id_header = (
+                                "<"
+                                + hashlib.sha256(raw_bytes).hexdigest()[:32]
+                                + "@postfach.local>"
+                            )
+                        items.append(
+                            {
+                                "direction": "inbound",
+                                "message_id_header": message_id_header,
+                                "in_reply_to": str(msg.get("in-reply-to") or "").strip()
+                                or None,
+                                "references_header": str(msg.get("references") or "").strip()
+                                or None,
+                                "from_value": str(msg.get("from") or ""),
+                                "to_value": str(msg.get("to") or ""),
+                                "subject_value": str(msg.get("subject") or ""),
+                                "body_value": body_raw,
+                                "raw_eml": raw_bytes,
+                                "has_attachments": bool(attachments),
+                                "received_at": _parse_received_at(msg),
+                                "link_emails": _extract_email_candidates(msg),
+                            }
+                        )
+                    except Exception:
+                        failures += 1
+                        continue
+                    item_attachments.append(attachments)
+                    item_uids.append(uid)
+                timings["parse"] += time.perf_counter() - t0
 
-                    result = store.store_message(
+                t0 = time.perf_counter()
+                try:
+                    results = store.store_messages(
                         db_path,
                         tenant_id=tenant_id,
                         account_id=account_id,
-                        direction="inbound",
-                        message_id_header=message_id_header,
-                        in_reply_to=in_reply_to,
-                        references_header=references_header,
-                        from_value=str(msg.get("from") or ""),
-                        to_value=str(msg.get("to") or ""),
-                        subject_value=str(msg.get("subject") or ""),
-                        body_value=body_raw,
-                        raw_eml=raw_bytes,
-                        has_attachments=bool(attachments),
-                        received_at=_parse_received_at(msg),
+                        messages=items,
                     )
-
-                    thread_id = str(result.get("thread_id") or "")
+                except Exception:
+                    # One bad message must not cost the whole batch: retry one by one.
+                    stored_uids: list[str] = []
+                    stored_attachments: list[list[dict[str, Any]]] = []
+                    results = []
+                    for uid, item, attachments in zip(item_uids, items, item_attachments):
+                        try:
+                            results.append(
+                                _store_single_message(
+                                    db_path,
+                                    tenant_id=tenant_id,
+                                    account_id=account_id,
+                                    item=item,
+                                )
+                            )
+                        except Exception:
+                            failures += 1
+                            continue
+                        stored_uids.append(uid)
+                        stored_attachments.append(attachments)
+                    item_uids, item_attachments = stored_uids, stored_attachments
+                timings["store"] += time.perf_counter() - t0
+
+                for uid, result, attachments in zip(item_uids, results, item_attachments):
                     message_id = str(result.get("message_id") or "")
+                    customer_links_created += int(result.get("linked") or 0)
                     if bool(result.get("duplicate")):
                         duplicates += 1
-                    else:
-                        imported += 1
-                        if auto_download_attachments and attachments and message_id:
+                        continue
+                    imported += 1
+                    if auto_download_attachments and attachments and message_id:
+                        t0 = time.perf_counter()
+                        try:
                             ingest = store.ingest_message_attachments(
                                 db_path,
                                 tenant_id=tenant_id,
@@ -444,26 +701,18 @@ def sync_account(
                                 message_id=message_id,
                                 attachments=attachments,
                             )
-                            attachments_processed += int(ingest.get("processed") or 0)
-                            attachments_accepted += int(ingest.get("accepted") or 0)
-                            attachments_rejected += int(ingest.get("rejected") or 0)
-                            attachments_quarantined += int(
-                                ingest.get("quarantined") or 0
-                            )
-
-                    if thread_id:
-                        link_result = store.link_thread_customers_by_email(
-                            db_path,
-                            tenant_id=tenant_id,
-                            thread_id=thread_id,
-                            emails=_extract_email_candidates(msg),
-                        )
-                        customer_links_created += int(link_result.get("linked") or 0)
-
-                    last_uid = uid
-                except Exception:
-                    failures += 1
-                    continue
+                        except Exception:
+                            ingest = {}
+                        timings["attachments"] += time.perf_counter() - t0
+                        attachments_processed += int(ingest.get("processed") or 0)
+                        attachments_rejected += int(ingest.get("rejected") or 0)
+                        attachments_pending += int(ingest.get("pending") or 0)
+
+                # The cursor only moves past UIDs that were stored or already known.
+                done = set(item_uids) | known
+                for uid in batch:
+                    if uid in done:
+                        last_uid = uid
 
         if last_uid:
             store.update_account_sync_cursor(
@@ -483,16 +732,10 @@ def sync_account(
             error_reason="" if failures == 0 else f"fetch_failures:{failures}",
         )
         automation_result: dict[str, Any] = {"ok": False, "reason": "not_run"}
-        try:
-            from app.automation.runner import process_events_for_tenant
-
-            automation_result = process_events_for_tenant(
-                tenant_id=tenant_id,
-                db_path=db_path,
-                source="eventlog",
-            )
-        except Exception:
-            automation_result = {"ok": False, "reason": "automation_runner_failed"}
+        if run_automation:
+            t0 = time.perf_counter()
+            automation_result = run_tenant_automation(db_path, tenant_id=tenant_id)
+            timings["automation"] = time.perf_counter() - t0
         return {
             "ok": True,
             "reason": "ok",
@@ -502,11 +745,11 @@ def sync_account(
             "failed_fetches": failures,
             "sync_cursor": str(last_uid or ""),
             "attachments_processed": attachments_processed,
-            "attachments_accepted": attachments_accepted,
             "attachments_rejected": attachments_rejected,
-            "attachments_quarantined": attachments_quarantined,
+            "attachments_pending": attachments_pending,
             "customer_links_created": customer_links_created,
             "automation": automation_result,
+            "timings_ms": _timings_ms(),
         }
     except Exception:
         store.update_account_sync_report(
@@ -526,8 +769,8 @@ def sync_account(
             "fetched": fetched,
             "failed_fetches": failures,
             "attachments_processed": attachments_processed,
-            "attachments_accepted": attachments_accepted,
             "attachments_rejected": attachments_rejected,
-            "attachments_quarantined": attachments_quarantined,
+            "attachments_pending": attachments_pending,
             "customer_links_created": customer_links_created,
+            "timings_ms": _timings_ms(),
         }
@@ -6,6 +6,7 @@ import json
 import os
 import re
 import sqlite3
+import threading
 import uuid
 from datetime import UTC, datetime
 from email import policy
@@ -16,14 +17,28 @@ from typing import Any
 
 from app import core as core
 from app.config import Config
+from app.core.task_queue import BackgroundTaskQueue
 from app.core.upload_pipeline import MAX_FILE_SIZE
 from app.event_id_map import entity_id_int
 from app.eventlog.core import event_append
 from app.knowledge import knowledge_redact_text
 
+from .attachment_storage import (
+    AttachmentTooLarge,
+    estimated_part_size,
+    storage_ledger,
+    write_attachment,
+)
+
 MAIL_ATTACHMENT_TENANT_QUOTA_BYTES = int(
     os.environ.get("KUKANILEA_MAIL_ATTACHMENT_TENANT_QUOTA_BYTES", str(100 * 1024 * 1024))
 )
+MAIL_ATTACHMENT_SCAN_WORKERS = max(
+    1, int(os.environ.get("KUKANILEA_MAIL_ATTACHMENT_SCAN_WORKERS", "2"))
+)
+MAIL_ATTACHMENT_SCAN_QUEUE_MAX = max(
+    1, int(os.environ.get("KUKANILEA_MAIL_ATTACHMENT_SCAN_QUEUE_MAX", "256"))
+)
 
 try:
     from cryptography.hazmat.primitives.ciphers.aead import AESGCM
@@ -195,7 +210,34 @@ def _migrate_legacy_account_secrets(con: sqlite3.Connection) -> int:
     return migrated
 
 
+_SCHEMA_READY: set[tuple[str, int, int]] = set()
+_SCHEMA_LOCK = threading.Lock()
+
+
+def _schema_key(db_path: Path) -> tuple[str, int, int] | None:
+    try:
+        st = os.stat(db_path)
+    except OSError:
+        return None
+    return (str(Path(db_path).resolve()), int(st.st_dev), int(st.st_ino))
+
+
 def ensure_postfach_schema(db_path: Path) -> None:
+    """Creates/migrates the Postfach tables once per database file and process."""
+    key = _schema_key(db_path)
+    if key is not None and key in _SCHEMA_READY:
+        return
+    with _SCHEMA_LOCK:
+        key = _schema_key(db_path)
+        if key is not None and key in _SCHEMA_READY:
+            return
+        _create_postfach_schema(db_path)
+        key = _schema_key(db_path)
+        if key is not None:
+            _SCHEMA_READY.add(key)
+
+
+def _create_postfach_schema(db_path: Path) -> None:
     con = _db(db_path)
     try:
         con.execute(
@@ -394,12 +436,135 @@ def ensure_postfach_schema(db_path: Path) -> None:
         _ensure_column(
             con, "mailbox_accounts", "last_sync_duplicates INTEGER NOT NULL DEFAULT 0"
         )
+        # Thread aggregates are maintained incrementally by _insert_message.
+        # Messages that existed before the read flag was introduced count as read.
+        _ensure_column(con, "mailbox_messages", "is_read INTEGER NOT NULL DEFAULT 1")
+        aggregates_missing = "unread_count" not in _table_columns(con, "mailbox_threads")
+        _ensure_column(
+            con, "mailbox_threads", "unread_count INTEGER NOT NULL DEFAULT 0"
+        )
+        _ensure_column(
+            con, "mailbox_threads", "has_attachments INTEGER NOT NULL DEFAULT 0"
+        )
+        if aggregates_missing:
+            _recompute_thread_aggregates(con)
         _migrate_legacy_account_secrets(con)
+        _ensure_search_rowid(con)
+        _ensure_message_search_index(con)
         con.commit()
     finally:
         con.close()
 
 
+# Full-text index over mailbox messages. The trigram tokenizer matches any
+# substring of three or more characters, i.e. the same hits as the former
+# LIKE '%q%' scans; shorter queries (and SQLite builds without FTS5/trigram)
+# keep the LIKE path. The index is keyed on mailbox_messages.search_rowid, an
+# explicit INTEGER column: the table's rowid is implicit (id is TEXT) and
+# VACUUM may renumber it.
+_MESSAGE_FTS_TRIGGER_NAMES = (
+    "mailbox_messages_fts_ai",
+    "mailbox_messages_fts_ad",
+    "mailbox_messages_fts_au",
+)
+_MESSAGE_FTS_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS mailbox_messages_fts_ai AFTER INSERT ON mailbox_messages BEGIN
+      INSERT INTO mailbox_messages_fts(rowid, subject_redacted, from_redacted, to_redacted, redacted_text)
+      VALUES (new.search_rowid, new.subject_redacted, new.from_redacted, new.to_redacted, new.redacted_text);
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS mailbox_messages_fts_ad AFTER DELETE ON mailbox_messages BEGIN
+      INSERT INTO mailbox_messages_fts(mailbox_messages_fts, rowid, subject_redacted, from_redacted, to_redacted, redacted_text)
+      VALUES ('delete', old.search_rowid, old.subject_redacted, old.from_redacted, old.to_redacted, old.redacted_text);
+    END;
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS mailbox_messages_fts_au
+    AFTER UPDATE OF subject_redacted, from_redacted, to_redacted, redacted_text ON mailbox_messages
+    BEGIN
+      INSERT INTO mailbox_messages_fts(mailbox_messages_fts, rowid, subject_redacted, from_redacted, to_redacted, redacted_text)
+      VALUES ('delete', old.search_rowid, old.subject_redacted, old.from_redacted, old.to_redacted, old.redacted_text);
+      INSERT INTO mailbox_messages_fts(rowid, subject_redacted, from_redacted, to_redacted, redacted_text)
+      VALUES (new.search_rowid, new.subject_redacted, new.from_redacted, new.to_redacted, new.redacted_text);
+    END;
+    """,
+)
+_MESSAGE_FTS_MIN_QUERY = 3
+# bm25 column weights: subject, from, to, body.
+_MESSAGE_FTS_RANK = "bm25(mailbox_messages_fts, 4.0, 2.0, 2.0, 1.0)"
+
+
+def _ensure_search_rowid(con: sqlite3.Connection) -> None:
+    """Adds and backfills the stable integer key of the message FTS index."""
+    _ensure_column(con, "mailbox_messages", "search_rowid INTEGER")
+    con.execute(
+        """
+        UPDATE mailbox_messages
+        SET search_rowid = rowid + (
+          SELECT COALESCE(MAX(search_rowid), 0) FROM mailbox_messages
+        )
+        WHERE search_rowid IS NULL
+        """
+    )
+    con.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_mailbox_messages_search_rowid ON mailbox_messages(search_rowid)"
+    )
+
+
+def _ensure_message_search_index(con: sqlite3.Connection) -> bool:
+    """Creates the FTS index and its triggers; backfills it when newly created."""
+    row = con.execute(
+        "SELECT sql FROM sqlite_master WHERE type='table' AND name='mailbox_messages_fts'"
+    ).fetchone()
+    if row is not None:
+        if "search_rowid" in str(row["sql"] or ""):
+            return True
+        # Index from before search_rowid, keyed on the implicit rowid: rebuild.
+        for name in _MESSAGE_FTS_TRIGGER_NAMES:
+            con.execute(f"DROP TRIGGER IF EXISTS {name}")
+        con.execute("DROP TABLE mailbox_messages_fts")
+    try:
+        con.execute(
+            """
+            CREATE VIRTUAL TABLE mailbox_messages_fts USING fts5(
+              subject_redacted, from_redacted, to_redacted, redacted_text,
+              content='mailbox_messages', content_rowid='search_rowid', tokenize='trigram'
+            )
+            """
+        )
+    except sqlite3.OperationalError:
+        return False
+    for ddl in _MESSAGE_FTS_TRIGGERS:
+        con.execute(ddl)
+    con.execute("INSERT INTO mailbox_messages_fts(mailbox_messages_fts) VALUES('rebuild')")
+    return True
+
+
+def rebuild_message_search_index(db_path: Path) -> dict[str, Any]:
+    """Rebuilds the mailbox FTS index from mailbox_messages and optimizes it."""
+    ensure_postfach_schema(db_path)
+    con = _db(db_path)
+    try:
+        if not _ensure_message_search_index(con):
+            return {"ok": False, "reason": "fts_unavailable", "indexed": 0}
+        con.execute("INSERT INTO mailbox_messages_fts(mailbox_messages_fts) VALUES('rebuild')")
+        con.execute("INSERT INTO mailbox_messages_fts(mailbox_messages_fts) VALUES('optimize')")
+        con.commit()
+        row = con.execute("SELECT COUNT(*) FROM mailbox_messages").fetchone()
+        return {"ok": True, "indexed": int(row[0] or 0)}
+    finally:
+        con.close()
+
+
+def _message_fts_query(con: sqlite3.Connection, text: str) -> str | None:
+    """FTS phrase for a substring search, or None if the LIKE path must be used."""
+    if len(text) < _MESSAGE_FTS_MIN_QUERY or not _table_exists(con, "mailbox_messages_fts"):
+        return None
+    return '"' + text.replace('"', '""') + '"'
+
+
 def _event(
     *,
     event_type: str,
@@ -554,6 +719,23 @@ def list_accounts(db_path: Path, tenant_id: str) -> list[dict[str, Any]]:
         con.close()
 
 
+def list_accounts_for_sync(db_path: Path) -> list[dict[str, Any]]:
+    """All accounts of all tenants with the fields the sync scheduler needs."""
+    ensure_postfach_schema(db_path)
+    con = _db(db_path)
+    try:
+        rows = con.execute(
+            """
+            SELECT id, tenant_id, imap_host, last_sync_at, last_sync_status
+            FROM mailbox_accounts
+            ORDER BY tenant_id, id
+            """
+        ).fetchall()
+        return [dict(r) for r in rows]
+    finally:
+        con.close()
+
+
 def get_account(
     db_path: Path, tenant_id: str, account_id: str
 ) -> dict[str, Any] | None:
@@ -919,7 +1101,7 @@ def _resolve_thread_id(
             subject_redacted,
             participants_redacted,
             key,
-            now,
+            None,
             0,
             "open",
             now,
@@ -929,11 +1111,86 @@ def _resolve_thread_id(
     return thread_id
 
 
-def store_message(
-    db_path: Path,
+def _recompute_thread_aggregates(
+    con: sqlite3.Connection, *, tenant_id: str | None = None
+) -> int:
+    """Recomputes thread aggregates from mailbox_messages (migration/repair only)."""
+    where = "WHERE tenant_id=?" if tenant_id else ""
+    cur = con.execute(
+        f"""
+        UPDATE mailbox_threads
+        SET message_count=(
+              SELECT COUNT(*) FROM mailbox_messages m
+              WHERE m.tenant_id=mailbox_threads.tenant_id AND m.thread_id=mailbox_threads.id
+            ),
+            unread_count=(
+              SELECT COUNT(*) FROM mailbox_messages m
+              WHERE m.tenant_id=mailbox_threads.tenant_id AND m.thread_id=mailbox_threads.id
+                AND m.is_read=0
+            ),
+            has_attachments=EXISTS(
+              SELECT 1 FROM mailbox_messages m
+              WHERE m.tenant_id=mailbox_threads.tenant_id AND m.thread_id=mailbox_threads.id
+                AND m.has_attachments=1
+            ),
+            last_message_at=COALESCE((
+              SELECT MAX(COALESCE(m.received_at, m.created_at)) FROM mailbox_messages m
+              WHERE m.tenant_id=mailbox_threads.tenant_id AND m.thread_id=mailbox_threads.id
+            ), last_message_at)
+        {where}
+        """,
+        (tenant_id,) if tenant_id else (),
+    )
+    return int(cur.rowcount or 0)
+
+
+def recompute_thread_aggregates(db_path: Path, *, tenant_id: str | None = None) -> int:
+    """Repairs message_count/unread_count/has_attachments/last_message_at."""
+    ensure_postfach_schema(db_path)
+    con = _db(db_path)
+    try:
+        updated = _recompute_thread_aggregates(con, tenant_id=tenant_id)
+        con.commit()
+        return updated
+    finally:
+        con.close()
+
+
+def _mark_thread_read(con: sqlite3.Connection, *, tenant_id: str, thread_id: str) -> int:
+    cur = con.execute(
+        """
+        UPDATE mailbox_messages SET is_read=1
+        WHERE tenant_id=? AND thread_id=? AND is_read=0
+        """,
+        (tenant_id, thread_id),
+    )
+    changed = int(cur.rowcount or 0)
+    if changed:
+        con.execute(
+            """
+            UPDATE mailbox_threads
+            SET unread_count=MAX(unread_count - ?, 0), updated_at=?
+            WHERE tenant_id=? AND id=?
+            """,
+            (changed, _now_iso(), tenant_id, thread_id),
+        )
+    return changed
+
+
+def mark_thread_read(db_path: Path, *, tenant_id: str, thread_id: str) -> int:
+    """Marks all messages of a thread as read; returns how many were unread."""
+    ensure_postfach_schema(db_path)
+    con = _db(db_path)
+    try:
+        changed = _mark_thread_read(con, tenant_id=tenant_id, thread_id=thread_id)
+        con.commit()
+        return changed
+    finally:
+        con.close()
+
+
+def _prepare_message(
     *,
-    tenant_id: str,
-    account_id: str,
     direction: str,
     message_id_header: str | None,
     in_reply_to: str | None,
@@ -946,8 +1203,6 @@ def store_message(
     has_attachments: bool,
     received_at: str,
 ) -> dict[str, Any]:
-    ensure_postfach_schema(db_path)
-
     safe_direction = str(direction or "inbound").strip().lower()
     if safe_direction not in {"inbound", "outbound"}:
         raise ValueError("validation_error")
@@ -963,134 +1218,305 @@ def store_message(
     content_hash = hashlib.sha256(
         (f"{message_id_clean or ''}|{subject_redacted}|{body_redacted}").encode()
     ).hexdigest()
+    return {
+        "direction": safe_direction,
+        "message_id_header": message_id_clean,
+        "in_reply_to": str(in_reply_to or "").strip() or None,
+        "references_header": str(references_header or "").strip() or None,
+        "from_redacted": from_redacted,
+        "to_redacted": to_redacted,
+        "subject_redacted": subject_redacted,
+        "body_redacted": body_redacted,
+        "participants_redacted": participants_redacted,
+        "content_hash": content_hash,
+        "raw_eml_blob": encrypt_bytes(raw_eml) if raw_eml else None,
+        "has_attachments": bool(has_attachments),
+        "received_at": received_at,
+    }
 
-    raw_eml_blob = None
-    if raw_eml:
-        raw_eml_blob = encrypt_bytes(raw_eml)
 
-    now = _now_iso()
-    con = _db(db_path)
-    try:
-        if message_id_clean:
-            existing = con.execute(
-                """
-                SELECT id, thread_id
-                FROM mailbox_messages
-                WHERE tenant_id=? AND account_id=? AND message_id_header=?
-                LIMIT 1
-                """,
-                (tenant_id, account_id, message_id_clean),
-            ).fetchone()
-            if existing:
-                return {
-                    "ok": True,
-                    "duplicate": True,
-                    "message_id": str(existing["id"]),
-                    "thread_id": str(existing["thread_id"]),
-                }
-
-        existing_hash = con.execute(
+def _insert_message(
+    con: sqlite3.Connection,
+    *,
+    tenant_id: str,
+    account_id: str,
+    prepared: dict[str, Any],
+) -> dict[str, Any]:
+    """Dedupes and inserts one prepared message; the caller owns the transaction."""
+    message_id_clean = prepared["message_id_header"]
+    if message_id_clean:
+        existing = con.execute(
             """
             SELECT id, thread_id
             FROM mailbox_messages
-            WHERE tenant_id=? AND account_id=? AND content_hash=?
+            WHERE tenant_id=? AND account_id=? AND message_id_header=?
             LIMIT 1
             """,
-            (tenant_id, account_id, content_hash),
+            (tenant_id, account_id, message_id_clean),
         ).fetchone()
-        if existing_hash:
+        if existing:
             return {
                 "ok": True,
                 "duplicate": True,
-                "message_id": str(existing_hash["id"]),
-                "thread_id": str(existing_hash["thread_id"]),
+                "message_id": str(existing["id"]),
+                "thread_id": str(existing["thread_id"]),
             }
 
-        thread_id = _resolve_thread_id(
-            con,
-            tenant_id=tenant_id,
-            account_id=account_id,
-            subject_redacted=subject_redacted,
-            participants_redacted=participants_redacted,
-            in_reply_to=in_reply_to,
-            references_header=references_header,
-        )
+    existing_hash = con.execute(
+        """
+        SELECT id, thread_id
+        FROM mailbox_messages
+        WHERE tenant_id=? AND account_id=? AND content_hash=?
+        LIMIT 1
+        """,
+        (tenant_id, account_id, prepared["content_hash"]),
+    ).fetchone()
+    if existing_hash:
+        return {
+            "ok": True,
+            "duplicate": True,
+            "message_id": str(existing_hash["id"]),
+            "thread_id": str(existing_hash["thread_id"]),
+        }
 
-        message_id = uuid.uuid4().hex
-        con.execute(
-            """
-            INSERT INTO mailbox_messages(
-              id, tenant_id, account_id, thread_id, direction,
-              message_id_header, content_hash, in_reply_to, references_header,
-              from_redacted, to_redacted, subject_redacted,
-              redacted_text, raw_eml_blob, has_attachments,
-              received_at, created_at, updated_at
-            ) VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)
-            """,
-            (
-                message_id,
-                tenant_id,
-                account_id,
-                thread_id,
-                safe_direction,
-                message_id_clean,
-                content_hash,
-                str(in_reply_to or "").strip() or None,
-                str(references_header or "").strip() or None,
-                from_redacted,
-                to_redacted,
-                subject_redacted,
-                body_redacted,
-                raw_eml_blob,
-                1 if has_attachments else 0,
-                str(received_at or now),
-                now,
-                now,
-            ),
-        )
-        con.execute(
-            """
-            UPDATE mailbox_threads
-            SET last_message_at=?,
-                message_count=(
-                  SELECT COUNT(*)
-                  FROM mailbox_messages m
-                  WHERE m.tenant_id=mailbox_threads.tenant_id
-                    AND m.thread_id=mailbox_threads.id
-                ),
-                updated_at=?
-            WHERE tenant_id=? AND id=?
-            """,
-            (str(received_at or now), now, tenant_id, thread_id),
+    thread_id = _resolve_thread_id(
+        con,
+        tenant_id=tenant_id,
+        account_id=account_id,
+        subject_redacted=prepared["subject_redacted"],
+        participants_redacted=prepared["participants_redacted"],
+        in_reply_to=prepared["in_reply_to"],
+        references_header=prepared["references_header"],
+    )
+
+    now = _now_iso()
+    received_at = str(prepared["received_at"] or now)
+    unread = prepared["direction"] == "inbound"
+    message_id = uuid.uuid4().hex
+    con.execute(
+        """
+        INSERT INTO mailbox_messages(
+          id, tenant_id, account_id, thread_id, direction,
+          message_id_header, content_hash, in_reply_to, references_header,
+          from_redacted, to_redacted, subject_redacted,
+          redacted_text, raw_eml_blob, has_attachments, is_read,
+          received_at, created_at, updated_at, search_rowid
+        ) VALUES (
+          ?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,?,
+          (SELECT COALESCE(MAX(search_rowid), 0) + 1 FROM mailbox_messages)
         )
-        con.commit()
-    finally:
-        con.close()
+        """,
+        (
+            message_id,
+            tenant_id,
+            account_id,
+            thread_id,
+            prepared["direction"],
+            message_id_clean,
+            prepared["content_hash"],
+            prepared["in_reply_to"],
+            prepared["references_header"],
+            prepared["from_redacted"],
+            prepared["to_redacted"],
+            prepared["subject_redacted"],
+            prepared["body_redacted"],
+            prepared["raw_eml_blob"],
+            1 if prepared["has_attachments"] else 0,
+            0 if unread else 1,
+            received_at,
+            now,
+            now,
+        ),
+    )
+    con.execute(
+        """
+        UPDATE mailbox_threads
+        SET last_message_at=CASE
+              WHEN last_message_at IS NULL OR last_message_at < ? THEN ?
+              ELSE last_message_at
+            END,
+            message_count=message_count + 1,
+            unread_count=unread_count + ?,
+            has_attachments=MAX(has_attachments, ?),
+            updated_at=?
+        WHERE tenant_id=? AND id=?
+        """,
+        (
+            received_at,
+            received_at,
+            1 if unread else 0,
+            1 if prepared["has_attachments"] else 0,
+            now,
+            tenant_id,
+            thread_id,
+        ),
+    )
+    return {
+        "ok": True,
+        "duplicate": False,
+        "message_id": message_id,
+        "thread_id": thread_id,
+    }
+
 
+def _message_stored_event(
+    *, tenant_id: str, account_id: str, prepared: dict[str, Any], result: dict[str, Any]
+) -> None:
+    direction = prepared["direction"]
     _event(
         event_type=(
-            "mailbox_message_received"
-            if safe_direction == "inbound"
-            else "mailbox_message_sent"
+            "mailbox_message_received" if direction == "inbound" else "mailbox_message_sent"
         ),
         entity_type="mailbox_thread",
-        entity_text_id=thread_id,
+        entity_text_id=result["thread_id"],
         tenant_id=tenant_id,
         payload={
             "account_id": account_id,
-            "thread_id": thread_id,
-            "message_id": message_id,
-            "direction": safe_direction,
-            "has_attachments": bool(has_attachments),
+            "thread_id": result["thread_id"],
+            "message_id": result["message_id"],
+            "direction": direction,
+            "has_attachments": bool(prepared["has_attachments"]),
         },
     )
 
-    return {
-        "ok": True,
-        "duplicate": False,
-        "message_id": message_id,
-        "thread_id": thread_id,
-    }
+
+def store_message(
+    db_path: Path,
+    *,
+    tenant_id: str,
+    account_id: str,
+    direction: str,
+    message_id_header: str | None,
+    in_reply_to: str | None,
+    references_header: str | None,
+    from_value: str,
+    to_value: str,
+    subject_value: str,
+    body_value: str,
+    raw_eml: bytes | None,
+    has_attachments: bool,
+    received_at: str,
+) -> dict[str, Any]:
+    ensure_postfach_schema(db_path)
+    prepared = _prepare_message(
+        direction=direction,
+        message_id_header=message_id_header,
+        in_reply_to=in_reply_to,
+        references_header=references_header,
+        from_value=from_value,
+        to_value=to_value,
+        subject_value=subject_value,
+        body_value=body_value,
+        raw_eml=raw_eml,
+        has_attachments=has_attachments,
+        received_at=received_at,
+    )
+
+    con = _db(db_path)
+    try:
+        result = _insert_message(
+            con, tenant_id=tenant_id, account_id=account_id, prepared=prepared
+        )
+        con.commit()
+    finally:
+        con.close()
+
+    if not result["duplicate"]:
+        _message_stored_event(
+            tenant_id=tenant_id, account_id=account_id, prepared=prepared, result=result
+        )
+    return result
+
+
+def store_messages(
+    db_path: Path,
+    *,
+    tenant_id: str,
+    account_id: str,
+    messages: list[dict[str, Any]],
+) -> list[dict[str, Any]]:
+    """
+    Stores several inbound/outbound messages in a single transaction.
+
+    Each item takes the keyword arguments of `store_message` plus an optional
+    `link_emails` list; threads are linked to customers matching those
+    addresses in the same transaction. Results are returned in input order
+    (each additionally carries `linked`). If any message fails, the whole batch
+    is rolled back and the exception propagates.
+    """
+    if not messages:
+        return []
+    ensure_postfach_schema(db_path)
+    prepared_items = [
+        _prepare_message(**{k: v for k, v in item.items() if k != "link_emails"})
+        for item in messages
+    ]
+
+    results: list[dict[str, Any]] = []
+    links: list[tuple[str, int]] = []
+    con = _db(db_path)
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        for item, prepared in zip(messages, prepared_items):
+            result = _insert_message(
+                con, tenant_id=tenant_id, account_id=account_id, prepared=prepared
+            )
+            emails = _normalize_email_candidates(list(item.get("link_emails") or []))
+            result["linked"] = 0
+            if emails and result["thread_id"]:
+                linked, _customer_ids = _link_thread_customers(
+                    con, tenant_id=tenant_id, thread_id=result["thread_id"], emails=emails
+                )
+                result["linked"] = linked
+                if linked:
+                    links.append((result["thread_id"], linked))
+            results.append(result)
+        con.commit()
+    except BaseException:
+        con.rollback()
+        raise
+    finally:
+        con.close()
+
+    for prepared, result in zip(prepared_items, results):
+        if not result["duplicate"]:
+            _message_stored_event(
+                tenant_id=tenant_id, account_id=account_id, prepared=prepared, result=result
+            )
+    for thread_id, linked in links:
+        _thread_linked_event(tenant_id=tenant_id, thread_id=thread_id, linked=linked)
+    return results
+
+
+def existing_message_id_headers(
+    db_path: Path,
+    *,
+    tenant_id: str,
+    account_id: str,
+    message_id_headers: list[str],
+) -> set[str]:
+    """Returns the subset of Message-ID headers already stored for the account."""
+    wanted = sorted({str(h).strip() for h in message_id_headers if str(h or "").strip()})
+    if not wanted:
+        return set()
+    found: set[str] = set()
+    con = _db(db_path)
+    try:
+        for start in range(0, len(wanted), 500):
+            chunk = wanted[start : start + 500]
+            placeholders = ",".join("?" for _ in chunk)
+            rows = con.execute(
+                f"""
+                SELECT message_id_header
+                FROM mailbox_messages
+                WHERE tenant_id=? AND account_id=? AND message_id_header IN ({placeholders})
+                """,
+                (tenant_id, account_id, *chunk),
+            ).fetchall()
+            found.update(str(r["message_id_header"]) for r in rows)
+    finally:
+        con.close()
+    return found
 
 
 def store_message_attachment(
@@ -1131,6 +1557,177 @@ def store_message_attachment(
     return attachment_id
 
 
+def update_attachment_ref(
+    db_path: Path,
+    *,
+    tenant_id: str,
+    attachment_id: str,
+    content_ref: dict[str, Any],
+) -> None:
+    con = _db(db_path)
+    try:
+        con.execute(
+            "UPDATE mailbox_attachments SET content_ref=? WHERE tenant_id=? AND id=?",
+            (
+                json.dumps(content_ref, ensure_ascii=False, sort_keys=True),
+                tenant_id,
+                attachment_id,
+            ),
+        )
+        con.commit()
+    finally:
+        con.close()
+
+
+_ATTACHMENT_SCAN_QUEUE: BackgroundTaskQueue | None = None
+_ATTACHMENT_SCAN_QUEUE_LOCK = threading.Lock()
+
+
+def _attachment_scan_queue() -> BackgroundTaskQueue:
+    global _ATTACHMENT_SCAN_QUEUE
+    with _ATTACHMENT_SCAN_QUEUE_LOCK:
+        if _ATTACHMENT_SCAN_QUEUE is None:
+            _ATTACHMENT_SCAN_QUEUE = BackgroundTaskQueue(
+                num_workers=MAIL_ATTACHMENT_SCAN_WORKERS,
+                maxsize=MAIL_ATTACHMENT_SCAN_QUEUE_MAX,
+            )
+            _ATTACHMENT_SCAN_QUEUE.start()
+        return _ATTACHMENT_SCAN_QUEUE
+
+
+_ATTACHMENT_SCANS_RESUMED: set[str] = set()
+_ATTACHMENT_SCANS_RESUMED_LOCK = threading.Lock()
+
+
+def _attachment_dirs() -> tuple[Path, Path]:
+    ledger_root = Config.USER_DATA_ROOT / "mail_attachments"
+    quarantine_dir = Config.USER_DATA_ROOT / "mail_quarantine"
+    return ledger_root, quarantine_dir
+
+
+def resume_pending_attachment_scans(db_path: Path) -> int:
+    """
+    Re-enqueues attachments still "pending" from an earlier process.
+
+    The scan queue lives in memory, so a restart drops its jobs; the pending
+    status on the mailbox_attachments row is the durable record. Runs once per
+    database and process, before the first ingest, and returns how many scans
+    were queued. Rows whose file is gone are marked as errors.
+    """
+    key = str(Path(db_path).resolve())
+    with _ATTACHMENT_SCANS_RESUMED_LOCK:
+        if key in _ATTACHMENT_SCANS_RESUMED:
+            return 0
+        _ATTACHMENT_SCANS_RESUMED.add(key)
+
+    ensure_postfach_schema(db_path)
+    con = _db(db_path)
+    try:
+        if not _table_exists(con, "mailbox_attachments"):
+            return 0
+        rows = con.execute(
+            """
+            SELECT id, tenant_id, message_id, content_ref
+            FROM mailbox_attachments
+            WHERE content_ref LIKE '%"status": "pending"%'
+            ORDER BY created_at ASC, id ASC
+            """
+        ).fetchall()
+    finally:
+        con.close()
+
+    ledger_root, quarantine_dir = _attachment_dirs()
+    quarantine_dir.mkdir(parents=True, exist_ok=True)
+    queued = 0
+    for row in rows:
+        try:
+            ref = json.loads(str(row["content_ref"] or ""))
+        except Exception:
+            continue
+        if not isinstance(ref, dict) or ref.get("status") != "pending":
+            continue
+        target = Path(str(ref.get("storage_path") or ""))
+        if not ref.get("storage_path") or not target.is_file():
+            ref["status"] = "error"
+            ref["reason"] = "attachment_missing"
+            update_attachment_ref(
+                db_path,
+                tenant_id=str(row["tenant_id"]),
+                attachment_id=str(row["id"]),
+                content_ref=ref,
+            )
+            continue
+        _attachment_scan_queue().submit(
+            _scan_stored_attachment,
+            db_path,
+            tenant_id=str(row["tenant_id"]),
+            attachment_id=str(row["id"]),
+            target=target,
+            quarantine_target=quarantine_dir
+            / f"{row['message_id']}_{row['id']}_{target.name}",
+            ledger_root=ledger_root,
+            ref=ref,
+        )
+        queued += 1
+    return queued
+
+
+def wait_for_attachment_scans(timeout: float = 30.0) -> bool:
+    """Blocks until queued attachment scans are done; False on timeout."""
+    with _ATTACHMENT_SCAN_QUEUE_LOCK:
+        scan_queue = _ATTACHMENT_SCAN_QUEUE
+    return True if scan_queue is None else scan_queue.wait_idle(timeout)
+
+
+def _scan_stored_attachment(
+    db_path: Path,
+    *,
+    tenant_id: str,
+    attachment_id: str,
+    target: Path,
+    quarantine_target: Path,
+    ledger_root: Path,
+    ref: dict[str, Any],
+) -> None:
+    """Background job: malware scan + upload pipeline for one stored attachment."""
+    from app.core.malware_scanner import scan_file_stream
+    from app.core.upload_pipeline import process_upload
+
+    tenant_key = str(tenant_id or "default")
+    ledger = storage_ledger(ledger_root)
+    size = int(ref.get("size_bytes") or 0)
+    try:
+        if not scan_file_stream(target):
+            try:
+                target.replace(quarantine_target)
+                ref["storage_path"] = str(quarantine_target)
+                ledger.adjust(tenant_key, -size, -1)
+            except Exception:
+                ref["storage_path"] = str(target)
+            ref["status"] = "quarantined"
+            ref["reason"] = "malware_detected"
+        else:
+            is_safe, info = process_upload(target, tenant_key)
+            if is_safe:
+                ref["status"] = "accepted"
+                ref["sha256"] = str(info or "")
+                ref.pop("reason", None)
+            else:
+                ref["status"] = "rejected"
+                ref["reason"] = str(info or "upload_pipeline_rejected")
+            ref["storage_path"] = str(target)
+            if not target.exists():
+                # The upload pipeline removes files it refuses.
+                ledger.adjust(tenant_key, -size, -1)
+    except Exception as exc:
+        ref["status"] = "error"
+        ref["reason"] = f"attachment_processing_failed:{exc.__class__.__name__}"
+        ref["storage_path"] = str(target)
+    update_attachment_ref(
+        db_path, tenant_id=tenant_id, attachment_id=attachment_id, content_ref=ref
+    )
+
+
 def ingest_message_attachments(
     db_path: Path,
     *,
@@ -1139,29 +1736,30 @@ def ingest_message_attachments(
     message_id: str,
     attachments: list[dict[str, Any]],
 ) -> dict[str, Any]:
+    """
+    Stores a message's attachments under the tenant's attachment directory.
+
+    Size and tenant quota are checked up front against the storage ledger.
+    Attachments are written (streamed from their MIME `part`, or from
+    `content_bytes`) with status "pending"; malware scan and upload pipeline
+    run on the bounded background scan queue, which sets the final status
+    (accepted/rejected/quarantined) on the mailbox_attachments row. The
+    returned `pending` count is what is still waiting for that scan.
+    """
     ensure_postfach_schema(db_path)
+    resume_pending_attachment_scans(db_path)
     tenant_key = str(tenant_id or "default")
-    base_dir = (
-        Config.USER_DATA_ROOT
-        / "mail_attachments"
-        / tenant_key
-        / str(account_id or "unknown")
-        / str(message_id or "unknown")
-    )
-    quarantine_dir = Config.USER_DATA_ROOT / "mail_quarantine"
-    tenant_dir = Config.USER_DATA_ROOT / "mail_attachments" / tenant_key
+    ledger_root, quarantine_dir = _attachment_dirs()
+    base_dir = ledger_root / tenant_key / str(account_id or "unknown") / str(message_id or "unknown")
     base_dir.mkdir(parents=True, exist_ok=True)
     quarantine_dir.mkdir(parents=True, exist_ok=True)
+    ledger = storage_ledger(ledger_root)
 
     processed = 0
-    accepted = 0
     rejected = 0
-    quarantined = 0
+    pending = 0
     errors = 0
     attachment_ids: list[str] = []
-    tenant_usage_bytes = sum(
-        path.stat().st_size for path in tenant_dir.rglob("*") if path.is_file()
-    )
 
     for idx, attachment in enumerate(attachments, start=1):
         filename = _safe_attachment_filename(
@@ -1169,10 +1767,14 @@ def ingest_message_attachments(
             fallback=f"attachment_{idx:03d}.bin",
         )
         mime_type = str(attachment.get("mime_type") or "application/octet-stream")
-        payload = bytes(attachment.get("content_bytes") or b"")
-        size_bytes = int(attachment.get("size_bytes") or len(payload))
+        payload = attachment.get("content_bytes") or b""
+        part = attachment.get("part")
+        size_bytes = int(
+            attachment.get("size_bytes")
+            or (estimated_part_size(part) if part is not None else len(payload))
+        )
         payload_size_bytes = max(0, len(payload), size_bytes)
-        if not payload and size_bytes <= 0:
+        if payload_size_bytes <= 0:
             continue
         processed += 1
 
@@ -1187,71 +1789,30 @@ def ingest_message_attachments(
         if payload_size_bytes > MAX_FILE_SIZE:
             ref["status"] = "rejected"
             ref["reason"] = "file_too_large"
-            rejected += 1
-            attachment_id = store_message_attachment(
-                db_path,
-                tenant_id=tenant_id,
-                message_id=message_id,
-                filename=filename,
-                mime_type=mime_type,
-                size_bytes=payload_size_bytes,
-                content_ref=ref,
-            )
-            attachment_ids.append(attachment_id)
-            continue
-
-        if tenant_usage_bytes + payload_size_bytes > MAIL_ATTACHMENT_TENANT_QUOTA_BYTES:
+        elif not ledger.reserve(tenant_key, payload_size_bytes, MAIL_ATTACHMENT_TENANT_QUOTA_BYTES):
             ref["status"] = "rejected"
             ref["reason"] = "tenant_quota_exceeded"
-            rejected += 1
-            attachment_id = store_message_attachment(
-                db_path,
-                tenant_id=tenant_id,
-                message_id=message_id,
-                filename=filename,
-                mime_type=mime_type,
-                size_bytes=payload_size_bytes,
-                content_ref=ref,
-            )
-            attachment_ids.append(attachment_id)
-            continue
-
-        try:
-            target.write_bytes(payload)
-            tenant_usage_bytes += payload_size_bytes
-            from app.core.malware_scanner import scan_file_stream
-            from app.core.upload_pipeline import process_upload
-
-            if not scan_file_stream(target):
-                quarantine_target = (
-                    quarantine_dir
-                    / f"{str(message_id)}_{idx:03d}_{uuid.uuid4().hex[:8]}_{filename}"
-                )
-                try:
-                    target.replace(quarantine_target)
-                    ref["storage_path"] = str(quarantine_target)
-                except Exception:
-                    ref["storage_path"] = str(target)
-                ref["status"] = "quarantined"
-                ref["reason"] = "malware_detected"
-                quarantined += 1
-                rejected += 1
+        else:
+            try:
+                written, digest = write_attachment(attachment, target, max_bytes=MAX_FILE_SIZE)
+            except AttachmentTooLarge:
+                ledger.adjust(tenant_key, -payload_size_bytes)
+                ref["status"] = "rejected"
+                ref["reason"] = "file_too_large"
+            except Exception as exc:
+                ledger.adjust(tenant_key, -payload_size_bytes)
+                ref["status"] = "error"
+                ref["reason"] = f"attachment_processing_failed:{exc.__class__.__name__}"
+                ref["storage_path"] = str(target)
             else:
-                is_safe, info = process_upload(target, str(tenant_id or "default"))
-                if is_safe:
-                    ref["status"] = "accepted"
-                    ref["sha256"] = str(info or "")
-                    ref["storage_path"] = str(target)
-                    accepted += 1
-                else:
-                    ref["status"] = "rejected"
-                    ref["reason"] = str(info or "upload_pipeline_rejected")
-                    ref["storage_path"] = str(target)
-                    rejected += 1
-        except Exception as exc:
-            ref["status"] = "error"
-            ref["reason"] = f"attachment_processing_failed:{exc.__class__.__name__}"
-            ref["storage_path"] = str(target)
+                ledger.adjust(tenant_key, written - payload_size_bytes, 1)
+                ref["size_bytes"] = payload_size_bytes = written
+                ref["sha256"] = digest
+                ref["storage_path"] = str(target)
+
+        if ref["status"] == "rejected":
+            rejected += 1
+        elif ref["status"] == "error":
             errors += 1
 
         attachment_id = store_message_attachment(
@@ -1265,12 +1826,25 @@ def ingest_message_attachments(
         )
         attachment_ids.append(attachment_id)
 
+        if ref["status"] == "pending":
+            _attachment_scan_queue().submit(
+                _scan_stored_attachment,
+                db_path,
+                tenant_id=tenant_id,
+                attachment_id=attachment_id,
+                target=target,
+                quarantine_target=quarantine_dir
+                / f"{str(message_id)}_{idx:03d}_{uuid.uuid4().hex[:8]}_{filename}",
+                ledger_root=ledger_root,
+                ref=dict(ref),
+            )
+            pending += 1
+
     return {
         "ok": True,
         "processed": processed,
-        "accepted": accepted,
         "rejected": rejected,
-        "quarantined": quarantined,
+        "pending": pending,
         "errors": errors,
         "attachment_ids": attachment_ids,
     }
@@ -1350,6 +1924,46 @@ def _find_customer_ids_by_emails(
     return matched
 
 
+def _link_thread_customers(
+    con: sqlite3.Connection,
+    *,
+    tenant_id: str,
+    thread_id: str,
+    emails: list[str],
+) -> tuple[int, list[str]]:
+    now = _now_iso()
+    linked = 0
+    resolved_ids = sorted(
+        _find_customer_ids_by_emails(con, tenant_id=tenant_id, emails=emails)
+    )
+    for customer_id in resolved_ids:
+        cur = con.execute(
+            """
+            INSERT OR IGNORE INTO mailbox_links(
+              id, tenant_id, thread_id, entity_type, entity_id, created_at
+            ) VALUES (?,?,?,?,?,?)
+            """,
+            (uuid.uuid4().hex, tenant_id, thread_id, "customer", customer_id, now),
+        )
+        if int(cur.rowcount or 0) > 0:
+            linked += 1
+    return linked, resolved_ids
+
+
+def _thread_linked_event(*, tenant_id: str, thread_id: str, linked: int) -> None:
+    _event(
+        event_type="mailbox_thread_linked",
+        entity_type="mailbox_thread",
+        entity_text_id=thread_id,
+        tenant_id=tenant_id,
+        payload={
+            "thread_id": thread_id,
+            "links_created": int(linked),
+            "entity_type": "customer",
+        },
+    )
+
+
 def link_thread_customers_by_email(
     db_path: Path,
     *,
@@ -1362,42 +1976,17 @@ def link_thread_customers_by_email(
     if not normalized:
         return {"ok": True, "linked": 0, "customer_ids": []}
 
-    now = _now_iso()
-    linked = 0
-    customer_ids: list[str] = []
     con = _db(db_path)
     try:
-        resolved_ids = sorted(
-            _find_customer_ids_by_emails(con, tenant_id=tenant_id, emails=normalized)
+        linked, customer_ids = _link_thread_customers(
+            con, tenant_id=tenant_id, thread_id=thread_id, emails=normalized
         )
-        for customer_id in resolved_ids:
-            cur = con.execute(
-                """
-                INSERT OR IGNORE INTO mailbox_links(
-                  id, tenant_id, thread_id, entity_type, entity_id, created_at
-                ) VALUES (?,?,?,?,?,?)
-                """,
-                (uuid.uuid4().hex, tenant_id, thread_id, "customer", customer_id, now),
-            )
-            if int(cur.rowcount or 0) > 0:
-                linked += 1
         con.commit()
-        customer_ids = resolved_ids
     finally:
         con.close()
 
     if linked > 0:
-        _event(
-            event_type="mailbox_thread_linked",
-            entity_type="mailbox_thread",
-            entity_text_id=thread_id,
-            tenant_id=tenant_id,
-            payload={
-                "thread_id": thread_id,
-                "links_created": int(linked),
-                "entity_type": "customer",
-            },
-        )
+        _thread_linked_event(tenant_id=tenant_id, thread_id=thread_id, linked=linked)
     return {"ok": True, "linked": int(linked), "customer_ids": customer_ids}
 
 
@@ -1409,12 +1998,45 @@ def list_threads(
     filter_text: str = "",
     limit: int = 100,
 ) -> list[dict[str, Any]]:
+    """
+    Threads of an account, newest first. With `filter_text`, threads are ranked
+    by their best-matching message (FTS) and carry `match_count` and `snippet`.
+    """
     ensure_postfach_schema(db_path)
     lim = max(1, min(int(limit or 100), 500))
     ftxt = (filter_text or "").strip()
     con = _db(db_path)
     try:
-        if ftxt:
+        fts_query = _message_fts_query(con, ftxt) if ftxt else None
+        if fts_query:
+            rows = con.execute(
+                f"""
+                WITH hits AS (
+                  SELECT m.thread_id AS thread_id,
+                         {_MESSAGE_FTS_RANK} AS score,
+                         snippet(mailbox_messages_fts, -1, '', '', ' … ', 12) AS snippet
+                  FROM mailbox_messages_fts
+                  JOIN mailbox_messages m ON m.search_rowid = mailbox_messages_fts.rowid
+                  WHERE mailbox_messages_fts MATCH ?
+                    AND m.tenant_id=? AND m.account_id=?
+                ),
+                agg AS (
+                  SELECT thread_id, MIN(score) AS score, COUNT(*) AS match_count
+                  FROM hits
+                  GROUP BY thread_id
+                )
+                SELECT t.*, agg.match_count,
+                       (SELECT h.snippet FROM hits h
+                        WHERE h.thread_id = agg.thread_id
+                        ORDER BY h.score LIMIT 1) AS snippet
+                FROM agg
+                JOIN mailbox_threads t ON t.id = agg.thread_id AND t.tenant_id=?
+                ORDER BY agg.score, t.last_message_at DESC, t.updated_at DESC
+                LIMIT ?
+                """,
+                (fts_query, tenant_id, account_id, tenant_id, lim),
+            ).fetchall()
+        elif ftxt:
             pattern = f"%{ftxt}%"
             rows = con.execute(
                 """
@@ -1453,6 +2075,13 @@ def list_threads(
         con.close()
 
 
+_SEARCH_MESSAGE_COLUMNS = """
+    m.id, m.tenant_id, m.account_id, m.thread_id, m.direction, m.message_id_header,
+    m.from_redacted, m.to_redacted, m.subject_redacted, m.redacted_text,
+    m.has_attachments, m.received_at, m.created_at
+"""
+
+
 def search_messages(
     db_path: Path,
     *,
@@ -1461,41 +2090,43 @@ def search_messages(
     query: str,
     limit: int = 100,
 ) -> list[dict[str, Any]]:
+    """
+    Substring search over subject, sender, recipients and body. Results are
+    ranked by relevance (bm25, subject weighted highest) and carry a `snippet`
+    when served from the FTS index; otherwise they are ordered newest first.
+    """
     ensure_postfach_schema(db_path)
     q = str(query or "").strip()
     if not q:
         return []
-    pattern = f"%{q}%"
     lim = max(1, min(int(limit or 100), 500))
+    account_clause = "AND m.account_id=?" if account_id else ""
+    account_params: tuple[Any, ...] = (account_id,) if account_id else ()
     con = _db(db_path)
     try:
-        if account_id:
+        fts_query = _message_fts_query(con, q)
+        if fts_query:
             rows = con.execute(
-                """
-                SELECT m.id, m.tenant_id, m.account_id, m.thread_id, m.direction, m.message_id_header,
-                       m.from_redacted, m.to_redacted, m.subject_redacted, m.redacted_text,
-                       m.has_attachments, m.received_at, m.created_at
-                FROM mailbox_messages m
-                WHERE m.tenant_id=? AND m.account_id=?
-                  AND (
-                    m.subject_redacted LIKE ?
-                    OR m.from_redacted LIKE ?
-                    OR m.to_redacted LIKE ?
-                    OR m.redacted_text LIKE ?
-                  )
-                ORDER BY COALESCE(m.received_at, m.created_at) DESC, m.id DESC
+                f"""
+                SELECT {_SEARCH_MESSAGE_COLUMNS},
+                       snippet(mailbox_messages_fts, -1, '', '', ' … ', 12) AS snippet
+                FROM mailbox_messages_fts
+                JOIN mailbox_messages m ON m.search_rowid = mailbox_messages_fts.rowid
+                WHERE mailbox_messages_fts MATCH ?
+                  AND m.tenant_id=? {account_clause}
+                ORDER BY {_MESSAGE_FTS_RANK},
+                         COALESCE(m.received_at, m.created_at) DESC, m.id DESC
                 LIMIT ?
                 """,
-                (tenant_id, account_id, pattern, pattern, pattern, pattern, lim),
+                (fts_query, tenant_id, *account_params, lim),
             ).fetchall()
         else:
+            pattern = f"%{q}%"
             rows = con.execute(
-                """
-                SELECT m.id, m.tenant_id, m.account_id, m.thread_id, m.direction, m.message_id_header,
-                       m.from_redacted, m.to_redacted, m.subject_redacted, m.redacted_text,
-                       m.has_attachments, m.received_at, m.created_at
+                f"""
+                SELECT {_SEARCH_MESSAGE_COLUMNS}
                 FROM mailbox_messages m
-                WHERE m.tenant_id=?
+                WHERE m.tenant_id=? {account_clause}
                   AND (
                     m.subject_redacted LIKE ?
                     OR m.from_redacted LIKE ?
@@ -1505,7 +2136,7 @@ def search_messages(
                 ORDER BY COALESCE(m.received_at, m.created_at) DESC, m.id DESC
                 LIMIT ?
                 """,
-                (tenant_id, pattern, pattern, pattern, pattern, lim),
+                (tenant_id, *account_params, pattern, pattern, pattern, pattern, lim),
             ).fetchall()
         return [dict(r) for r in rows]
     finally:
@@ -1513,11 +2144,21 @@ def search_messages(
 
 
 def get_thread(
-    db_path: Path, *, tenant_id: str, thread_id: str
+    db_path: Path, *, tenant_id: str, thread_id: str, mark_read: bool = False
 ) -> dict[str, Any] | None:
+    """Loads a thread with messages, attachments and links.
+
+    ``mark_read`` is for callers that open the thread for a user: its messages
+    are marked read and ``unread_count`` drops before the thread is returned.
+    Drafting and summarizing read threads without touching the unread state.
+    """
     ensure_postfach_schema(db_path)
     con = _db(db_path)
     try:
+        if mark_read and _mark_thread_read(
+            con, tenant_id=tenant_id, thread_id=thread_id
+        ):
+            con.commit()
         thread_row = con.execute(
             """
             SELECT *
@@ -1566,6 +2207,13 @@ def get_thread(
                         item["content_ref_json"] = None
                 else:
                     item["content_ref_json"] = None
+                ref_json = item["content_ref_json"]
+                if isinstance(ref_json, dict) and ref_json.get("status") != "accepted":
+                    # Only scanned, accepted files are reachable from a thread.
+                    ref_json.pop("storage_path", None)
+                    item["content_ref"] = json.dumps(
+                        ref_json, ensure_ascii=False, sort_keys=True
+                    )
                 mid = str(item.get("message_id") or "")
                 attachments_by_message.setdefault(mid, []).append(item)
             for msg in messages:
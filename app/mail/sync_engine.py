@@ -1,41 +1,134 @@
 from __future__ import annotations
 
+import os
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 
 from . import postfach_imap, postfach_store
 
+MAIL_SYNC_WORKERS = max(1, int(os.environ.get("KUKANILEA_MAIL_SYNC_WORKERS", "4")))
+# Concurrent sync connections per IMAP host (shared by all tenants/accounts).
+MAIL_SYNC_PER_HOST = max(1, int(os.environ.get("KUKANILEA_MAIL_SYNC_PER_HOST", "2")))
+MAIL_SYNC_MIN_INTERVAL = max(
+    10, int(os.environ.get("KUKANILEA_MAIL_SYNC_MIN_INTERVAL", "60"))
+)
+MAIL_SYNC_MAX_INTERVAL = max(
+    MAIL_SYNC_MIN_INTERVAL, int(os.environ.get("KUKANILEA_MAIL_SYNC_MAX_INTERVAL", "1800"))
+)
+MAIL_SYNC_IDLE = os.environ.get("KUKANILEA_MAIL_SYNC_IDLE", "1") not in {"0", "false", "no"}
+MAIL_SYNC_IDLE_TIMEOUT = max(
+    30, int(os.environ.get("KUKANILEA_MAIL_SYNC_IDLE_TIMEOUT", "600"))
+)
+# Long-lived IDLE connections per IMAP host, capped apart from the sync slots so
+# watchers never starve syncs. Accounts beyond the cap are polled instead.
+MAIL_SYNC_IDLE_PER_HOST = max(
+    1, int(os.environ.get("KUKANILEA_MAIL_SYNC_IDLE_PER_HOST", "4"))
+)
 
-def sync_all_accounts(
+_HOST_SLOTS: dict[str, threading.BoundedSemaphore] = {}
+_IDLE_SLOTS: dict[str, threading.BoundedSemaphore] = {}
+_HOST_SLOTS_LOCK = threading.Lock()
+
+
+def _slot(
+    slots: dict[str, threading.BoundedSemaphore], host: str, limit: int
+) -> threading.BoundedSemaphore:
+    key = str(host or "").strip().lower()
+    with _HOST_SLOTS_LOCK:
+        slot = slots.get(key)
+        if slot is None:
+            slot = threading.BoundedSemaphore(limit)
+            slots[key] = slot
+        return slot
+
+
+def _host_slot(host: str) -> threading.BoundedSemaphore:
+    return _slot(_HOST_SLOTS, host, MAIL_SYNC_PER_HOST)
+
+
+def _idle_slot(host: str) -> threading.BoundedSemaphore:
+    return _slot(_IDLE_SLOTS, host, MAIL_SYNC_IDLE_PER_HOST)
+
+
+def _sync_one(
     db_path: Path,
     *,
     tenant_id: str,
-    limit_per_account: int = 50,
-    auto_download_attachments: bool = True,
+    account_id: str,
+    host: str,
+    limit: int,
+    auto_download_attachments: bool,
 ) -> dict[str, Any]:
-    postfach_store.ensure_postfach_schema(db_path)
-    results: list[dict[str, Any]] = []
-    accounts = postfach_store.list_accounts(db_path, tenant_id)
-    for account in accounts:
-        account_id = str(account.get("id") or "")
-        if not account_id:
-            continue
+    with _host_slot(host):
         try:
-            res = postfach_imap.sync_account(
+            return postfach_imap.sync_account(
                 db_path,
                 tenant_id=tenant_id,
                 account_id=account_id,
-                limit=limit_per_account,
+                limit=limit,
                 auto_download_attachments=auto_download_attachments,
+                run_automation=False,
             )
         except Exception:
-            res = {"ok": False, "reason": "sync_exception", "imported": 0, "duplicates": 0}
-        results.append({"account_id": account_id, "result": res})
+            return {"ok": False, "reason": "sync_exception", "imported": 0, "duplicates": 0}
+
+
+def _wave_produced_events(results: list[dict[str, Any]]) -> bool:
+    return any(
+        int(r.get("imported") or 0) > 0 or int(r.get("customer_links_created") or 0) > 0
+        for r in results
+    )
+
 
-    imported = sum(int((r.get("result") or {}).get("imported") or 0) for r in results)
-    duplicates = sum(int((r.get("result") or {}).get("duplicates") or 0) for r in results)
-    failed = len([r for r in results if not bool((r.get("result") or {}).get("ok"))])
+def sync_all_accounts(
+    db_path: Path,
+    *,
+    tenant_id: str,
+    limit_per_account: int = 50,
+    auto_download_attachments: bool = True,
+    max_workers: int | None = None,
+) -> dict[str, Any]:
+    """
+    Syncs all accounts of a tenant concurrently (bounded by `max_workers` and
+    the per-host connection limit), then runs the tenant's automation once.
+    """
+    postfach_store.ensure_postfach_schema(db_path)
+    accounts = [
+        a for a in postfach_store.list_accounts(db_path, tenant_id) if str(a.get("id") or "")
+    ]
+    results: list[dict[str, Any]] = []
+    if accounts:
+        workers = max(1, min(int(max_workers or MAIL_SYNC_WORKERS), len(accounts)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="mail-sync") as pool:
+            futures = [
+                (
+                    str(account.get("id")),
+                    pool.submit(
+                        _sync_one,
+                        db_path,
+                        tenant_id=tenant_id,
+                        account_id=str(account.get("id")),
+                        host=str(account.get("imap_host") or ""),
+                        limit=limit_per_account,
+                        auto_download_attachments=auto_download_attachments,
+                    ),
+                )
+                for account in accounts
+            ]
+            results = [{"account_id": aid, "result": fut.result()} for aid, fut in futures]
+
+    account_results = [r.get("result") or {} for r in results]
+    automation: dict[str, Any] = {"ok": False, "reason": "not_run"}
+    if _wave_produced_events(account_results):
+        automation = postfach_imap.run_tenant_automation(db_path, tenant_id=tenant_id)
+
+    imported = sum(int(r.get("imported") or 0) for r in account_results)
+    duplicates = sum(int(r.get("duplicates") or 0) for r in account_results)
+    failed = len([r for r in account_results if not bool(r.get("ok"))])
     return {
         "ok": failed == 0,
         "reason": "ok" if failed == 0 else "partial_failure",
@@ -44,9 +137,353 @@ def sync_all_accounts(
         "imported": imported,
         "duplicates": duplicates,
         "results": results,
+        "automation": automation,
     }
 
 
+@dataclass
+class _AccountState:
+    tenant_id: str
+    account_id: str
+    host: str
+    interval: float
+    next_due: float
+    last_synced: float = 0.0
+    rate_per_min: float = 0.0
+    last_imported: int = 0
+    last_ok: bool = True
+    failures: int = 0
+    running: bool = False
+    idle: str = ""  # "", "active", "unsupported"
+
+
+class MailSyncScheduler:
+    """
+    Background sync for all mailbox accounts of all tenants.
+
+    Due accounts are synced in waves on a bounded thread pool; a per-host
+    semaphore caps concurrent connections to the same IMAP server. After a
+    wave, automation runs once per tenant that received new mail.
+
+    Each account's polling interval follows its observed message rate (about
+    one new message per poll, clamped to [min_interval, max_interval]) and
+    backs off exponentially on failures. Accounts whose server offers IMAP
+    IDLE get a watcher thread that triggers a sync as soon as mail arrives;
+    their poll interval stays at max_interval as a safety net. At most
+    MAIL_SYNC_IDLE_PER_HOST watchers per host hold an IDLE connection; the
+    others wait for a free slot and are polled meanwhile.
+    """
+
+    def __init__(
+        self,
+        *,
+        db_path: Path,
+        workers: int | None = None,
+        min_interval: int | None = None,
+        max_interval: int | None = None,
+        idle: bool | None = None,
+        limit_per_account: int = 200,
+        auto_download_attachments: bool = True,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.db_path = Path(db_path)
+        self.workers = max(1, int(workers or MAIL_SYNC_WORKERS))
+        self.min_interval = float(min_interval or MAIL_SYNC_MIN_INTERVAL)
+        self.max_interval = max(self.min_interval, float(max_interval or MAIL_SYNC_MAX_INTERVAL))
+        self.idle = MAIL_SYNC_IDLE if idle is None else bool(idle)
+        self.limit_per_account = int(limit_per_account)
+        self.auto_download_attachments = bool(auto_download_attachments)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._pool: ThreadPoolExecutor | None = None
+        self._accounts: dict[str, _AccountState] = {}
+        self._idle_threads: dict[str, threading.Thread] = {}
+        self._counters = {
+            "waves": 0,
+            "syncs": 0,
+            "syncs_failed": 0,
+            "imported": 0,
+            "duplicates": 0,
+            "automation_runs": 0,
+            "idle_wakeups": 0,
+        }
+
+    # -- lifecycle -------------------------------------------------------
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="mail-sync-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def is_alive(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def notify(self, tenant_id: str, account_id: str) -> None:
+        """Marks an account as due now (e.g. after an IDLE wakeup or a manual request)."""
+        with self._lock:
+            state = self._accounts.get(self._key(tenant_id, account_id))
+            if state is not None:
+                state.next_due = self._clock()
+        self._wake.set()
+
+    # -- scheduling ------------------------------------------------------
+    @staticmethod
+    def _key(tenant_id: str, account_id: str) -> str:
+        return f"{tenant_id}\x1f{account_id}"
+
+    def refresh_accounts(self) -> None:
+        rows = postfach_store.list_accounts_for_sync(self.db_path)
+        now = self._clock()
+        with self._lock:
+            seen: set[str] = set()
+            for row in rows:
+                key = self._key(str(row.get("tenant_id") or ""), str(row.get("id") or ""))
+                seen.add(key)
+                if key not in self._accounts:
+                    self._accounts[key] = _AccountState(
+                        tenant_id=str(row.get("tenant_id") or ""),
+                        account_id=str(row.get("id") or ""),
+                        host=str(row.get("imap_host") or ""),
+                        interval=self.min_interval,
+                        next_due=now,
+                    )
+            for key in list(self._accounts):
+                if key not in seen:
+                    del self._accounts[key]
+
+    def _next_interval(self, state: _AccountState, result: dict[str, Any], now: float) -> float:
+        if not bool(result.get("ok")):
+            state.failures += 1
+            return min(self.max_interval, self.min_interval * (2 ** min(state.failures, 10)))
+        state.failures = 0
+        if state.idle == "active":
+            return self.max_interval
+        if not state.last_synced:
+            # The first sync imports the backlog and says nothing about the rate.
+            return self.min_interval
+        imported = int(result.get("imported") or 0)
+        minutes = max((now - state.last_synced) / 60.0, 1.0 / 60.0)
+        state.rate_per_min = 0.7 * state.rate_per_min + 0.3 * (imported / minutes)
+        if state.rate_per_min <= 0:
+            return self.max_interval
+        return max(self.min_interval, min(self.max_interval, 60.0 / state.rate_per_min))
+
+    def run_wave(self) -> dict[str, Any]:
+        """Syncs every due account concurrently and returns the wave summary."""
+        now = self._clock()
+        with self._lock:
+            due = [s for s in self._accounts.values() if s.next_due <= now and not s.running]
+            for state in due:
+                state.running = True
+        if not due:
+            return {"accounts": 0, "imported": 0, "automation_runs": 0}
+
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="mail-sync"
+            )
+        futures = {
+            self._pool.submit(
+                _sync_one,
+                self.db_path,
+                tenant_id=state.tenant_id,
+                account_id=state.account_id,
+                host=state.host,
+                limit=self.limit_per_account,
+                auto_download_attachments=self.auto_download_attachments,
+            ): state
+            for state in due
+        }
+        wait(list(futures))
+
+        by_tenant: dict[str, list[dict[str, Any]]] = {}
+        finished = self._clock()
+        with self._lock:
+            for fut, state in futures.items():
+                try:
+                    result = fut.result()
+                except Exception:
+                    result = {"ok": False, "reason": "sync_exception"}
+                state.running = False
+                state.last_ok = bool(result.get("ok"))
+                state.last_imported = int(result.get("imported") or 0)
+                state.interval = self._next_interval(state, result, finished)
+                state.last_synced = finished
+                state.next_due = finished + state.interval
+                by_tenant.setdefault(state.tenant_id, []).append(result)
+                self._counters["syncs"] += 1
+                self._counters["syncs_failed"] += 0 if state.last_ok else 1
+                self._counters["imported"] += state.last_imported
+                self._counters["duplicates"] += int(result.get("duplicates") or 0)
+            self._counters["waves"] += 1
+
+        automation_runs = 0
+        for tenant_id, results in by_tenant.items():
+            if _wave_produced_events(results):
+                postfach_imap.run_tenant_automation(self.db_path, tenant_id=tenant_id)
+                automation_runs += 1
+        with self._lock:
+            self._counters["automation_runs"] += automation_runs
+        return {
+            "accounts": len(due),
+            "imported": sum(int(r.get("imported") or 0) for rs in by_tenant.values() for r in rs),
+            "automation_runs": automation_runs,
+        }
+
+    # -- IMAP IDLE -------------------------------------------------------
+    def _ensure_idle_watchers(self) -> None:
+        if not self.idle:
+            return
+        with self._lock:
+            states = [s for s in self._accounts.values() if s.idle != "unsupported"]
+            for state in states:
+                key = self._key(state.tenant_id, state.account_id)
+                thread = self._idle_threads.get(key)
+                if thread is not None and thread.is_alive():
+                    continue
+                thread = threading.Thread(
+                    target=self._idle_loop,
+                    args=(state,),
+                    name=f"mail-idle-{state.account_id[:8]}",
+                    daemon=True,
+                )
+                self._idle_threads[key] = thread
+                thread.start()
+
+    def _idle_entered(self, state: _AccountState) -> None:
+        with self._lock:
+            state.idle = "active"
+
+    def _idle_loop(self, state: _AccountState) -> None:
+        errors = 0
+        slot = _idle_slot(state.host)
+        while not self._stop_event.is_set():
+            with self._lock:
+                if self._key(state.tenant_id, state.account_id) not in self._accounts:
+                    return
+            if not slot.acquire(timeout=1.0):
+                # Every IDLE slot of the host is taken: the account is polled.
+                with self._lock:
+                    state.idle = ""
+                continue
+            try:
+                outcome = postfach_imap.wait_for_new_mail(
+                    self.db_path,
+                    tenant_id=state.tenant_id,
+                    account_id=state.account_id,
+                    timeout_seconds=MAIL_SYNC_IDLE_TIMEOUT,
+                    on_idle=lambda: self._idle_entered(state),
+                )
+            finally:
+                slot.release()
+            if outcome == "unsupported":
+                with self._lock:
+                    state.idle = "unsupported"
+                return
+            if outcome == "error":
+                errors += 1
+                with self._lock:
+                    state.idle = ""
+                self._stop_event.wait(min(self.max_interval, 30 * (2 ** min(errors, 6))))
+                continue
+            errors = 0
+            if outcome == "new_mail":
+                with self._lock:
+                    self._counters["idle_wakeups"] += 1
+                self.notify(state.tenant_id, state.account_id)
+
+    # -- loop ------------------------------------------------------------
+    def _run(self) -> None:
+        last_refresh = 0.0
+        while not self._stop_event.is_set():
+            try:
+                if self._clock() - last_refresh >= self.min_interval:
+                    self.refresh_accounts()
+                    self._ensure_idle_watchers()
+                    last_refresh = self._clock()
+                self.run_wave()
+            except Exception:
+                # Offline/network errors must never crash the loop.
+                pass
+            with self._lock:
+                upcoming = [s.next_due for s in self._accounts.values() if not s.running]
+            delay = (min(upcoming) - self._clock()) if upcoming else self.min_interval
+            self._wake.clear()
+            self._wake.wait(max(1.0, min(delay, self.min_interval)))
+
+    def status(self) -> dict[str, Any]:
+        now = self._clock()
+        with self._lock:
+            accounts = [
+                {
+                    "tenant_id": s.tenant_id,
+                    "account_id": s.account_id,
+                    "interval_seconds": int(s.interval),
+                    "next_sync_in_seconds": max(0, int(s.next_due - now)),
+                    "rate_per_min": round(s.rate_per_min, 3),
+                    "last_imported": s.last_imported,
+                    "last_ok": s.last_ok,
+                    "failures": s.failures,
+                    "running": s.running,
+                    "idle": s.idle,
+                }
+                for s in self._accounts.values()
+            ]
+            out: dict[str, Any] = dict(self._counters)
+        out["running"] = self.is_alive()
+        out["active_syncs"] = sum(1 for a in accounts if a["running"])
+        out["idle_accounts"] = sum(1 for a in accounts if a["idle"] == "active")
+        out["accounts"] = accounts
+        return out
+
+
+_MAIL_SYNC_SCHEDULER: MailSyncScheduler | None = None
+_MAIL_SYNC_SCHEDULER_LOCK = threading.Lock()
+
+
+def start_mail_sync_scheduler(*, db_path: Path | str, **kwargs: Any) -> MailSyncScheduler:
+    global _MAIL_SYNC_SCHEDULER
+    with _MAIL_SYNC_SCHEDULER_LOCK:
+        if _MAIL_SYNC_SCHEDULER is not None and _MAIL_SYNC_SCHEDULER.is_alive():
+            return _MAIL_SYNC_SCHEDULER
+        scheduler = MailSyncScheduler(db_path=Path(db_path), **kwargs)
+        # Scans queued by a previous process were lost with it.
+        postfach_store.resume_pending_attachment_scans(Path(db_path))
+        scheduler.start()
+        _MAIL_SYNC_SCHEDULER = scheduler
+        return scheduler
+
+
+def stop_mail_sync_scheduler() -> None:
+    global _MAIL_SYNC_SCHEDULER
+    with _MAIL_SYNC_SCHEDULER_LOCK:
+        if _MAIL_SYNC_SCHEDULER is None:
+            return
+        _MAIL_SYNC_SCHEDULER.stop()
+        _MAIL_SYNC_SCHEDULER = None
+
+
+def mail_sync_status() -> dict[str, Any]:
+    with _MAIL_SYNC_SCHEDULER_LOCK:
+        scheduler = _MAIL_SYNC_SCHEDULER
+    if scheduler is None:
+        return {"running": False, "accounts": []}
+    return scheduler.status()
+
+
 class MailSyncEngine:
     def __init__(
         self,
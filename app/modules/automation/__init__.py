@@ -1,5 +1,10 @@
 from .actions import execute_action as builder_execute_action
 from .actions import run_rule_actions as builder_run_actions
+from .dispatcher import (
+    automation_dispatcher_status,
+    start_automation_dispatcher,
+    stop_automation_dispatcher,
+)
 from .logic import (
     automation_rule_create,
     automation_rule_disable,
@@ -73,6 +78,7 @@ from .store import (
 )
 
 __all__ = [
+    "automation_dispatcher_status",
     "automation_rule_create",
     "automation_rule_disable",
     "automation_rule_get",
@@ -107,7 +113,9 @@ __all__ = [
     "simulate_rule_for_tenant",
     "load_rule_file",
     "load_rules_from_dir",
+    "start_automation_dispatcher",
     "start_cron_checker",
+    "stop_automation_dispatcher",
     "stop_cron_checker",
     "RulesEngine",
     "RulesEngineState",
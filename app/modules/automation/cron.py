@@ -1,68 +1,221 @@
 from __future__ import annotations
 
-from datetime import UTC, datetime
+import calendar
+import string
+from bisect import bisect_left
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from functools import lru_cache
 
 CRON_FIELD_COUNT = 5
 CRON_MAX_EXPRESSION_LENGTH = 120
+# Years next_fire_after looks ahead; a Feb 29 schedule may skip 2100 (8 years).
+CRON_SEARCH_YEARS = 9
 
+_MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@midnight": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+_MONTH_NAMES = {
+    name: index
+    for index, name in enumerate(
+        ("JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"),
+        start=1,
+    )
+}
+# Sunday=0, Monday=1 ... Saturday=6 (7 is accepted as Sunday)
+_WEEKDAY_NAMES = {
+    name: index for index, name in enumerate(("SUN", "MON", "TUE", "WED", "THU", "FRI", "SAT"))
+}
+_ALLOWED_CHARS = set("0123456789*,-/ \t@") | set(string.ascii_letters)
 
-def _parse_field(
-    token: str, *, minimum: int, maximum: int, field_name: str
-) -> int | None:
-    value = str(token or "").strip()
-    if value == "*":
-        return None
+
+def utc_minute(dt: datetime) -> datetime:
+    current = dt.replace(second=0, microsecond=0)
+    if current.tzinfo is None:
+        return current.replace(tzinfo=UTC)
+    return current.astimezone(UTC)
+
+
+def _parse_value(token: str, *, names: dict[str, int], field_name: str) -> int:
+    value = token.strip().upper()
+    if value in names:
+        return names[value]
     if not value.isdigit():
         raise ValueError(f"validation_error:cron_invalid_{field_name}")
-    parsed = int(value)
-    if parsed < minimum or parsed > maximum:
-        raise ValueError(f"validation_error:cron_out_of_range_{field_name}")
-    return parsed
+    return int(value)
 
 
-def parse_cron_expression(
-    expression: str,
-) -> tuple[int | None, int | None, int | None, int | None, int | None]:
+def _parse_field(
+    token: str,
+    *,
+    minimum: int,
+    maximum: int,
+    field_name: str,
+    names: dict[str, int] | None = None,
+) -> tuple[int, ...]:
+    """Expands one field (`*`, `a`, `a-b`, steps `/n`, lists `,`) to its sorted values."""
+    values: set[int] = set()
+    for item in str(token or "").strip().split(","):
+        base, _, step_raw = item.partition("/")
+        step = 1
+        if step_raw:
+            if not step_raw.isdigit() or int(step_raw) < 1:
+                raise ValueError(f"validation_error:cron_invalid_{field_name}")
+            step = int(step_raw)
+        if base == "*":
+            low, high = minimum, maximum
+        elif "-" in base:
+            low_raw, _, high_raw = base.partition("-")
+            low = _parse_value(low_raw, names=names or {}, field_name=field_name)
+            high = _parse_value(high_raw, names=names or {}, field_name=field_name)
+            if low > high:
+                raise ValueError(f"validation_error:cron_invalid_{field_name}")
+        else:
+            low = _parse_value(base, names=names or {}, field_name=field_name)
+            # "a/n" runs from a to the end of the field.
+            high = maximum if step_raw else low
+        if low < minimum or high > maximum:
+            raise ValueError(f"validation_error:cron_out_of_range_{field_name}")
+        values.update(range(low, high + 1, step))
+    return tuple(sorted(values))
+
+
+@dataclass(frozen=True)
+class CronExpression:
+    """
+    A compiled five-field cron expression (UTC, minute resolution).
+
+    Each field holds its sorted allowed values. As in classic cron, a rule
+    restricting both day of month and weekday fires when either matches.
+    """
+
+    expression: str
+    minutes: tuple[int, ...]
+    hours: tuple[int, ...]
+    days: tuple[int, ...]
+    months: tuple[int, ...]
+    weekdays: tuple[int, ...]
+    day_restricted: bool
+    weekday_restricted: bool
+
+    def _day_matches(self, year: int, month: int, day: int) -> bool:
+        weekday = (calendar.weekday(year, month, day) + 1) % 7
+        if self.day_restricted and self.weekday_restricted:
+            return day in self.days or weekday in self.weekdays
+        # An unrestricted field holds every value, so stepped ones like */2 still apply.
+        return day in self.days and weekday in self.weekdays
+
+    def matches(self, dt: datetime) -> bool:
+        current = utc_minute(dt)
+        return (
+            current.minute in self.minutes
+            and current.hour in self.hours
+            and current.month in self.months
+            and self._day_matches(current.year, current.month, current.day)
+        )
+
+    def next_fire_after(self, dt: datetime) -> datetime | None:
+        """First fire strictly after `dt`, or None if it never fires again."""
+        start = utc_minute(dt) + timedelta(minutes=1)
+        for year in range(start.year, start.year + CRON_SEARCH_YEARS):
+            first_month = start.month if year == start.year else 1
+            for month in self.months[bisect_left(self.months, first_month) :]:
+                same_month = (year, month) == (start.year, start.month)
+                last_day = calendar.monthrange(year, month)[1]
+                for day in range(start.day if same_month else 1, last_day + 1):
+                    if not self._day_matches(year, month, day):
+                        continue
+                    same_day = same_month and day == start.day
+                    fire = self._first_time_of_day(start if same_day else None)
+                    if fire is not None:
+                        return datetime(year, month, day, fire[0], fire[1], tzinfo=UTC)
+        return None
+
+    def _first_time_of_day(self, start: datetime | None) -> tuple[int, int] | None:
+        if start is None:
+            return self.hours[0], self.minutes[0]
+        index = bisect_left(self.hours, start.hour)
+        if index < len(self.hours) and self.hours[index] == start.hour:
+            minute_index = bisect_left(self.minutes, start.minute)
+            if minute_index < len(self.minutes):
+                return start.hour, self.minutes[minute_index]
+            index += 1
+        if index < len(self.hours):
+            return self.hours[index], self.minutes[0]
+        return None
+
+    def fires_between(
+        self, start: datetime, end: datetime, *, limit: int | None = None
+    ) -> list[datetime]:
+        """Fires in (start, end], oldest first; at most `limit` of them."""
+        out: list[datetime] = []
+        stop = utc_minute(end)
+        fire = self.next_fire_after(start)
+        while fire is not None and fire <= stop:
+            out.append(fire)
+            if limit is not None and len(out) >= limit:
+                break
+            fire = self.next_fire_after(fire)
+        return out
+
+
+def parse_cron_expression(expression: str) -> CronExpression:
     raw = str(expression or "").strip()
     if not raw:
         raise ValueError("validation_error:cron_empty")
     if len(raw) > CRON_MAX_EXPRESSION_LENGTH:
         raise ValueError("validation_error:cron_too_long")
-    if any(ch not in "0123456789* \t" for ch in raw):
+    if any(ch not in _ALLOWED_CHARS for ch in raw):
         raise ValueError("validation_error:cron_unsupported_syntax")
-    parts = [p.strip() for p in raw.split() if p.strip()]
+    if raw.startswith("@"):
+        macro = _MACROS.get(raw.lower())
+        if macro is None:
+            raise ValueError("validation_error:cron_unsupported_syntax")
+        parts = macro.split()
+    else:
+        parts = [p.strip() for p in raw.split() if p.strip()]
     if len(parts) != CRON_FIELD_COUNT:
         raise ValueError("validation_error:cron_field_count")
-    minute = _parse_field(parts[0], minimum=0, maximum=59, field_name="minute")
-    hour = _parse_field(parts[1], minimum=0, maximum=23, field_name="hour")
-    day = _parse_field(parts[2], minimum=1, maximum=31, field_name="day")
-    month = _parse_field(parts[3], minimum=1, maximum=12, field_name="month")
-    # Sunday=0, Monday=1 ... Saturday=6
-    weekday = _parse_field(parts[4], minimum=0, maximum=6, field_name="weekday")
-    return minute, hour, day, month, weekday
+    weekdays = _parse_field(
+        parts[4], minimum=0, maximum=7, field_name="weekday", names=_WEEKDAY_NAMES
+    )
+    return CronExpression(
+        expression=raw,
+        minutes=_parse_field(parts[0], minimum=0, maximum=59, field_name="minute"),
+        hours=_parse_field(parts[1], minimum=0, maximum=23, field_name="hour"),
+        days=_parse_field(parts[2], minimum=1, maximum=31, field_name="day"),
+        months=_parse_field(
+            parts[3], minimum=1, maximum=12, field_name="month", names=_MONTH_NAMES
+        ),
+        weekdays=tuple(sorted({0 if value == 7 else value for value in weekdays})),
+        day_restricted=not parts[2].startswith("*"),
+        weekday_restricted=not parts[4].startswith("*"),
+    )
+
+
+@lru_cache(maxsize=1024)
+def compile_cron(expression: str) -> CronExpression:
+    """parse_cron_expression, cached per expression string."""
+    return parse_cron_expression(expression)
 
 
 def cron_match(expression: str, dt: datetime) -> bool:
-    minute, hour, day, month, weekday = parse_cron_expression(expression)
-    current = dt.replace(second=0, microsecond=0)
-    if current.tzinfo is None:
-        current = current.replace(tzinfo=UTC)
-    else:
-        current = current.astimezone(UTC)
-    current_weekday = (current.weekday() + 1) % 7
-    return (
-        (minute is None or minute == current.minute)
-        and (hour is None or hour == current.hour)
-        and (day is None or day == current.day)
-        and (month is None or month == current.month)
-        and (weekday is None or weekday == current_weekday)
-    )
+    return compile_cron(str(expression or "").strip()).matches(dt)
 
 
 def cron_minute_ref(dt: datetime) -> str:
-    current = dt.replace(second=0, microsecond=0)
-    if current.tzinfo is None:
-        current = current.replace(tzinfo=UTC)
-    else:
-        current = current.astimezone(UTC)
-    return current.strftime("%Y%m%d%H%M")
+    return utc_minute(dt).strftime("%Y%m%d%H%M")
+
+
+def parse_cron_minute_ref(ref: str) -> datetime | None:
+    """Inverse of cron_minute_ref; None for anything else."""
+    try:
+        return datetime.strptime(str(ref or "").strip(), "%Y%m%d%H%M").replace(tzinfo=UTC)
+    except ValueError:
+        return None
@@ -0,0 +1,428 @@
+from __future__ import annotations
+
+import heapq
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any, Callable
+
+from app.eventlog.core import ensure_event_tenant_index
+
+from .cron import utc_minute
+from .rule_index import RuleIndex, get_rule_index
+from .runner import (
+    EVENTLOG_SOURCE,
+    LoopGuardError,
+    _connect,
+    _list_tenants_with_cron_rules,
+    _resolve_db_path,
+    next_cron_fire_for_tenant,
+    process_events_for_tenant,
+    run_due_cron_for_tenant,
+)
+from .store import list_state_cursors
+
+AUTOMATION_WORKERS = max(1, int(os.environ.get("KUKANILEA_AUTOMATION_WORKERS", "4")))
+AUTOMATION_TICK_SECONDS = max(
+    0.5, float(os.environ.get("KUKANILEA_AUTOMATION_TICK_SECONDS", "2"))
+)
+# Tenants with cron rules (and their schedules) are re-read this often.
+AUTOMATION_CRON_REFRESH_SECONDS = max(
+    10, int(os.environ.get("KUKANILEA_AUTOMATION_CRON_REFRESH_SECONDS", "60"))
+)
+# A tenant whose drain failed is retried after tick * 2^(failures - 1),
+# capped at this many seconds.
+AUTOMATION_RETRY_MAX_SECONDS = max(
+    1, int(os.environ.get("KUKANILEA_AUTOMATION_RETRY_MAX_SECONDS", "300"))
+)
+_EVENT_PAGE = 200
+
+
+def _index_next_fire(index: RuleIndex, after: datetime) -> datetime | None:
+    fires = [
+        fire
+        for rule in index.cron_rules
+        for _expr, schedule in rule.cron_triggers
+        if schedule is not None
+        for fire in (schedule.next_fire_after(after),)
+        if fire is not None
+    ]
+    return min(fires) if fires else None
+
+
+class AutomationDispatcher:
+    """
+    Runs event and cron automation for all tenants of one database.
+
+    Each tick reads the event log once: only the (tenant_id, max id) of rows
+    appended since the last tick, via idx_events_tenant. Tenants with new
+    events are queued and drained on a bounded worker pool. A tenant is never
+    processed by two workers at once; events arriving while it runs re-queue
+    it. A drain that fails (loop guard, rule error) keeps the tenant queued
+    and retries it with exponential backoff; its own persisted cursor, not
+    the global one, decides which events are left. Cron rules are not matched every minute. Each tenant's next fire time
+    sits in a min-heap and only due tenants are run.
+
+    status() reports event lag, queue depth and per-rule latency.
+    """
+
+    def __init__(
+        self,
+        *,
+        db_path: Path,
+        workers: int | None = None,
+        tick_seconds: float | None = None,
+        cron_refresh_seconds: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        now: Callable[[], datetime] = lambda: datetime.now(UTC),
+    ) -> None:
+        self.db_path = Path(db_path)
+        self.workers = max(1, int(workers or AUTOMATION_WORKERS))
+        self.tick_seconds = float(tick_seconds or AUTOMATION_TICK_SECONDS)
+        self.cron_refresh_seconds = float(cron_refresh_seconds or AUTOMATION_CRON_REFRESH_SECONDS)
+        self._clock = clock
+        self._now = now
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._pool: ThreadPoolExecutor | None = None
+        self._futures: set[Future] = set()
+        # Highest event id handed out; None until the startup catch-up ran.
+        self._cursor: int | None = None
+        # tenant -> (events queued, clock time the oldest of them was queued)
+        self._queued: dict[str, tuple[int, float]] = {}
+        self._inflight: dict[str, float] = {}
+        # tenant -> (consecutive failed drains, clock time of the next retry)
+        self._backoff: dict[str, tuple[int, float]] = {}
+        # (fire minute, tenant, generation); stale generations are skipped.
+        self._cron_heap: list[tuple[datetime, str, int]] = []
+        self._cron_tenants: dict[str, tuple[RuleIndex, int]] = {}
+        self._cron_refreshed = float("-inf")
+        self._rule_latency: dict[str, list[float]] = {}
+        self._counters = {
+            "ticks": 0,
+            "events_dispatched": 0,
+            "tenant_runs": 0,
+            "tenant_failures": 0,
+            "cron_runs": 0,
+            "loop_guard": 0,
+        }
+
+    # -- lifecycle -------------------------------------------------------
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="automation-dispatcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def is_alive(self) -> bool:
+        return bool(self._thread and self._thread.is_alive())
+
+    def notify(self, tenant_id: str = "") -> None:
+        """Wakes the dispatcher early (e.g. after a mail sync wrote events)."""
+        self._wake.set()
+
+    def wait_idle(self, timeout: float | None = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                pending = [f for f in self._futures if not f.done()]
+            if not pending:
+                return True
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            wait(pending, timeout=remaining)
+
+    # -- events ----------------------------------------------------------
+    def _read_new_events(self) -> dict[str, tuple[int, int]]:
+        """New events per tenant since the last tick as {tenant: (count, max id)}."""
+        con = _connect(self.db_path)
+        try:
+            if ensure_event_tenant_index(con):
+                con.commit()
+            if self._cursor is None:
+                # Startup: every tenant whose own cursor lags behind its events.
+                cursors = list_state_cursors(source=EVENTLOG_SOURCE, db_path=self.db_path)
+                rows = con.execute(
+                    """
+                    SELECT tenant_id, COUNT(*) AS n, MAX(id) AS last_id
+                    FROM events WHERE tenant_id <> '' GROUP BY tenant_id
+                    """
+                ).fetchall()
+                head = con.execute("SELECT COALESCE(MAX(id), 0) FROM events").fetchone()[0]
+                self._cursor = int(head)
+                out = {}
+                for row in rows:
+                    raw = cursors.get(str(row["tenant_id"]), "")
+                    if int(row["last_id"]) > (int(raw) if raw.isdigit() else 0):
+                        out[str(row["tenant_id"])] = (int(row["n"]), int(row["last_id"]))
+                return out
+            rows = con.execute(
+                """
+                SELECT tenant_id, COUNT(*) AS n, MAX(id) AS last_id
+                FROM events WHERE id > ? GROUP BY tenant_id
+                """,
+                (self._cursor,),
+            ).fetchall()
+        except sqlite3.OperationalError:
+            return {}
+        finally:
+            con.close()
+        out = {}
+        for row in rows:
+            self._cursor = max(self._cursor, int(row["last_id"]))
+            if str(row["tenant_id"] or ""):
+                out[str(row["tenant_id"])] = (int(row["n"]), int(row["last_id"]))
+        return out
+
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> None:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="automation"
+            )
+        future = self._pool.submit(fn, *args)
+        with self._lock:
+            self._futures = {f for f in self._futures if not f.done()}
+            self._futures.add(future)
+
+    def _queue_tenant(self, tenant_id: str, events: int) -> None:
+        now = self._clock()
+        with self._lock:
+            count, since = self._queued.get(tenant_id, (0, now))
+            self._queued[tenant_id] = (count + events, since)
+            _failures, retry_at = self._backoff.get(tenant_id, (0, now))
+            start = tenant_id not in self._inflight and retry_at <= now
+            if start:
+                self._inflight[tenant_id] = now
+        if start:
+            self._submit(self._drain_tenant, tenant_id)
+
+    def _drain_tenant(self, tenant_id: str) -> None:
+        while True:
+            with self._lock:
+                if self._queued.pop(tenant_id, None) is None:
+                    self._inflight.pop(tenant_id, None)
+                    return
+            failed = False
+            while not self._stop_event.is_set():
+                try:
+                    result = process_events_for_tenant(
+                        tenant_id,
+                        db_path=self.db_path,
+                        limit=_EVENT_PAGE,
+                        observer=self._observe_rule,
+                    )
+                except LoopGuardError:
+                    self._count("loop_guard")
+                    failed = True
+                    break
+                except Exception:
+                    result = {"ok": False, "reason": "error_transient:dispatcher"}
+                self._count("tenant_runs")
+                if not bool(result.get("ok")):
+                    self._count("tenant_failures")
+                    failed = True
+                    break
+                if int(result.get("processed") or 0) < _EVENT_PAGE:
+                    break
+            if failed:
+                # Events past the tenant's cursor are still unprocessed: keep
+                # it queued and let a later tick retry once the backoff ran out.
+                with self._lock:
+                    failures = self._backoff.get(tenant_id, (0, 0.0))[0] + 1
+                    delay = min(
+                        AUTOMATION_RETRY_MAX_SECONDS,
+                        self.tick_seconds * 2 ** (failures - 1),
+                    )
+                    self._backoff[tenant_id] = (failures, self._clock() + delay)
+                    self._queued.setdefault(tenant_id, (0, self._clock()))
+                    self._inflight.pop(tenant_id, None)
+                return
+            with self._lock:
+                self._backoff.pop(tenant_id, None)
+
+    # -- cron ------------------------------------------------------------
+    def _refresh_cron(self, now_minute: datetime) -> None:
+        tenants = set(_list_tenants_with_cron_rules(self.db_path))
+        for tenant_id in tenants:
+            index = get_rule_index(tenant_id, self.db_path)
+            current = self._cron_tenants.get(tenant_id)
+            if current is not None and current[0] is index:
+                continue
+            generation = (current[1] + 1) if current else 1
+            self._cron_tenants[tenant_id] = (index, generation)
+            # Starts from the tenant's cron cursor: minutes missed while no
+            # dispatcher ran are due right away and replayed by the run.
+            fire = next_cron_fire_for_tenant(tenant_id, db_path=self.db_path, now_dt=now_minute)
+            if fire is not None:
+                heapq.heappush(self._cron_heap, (fire, tenant_id, generation))
+        for tenant_id in list(self._cron_tenants):
+            if tenant_id not in tenants:
+                del self._cron_tenants[tenant_id]
+
+    def _run_cron(self, tenant_id: str, now_minute: datetime) -> None:
+        try:
+            run_due_cron_for_tenant(
+                tenant_id, db_path=self.db_path, now_dt=now_minute, observer=self._observe_rule
+            )
+        except LoopGuardError:
+            self._count("loop_guard")
+        except Exception:
+            self._count("tenant_failures")
+        self._count("cron_runs")
+
+    def _dispatch_cron(self, now_minute: datetime) -> int:
+        due = 0
+        while self._cron_heap and self._cron_heap[0][0] <= now_minute:
+            _fire, tenant_id, generation = heapq.heappop(self._cron_heap)
+            current = self._cron_tenants.get(tenant_id)
+            if current is None or current[1] != generation:
+                continue
+            # The run replays every minute due up to now, so a stalled
+            # dispatcher catches up instead of skipping fires.
+            self._submit(self._run_cron, tenant_id, now_minute)
+            due += 1
+            following = _index_next_fire(current[0], now_minute)
+            if following is not None:
+                heapq.heappush(self._cron_heap, (following, tenant_id, generation))
+        return due
+
+    # -- loop ------------------------------------------------------------
+    def run_once(self) -> dict[str, Any]:
+        """One tick: dispatch new events per tenant and run due cron tenants."""
+        new_events = self._read_new_events()
+        for tenant_id, (count, _last_id) in new_events.items():
+            self._queue_tenant(tenant_id, count)
+        with self._lock:
+            retry = [t for t in self._queued if t not in self._inflight]
+        for tenant_id in retry:
+            self._queue_tenant(tenant_id, 0)
+
+        now_minute = utc_minute(self._now())
+        if self._clock() - self._cron_refreshed >= self.cron_refresh_seconds:
+            self._refresh_cron(now_minute)
+            self._cron_refreshed = self._clock()
+        cron_due = self._dispatch_cron(now_minute)
+
+        events = sum(count for count, _ in new_events.values())
+        with self._lock:
+            self._counters["ticks"] += 1
+            self._counters["events_dispatched"] += events
+        return {"tenants": len(new_events), "events": events, "cron_due": cron_due}
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception:
+                # A broken tick must never kill the dispatcher.
+                pass
+            self._wake.clear()
+            self._wake.wait(self.tick_seconds)
+
+    # -- metrics ---------------------------------------------------------
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def _observe_rule(self, rule_id: str, seconds: float) -> None:
+        with self._lock:
+            stats = self._rule_latency.setdefault(rule_id, [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+    def status(self) -> dict[str, Any]:
+        now = self._clock()
+        with self._lock:
+            out: dict[str, Any] = dict(self._counters)
+            waiting = [since for _count, since in self._queued.values()]
+            waiting.extend(self._inflight.values())
+            out["queue_depth"] = sum(count for count, _ in self._queued.values())
+            out["tenants_queued"] = len(self._queued)
+            out["tenants_running"] = len(self._inflight)
+            out["tenants_backing_off"] = len(self._backoff)
+            out["lag_seconds"] = round(max((now - t for t in waiting), default=0.0), 3)
+            out["rule_latency"] = {
+                rule_id: {
+                    "runs": int(runs),
+                    "avg_ms": round(total * 1000 / runs, 2),
+                    "max_ms": round(peak * 1000, 2),
+                }
+                for rule_id, (runs, total, peak) in self._rule_latency.items()
+            }
+        live = [
+            entry
+            for entry in self._cron_heap
+            if self._cron_tenants.get(entry[1], (None, -1))[1] == entry[2]
+        ]
+        next_fire = min(live)[0] if live else None
+        out["running"] = self.is_alive()
+        out["workers"] = self.workers
+        out["event_cursor"] = self._cursor
+        out["cron_tenants"] = len(self._cron_tenants)
+        out["next_cron_fire"] = next_fire.isoformat().replace("+00:00", "Z") if next_fire else None
+        return out
+
+
+_DISPATCHER: AutomationDispatcher | None = None
+_DISPATCHER_LOCK = threading.Lock()
+
+
+def start_automation_dispatcher(
+    *, db_path: Path | str | None = None, **kwargs: Any
+) -> AutomationDispatcher:
+    global _DISPATCHER
+    with _DISPATCHER_LOCK:
+        if _DISPATCHER is not None and _DISPATCHER.is_alive():
+            return _DISPATCHER
+        dispatcher = AutomationDispatcher(db_path=_resolve_db_path(db_path), **kwargs)
+        dispatcher.start()
+        _DISPATCHER = dispatcher
+        return dispatcher
+
+
+def stop_automation_dispatcher() -> None:
+    global _DISPATCHER
+    with _DISPATCHER_LOCK:
+        if _DISPATCHER is None:
+            return
+        _DISPATCHER.stop()
+        _DISPATCHER = None
+
+
+def running_automation_dispatcher(db_path: Path | str | None = None) -> AutomationDispatcher | None:
+    """The live dispatcher for `db_path` (any database if None), else None."""
+    with _DISPATCHER_LOCK:
+        dispatcher = _DISPATCHER
+    if dispatcher is None or not dispatcher.is_alive():
+        return None
+    if db_path is not None and Path(db_path).resolve() != dispatcher.db_path.resolve():
+        return None
+    return dispatcher
+
+
+def automation_dispatcher_status() -> dict[str, Any]:
+    with _DISPATCHER_LOCK:
+        dispatcher = _DISPATCHER
+    if dispatcher is None:
+        return {"running": False}
+    return dispatcher.status()
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from .cron import CronExpression, compile_cron
+from .store import (
+    list_enabled_rules_with_components,
+    rules_fingerprint,
+    rules_version,
+)
+from .types import AutomationRuleRecord
+
+EVENTLOG_SOURCE = "eventlog"
+CRON_SOURCE = "cron"
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    """An enabled rule with its triggers, conditions and actions pre-parsed."""
+
+    id: str
+    record: AutomationRuleRecord
+    max_executions_per_minute: int
+    event_types: frozenset[str]
+    # (expression, compiled schedule); None for an invalid expression.
+    cron_triggers: tuple[tuple[str, CronExpression | None], ...]
+    # None when a condition is malformed: such a rule never passes.
+    conditions: tuple[Mapping[str, Any], ...] | None
+    action_payloads: tuple[dict[str, Any], ...]
+
+
+@dataclass
+class RuleIndex:
+    """Compiled rules of one tenant, keyed by the event types they listen to."""
+
+    version: int
+    fingerprint: tuple[int, int, str]
+    rules: tuple[CompiledRule, ...] = ()
+    by_event_type: dict[str, tuple[CompiledRule, ...]] = field(default_factory=dict)
+    cron_rules: tuple[CompiledRule, ...] = ()
+
+    def candidates(self, event_type: str) -> tuple[CompiledRule, ...]:
+        return self.by_event_type.get(str(event_type or "").strip(), ())
+
+
+def rule_triggers(rule: Mapping[str, Any], source: str) -> list[dict[str, Any]]:
+    out: list[dict[str, Any]] = []
+    for trigger in rule.get("triggers") or []:
+        if not isinstance(trigger, dict):
+            continue
+        trigger_type = str(trigger.get("type") or "").strip().lower()
+        if trigger_type != source:
+            continue
+        cfg = trigger.get("config")
+        out.append(cfg if isinstance(cfg, dict) else {})
+    return out
+
+
+def trigger_event_types(trigger_cfg: Mapping[str, Any]) -> set[str]:
+    allowed = trigger_cfg.get("allowed_event_types")
+    if not isinstance(allowed, list) or not allowed:
+        return set()
+    return {str(item).strip() for item in allowed if str(item).strip()}
+
+
+def cron_expression(trigger_cfg: Mapping[str, Any]) -> str:
+    return str(trigger_cfg.get("cron") or trigger_cfg.get("expression") or "").strip()
+
+
+def _compile_conditions(rule: Mapping[str, Any]) -> tuple[Mapping[str, Any], ...] | None:
+    conditions = rule.get("conditions") or []
+    if not isinstance(conditions, list):
+        return None
+    out: list[Mapping[str, Any]] = []
+    for condition in conditions:
+        if not isinstance(condition, Mapping):
+            return None
+        cfg = condition.get("config")
+        if not isinstance(cfg, Mapping):
+            return None
+        out.append(cfg)
+    return tuple(out)
+
+
+def compile_rule(rule: AutomationRuleRecord) -> CompiledRule:
+    event_types: set[str] = set()
+    for cfg in rule_triggers(rule, EVENTLOG_SOURCE):
+        event_types |= trigger_event_types(cfg)
+    cron_triggers: list[tuple[str, CronExpression | None]] = []
+    for cfg in rule_triggers(rule, CRON_SOURCE):
+        expr = cron_expression(cfg)
+        try:
+            schedule = compile_cron(expr) if expr else None
+        except ValueError:
+            schedule = None
+        cron_triggers.append((expr, schedule))
+    return CompiledRule(
+        id=str(rule.get("id") or "").strip(),
+        record=rule,
+        max_executions_per_minute=min(int(rule.get("max_executions_per_minute") or 5), 5),
+        event_types=frozenset(event_types),
+        cron_triggers=tuple(cron_triggers),
+        conditions=_compile_conditions(rule),
+        action_payloads=tuple(
+            {"action_type": str(a.get("type") or "").strip(), **(a.get("config") or {})}
+            for a in (rule.get("actions") or [])
+            if isinstance(a, Mapping)
+        ),
+    )
+
+
+def _build_index(
+    tenant_id: str, db_path: Path, version: int, fingerprint: tuple[int, int, str]
+) -> RuleIndex:
+    compiled = tuple(
+        compile_rule(rule)
+        for rule in list_enabled_rules_with_components(tenant_id=tenant_id, db_path=db_path)
+    )
+    by_event_type: dict[str, list[CompiledRule]] = {}
+    for rule in compiled:
+        for event_type in rule.event_types:
+            by_event_type.setdefault(event_type, []).append(rule)
+    return RuleIndex(
+        version=version,
+        fingerprint=fingerprint,
+        rules=compiled,
+        by_event_type={k: tuple(v) for k, v in by_event_type.items()},
+        cron_rules=tuple(rule for rule in compiled if rule.cron_triggers),
+    )
+
+
+_INDEXES: dict[tuple[str, str], RuleIndex] = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def _key(db_path: Path, tenant_id: str) -> tuple[str, str]:
+    try:
+        return str(db_path.resolve()), tenant_id
+    except OSError:
+        return str(db_path), tenant_id
+
+
+def get_rule_index(tenant_id: str, db_path: Path) -> RuleIndex:
+    """
+    Cached compiled index of a tenant's enabled rules.
+
+    Recompiled when the in-process version counter moves (rule written here)
+    or the rule table fingerprint changes (rule written by another process).
+    """
+    key = _key(db_path, tenant_id)
+    version = rules_version(tenant_id=tenant_id, db_path=db_path)
+    fingerprint = rules_fingerprint(tenant_id=tenant_id, db_path=db_path)
+    with _INDEXES_LOCK:
+        cached = _INDEXES.get(key)
+    if cached is not None and cached.version == version and cached.fingerprint == fingerprint:
+        return cached
+    index = _build_index(tenant_id, db_path, version, fingerprint)
+    with _INDEXES_LOCK:
+        _INDEXES[key] = index
+    return index
+
+
+def clear_rule_indexes() -> None:
+    with _INDEXES_LOCK:
+        _INDEXES.clear()
@@ -1,31 +1,37 @@
 from __future__ import annotations
 
 import json
+import os
 import sqlite3
 import threading
 import time
-from collections.abc import Mapping
+from collections.abc import Callable, Mapping
 from datetime import UTC, datetime, timedelta
 from pathlib import Path
 from typing import Any
 
 from app import core as core
+from app.eventlog.core import ensure_event_tenant_index
 
 from .actions import run_rule_actions
 from .conditions import evaluate_conditions
-from .cron import cron_match, cron_minute_ref
+from .cron import CronExpression, cron_minute_ref, parse_cron_minute_ref, utc_minute
+from .rule_index import (
+    CRON_SOURCE,
+    EVENTLOG_SOURCE,
+    CompiledRule,
+    compile_rule,
+    get_rule_index,
+)
 from .store import (
     append_execution_log,
     count_execution_logs_since,
     get_rule,
     get_state_cursor,
-    list_rules,
     update_execution_log,
     upsert_state_cursor,
 )
 
-EVENTLOG_SOURCE = "eventlog"
-CRON_SOURCE = "cron"
 CONTEXT_ALLOWLIST = {
     "event_id",
     "event_type",
@@ -47,6 +53,19 @@ CONTEXT_ALLOWLIST = {
     "cron_expression",
     "scheduled_minute",
 }
+_CONTEXT_FIELDS = sorted(CONTEXT_ALLOWLIST)
+
+# Called with (rule_id, seconds) after each rule that matched.
+RuleObserver = Callable[[str, float], None]
+
+# Missed cron minutes are replayed after downtime up to this far back, and at
+# most this many per tenant run (below the per-minute loop guard of 5).
+CRON_CATCHUP_MINUTES = max(
+    0, int(os.environ.get("KUKANILEA_AUTOMATION_CRON_CATCHUP_MINUTES", "1440"))
+)
+CRON_CATCHUP_MAX_FIRES = max(
+    1, int(os.environ.get("KUKANILEA_AUTOMATION_CRON_CATCHUP_FIRES", "3"))
+)
 
 _CRON_CHECKER_LOCK = threading.Lock()
 _CRON_CHECKER: CronChecker | None = None
@@ -107,20 +126,25 @@ def _now_minus_minutes_rfc3339(minutes: int) -> str:
 def _fetch_events_after_cursor(
     *,
     db_path: Path,
+    tenant_id: str,
     cursor: int,
     limit: int,
 ) -> list[dict[str, Any]]:
+    """One page of the tenant's own events after `cursor` (idx_events_tenant)."""
     con = _connect(db_path)
     try:
+        # Picks up logs written before the tenant_id column or by legacy writers.
+        if ensure_event_tenant_index(con):
+            con.commit()
         rows = con.execute(
             """
             SELECT id, ts, event_type, entity_type, entity_id, payload_json
             FROM events
-            WHERE id > ?
+            WHERE tenant_id=? AND id > ?
             ORDER BY id ASC
             LIMIT ?
             """,
-            (max(0, int(cursor)), max(1, min(int(limit or 200), 1000))),
+            (tenant_id, max(0, int(cursor)), max(1, min(int(limit or 200), 1000))),
         ).fetchall()
         return [dict(row) for row in rows]
     except sqlite3.OperationalError:
@@ -151,121 +175,44 @@ def _fetch_event_by_id(*, db_path: Path, event_id: int) -> dict[str, Any] | None
 def _fetch_latest_tenant_event(
     *, db_path: Path, tenant_id: str
 ) -> dict[str, Any] | None:
-    rows = _fetch_events_after_cursor(db_path=db_path, cursor=0, limit=500)
-    tenant = str(tenant_id or "").strip()
-    for row in reversed(rows):
-        payload = _safe_json_loads(str(row.get("payload_json") or "{}"))
-        if str(payload.get("tenant_id") or "").strip() == tenant:
-            return row
-    return None
-
-
-def _rule_eventlog_triggers(rule: dict[str, Any]) -> list[dict[str, Any]]:
-    triggers = rule.get("triggers") or []
-    out: list[dict[str, Any]] = []
-    for trigger in triggers:
-        if not isinstance(trigger, dict):
-            continue
-        trigger_type = str(trigger.get("type") or "").strip().lower()
-        if trigger_type != EVENTLOG_SOURCE:
-            continue
-        cfg = trigger.get("config")
-        out.append(cfg if isinstance(cfg, dict) else {})
-    return out
-
-
-def _rule_cron_triggers(rule: dict[str, Any]) -> list[dict[str, Any]]:
-    triggers = rule.get("triggers") or []
-    out: list[dict[str, Any]] = []
-    for trigger in triggers:
-        if not isinstance(trigger, dict):
-            continue
-        trigger_type = str(trigger.get("type") or "").strip().lower()
-        if trigger_type != CRON_SOURCE:
-            continue
-        cfg = trigger.get("config")
-        out.append(cfg if isinstance(cfg, dict) else {})
-    return out
-
-
-def _trigger_matches_event(trigger_cfg: dict[str, Any], event_type: str) -> bool:
-    allowed = trigger_cfg.get("allowed_event_types")
-    if not isinstance(allowed, list) or not allowed:
-        return False
-    allowed_set = {str(item).strip() for item in allowed if str(item).strip()}
-    return str(event_type or "").strip() in allowed_set
-
-
-def _cron_expression(trigger_cfg: Mapping[str, Any]) -> str:
-    return str(trigger_cfg.get("cron") or trigger_cfg.get("expression") or "").strip()
-
-
-def _trigger_matches_cron(trigger_cfg: Mapping[str, Any], dt: datetime) -> bool:
-    expr = _cron_expression(trigger_cfg)
-    if not expr:
-        return False
+    con = _connect(db_path)
     try:
-        return bool(cron_match(expr, dt))
-    except ValueError:
-        return False
-
-
-def _load_eventlog_rules(tenant_id: str, db_path: Path) -> list[dict[str, Any]]:
-    out: list[dict[str, Any]] = []
-    summaries = list_rules(tenant_id=tenant_id, db_path=db_path)
-    for summary in summaries:
-        if not bool(summary.get("is_enabled")):
-            continue
-        rid = str(summary.get("id") or "").strip()
-        if not rid:
-            continue
-        full = get_rule(tenant_id=tenant_id, rule_id=rid, db_path=db_path)
-        if not full:
-            continue
-        if _rule_eventlog_triggers(full):
-            out.append(full)
-    return out
-
-
-def _load_cron_rules(tenant_id: str, db_path: Path) -> list[dict[str, Any]]:
-    out: list[dict[str, Any]] = []
-    summaries = list_rules(tenant_id=tenant_id, db_path=db_path)
-    for summary in summaries:
-        if not bool(summary.get("is_enabled")):
-            continue
-        rid = str(summary.get("id") or "").strip()
-        if not rid:
-            continue
-        full = get_rule(tenant_id=tenant_id, rule_id=rid, db_path=db_path)
-        if not full:
-            continue
-        if _rule_cron_triggers(full):
-            out.append(full)
-    return out
+        if ensure_event_tenant_index(con):
+            con.commit()
+        row = con.execute(
+            """
+            SELECT id, ts, event_type, entity_type, entity_id, payload_json
+            FROM events
+            WHERE tenant_id=?
+            ORDER BY id DESC
+            LIMIT 1
+            """,
+            (str(tenant_id or "").strip(),),
+        ).fetchone()
+        return dict(row) if row else None
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        con.close()
 
 
 def _process_rule_for_event(
     *,
     tenant_id: str,
-    rule: dict[str, Any],
+    rule: CompiledRule,
     event_row: dict[str, Any],
     db_path: Path,
 ) -> dict[str, Any]:
-    rule_id = str(rule.get("id") or "").strip()
+    rule_id = rule.id
     event_id = int(event_row.get("id") or 0)
     event_type = str(event_row.get("event_type") or "").strip()
     if not rule_id or event_id <= 0 or not event_type:
         return {"ok": False, "reason": "validation_error"}
 
-    matched = False
-    for trigger_cfg in _rule_eventlog_triggers(rule):
-        if _trigger_matches_event(trigger_cfg, event_type):
-            matched = True
-            break
-    if not matched:
+    if event_type not in rule.event_types:
         return {"ok": True, "matched": False}
 
-    max_execs = min(int(rule.get("max_executions_per_minute") or 5), 5)
+    max_execs = rule.max_executions_per_minute
     recent_count = count_execution_logs_since(
         tenant_id=tenant_id,
         rule_id=rule_id,
@@ -315,15 +262,10 @@ def _process_rule_for_event(
         )
         return {"ok": True, "matched": True, "duplicate": False}
 
-    actions = [a for a in (rule.get("actions") or []) if isinstance(a, Mapping)]
-    action_payloads = [
-        {"action_type": str(a.get("type") or "").strip(), **(a.get("config") or {})}
-        for a in actions
-    ]
     action_result = run_rule_actions(
         tenant_id=tenant_id,
         rule_id=rule_id,
-        actions=action_payloads,
+        actions=[dict(a) for a in rule.action_payloads],
         context=context,
         db_path=db_path,
     )
@@ -380,21 +322,11 @@ def _build_context(
     return context
 
 
-def _rule_conditions_pass(rule: dict[str, Any], context: Mapping[str, Any]) -> bool:
-    conditions = rule.get("conditions") or []
-    if not isinstance(conditions, list):
+def _rule_conditions_pass(rule: CompiledRule, context: Mapping[str, Any]) -> bool:
+    if rule.conditions is None:
         return False
-    if not conditions:
-        return True
-    for condition in conditions:
-        if not isinstance(condition, Mapping):
-            return False
-        cfg = condition.get("config")
-        if not isinstance(cfg, Mapping):
-            return False
-        if not evaluate_conditions(
-            cfg, context, allowed_fields=sorted(CONTEXT_ALLOWLIST)
-        ):
+    for cfg in rule.conditions:
+        if not evaluate_conditions(cfg, context, allowed_fields=_CONTEXT_FIELDS):
             return False
     return True
 
@@ -429,20 +361,20 @@ def _build_cron_context(
 def _process_rule_for_cron(
     *,
     tenant_id: str,
-    rule: dict[str, Any],
-    trigger_cfg: dict[str, Any],
+    rule: CompiledRule,
+    cron_expr: str,
+    schedule: CronExpression | None,
     now_dt: datetime,
     db_path: Path,
 ) -> dict[str, Any]:
-    rule_id = str(rule.get("id") or "").strip()
-    cron_expr = _cron_expression(trigger_cfg)
+    rule_id = rule.id
     if not rule_id or not cron_expr:
         return {"ok": False, "reason": "validation_error"}
-    if not _trigger_matches_cron(trigger_cfg, now_dt):
+    if schedule is None or not schedule.matches(now_dt):
         return {"ok": True, "matched": False}
 
     trigger_ref = f"{CRON_SOURCE}:{rule_id}:{cron_minute_ref(now_dt)}"
-    max_execs = min(int(rule.get("max_executions_per_minute") or 5), 5)
+    max_execs = rule.max_executions_per_minute
     recent_count = count_execution_logs_since(
         tenant_id=tenant_id,
         rule_id=rule_id,
@@ -493,15 +425,10 @@ def _process_rule_for_cron(
         )
         return {"ok": True, "matched": True, "duplicate": False}
 
-    actions = [a for a in (rule.get("actions") or []) if isinstance(a, Mapping)]
-    action_payloads = [
-        {"action_type": str(a.get("type") or "").strip(), **(a.get("config") or {})}
-        for a in actions
-    ]
     action_result = run_rule_actions(
         tenant_id=tenant_id,
         rule_id=rule_id,
-        actions=action_payloads,
+        actions=[dict(a) for a in rule.action_payloads],
         context=context,
         db_path=db_path,
     )
@@ -534,6 +461,7 @@ def process_events_for_tenant(
     db_path: Path | str | None = None,
     limit: int = 200,
     source: str = EVENTLOG_SOURCE,
+    observer: RuleObserver | None = None,
 ) -> dict[str, Any]:
     tenant = str(tenant_id or "").strip()
     if not tenant:
@@ -544,12 +472,14 @@ def process_events_for_tenant(
         raise ValueError("validation_error")
 
     resolved_db = _resolve_db_path(db_path)
-    rules = _load_eventlog_rules(tenant, resolved_db)
+    index = get_rule_index(tenant, resolved_db)
     cursor_raw = get_state_cursor(tenant_id=tenant, source=src, db_path=resolved_db)
     cursor = int(cursor_raw) if cursor_raw.isdigit() else 0
     last_cursor = cursor
 
-    events = _fetch_events_after_cursor(db_path=resolved_db, cursor=cursor, limit=limit)
+    events = _fetch_events_after_cursor(
+        db_path=resolved_db, tenant_id=tenant, cursor=cursor, limit=limit
+    )
     processed = 0
     matched = 0
     duplicates = 0
@@ -558,14 +488,16 @@ def process_events_for_tenant(
         event_id = int(event_row.get("id") or 0)
         if event_id <= 0:
             continue
+        # The tenant_id column is outside the hash chain; the payload decides.
         payload = _safe_json_loads(str(event_row.get("payload_json") or "{}"))
         payload_tenant = str(payload.get("tenant_id") or "").strip()
         if payload_tenant != tenant:
             last_cursor = event_id
             continue
 
-        for rule in rules:
+        for rule in index.candidates(str(event_row.get("event_type") or "")):
             outcome: dict[str, Any] | None = None
+            started = time.perf_counter()
             for attempt in (0, 1):
                 try:
                     outcome = _process_rule_for_event(
@@ -620,6 +552,8 @@ def process_events_for_tenant(
                 matched += 1
                 if bool(outcome.get("duplicate")):
                     duplicates += 1
+                if observer is not None:
+                    observer(rule.id, time.perf_counter() - started)
         processed += 1
         last_cursor = event_id
 
@@ -646,22 +580,25 @@ def process_cron_for_tenant(
     *,
     db_path: Path | str | None = None,
     now_dt: datetime | None = None,
+    observer: RuleObserver | None = None,
 ) -> dict[str, Any]:
     tenant = str(tenant_id or "").strip()
     if not tenant:
         raise ValueError("validation_error")
     resolved_db = _resolve_db_path(db_path)
     current = now_dt or datetime.now(UTC)
-    rules = _load_cron_rules(tenant, resolved_db)
+    index = get_rule_index(tenant, resolved_db)
     processed = 0
     matched = 0
     duplicates = 0
-    for rule in rules:
-        for trigger_cfg in _rule_cron_triggers(rule):
+    for rule in index.cron_rules:
+        for cron_expr, schedule in rule.cron_triggers:
+            started = time.perf_counter()
             outcome = _process_rule_for_cron(
                 tenant_id=tenant,
                 rule=rule,
-                trigger_cfg=trigger_cfg,
+                cron_expr=cron_expr,
+                schedule=schedule,
                 now_dt=current,
                 db_path=resolved_db,
             )
@@ -678,6 +615,8 @@ def process_cron_for_tenant(
                 matched += 1
                 if bool(outcome.get("duplicate")):
                     duplicates += 1
+                if observer is not None:
+                    observer(rule.id, time.perf_counter() - started)
     return {
         "ok": True,
         "reason": "ok",
@@ -687,6 +626,88 @@ def process_cron_for_tenant(
     }
 
 
+def _cron_handled_until(tenant_id: str, *, db_path: Path, now_minute: datetime) -> datetime:
+    """Last minute whose cron fires already ran for the tenant (catch-up bounded)."""
+    cursor = parse_cron_minute_ref(
+        get_state_cursor(tenant_id=tenant_id, source=CRON_SOURCE, db_path=db_path)
+    )
+    earliest = now_minute - timedelta(minutes=CRON_CATCHUP_MINUTES + 1)
+    if cursor is None:
+        return now_minute - timedelta(minutes=1)
+    return min(max(cursor, earliest), now_minute)
+
+
+def next_cron_fire_for_tenant(
+    tenant_id: str,
+    *,
+    db_path: Path | str | None = None,
+    now_dt: datetime | None = None,
+) -> datetime | None:
+    """Earliest cron fire of the tenant that has not run yet (may be overdue)."""
+    tenant = str(tenant_id or "").strip()
+    if not tenant:
+        raise ValueError("validation_error")
+    resolved_db = _resolve_db_path(db_path)
+    now_minute = utc_minute(now_dt or datetime.now(UTC))
+    after = _cron_handled_until(tenant, db_path=resolved_db, now_minute=now_minute)
+    fires = [
+        fire
+        for rule in get_rule_index(tenant, resolved_db).cron_rules
+        for _expr, schedule in rule.cron_triggers
+        if schedule is not None
+        for fire in (schedule.next_fire_after(after),)
+        if fire is not None
+    ]
+    return min(fires) if fires else None
+
+
+def run_due_cron_for_tenant(
+    tenant_id: str,
+    *,
+    db_path: Path | str | None = None,
+    now_dt: datetime | None = None,
+    observer: RuleObserver | None = None,
+) -> dict[str, Any]:
+    """
+    Runs every cron minute of the tenant due since its cron cursor, up to now.
+
+    Minutes missed while no scheduler ran are replayed oldest first (bounded
+    by CRON_CATCHUP_MINUTES / CRON_CATCHUP_MAX_FIRES). The cursor advances
+    after each replayed minute, so a failure resumes where it stopped.
+    """
+    tenant = str(tenant_id or "").strip()
+    if not tenant:
+        raise ValueError("validation_error")
+    resolved_db = _resolve_db_path(db_path)
+    now_minute = utc_minute(now_dt or datetime.now(UTC))
+    after = _cron_handled_until(tenant, db_path=resolved_db, now_minute=now_minute)
+    due = sorted(
+        {
+            fire
+            for rule in get_rule_index(tenant, resolved_db).cron_rules
+            for _expr, schedule in rule.cron_triggers
+            if schedule is not None
+            for fire in schedule.fires_between(after, now_minute)
+        }
+    )[-CRON_CATCHUP_MAX_FIRES:]
+    totals = {"processed": 0, "matched": 0, "duplicates": 0}
+    for fire in due:
+        result = process_cron_for_tenant(
+            tenant, db_path=resolved_db, now_dt=fire, observer=observer
+        )
+        if not bool(result.get("ok")):
+            return {**result, "fires": [cron_minute_ref(f) for f in due]}
+        for key in totals:
+            totals[key] += int(result.get(key) or 0)
+        upsert_state_cursor(
+            tenant_id=tenant, source=CRON_SOURCE, cursor=cron_minute_ref(fire), db_path=resolved_db
+        )
+    upsert_state_cursor(
+        tenant_id=tenant, source=CRON_SOURCE, cursor=cron_minute_ref(now_minute), db_path=resolved_db
+    )
+    return {"ok": True, "reason": "ok", "fires": [cron_minute_ref(f) for f in due], **totals}
+
+
 def _list_tenants_with_cron_rules(db_path: Path) -> list[str]:
     con = _connect(db_path)
     try:
@@ -714,15 +735,23 @@ def _list_tenants_with_cron_rules(db_path: Path) -> list[str]:
 
 
 class CronChecker(threading.Thread):
+    """
+    Runs due cron rules of all tenants.
+
+    Sleeps until the earliest next fire instead of polling every minute;
+    `interval_seconds` only caps the sleep so rules changed by another
+    process are picked up.
+    """
+
     def __init__(
         self,
         *,
         db_path: Path,
-        interval_seconds: int = 60,
+        interval_seconds: int = 300,
     ) -> None:
         super().__init__(name="automation-cron-checker", daemon=True)
         self._db_path = db_path
-        self._interval_seconds = max(10, int(interval_seconds or 60))
+        self._interval_seconds = max(10, int(interval_seconds or 300))
         self._stop_event = threading.Event()
 
     def stop(self) -> None:
@@ -730,23 +759,28 @@ class CronChecker(threading.Thread):
 
     def run(self) -> None:  # pragma: no cover - thread behavior
         while not self._stop_event.is_set():
-            tick = datetime.now(UTC).replace(second=0, microsecond=0)
+            now = datetime.now(UTC)
+            fires: list[datetime] = []
             for tenant_id in _list_tenants_with_cron_rules(self._db_path):
                 try:
-                    process_cron_for_tenant(
-                        tenant_id,
-                        db_path=self._db_path,
-                        now_dt=tick,
+                    run_due_cron_for_tenant(tenant_id, db_path=self._db_path, now_dt=now)
+                    upcoming = next_cron_fire_for_tenant(
+                        tenant_id, db_path=self._db_path, now_dt=now
                     )
                 except Exception:
                     continue
-            self._stop_event.wait(self._interval_seconds)
+                if upcoming is not None:
+                    fires.append(upcoming)
+            delay = float(self._interval_seconds)
+            if fires:
+                delay = min(delay, (min(fires) - datetime.now(UTC)).total_seconds())
+            self._stop_event.wait(max(1.0, delay))
 
 
 def start_cron_checker(
     *,
     db_path: Path | str | None = None,
-    interval_seconds: int = 60,
+    interval_seconds: int = 300,
 ) -> CronChecker:
     global _CRON_CHECKER
     resolved = _resolve_db_path(db_path)
@@ -781,9 +815,10 @@ def simulate_rule_for_tenant(
         raise ValueError("validation_error")
 
     resolved_db = _resolve_db_path(db_path)
-    rule = get_rule(tenant_id=tenant, rule_id=rid, db_path=resolved_db)
-    if not rule:
+    record = get_rule(tenant_id=tenant, rule_id=rid, db_path=resolved_db)
+    if not record:
         return {"ok": False, "reason": "not_found"}
+    rule = compile_rule(record)
 
     row = (
         _fetch_event_by_id(db_path=resolved_db, event_id=int(event_id))
@@ -798,22 +833,15 @@ def simulate_rule_for_tenant(
         return {"ok": False, "reason": "event_not_found"}
 
     ev_type = str(row.get("event_type") or "").strip()
-    matched = any(
-        _trigger_matches_event(cfg, ev_type) for cfg in _rule_eventlog_triggers(rule)
-    )
+    matched = ev_type in rule.event_types
     trigger_ref = f"simulation:eventlog:{int(row.get('id') or 0)}"
     context = _build_context(tenant_id=tenant, event_row=row, trigger_ref=trigger_ref)
     cond_ok = matched and _rule_conditions_pass(rule, context)
-    actions_payload = [
-        {"action_type": str(a.get("type") or "").strip(), **(a.get("config") or {})}
-        for a in (rule.get("actions") or [])
-        if isinstance(a, Mapping)
-    ]
     action_result = (
         run_rule_actions(
             tenant_id=tenant,
             rule_id=rid,
-            actions=actions_payload,
+            actions=[dict(a) for a in rule.action_payloads],
             context=context,
             db_path=resolved_db,
             dry_run=True,
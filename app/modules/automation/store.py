@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import json
 import sqlite3
+import threading
 import uuid
 from collections.abc import Mapping, Sequence
 from datetime import UTC, datetime
@@ -50,6 +51,11 @@ EXECUTION_STATUS_ALLOWLIST = {
 }
 PENDING_STATUS_ALLOWLIST = {"pending", "confirmed", "failed", "executing"}
 
+# In-process rule-set version per (db, tenant), bumped by every rule write so
+# compiled rule indexes (rule_index.py) know when to recompile.
+_RULES_VERSIONS: dict[tuple[str, str], int] = {}
+_RULES_VERSIONS_LOCK = threading.Lock()
+
 
 def _now_rfc3339() -> str:
     return datetime.now(UTC).replace(microsecond=0).isoformat().replace("+00:00", "Z")
@@ -91,6 +97,25 @@ def _ensure_column(con: sqlite3.Connection, table_name: str, column_def: str) ->
     _execute_sql(con, f"ALTER TABLE {table_name} ADD COLUMN {column_def}")
 
 
+def _db_key(path: Path) -> str:
+    try:
+        return str(path.resolve())
+    except OSError:
+        return str(path)
+
+
+def _bump_rules_version(path: Path, tenant_id: str) -> None:
+    key = (_db_key(path), tenant_id)
+    with _RULES_VERSIONS_LOCK:
+        _RULES_VERSIONS[key] = _RULES_VERSIONS.get(key, 0) + 1
+
+
+def rules_version(*, tenant_id: str, db_path: Path | str | None = None) -> int:
+    key = (_db_key(_resolve_db_path(db_path)), _norm_tenant(tenant_id))
+    with _RULES_VERSIONS_LOCK:
+        return _RULES_VERSIONS.get(key, 0)
+
+
 def _norm_tenant(tenant_id: str) -> str:
     tenant = str(tenant_id or "").strip()
     if not tenant:
@@ -500,6 +525,7 @@ def create_rule(
         con.commit()
     finally:
         con.close()
+    _bump_rules_version(path, tenant)
 
     _event(
         event_type="automation.rule.created",
@@ -633,6 +659,111 @@ def list_rules(
         con.close()
 
 
+def rules_fingerprint(
+    *, tenant_id: str, db_path: Path | str | None = None
+) -> tuple[int, int, str]:
+    """Cheap (count, version sum, last update) summary of a tenant's rules.
+
+    Catches rule writes made by other processes, which the in-process
+    version counter cannot see.
+    """
+    tenant = _norm_tenant(tenant_id)
+    path = _resolve_db_path(db_path)
+    con = _connect(path)
+    try:
+        row = _execute_sql(con,
+            f"""
+            SELECT COUNT(1) AS n, COALESCE(SUM(version), 0) AS versions,
+                   COALESCE(MAX(updated_at), '') AS updated_at
+            FROM {RULE_TABLE}
+            WHERE tenant_id=?
+            """,
+            (tenant,),
+        ).fetchone()
+        return int(row["n"] or 0), int(row["versions"] or 0), str(row["updated_at"] or "")
+    except sqlite3.OperationalError:
+        return 0, 0, ""
+    finally:
+        con.close()
+
+
+def list_enabled_rules_with_components(
+    *, tenant_id: str, db_path: Path | str | None = None
+) -> list[AutomationRuleRecord]:
+    """All enabled rules of a tenant with their children, in list_rules order.
+
+    Four queries in total instead of one get_rule round-trip per rule.
+    """
+    tenant = _norm_tenant(tenant_id)
+    ensure_automation_schema(db_path)
+    path = _resolve_db_path(db_path)
+    con = _connect(path)
+    try:
+        rows = _execute_sql(con,
+            f"""
+            SELECT
+              id, tenant_id, name, description, is_enabled,
+              max_executions_per_minute, created_at, updated_at, version
+            FROM {RULE_TABLE}
+            WHERE tenant_id=? AND is_enabled=1
+            ORDER BY updated_at DESC, id DESC
+            """,
+            (tenant,),
+        ).fetchall()
+        rules: dict[str, AutomationRuleRecord] = {}
+        for row in rows:
+            rules[str(row["id"])] = {
+                "id": str(row["id"]),
+                "tenant_id": str(row["tenant_id"]),
+                "name": str(row["name"]),
+                "description": str(row["description"] or ""),
+                "is_enabled": True,
+                "max_executions_per_minute": int(
+                    row["max_executions_per_minute"] or RULE_MAX_EXECUTIONS_DEFAULT
+                ),
+                "version": int(row["version"] or 1),
+                "created_at": str(row["created_at"] or ""),
+                "updated_at": str(row["updated_at"] or ""),
+                "triggers": [],
+                "conditions": [],
+                "actions": [],
+            }
+        if not rules:
+            return []
+        for key, table_name, kind_column in (
+            ("triggers", TRIGGER_TABLE, "trigger_type"),
+            ("conditions", CONDITION_TABLE, "condition_type"),
+            ("actions", ACTION_TABLE, "action_type"),
+        ):
+            children = _execute_sql(con,
+                f"""
+                SELECT id, tenant_id, rule_id, {kind_column} AS component_type, config_json, created_at, updated_at
+                FROM {table_name}
+                WHERE tenant_id=?
+                ORDER BY created_at ASC, id ASC
+                """,
+                (tenant,),
+            ).fetchall()
+            for row in children:
+                rule = rules.get(str(row["rule_id"]))
+                if rule is None:
+                    continue
+                rule[key].append(
+                    {
+                        "id": str(row["id"]),
+                        "tenant_id": str(row["tenant_id"]),
+                        "rule_id": str(row["rule_id"]),
+                        "type": str(row["component_type"]),
+                        "config": json.loads(str(row["config_json"] or "{}")),
+                        "created_at": str(row["created_at"] or ""),
+                        "updated_at": str(row["updated_at"] or ""),
+                    }
+                )
+        return list(rules.values())
+    finally:
+        con.close()
+
+
 def update_rule(
     *,
     tenant_id: str,
@@ -767,6 +898,7 @@ def update_rule(
         con.commit()
     finally:
         con.close()
+    _bump_rules_version(path, tenant)
 
     updated = get_rule(tenant_id=tenant, rule_id=rid, db_path=path)
     if updated is None:
@@ -809,6 +941,8 @@ def delete_rule(
         con.commit()
     finally:
         con.close()
+    if deleted:
+        _bump_rules_version(path, tenant)
 
     if deleted:
         _event(
@@ -842,6 +976,26 @@ def get_state_cursor(
         con.close()
 
 
+def list_state_cursors(
+    *, source: str, db_path: Path | str | None = None
+) -> dict[str, str]:
+    """Cursor of every tenant for one source, e.g. for a multi-tenant dispatcher."""
+    src = str(source or "").strip()
+    if not src:
+        raise ValueError("validation_error")
+    ensure_automation_schema(db_path)
+    path = _resolve_db_path(db_path)
+    con = _connect(path)
+    try:
+        rows = _execute_sql(con,
+            f"SELECT tenant_id, cursor FROM {STATE_TABLE} WHERE source=?",
+            (src,),
+        ).fetchall()
+        return {str(row["tenant_id"]): str(row["cursor"] or "") for row in rows}
+    finally:
+        con.close()
+
+
 def upsert_state_cursor(
     *,
     tenant_id: str,
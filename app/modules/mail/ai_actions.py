@@ -69,7 +69,9 @@ def email_summarize_thread_action(payload: dict[str, Any]) -> dict[str, Any]:
     if not thread_id:
         return _safe_error("thread_id_required")
     try:
-        thread = postfach_get_thread(_db_path(), tenant_id=tenant_id, thread_id=thread_id)
+        thread = postfach_get_thread(
+            _db_path(), tenant_id=tenant_id, thread_id=thread_id, mark_read=True
+        )
         if not thread:
             return _safe_error("thread_not_found")
         messages = thread.get("messages") if isinstance(thread.get("messages"), list) else []
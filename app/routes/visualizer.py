@@ -2,7 +2,7 @@ from __future__ import annotations
 import itertools
 import logging
 from pathlib import Path
-from flask import Blueprint, current_app, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request, url_for
 
 from app.auth import login_required, current_tenant, current_user
 from app.web import _unb64, _is_allowed_path, _b64
@@ -24,6 +24,8 @@ def _core_get(name: str, default=None):
 list_pending = _core_get("list_pending")
 list_recent_docs = _core_get("list_recent_docs")
 build_visualizer_payload = _core_get("build_visualizer_payload")
+render_visualizer_page = _core_get("render_visualizer_page")
+visualizer_page_key = _core_get("visualizer_page_key")
 EINGANG = _core_get("EINGANG")
 BASE_PATH = _core_get("BASE_PATH")
 PENDING_DIR = _core_get("PENDING_DIR")
@@ -161,12 +163,61 @@ def api_visualizer_render():
         
         payload = build_visualizer_payload(fp, page=page, sheet=sheet, force_ocr=force_ocr)
         payload["source"] = src_b64
+        page_info = payload.get("page")
+        if isinstance(page_info, dict) and page_info.get("image_key"):
+            page_info["image_url"] = url_for(
+                "visualizer.api_visualizer_page",
+                source=src_b64,
+                page=int(page_info.get("index") or 0),
+                v=page_info["image_key"],
+            )
         return jsonify(payload)
     except Exception as e:
         logger.exception("Visualizer render failed")
         return jsonify(error="render_failed", message=str(e)), 500
 
 
+@bp.get("/api/visualizer/page")
+@login_required
+def api_visualizer_page():
+    """Binary PNG of one PDF page (render cache + ETag/304)."""
+    src_b64 = request.args.get("source", "")
+    if not src_b64:
+        return jsonify(error="missing_source"), 400
+    try:
+        raw_path = _unb64(src_b64)
+    except Exception:
+        return jsonify(error="invalid_source"), 400
+
+    fp = Path(raw_path)
+    if not fp.exists():
+        return jsonify(error="file_not_found"), 404
+    if not _is_allowed_path(fp):
+        return jsonify(error="forbidden_path"), 403
+    if not _is_tenant_visualizer_path(fp, current_tenant() or "default"):
+        return jsonify(error="forbidden_tenant_path"), 403
+    if not callable(render_visualizer_page) or not callable(visualizer_page_key):
+        return jsonify(error="visualizer_logic_missing"), 503
+
+    try:
+        page = int(request.args.get("page", "0") or "0")
+        dpi = int(request.args.get("dpi", "0") or "0") or None
+        etag = visualizer_page_key(fp, page=page, dpi=dpi)
+        if etag in request.if_none_match:
+            resp = Response(status=304)
+        else:
+            png, etag = render_visualizer_page(fp, page=page, dpi=dpi)
+            resp = Response(png, mimetype="image/png")
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "private, max-age=86400"
+        return resp
+    except ValueError as e:
+        return jsonify(error=str(e)), 415
+    except Exception as e:
+        logger.exception("Visualizer page render failed")
+        return jsonify(error="render_failed", message=str(e)), 500
+
+
 @bp.get("/api/visualizer/projects")
 @login_required
 def api_visualizer_projects():
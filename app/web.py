@@ -174,6 +174,7 @@ analyze_to_pending = _core_get("analyze_to_pending") or _core_get(
     "start_background_analysis"
 )
 read_pending = _core_get("read_pending")
+read_pending_progress = _core_get("read_pending_progress") or read_pending
 write_pending = _core_get("write_pending")
 delete_pending = _core_get("delete_pending")
 list_pending = _core_get("list_pending")
@@ -3072,7 +3073,7 @@ def api_progress_multi():
     results = {}
     for t in tokens:
         if not t: continue
-        p = read_pending(t)
+        p = read_pending_progress(t)
         if p:
             results[t] = {
                 "status": p.get("status", "ANALYZING"),
@@ -3088,7 +3089,7 @@ def api_progress_multi():
 def api_progress(token: str):
     if (not current_user()) and (request.remote_addr not in ("127.0.0.1", "::1")):
         return jsonify(error="unauthorized"), 401
-    p = read_pending(token)
+    p = read_pending_progress(token)
     if not p:
         return jsonify(error="not_found"), 404
     return jsonify(
@@ -5652,6 +5653,21 @@ def admin_audit_verify():
         return f'<div class="badge" style="background:rgba(239,68,68,0.1); color:var(--color-danger); border-color:rgba(239,68,68,0.2);">CHAIN MANIPULIERT ({len(errors)} FEHLER)</div>'
 
 
+@bp.get("/admin/audit/verify/stats")
+@login_required
+@require_role(["DEV", "ADMIN"])
+def admin_audit_verify_stats():
+    """Verifies event log and evidence vault; reports rows checked and throughput."""
+    from app.core.audit import vault
+    from app.eventlog import event_verify_report
+
+    full = request.args.get("full") in ("1", "true", "yes")
+    eventlog = event_verify_report(full=full)
+    evidence = vault.verify_report(full=full)
+    evidence["errors"] = evidence["errors"][:50]
+    return jsonify(ok=bool(eventlog["ok"] and evidence["ok"]), eventlog=eventlog, vault=evidence)
+
+
 @bp.route("/time")
 @login_required
 def time_tracking():
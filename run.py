@@ -10,6 +10,7 @@ Usage:
   python run.py maintenance
   python run.py audit
   python run.py chaos
+  python run.py mail-reindex
 """
 
 import argparse
@@ -104,6 +105,18 @@ def run_chaos_monkey():
         sys.exit(1)
 
 
+def run_mail_reindex():
+    """Rebuilds the Postfach full-text search index from stored messages."""
+    from app.config import Config
+    from app.mail.postfach_store import rebuild_message_search_index
+
+    result = rebuild_message_search_index(Config.CORE_DB)
+    if not result.get("ok"):
+        print(f"❌ Mail search index unavailable: {result.get('reason')}")
+        sys.exit(1)
+    print(f"📬 Mail search index rebuilt ({result['indexed']} messages).")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="KUKANILEA Systems - Central Control Unit",
@@ -129,6 +142,11 @@ def main():
     # Command: chaos
     subparsers.add_parser("chaos", help="Run chaos & resilience tests")
 
+    # Command: mail-reindex
+    subparsers.add_parser(
+        "mail-reindex", help="Rebuild the Postfach full-text search index"
+    )
+
     args = parser.parse_args()
 
     # Default to server if no command provided (useful for bundled apps)
@@ -146,6 +164,8 @@ def main():
             run_security_audit()
         elif args.command == "chaos":
             run_chaos_monkey()
+        elif args.command == "mail-reindex":
+            run_mail_reindex()
         else:
             parser.print_help()
     except subprocess.CalledProcessError as e:
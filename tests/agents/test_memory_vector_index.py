@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import random
+import sqlite3
+import struct
+from unittest.mock import patch
+
+import pytest
+
+from app.agents import vector_index
+from app.agents.memory_store import MemoryManager
+
+np = pytest.importorskip("numpy")
+
+
+def _setup_db(db_path: str) -> None:
+    con = sqlite3.connect(db_path)
+    con.execute(
+        """
+        CREATE TABLE agent_memory(
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          tenant_id TEXT NOT NULL,
+          timestamp TEXT NOT NULL,
+          agent_role TEXT NOT NULL,
+          content TEXT NOT NULL,
+          embedding BLOB NOT NULL,
+          metadata TEXT,
+          importance_score INTEGER DEFAULT 5,
+          category TEXT DEFAULT 'FAKT'
+        )
+        """
+    )
+    con.commit()
+    con.close()
+
+
+def _insert_raw(db_path: str, tenant_id: str, content: str, vec: list[float]) -> None:
+    con = sqlite3.connect(db_path)
+    con.execute(
+        "INSERT INTO agent_memory(tenant_id, timestamp, agent_role, content, embedding, metadata) VALUES (?,?,?,?,?,?)",
+        (tenant_id, "2024-01-01T00:00:00Z", "system", content, struct.pack(f"{len(vec)}f", *vec), "{}"),
+    )
+    con.commit()
+    con.close()
+
+
+@pytest.fixture()
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(vector_index, "_INDEXES", {})
+    db_path = str(tmp_path / "auth.sqlite3")
+    _setup_db(db_path)
+    return MemoryManager(db_path)
+
+
+def test_indexed_search_matches_full_scan(manager):
+    rng = random.Random(7)
+    vectors = {f"memory {i}": [rng.uniform(-1, 1) for _ in range(8)] for i in range(300)}
+    for content, vec in vectors.items():
+        _insert_raw(manager.db_path, "TENANT_A", content, vec)
+    _insert_raw(manager.db_path, "TENANT_B", "other tenant", [1.0] * 8)
+    query = [rng.uniform(-1, 1) for _ in range(8)]
+
+    with patch("app.agents.memory_store.generate_embedding", return_value=query):
+        indexed = manager.retrieve_context("TENANT_A", "frage", limit=5)
+        scanned = manager._retrieve_scanned_context("TENANT_A", query, 5)
+
+    assert [h["content"] for h in indexed] == [h["content"] for h in scanned]
+    assert [round(h["score"], 5) for h in indexed] == [round(h["score"], 5) for h in scanned]
+
+
+def test_index_is_updated_incrementally_and_persisted(manager, monkeypatch):
+    monkeypatch.setattr(vector_index, "SNAPSHOT_MIN_ROWS", 2)
+    embeddings = {"Zahlungsfrist": [1.0, 0.0, 0.0], "Lieferzeit": [0.0, 1.0, 0.0]}
+
+    def _embed(text):
+        for key, vec in embeddings.items():
+            if key in text:
+                return vec
+        return [0.0, 0.0, 1.0]
+
+    with patch("app.agents.memory_store.generate_embedding", side_effect=_embed):
+        manager.store_memory("TENANT_A", "system", "Die Zahlungsfrist beträgt 14 Tage.")
+        assert manager.retrieve_context("TENANT_A", "Zahlungsfrist", limit=1)[0]["score"] > 0.99
+
+        manager.store_memory("TENANT_A", "system", "Die Lieferzeit beträgt 5 Tage.")
+        _insert_raw(manager.db_path, "TENANT_A", "Sonstiges", [0.0, 0.0, 1.0])
+        hits = manager.retrieve_context("TENANT_A", "Lieferzeit", limit=3)
+        assert [h["content"] for h in hits][0] == "Die Lieferzeit beträgt 5 Tage."
+        assert len(hits) == 3
+
+        index = vector_index.get_index(manager.db_path, "TENANT_A", 3)
+        assert (index.directory / "vectors.npy").exists()
+
+        # A fresh process loads the snapshot instead of decoding every row.
+        monkeypatch.setattr(vector_index, "_INDEXES", {})
+        reloaded = vector_index.get_index(manager.db_path, "TENANT_A", 3)
+        with sqlite3.connect(manager.db_path) as con:
+            assert reloaded.search(con, [0.0, 0.0, 1.0], 1)[0][1] > 0.99
+        assert isinstance(reloaded._base, np.memmap)
+
+
+def test_deleted_rows_trigger_rebuild(manager):
+    _insert_raw(manager.db_path, "TENANT_A", "alt", [1.0, 0.0])
+    _insert_raw(manager.db_path, "TENANT_A", "neu", [0.9, 0.1])
+
+    with patch("app.agents.memory_store.generate_embedding", return_value=[1.0, 0.0]):
+        assert [h["content"] for h in manager.retrieve_context("TENANT_A", "q", limit=1)] == ["alt"]
+        with sqlite3.connect(manager.db_path) as con:
+            con.execute("DELETE FROM agent_memory WHERE content = 'alt'")
+        assert [h["content"] for h in manager.retrieve_context("TENANT_A", "q", limit=1)] == ["neu"]
+
+
+def test_removed_rows_are_masked_without_rebuild(manager, monkeypatch):
+    _insert_raw(manager.db_path, "TENANT_A", "alt", [1.0, 0.0])
+    _insert_raw(manager.db_path, "TENANT_A", "neu", [0.9, 0.1])
+
+    with patch("app.agents.memory_store.generate_embedding", return_value=[1.0, 0.0]):
+        assert [h["content"] for h in manager.retrieve_context("TENANT_A", "q", limit=1)] == ["alt"]
+        index = vector_index.get_index(manager.db_path, "TENANT_A", 2)
+        monkeypatch.setattr(
+            index, "_reset", lambda: pytest.fail("index must not be rebuilt")
+        )
+        manager.update_document_chunks("TENANT_A", "doc-1", moved=[], total_chunks=1, deleted=[1])
+        assert [h["content"] for h in manager.retrieve_context("TENANT_A", "q", limit=2)] == ["neu"]
+
+    # The next snapshot drops the tombstoned row for good.
+    monkeypatch.setattr(vector_index, "SNAPSHOT_MIN_ROWS", 1)
+    with sqlite3.connect(manager.db_path) as con:
+        assert index.search(con, [1.0, 0.0], 2)[0][0] == 2
+    assert index._removed == set()
+    assert np.load(index.directory / "ids.npy").tolist() == [2]
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime
+
+from app.eventlog import core as eventlog
+from app.modules.automation import dispatcher as dispatcher_mod
+from app.modules.automation.dispatcher import AutomationDispatcher
+from app.modules.automation.store import create_rule, get_state_cursor
+
+
+def _lead_rule(db_path, tenant_id: str, *, cron: str = "") -> str:
+    triggers = [{"type": "eventlog", "config": {"allowed_event_types": ["lead.created"]}}]
+    if cron:
+        triggers.append({"type": "cron", "config": {"cron": cron}})
+    return create_rule(
+        tenant_id=tenant_id,
+        name=f"lead {tenant_id}",
+        triggers=triggers,
+        actions=[{"type": "create_task", "config": {"title": "Lead", "requires_confirm": True}}],
+        db_path=db_path,
+    )
+
+
+def test_dispatcher_fans_new_events_out_per_tenant(monkeypatch, tmp_path):
+    db_path = tmp_path / "core.sqlite3"
+    monkeypatch.setattr(eventlog.Config, "CORE_DB", db_path)
+    _lead_rule(db_path, "T1")
+    _lead_rule(db_path, "T2")
+    dispatcher = AutomationDispatcher(db_path=db_path, workers=2)
+    try:
+        first = dispatcher.run_once()
+        assert first["tenants"] == 2  # each tenant's automation.rule.created
+        assert dispatcher.wait_idle(timeout=10)
+
+        ids = {
+            tenant: [
+                eventlog.event_append("lead.created", "lead", i + 1, {"tenant_id": tenant})
+                for i in range(3)
+            ]
+            for tenant in ("T1", "T2")
+        }
+        tick = dispatcher.run_once()
+        assert tick == {"tenants": 2, "events": 6, "cron_due": 0}
+        assert dispatcher.wait_idle(timeout=10)
+        for tenant, own in ids.items():
+            cursor = get_state_cursor(tenant_id=tenant, source="eventlog", db_path=db_path)
+            assert cursor == str(own[-1])
+
+        # The pending actions the rules proposed are events of their own; once
+        # those are drained, a tick without new events schedules no tenant.
+        assert dispatcher.run_once()["tenants"] == 2
+        assert dispatcher.wait_idle(timeout=10)
+        assert dispatcher.run_once()["tenants"] == 0
+        status = dispatcher.status()
+        assert status["queue_depth"] == 0 and status["tenants_running"] == 0
+        assert status["events_dispatched"] > 8
+        assert status["tenant_failures"] == 0
+        latency = next(iter(status["rule_latency"].values()))
+        assert latency["runs"] == 3 and latency["max_ms"] >= latency["avg_ms"]
+    finally:
+        dispatcher.stop()
+
+
+def test_dispatcher_runs_cron_tenants_only_when_due(monkeypatch, tmp_path):
+    db_path = tmp_path / "core.sqlite3"
+    monkeypatch.setattr(eventlog.Config, "CORE_DB", db_path)
+    _lead_rule(db_path, "T1", cron="0 8 * * *")
+    _lead_rule(db_path, "T2", cron="30 9 * * *")
+    runs: list[tuple[str, datetime]] = []
+    monkeypatch.setattr(
+        dispatcher_mod,
+        "run_due_cron_for_tenant",
+        lambda tenant_id, *, db_path, now_dt, observer: runs.append((tenant_id, now_dt)),
+    )
+    now = [datetime(2026, 3, 2, 7, 59, 30, tzinfo=UTC)]
+    dispatcher = AutomationDispatcher(db_path=db_path, now=lambda: now[0])
+    try:
+        assert dispatcher.run_once()["cron_due"] == 0
+        assert dispatcher.status()["next_cron_fire"] == "2026-03-02T08:00:00Z"
+
+        now[0] = datetime(2026, 3, 2, 8, 0, 5, tzinfo=UTC)
+        assert dispatcher.run_once()["cron_due"] == 1
+        assert dispatcher.run_once()["cron_due"] == 0  # same minute: not again
+        assert dispatcher.wait_idle(timeout=10)
+        assert runs == [("T1", datetime(2026, 3, 2, 8, 0, tzinfo=UTC))]
+        assert dispatcher.status()["next_cron_fire"] == "2026-03-02T09:30:00Z"
+    finally:
+        dispatcher.stop()
+
+
+def test_failed_tenant_drain_is_retried_with_backoff(monkeypatch, tmp_path):
+    db_path = tmp_path / "core.sqlite3"
+    monkeypatch.setattr(eventlog.Config, "CORE_DB", db_path)
+    _lead_rule(db_path, "T1")
+    real_process = dispatcher_mod.process_events_for_tenant
+    failures = [
+        dispatcher_mod.LoopGuardError("loop"),
+        {"ok": False, "reason": "error_permanent:rule_processing_failed", "processed": 0},
+    ]
+
+    def flaky_process(tenant_id, **kwargs):
+        if failures:
+            outcome = failures.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        return real_process(tenant_id, **kwargs)
+
+    monkeypatch.setattr(dispatcher_mod, "process_events_for_tenant", flaky_process)
+    clock = [100.0]
+    dispatcher = AutomationDispatcher(db_path=db_path, tick_seconds=2, clock=lambda: clock[0])
+    try:
+        ids = [
+            eventlog.event_append("lead.created", "lead", i + 1, {"tenant_id": "T1"})
+            for i in range(3)
+        ]
+
+        def tick_and_cursor() -> str:
+            dispatcher.run_once()
+            assert dispatcher.wait_idle(timeout=10)
+            return get_state_cursor(tenant_id="T1", source="eventlog", db_path=db_path)
+
+        assert tick_and_cursor() == ""
+        status = dispatcher.status()
+        assert status["loop_guard"] == 1 and status["tenants_backing_off"] == 1
+        assert status["tenants_queued"] == 1
+
+        clock[0] += 1  # still backing off: the tenant is not started
+        assert tick_and_cursor() == ""
+        clock[0] += 1
+        assert tick_and_cursor() == ""
+        assert dispatcher.status()["tenant_failures"] == 1
+
+        clock[0] += 3  # second failure doubled the delay to 4s
+        assert tick_and_cursor() == ""
+        clock[0] += 1
+        assert int(tick_and_cursor()) >= ids[-1]
+        status = dispatcher.status()
+        assert status["tenants_backing_off"] == 0 and status["tenants_queued"] == 0
+    finally:
+        dispatcher.stop()
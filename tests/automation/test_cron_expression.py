@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from app.eventlog import core as eventlog
+from app.modules.automation import runner
+from app.modules.automation.cron import compile_cron, cron_match, parse_cron_expression
+from app.modules.automation.store import (
+    create_rule,
+    get_state_cursor,
+    upsert_state_cursor,
+)
+
+
+def _utc(*args: int) -> datetime:
+    return datetime(*args, tzinfo=UTC)
+
+
+def _brute_next(expression: str, after: datetime) -> datetime:
+    current = after + timedelta(minutes=1)
+    while not cron_match(expression, current):
+        current += timedelta(minutes=1)
+    return current
+
+
+def test_parses_ranges_lists_steps_and_names():
+    cron = parse_cron_expression("*/15 8-17/3 1,15 JAN-mar mon-FRI")
+    assert cron.minutes == (0, 15, 30, 45)
+    assert cron.hours == (8, 11, 14, 17)
+    assert cron.days == (1, 15)
+    assert cron.months == (1, 2, 3)
+    assert cron.weekdays == (1, 2, 3, 4, 5)
+    assert parse_cron_expression("0 0 * * 5-7").weekdays == (0, 5, 6)
+    assert parse_cron_expression("5/20 * * * *").minutes == (5, 25, 45)
+    weekly = parse_cron_expression("@weekly")
+    assert (weekly.minutes, weekly.hours, weekly.weekdays) == ((0,), (0,), (0,))
+
+
+@pytest.mark.parametrize(
+    ("expression", "error"),
+    [
+        ("", "validation_error:cron_empty"),
+        ("* * * *", "validation_error:cron_field_count"),
+        ("60 * * * *", "validation_error:cron_out_of_range_minute"),
+        ("*/0 * * * *", "validation_error:cron_invalid_minute"),
+        ("10-5 * * * *", "validation_error:cron_invalid_minute"),
+        ("0 0 * FOO *", "validation_error:cron_invalid_month"),
+        ("0 0 L * *", "validation_error:cron_invalid_day"),
+        ("0 0 ? * *", "validation_error:cron_unsupported_syntax"),
+        ("@reboot", "validation_error:cron_unsupported_syntax"),
+    ],
+)
+def test_rejects_invalid_expressions(expression, error):
+    with pytest.raises(ValueError, match=error):
+        parse_cron_expression(expression)
+
+
+@pytest.mark.parametrize(
+    "expression",
+    ["*/7 * * * *", "0 8 * * 1", "30 9 1,15 * *", "0 0 13 * 5", "45 23 * 2 SUN", "0 6 */2 * *"],
+)
+def test_next_fire_matches_minute_by_minute_scan(expression):
+    cron = compile_cron(expression)
+    after = _utc(2026, 1, 30, 23, 59)
+    for _ in range(5):
+        fire = cron.next_fire_after(after)
+        assert fire == _brute_next(expression, after)
+        after = fire
+
+
+def test_day_and_weekday_fire_when_either_matches():
+    cron = compile_cron("0 0 13 * 5")  # the 13th, and every Friday
+    assert cron.matches(_utc(2026, 3, 13, 0, 0))  # a Friday the 13th
+    assert cron.matches(_utc(2026, 4, 13, 0, 0))  # a Monday
+    assert cron.matches(_utc(2026, 4, 3, 0, 0))  # a Friday
+    assert not cron.matches(_utc(2026, 4, 4, 0, 0))
+
+
+def test_stepped_day_and_weekday_fields_restrict_matches():
+    every_other_day = compile_cron("0 0 */2 * *")
+    assert every_other_day.matches(_utc(2026, 3, 1))
+    assert not every_other_day.matches(_utc(2026, 3, 2))
+    assert every_other_day.next_fire_after(_utc(2026, 3, 1)) == _utc(2026, 3, 3)
+
+    every_other_weekday = compile_cron("0 9 * * */2")  # Sun, Tue, Thu, Sat
+    assert every_other_weekday.matches(_utc(2026, 3, 3, 9))  # a Tuesday
+    assert not every_other_weekday.matches(_utc(2026, 3, 2, 9))  # a Monday
+    assert every_other_weekday.next_fire_after(_utc(2026, 3, 3, 9)) == _utc(2026, 3, 5, 9)
+
+
+def test_next_fire_and_fires_between():
+    assert compile_cron("0 0 31 2 *").next_fire_after(_utc(2026, 1, 1)) is None
+    assert compile_cron("15 6 29 2 *").next_fire_after(_utc(2026, 3, 1)) == _utc(2028, 2, 29, 6, 15)
+    fires = compile_cron("0 */6 * * *").fires_between(_utc(2026, 3, 1, 6, 0), _utc(2026, 3, 2, 6, 0))
+    assert fires == [_utc(2026, 3, 1, h) for h in (12, 18)] + [_utc(2026, 3, 2, h) for h in (0, 6)]
+    assert compile_cron("* * * * *").fires_between(_utc(2026, 3, 1), _utc(2026, 3, 2), limit=3) == [
+        _utc(2026, 3, 1, 0, m) for m in (1, 2, 3)
+    ]
+
+
+def test_due_cron_catches_up_missed_minutes(monkeypatch, tmp_path):
+    db_path = tmp_path / "core.sqlite3"
+    monkeypatch.setattr(eventlog.Config, "CORE_DB", db_path)
+    create_rule(
+        tenant_id="T1",
+        name="shift report",
+        triggers=[{"type": "cron", "config": {"cron": "0 */2 * * *"}}],
+        actions=[{"type": "create_task", "config": {"title": "Report", "requires_confirm": True}}],
+        db_path=db_path,
+    )
+    seen: list[datetime] = []
+    real = runner.process_cron_for_tenant
+    monkeypatch.setattr(
+        runner,
+        "process_cron_for_tenant",
+        lambda tenant, **kw: seen.append(kw["now_dt"]) or real(tenant, **kw),
+    )
+    upsert_state_cursor(tenant_id="T1", source="cron", cursor="202603010300", db_path=db_path)
+
+    now = _utc(2026, 3, 1, 9, 30)
+    assert runner.next_cron_fire_for_tenant("T1", db_path=db_path, now_dt=now) == _utc(2026, 3, 1, 4)
+    result = runner.run_due_cron_for_tenant("T1", db_path=db_path, now_dt=now)
+
+    # 04:00, 06:00 and 08:00 were missed; CRON_CATCHUP_MAX_FIRES keeps all three.
+    assert result["ok"] is True and result["matched"] == 3
+    assert seen == [_utc(2026, 3, 1, h) for h in (4, 6, 8)]
+    assert get_state_cursor(tenant_id="T1", source="cron", db_path=db_path) == "202603010930"
+    assert runner.next_cron_fire_for_tenant("T1", db_path=db_path, now_dt=now) == _utc(2026, 3, 1, 10)
+    assert runner.run_due_cron_for_tenant("T1", db_path=db_path, now_dt=now)["fires"] == []
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+
+from app.core.migrations import run_migrations
+from app.eventlog import core as eventlog
+from app.modules.automation import runner
+from app.modules.automation.store import create_rule, get_state_cursor
+
+_LEGACY_EVENTS = """
+CREATE TABLE events(
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  ts TEXT NOT NULL,
+  event_type TEXT NOT NULL,
+  entity_type TEXT NOT NULL,
+  entity_id INTEGER NOT NULL,
+  payload_json TEXT NOT NULL,
+  prev_hash TEXT NOT NULL,
+  hash TEXT NOT NULL UNIQUE
+)
+"""
+
+
+def _legacy_db(db_path, payloads: list[str]) -> None:
+    con = sqlite3.connect(str(db_path))
+    try:
+        con.execute(_LEGACY_EVENTS)
+        for i, payload_json in enumerate(payloads, start=1):
+            con.execute(
+                "INSERT INTO events(ts,event_type,entity_type,entity_id,payload_json,prev_hash,hash) "
+                "VALUES ('2026-01-01T00:00:00Z','lead.created','lead',1,?,'p',?)",
+                (payload_json, f"h{i}"),
+            )
+        con.commit()
+    finally:
+        con.close()
+
+
+def _tenants(db_path) -> list[str | None]:
+    con = sqlite3.connect(str(db_path))
+    try:
+        return [row[0] for row in con.execute("SELECT tenant_id FROM events ORDER BY id")]
+    finally:
+        con.close()
+
+
+def test_migration_backfills_tenant_column(tmp_path):
+    db_path = tmp_path / "core.sqlite3"
+    _legacy_db(db_path, ['{"tenant_id":"T1"}', '{"tenant_id":" T2 "}', "{}", "not json"])
+
+    run_migrations(db_path)
+
+    assert _tenants(db_path) == ["T1", "T2", "", ""]
+    con = sqlite3.connect(str(db_path))
+    try:
+        indexes = {row[1] for row in con.execute("PRAGMA index_list(events)")}
+    finally:
+        con.close()
+    assert "idx_events_tenant" in indexes
+
+
+def test_event_append_writes_tenant_column(monkeypatch, tmp_path):
+    db_path = tmp_path / "core.sqlite3"
+    monkeypatch.setattr(eventlog.Config, "CORE_DB", db_path)
+    eventlog.event_append("lead.created", "lead", 1, {"tenant_id": "T1"})
+    eventlog.event_append("system.tick", "system", 1, {})
+    assert _tenants(db_path) == ["T1", ""]
+    assert eventlog.event_verify_chain() == (True, None, None)
+
+
+def test_runner_pages_only_its_own_tenant_events(monkeypatch, tmp_path):
+    db_path = tmp_path / "core.sqlite3"
+    monkeypatch.setattr(eventlog.Config, "CORE_DB", db_path)
+    create_rule(
+        tenant_id="T1",
+        name="lead triage",
+        triggers=[{"type": "eventlog", "config": {"allowed_event_types": ["lead.created"]}}],
+        actions=[{"type": "create_task", "config": {"title": "Lead", "requires_confirm": True}}],
+        db_path=db_path,
+    )
+    own: list[int] = []
+    other: list[int] = []
+    for i in range(40):
+        tenant = "T1" if i % 10 == 0 else "T2"
+        event_id = eventlog.event_append("lead.created", "lead", i + 1, {"tenant_id": tenant})
+        (own if tenant == "T1" else other).append(event_id)
+
+    decoded: list[str] = []
+    real_loads = runner._safe_json_loads
+    monkeypatch.setattr(
+        runner, "_safe_json_loads", lambda raw: decoded.append(raw) or real_loads(raw)
+    )
+    result = runner.process_events_for_tenant("T1", db_path=db_path)
+
+    assert result["ok"] is True
+    # Plus the tenant's own automation.rule.created event.
+    assert result["processed"] == len(own) + 1 and result["matched"] == len(own)
+    assert all(json.loads(raw)["tenant_id"] == "T1" for raw in decoded)
+    assert get_state_cursor(tenant_id="T1", source="eventlog", db_path=db_path) == str(own[-1])
+    assert runner._fetch_latest_tenant_event(db_path=db_path, tenant_id="T2")["id"] == other[-1]
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import sqlite3
+
+from app.modules.automation import rule_index
+from app.modules.automation.cron import compile_cron
+from app.modules.automation.store import create_rule, delete_rule, update_rule
+
+
+def _rule(db_path, name: str, event_types: list[str], *, cron: str = "") -> str:
+    triggers = [{"type": "eventlog", "config": {"allowed_event_types": event_types}}]
+    if cron:
+        triggers.append({"type": "cron", "config": {"cron": cron}})
+    return create_rule(
+        tenant_id="T1",
+        name=name,
+        triggers=triggers,
+        conditions=[{"type": "match_context", "config": {"field": "lead_id", "present": True}}],
+        actions=[{"type": "create_task", "config": {"title": name}}],
+        db_path=db_path,
+    )
+
+
+def test_index_groups_rules_by_event_type(tmp_path):
+    db_path = tmp_path / "core.sqlite3"
+    lead = _rule(db_path, "lead", ["lead.created"], cron="0 8 * * 1")
+    both = _rule(db_path, "both", ["lead.created", "case.opened"])
+    _rule(db_path, "broken cron", ["task.done"], cron="every monday")
+
+    index = rule_index.get_rule_index("T1", db_path)
+    assert {r.id for r in index.candidates("lead.created")} == {lead, both}
+    assert [r.id for r in index.candidates("case.opened")] == [both]
+    assert index.candidates("unknown.event") == ()
+
+    crons = {r.record["name"]: r.cron_triggers for r in index.cron_rules}
+    assert crons["lead"] == (("0 8 * * 1", compile_cron("0 8 * * 1")),)
+    assert crons["broken cron"] == (("every monday", None),)
+    compiled = index.candidates("case.opened")[0]
+    assert compiled.conditions == ({"field": "lead_id", "present": True},)
+    assert compiled.action_payloads == ({"action_type": "create_task", "title": "both"},)
+
+
+def test_index_is_cached_and_invalidated_by_rule_writes(tmp_path):
+    db_path = tmp_path / "core.sqlite3"
+    rid = _rule(db_path, "lead", ["lead.created"])
+    first = rule_index.get_rule_index("T1", db_path)
+    assert rule_index.get_rule_index("T1", db_path) is first
+
+    update_rule(tenant_id="T1", rule_id=rid, patch={"is_enabled": False}, db_path=db_path)
+    disabled = rule_index.get_rule_index("T1", db_path)
+    assert disabled is not first and disabled.candidates("lead.created") == ()
+
+    update_rule(tenant_id="T1", rule_id=rid, patch={"is_enabled": True}, db_path=db_path)
+    assert len(rule_index.get_rule_index("T1", db_path).candidates("lead.created")) == 1
+    delete_rule(tenant_id="T1", rule_id=rid, db_path=db_path)
+    assert rule_index.get_rule_index("T1", db_path).rules == ()
+
+
+def test_index_notices_rule_writes_from_other_processes(tmp_path):
+    db_path = tmp_path / "core.sqlite3"
+    _rule(db_path, "lead", ["lead.created"])
+    cached = rule_index.get_rule_index("T1", db_path)
+
+    con = sqlite3.connect(str(db_path))
+    try:
+        con.execute(
+            "UPDATE automation_builder_rules SET is_enabled=0, version=version+1 WHERE tenant_id='T1'"
+        )
+        con.commit()
+    finally:
+        con.close()
+
+    refreshed = rule_index.get_rule_index("T1", db_path)
+    assert refreshed is not cached and refreshed.rules == ()
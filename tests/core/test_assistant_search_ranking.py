@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from app.core import logic
+
+
+def _doc(doc_id: str, text: str, **overrides):
+    doc = {
+        "doc_id": doc_id,
+        "group_key": f"group-{doc_id}",
+        "kdnr": "FIRMA_A:1001",
+        "object_folder": "FIRMA_A/1001_Muster",
+        "doctype": "RECHNUNG",
+        "doc_date": "2024-02-01",
+        "file_name": f"{doc_id}.txt",
+        "file_path": f"/vault/{doc_id}.txt",
+        "extracted_text": text,
+        "tenant_id": "FIRMA_A",
+    }
+    doc.update(overrides)
+    return doc
+
+
+@pytest.fixture()
+def core_db(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("app.core.rag_sync.enqueue_document_sync", lambda **_kw: None)
+    logic.bind_request_db_path(tmp_path / "core.sqlite3")
+    yield
+    logic.bind_request_db_path(None)
+
+
+def test_assistant_search_is_bm25_ranked_with_version_counts(core_db) -> None:
+    logic.index_upsert_documents(
+        [
+            _doc("doc-weak", "Angebot Malerarbeiten Treppenhaus Fenster Dach Keller"),
+            _doc("doc-strong", "Dachrinne Dachrinne Dachrinne Reparatur"),
+            _doc("doc-none", "Wartung Heizung"),
+        ]
+    )
+    logic.index_upsert_documents(
+        [_doc("doc-strong", "Dachrinne Dachrinne Dachrinne Reparatur", note="v2")]
+    )
+
+    con = logic._db()
+    if not logic._table_exists(con, "docs_fts"):
+        con.close()
+        pytest.skip("FTS5 not available")
+    statements = []
+    con.set_trace_callback(statements.append)
+    con.close()  # back to the pool; the search below reuses it on this thread
+    try:
+        hits = logic.assistant_search("Dachrinne Malerarbeiten", tenant_id="FIRMA_A")
+    finally:
+        con.set_trace_callback(None)
+
+    assert [h["doc_id"] for h in hits] == ["doc-strong", "doc-weak"]
+    assert hits[0]["version_count"] == 2
+    assert hits[1]["version_count"] == 1
+    assert not any("FROM versions WHERE doc_id=?" in s for s in statements)
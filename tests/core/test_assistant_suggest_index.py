@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from app.core import logic
+
+pytest.importorskip("rapidfuzz")
+
+
+def _doc(doc_id: str, **overrides):
+    doc = {
+        "doc_id": doc_id,
+        "group_key": f"group-{doc_id}",
+        "kdnr": "FIRMA_A:1001",
+        "object_folder": "FIRMA_A/1001_Muster",
+        "doctype": "RECHNUNG",
+        "doc_date": "2024-02-01",
+        "file_name": f"{doc_id}.txt",
+        "file_path": f"/vault/{doc_id}.txt",
+        "extracted_text": "Rechnung Hausmeisterservice",
+        "tenant_id": "FIRMA_A",
+    }
+    doc.update(overrides)
+    return doc
+
+
+@pytest.fixture()
+def core_db(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("app.core.rag_sync.enqueue_document_sync", lambda **_kw: None)
+    logic.bind_request_db_path(tmp_path / "core.sqlite3")
+    con = logic._db()
+    has_index = logic._table_exists(con, "suggest_fts")
+    con.close()
+    if not has_index:
+        logic.bind_request_db_path(None)
+        pytest.skip("FTS5 trigram tokenizer not available")
+    yield
+    logic.bind_request_db_path(None)
+
+
+def _terms(tenant_id: str) -> dict:
+    con = logic._db()
+    try:
+        rows = con.execute(
+            "SELECT term, refs FROM suggest_terms WHERE tenant_id=?", (tenant_id,)
+        ).fetchall()
+    finally:
+        con.close()
+    return {r["term"]: r["refs"] for r in rows}
+
+
+def test_suggest_is_typo_tolerant_and_tenant_scoped(core_db) -> None:
+    logic.index_upsert_documents(
+        [
+            _doc("angebot_dachrinne_2024"),
+            _doc("wartung_heizung"),
+            _doc("fremd_dachrinne", tenant_id="FIRMA_B", kdnr="FIRMA_B:2002"),
+        ]
+    )
+
+    assert logic.assistant_suggest("dachrine", tenant_id="FIRMA_A") == [
+        "angebot_dachrinne_2024.txt"
+    ]
+    assert logic.assistant_suggest("fremd", tenant_id="FIRMA_A") == []
+
+
+def test_suggest_terms_follow_docs_index_writes(core_db) -> None:
+    logic.index_upsert_documents([_doc("doc-1"), _doc("doc-2")])
+    assert _terms("FIRMA_A")["RECHNUNG"] == 2
+    assert logic.assistant_suggest("doc-1", tenant_id="FIRMA_A")[0] == "doc-1.txt"
+
+    # Re-indexing under a new name drops the old term and invalidates the cache.
+    logic.index_upsert_documents([_doc("doc-1", file_name="umbenannt.txt")])
+    assert "doc-1.txt" not in _terms("FIRMA_A")
+    assert "doc-1.txt" not in logic.assistant_suggest("doc-1", tenant_id="FIRMA_A")
+
+    # Direct UPDATEs from other modules are picked up as well.
+    con = logic._db()
+    con.execute("UPDATE docs_index SET customer_name=? WHERE doc_id=?", ("Meyer GmbH", "doc-2"))
+    con.commit()
+    con.close()
+    assert logic.assistant_suggest("Meier GmbH", tenant_id="FIRMA_A") == ["Meyer GmbH"]
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from app.core import logic
+from app.core.db_lock import DBLock
+
+
+def test_readers_do_not_wait_for_the_writer() -> None:
+    lock = DBLock()
+    writer_in = threading.Event()
+    reader_done = threading.Event()
+
+    def _writer() -> None:
+        with lock:
+            writer_in.set()
+            reader_done.wait(2)
+
+    t = threading.Thread(target=_writer)
+    t.start()
+    writer_in.wait(2)
+    with lock.read():
+        assert lock.stats()["active_readers"] == 1
+    reader_done.set()
+    t.join()
+
+    stats = lock.stats()
+    assert stats["read_acquisitions"] == 1
+    assert stats["active_readers"] == 0
+    assert stats["write_contended"] == 0
+
+
+def test_writers_are_serialised_and_wait_is_measured() -> None:
+    lock = DBLock()
+    order = []
+    first_in = threading.Event()
+
+    def _first() -> None:
+        with lock:
+            first_in.set()
+            time.sleep(0.05)
+            order.append("first")
+
+    def _second() -> None:
+        first_in.wait(2)
+        with lock.write():
+            order.append("second")
+
+    threads = [threading.Thread(target=_first), threading.Thread(target=_second)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = lock.stats()
+    assert order == ["first", "second"]
+    assert stats["write_acquisitions"] == 2
+    assert stats["write_contended"] == 1
+    assert stats["write_wait_ms_max"] > 0
+
+
+def test_writer_lock_is_reentrant_and_reads_nest_inside() -> None:
+    lock = DBLock()
+    with lock:
+        with lock:
+            with lock.read():
+                pass
+    assert lock.stats()["write_acquisitions"] == 1
+    assert lock.acquire(blocking=False)
+    lock.release()
+
+
+def test_exclusive_reads_when_shared_reads_disabled() -> None:
+    lock = DBLock(shared_reads=False)
+    with lock.read():
+        pass
+    stats = lock.stats()
+    assert stats["write_acquisitions"] == 1
+    assert stats["read_acquisitions"] == 0
+
+
+def test_assistant_search_runs_while_a_writer_holds_the_lock(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("app.core.rag_sync.enqueue_document_sync", lambda **_kw: None)
+    logic.bind_request_db_path(tmp_path / "core.sqlite3")
+    try:
+        logic.index_upsert_documents(
+            [
+                {
+                    "doc_id": "doc-1",
+                    "group_key": "g1",
+                    "kdnr": "1001",
+                    "object_folder": "FIRMA_A/1001_Muster",
+                    "doctype": "RECHNUNG",
+                    "doc_date": "2024-02-01",
+                    "file_name": "rechnung.txt",
+                    "file_path": "/vault/rechnung.txt",
+                    "extracted_text": "Rechnung Hausmeisterservice",
+                    "tenant_id": "FIRMA_A",
+                }
+            ]
+        )
+        held = threading.Event()
+        release = threading.Event()
+
+        def _hold_writer() -> None:
+            with logic._DB_LOCK:
+                held.set()
+                release.wait(5)
+
+        t = threading.Thread(target=_hold_writer)
+        t.start()
+        held.wait(2)
+        try:
+            hits = logic.assistant_search("Hausmeisterservice", tenant_id="FIRMA_A")
+        finally:
+            release.set()
+            t.join()
+        assert [h["doc_id"] for h in hits] == ["doc-1"]
+        assert "lock" in logic.get_db_info()
+    finally:
+        logic.bind_request_db_path(None)
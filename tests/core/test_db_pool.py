@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from pathlib import Path
+
+from app.core.db_pool import ConnectionPool, PooledConnection
+
+
+def _opener(path: Path):
+    def _open() -> sqlite3.Connection:
+        con = sqlite3.connect(
+            str(path), factory=PooledConnection, check_same_thread=False
+        )
+        con.row_factory = sqlite3.Row
+        return con
+
+    return _open
+
+
+def test_pool_reuses_connection_per_thread_and_rolls_back_on_close(tmp_path: Path) -> None:
+    db = tmp_path / "pool.sqlite3"
+    pool = ConnectionPool()
+    key = str(db)
+
+    con = pool.acquire(key, _opener(db))
+    con.execute("CREATE TABLE t(x INTEGER)")
+    con.commit()
+    con.execute("INSERT INTO t VALUES (1)")
+    con.close()  # uncommitted insert must not leak into the next checkout
+
+    again = pool.acquire(key, _opener(db))
+    assert again is con
+    assert again.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 0
+    again.close()
+
+    seen = []
+    worker = threading.Thread(target=lambda: seen.append(pool.acquire(key, _opener(db))))
+    worker.start()
+    worker.join()
+    assert seen[0] is not con
+
+    stats = pool.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+
+
+def test_pool_evicts_idle_and_replaced_database_files(tmp_path: Path) -> None:
+    db = tmp_path / "pool.sqlite3"
+    key = str(db)
+
+    idle_pool = ConnectionPool(max_idle_seconds=0)
+    first = idle_pool.acquire(key, _opener(db))
+    first.close()
+    assert idle_pool.acquire(key, _opener(db)) is not first
+    assert idle_pool.stats()["evicted_idle"] == 1
+
+    pool = ConnectionPool()
+    con = pool.acquire(key, _opener(db))
+    con.close()
+    db.unlink()
+    sqlite3.connect(str(db)).close()  # restored/replaced file, new inode
+    assert pool.acquire(key, _opener(db)) is not con
+    assert pool.stats()["evicted_unhealthy"] == 1
+
+
+def test_nested_checkout_and_clear(tmp_path: Path) -> None:
+    db = tmp_path / "pool.sqlite3"
+    key = str(db)
+    pool = ConnectionPool()
+
+    outer = pool.acquire(key, _opener(db))
+    inner = pool.acquire(key, _opener(db))
+    assert inner is not outer
+    inner.close()
+    outer.close()  # slot already taken by inner -> outer is closed for real
+    assert pool.stats()["discarded"] == 1
+
+    assert pool.clear() == 1
+    assert pool.acquire(key, _opener(db)) is not inner
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from app.core import logic
+from app.core.extraction_cache import ExtractionCache
+
+
+@pytest.fixture()
+def cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> ExtractionCache:
+    c = ExtractionCache(tmp_path / "extract_cache.sqlite3", max_bytes=1024 * 1024)
+    monkeypatch.setattr(logic, "EXTRACT_CACHE", c)
+    return c
+
+
+def test_second_extraction_of_identical_bytes_is_a_lookup(
+    cache: ExtractionCache, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    calls = []
+
+    def _fake_ocr(fp: Path) -> str:
+        calls.append(fp.name)
+        return "Rechnung 2024-001"
+
+    monkeypatch.setattr(logic, "_ocr_image", _fake_ocr)
+    first = tmp_path / "scan.png"
+    first.write_bytes(b"same-bytes")
+    copy = tmp_path / "kopie.png"
+    copy.write_bytes(b"same-bytes")
+
+    assert logic._extract_text(first) == ("Rechnung 2024-001", True)
+    assert logic._extract_text(copy) == ("Rechnung 2024-001", True)
+    assert calls == ["scan.png"]
+
+    # Different settings (force_ocr) are a separate entry.
+    logic._extract_text(copy, force_ocr=True)
+    assert calls == ["scan.png", "kopie.png"]
+
+    stats = logic.extract_cache_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["entries"] == 2
+
+
+def test_empty_results_are_not_cached(
+    cache: ExtractionCache, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(logic, "_ocr_image", lambda _fp: "")
+    fp = tmp_path / "leer.png"
+    fp.write_bytes(b"x")
+
+    assert logic._extract_text(fp) == ("", False)
+    assert cache.stats()["entries"] == 0
+
+
+def test_cache_evicts_least_recently_used_entries(tmp_path: Path) -> None:
+    c = ExtractionCache(tmp_path / "lru.sqlite3", max_bytes=250)
+    for i in range(3):
+        c.put(f"k{i}", "x" * 100, False)
+
+    assert c.get("k0") is None
+    assert c.get("k2") == ("x" * 100, False)
+    stats = c.stats()
+    assert stats["evictions"] >= 1
+    assert stats["bytes"] <= 250
@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from app.core import index_pipeline, logic
+
+
+@pytest.fixture()
+def vault(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    base = tmp_path / "vault"
+    for tenant, kdnr in (("FIRMA_A", "1001"), ("FIRMA_B", "2002")):
+        folder = base / tenant / f"{kdnr}_Muster"
+        folder.mkdir(parents=True)
+        for i in range(3):
+            (folder / f"rechnung_{i}.txt").write_text(
+                f"Rechnung {tenant} {i} vom 01.02.2024", encoding="utf-8"
+            )
+    (base / "FIRMA_A" / "notes.bin").write_bytes(b"\x00\x01")
+    monkeypatch.setattr(logic, "BASE_PATH", base)
+    monkeypatch.setattr(
+        "app.core.rag_sync.enqueue_document_sync", lambda **_kwargs: None
+    )
+    logic.bind_request_db_path(tmp_path / "core.sqlite3")
+    yield base
+    logic.bind_request_db_path(None)
+
+
+def test_iter_vault_files_is_sorted_and_resumes_behind_checkpoint(vault: Path) -> None:
+    files = [p.relative_to(vault).as_posix() for p in index_pipeline.iter_vault_files(vault)]
+    assert files == sorted(files, key=lambda p: tuple(p.split("/")))
+
+    after = files[3]
+    resumed = [
+        p.relative_to(vault).as_posix()
+        for p in index_pipeline.iter_vault_files(vault, after=after)
+    ]
+    assert resumed == files[4:]
+
+
+def test_index_run_full_indexes_once_and_reports_progress(vault: Path) -> None:
+    snapshots = []
+    first = logic.index_run_full(vault, workers=1, batch_size=2, on_progress=snapshots.append)
+
+    assert first["indexed"] == 6
+    assert first["skipped_by_reason"]["unsupported_ext"] == 1
+    assert first["progress"]["state"] == "done"
+    assert first["progress"]["files_per_s"] > 0
+    assert snapshots and snapshots[-1]["indexed"] == 6
+
+    second = logic.index_run_full(vault, workers=1, batch_size=2)
+    assert second["indexed"] == 0
+    assert second["skipped_by_reason"]["already_indexed"] == 6
+
+
+def test_index_run_full_counts_extraction_and_write_errors(
+    vault: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    extract = index_pipeline._extract_for_index
+    batched = logic.index_upsert_documents
+
+    def _extract(path: str, content_sha256: str):
+        if Path(path).name == "rechnung_0.txt" and "FIRMA_A" in Path(path).parts:
+            raise RuntimeError("corrupt file")
+        return extract(path, content_sha256)
+
+    def _write(docs, **kwargs):
+        docs = list(docs)
+        if any(d["file_name"] == "rechnung_2.txt" and d["tenant_id"] == "FIRMA_B" for d in docs):
+            raise RuntimeError("disk full")
+        return batched(docs, **kwargs)
+
+    monkeypatch.setattr(index_pipeline, "_extract_for_index", _extract)
+    monkeypatch.setattr(logic, "index_upsert_documents", _write)
+    res = logic.index_run_full(vault, workers=1, batch_size=3)
+
+    assert res["indexed"] == 4
+    assert res["errors"] == 2
+    assert res["progress"]["errors"] == 2
+    assert res["skipped_by_reason"]["parse_failed"] == 2
+
+
+def test_index_run_full_resumes_from_persisted_checkpoint(vault: Path) -> None:
+    files = [p.relative_to(vault).as_posix() for p in index_pipeline.iter_vault_files(vault)]
+    index_pipeline.save_checkpoint(
+        vault, last_path=files[3], status="running", counters={}
+    )
+
+    res = logic.index_run_full(vault, workers=1, batch_size=2)
+
+    assert res["progress"]["resumed_from"] == files[3]
+    assert res["progress"]["discovered"] == len(files) - 4
+    assert index_pipeline.load_checkpoint(vault)["status"] == "done"
+
+
+def test_index_run_full_with_process_pool(vault: Path) -> None:
+    res = logic.index_run_full(vault, workers=2, batch_size=2, resume=False)
+
+    assert res["indexed"] == 6
+    assert res["progress"]["extracted"] == 6
+
+
+def test_unchanged_files_are_skipped_via_stat_manifest(
+    vault: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    logic.index_run_full(vault, workers=1)
+
+    hashed = []
+    real_hash = index_pipeline.sha256_file
+
+    def _counting_hash(fp, *args, **kwargs):
+        hashed.append(Path(fp).name)
+        return real_hash(fp, *args, **kwargs)
+
+    monkeypatch.setattr(index_pipeline, "sha256_file", _counting_hash)
+
+    res = logic.index_run_full(vault, workers=1, verify_fraction=0)
+    assert hashed == []
+    assert res["progress"]["manifest_hits"] == 6
+    assert res["skipped_by_reason"]["already_indexed"] == 6
+
+    touched = vault / "FIRMA_A" / "1001_Muster" / "rechnung_0.txt"
+    touched.write_text("Rechnung FIRMA_A geaendert vom 03.04.2024", encoding="utf-8")
+    res = logic.index_run_full(vault, workers=1, verify_fraction=0)
+    assert hashed == ["rechnung_0.txt"]
+    assert res["indexed"] == 1
+
+    hashed.clear()
+    res = logic.index_run_full(vault, workers=1, verify_fraction=1.0)
+    assert len(hashed) == 6
+    assert res["progress"]["manifest_verified"] == 6
+    assert res["progress"]["manifest_mismatches"] == 0
+
+
+def test_import_run_skips_unchanged_files_without_reading(
+    vault: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    first = logic.import_run(import_root=vault)
+    assert first["indexed"] == 6
+
+    def _no_read(_fp):
+        raise AssertionError("unchanged file must not be read")
+
+    monkeypatch.setattr(logic, "_read_bytes", _no_read)
+    second = logic.import_run(import_root=vault, verify_fraction=0)
+    assert second["indexed"] == 0
+    assert second["skipped_by_reason"]["already_indexed"] == 6
+
+
+def test_import_run_retries_failed_batch_per_document(
+    vault: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    batched, single = logic.index_upsert_documents, logic.index_upsert_document
+
+    def _batch_fails(_docs, **_kwargs):
+        raise RuntimeError("batch write failed")
+
+    def _one_bad(**doc):
+        if doc["file_name"] == "rechnung_1.txt" and doc["tenant_id"] == "FIRMA_B":
+            raise RuntimeError("bad document")
+        single(**doc)
+
+    monkeypatch.setattr(logic, "index_upsert_documents", _batch_fails)
+    monkeypatch.setattr(logic, "index_upsert_document", _one_bad)
+    res = logic.import_run(import_root=vault)
+
+    assert res["indexed"] == 5
+    assert res["errors"] == 1
+    assert res["skipped_by_reason"]["parse_failed"] == 1
+
+    # The failed document has no manifest entry and is picked up next time.
+    monkeypatch.setattr(logic, "index_upsert_documents", batched)
+    monkeypatch.setattr(logic, "index_upsert_document", single)
+    again = logic.import_run(import_root=vault, verify_fraction=0)
+    assert again["indexed"] == 1
+    assert again["skipped_by_reason"]["already_indexed"] == 5
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from app.core import logic
+
+
+def _doc(i: int, **overrides):
+    doc = {
+        "doc_id": f"doc-{i:03d}",
+        "group_key": f"group-{i}",
+        "kdnr": "FIRMA_A:1001",
+        "object_folder": "FIRMA_A/1001_Muster",
+        "doctype": "RECHNUNG",
+        "doc_date": "2024-02-01",
+        "file_name": f"rechnung_{i}.txt",
+        "file_path": f"/vault/FIRMA_A/1001_Muster/rechnung_{i}.txt",
+        "extracted_text": f"Rechnung Nr. {1000 + i} Hausmeisterservice Beispiel",
+        "used_ocr": False,
+        "note": "bulk",
+        "tenant_id": "FIRMA_A",
+    }
+    doc.update(overrides)
+    return doc
+
+
+@pytest.fixture()
+def core_db(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    queued = []
+    monkeypatch.setattr(
+        "app.core.rag_sync.enqueue_document_sync", lambda **kwargs: queued.append(kwargs)
+    )
+    logic.bind_request_db_path(tmp_path / "core.sqlite3")
+    yield queued
+    logic.bind_request_db_path(None)
+
+
+def test_index_upsert_documents_writes_all_tables_in_batches(core_db) -> None:
+    written = logic.index_upsert_documents((_doc(i) for i in range(7)), batch_size=3)
+
+    assert written == 7
+    con = logic._db()
+    try:
+        assert con.execute("SELECT COUNT(*) FROM docs").fetchone()[0] == 7
+        assert con.execute("SELECT COUNT(*) FROM versions").fetchone()[0] == 7
+        assert con.execute("SELECT COUNT(*) FROM docs_index").fetchone()[0] == 7
+        if logic._table_exists(con, "docs_fts"):
+            assert con.execute("SELECT COUNT(*) FROM docs_fts").fetchone()[0] == 7
+    finally:
+        con.close()
+    assert [q["doc_id"] for q in core_db] == [f"doc-{i:03d}" for i in range(7)]
+
+
+def test_index_upsert_documents_chains_versions_like_single_upsert(core_db) -> None:
+    logic.index_upsert_documents([_doc(1)])
+    logic.index_upsert_documents(
+        [_doc(1, file_path="/vault/moved/rechnung_1.txt"), _doc(1, note="again")]
+    )
+
+    con = logic._db()
+    try:
+        rows = con.execute(
+            "SELECT version_no, data_hash, previous_hash FROM versions WHERE doc_id=? ORDER BY version_no",
+            ("doc-001",),
+        ).fetchall()
+        index_rows = con.execute(
+            "SELECT file_path FROM docs_index WHERE doc_id=?", ("doc-001",)
+        ).fetchall()
+    finally:
+        con.close()
+
+    assert [r["version_no"] for r in rows] == [1, 2, 3]
+    assert rows[0]["previous_hash"] == ""
+    assert rows[1]["previous_hash"] == rows[0]["data_hash"]
+    assert rows[2]["previous_hash"] == rows[1]["data_hash"]
+    assert len(index_rows) == 1
+
+
+def test_index_upsert_documents_can_sync_rag_inline(
+    core_db, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    synced = []
+    monkeypatch.setattr(
+        "app.core.rag_sync.sync_document_to_memory", lambda **kwargs: synced.append(kwargs)
+    )
+
+    logic.index_upsert_documents([_doc(5)], defer_rag_sync=False)
+
+    assert core_db == []
+    assert synced[0]["doc_id"] == "doc-005"
+    assert synced[0]["metadata"]["doctype"] == "RECHNUNG"
+
+
+def test_index_upsert_documents_consumes_lazy_docs_outside_writer_lock(core_db) -> None:
+    depths = []
+
+    def _docs():
+        for i in range(5):
+            depths.append(getattr(logic._DB_LOCK._local, "write_depth", 0))
+            yield _doc(i)
+
+    assert logic.index_upsert_documents(_docs(), batch_size=2) == 5
+    assert depths == [0] * 5
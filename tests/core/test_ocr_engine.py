@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from app.core import hw_profile, logic, ocr_engine
+from app.core.extraction_cache import ExtractionCache
+
+fitz = pytest.importorskip("fitz")
+
+
+@pytest.fixture()
+def scanned_pdf(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    fp = tmp_path / "scan.pdf"
+    doc = fitz.open()
+    for _ in range(6):
+        doc.new_page()
+    doc.save(str(fp))
+    doc.close()
+
+    pages = {
+        0: "RECHNUNG Hausmeisterservice Beispiel GmbH " + "x" * 200,
+        1: "Kunden-Nr: 10234 Rechnungsdatum 12.03.2024",
+    }
+    calls = []
+
+    def _fake_page(path: str, index: int, dpi: int, lang: str) -> str:
+        calls.append(index)
+        return pages.get(index, f"Seite {index + 1}")
+
+    monkeypatch.setattr(ocr_engine, "ocr_available", lambda: True)
+    monkeypatch.setattr(ocr_engine, "_ocr_page", _fake_page)
+    return fp, calls
+
+
+def test_ocr_pdf_reports_pages_and_stops_early(scanned_pdf) -> None:
+    fp, calls = scanned_pdf
+    progress = []
+    result = ocr_engine.ocr_pdf(
+        fp,
+        max_pages=20,
+        dpi=150,
+        lang="deu",
+        workers=1,
+        on_page=lambda done, total: progress.append((done, total)),
+        stop_when=lambda text: logic._analysis_text_sufficient(text, "scan.pdf"),
+    )
+
+    assert not result.complete
+    assert (result.pages_done, result.pages_total) == (2, 6)
+    assert progress == [(1, 6), (2, 6)]
+    assert "Kunden-Nr: 10234" in result.text
+    assert calls == [0, 1]
+
+
+def test_early_exit_extraction_is_not_cached(
+    scanned_pdf, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    fp, _calls = scanned_pdf
+    cache = ExtractionCache(tmp_path / "cache.sqlite3", max_bytes=1024 * 1024)
+    monkeypatch.setattr(logic, "EXTRACT_CACHE", cache)
+    monkeypatch.setenv("KUKANILEA_OCR_WORKERS", "1")
+
+    text, used_ocr = logic._extract_text(
+        fp, ocr_stop_when=lambda t: "Kunden-Nr" in t
+    )
+    assert used_ocr and "Seite 6" not in text
+    assert cache.stats()["entries"] == 0
+
+    text, used_ocr = logic._extract_text(fp)
+    assert used_ocr and "Seite 6" in text
+    assert cache.stats()["entries"] == 1
+
+
+def test_ocr_worker_limit_follows_cpu_and_ram(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("KUKANILEA_OCR_WORKERS", raising=False)
+    assert hw_profile.ocr_worker_limit({"cpu_count": 16, "ram_gb": 8}) == 4
+    assert hw_profile.ocr_worker_limit({"cpu_count": 4, "ram_gb": 64}) == 3
+    assert hw_profile.ocr_worker_limit({"cpu_count": 1, "ram_gb": 2}) == 1
+    monkeypatch.setenv("KUKANILEA_OCR_WORKERS", "6")
+    assert hw_profile.ocr_worker_limit({"cpu_count": 1, "ram_gb": 2}) == 6
+
+
+def test_pdf_text_layer_behind_blank_pages_survives_without_ocr(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    class _Page:
+        def __init__(self, text: str) -> None:
+            self.text = text
+
+        def extract_text(self) -> str:
+            return self.text
+
+    class _Reader:
+        def __init__(self, _path: str) -> None:
+            self.pages = [_Page(""), _Page(""), _Page("Rechnung " + "y" * 200)]
+
+    fp = tmp_path / "cover.pdf"
+    fp.write_bytes(b"%PDF-1.4")
+    monkeypatch.setattr(logic, "PdfReader", _Reader)
+    monkeypatch.setattr(ocr_engine, "ocr_available", lambda: False)
+
+    assert logic._extract_pdf_text(fp, probe=True) == ""
+    text, used_ocr = logic._extract_text_uncached(fp)
+    assert text.startswith("Rechnung") and not used_ocr
+
+    # OCR runs but finds nothing: the full text-layer pass is the fallback.
+    monkeypatch.setattr(ocr_engine, "ocr_available", lambda: True)
+    monkeypatch.setattr(logic, "_ocr_pdf", lambda _fp, **_kwargs: "")
+    text, used_ocr = logic._extract_text_uncached(fp)
+    assert text.startswith("Rechnung") and not used_ocr
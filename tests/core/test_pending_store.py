@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from app.core import logic
+
+
+@pytest.fixture()
+def pending_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    directory = tmp_path / "pending"
+    monkeypatch.setattr(logic, "PENDING_DIR", directory)
+    return directory
+
+
+def _payload(owner: str, **overrides):
+    payload = {
+        "status": "ANALYZING",
+        "owner": owner,
+        "progress": 1.0,
+        "progress_phase": "Init…",
+        "filename": "scan.pdf",
+        "extracted_text": "Rechnung " * 1000,
+        "preview": "iVBORw0KGgo=",
+        "kdnr_ranked": [["1234", 0.9]],
+    }
+    payload.update(overrides)
+    return payload
+
+
+def test_pending_roundtrip_progress_and_delete(pending_dir: Path) -> None:
+    logic.write_pending("tok-a", _payload("alice"))
+
+    logic._set_progress("tok-a", 42.0, "OCR Seite 2/5…")
+    assert logic.read_pending_progress("tok-a")["progress"] == 42.0
+
+    d = logic.read_pending("tok-a")
+    assert d["progress_phase"] == "OCR Seite 2/5…"
+    assert d["extracted_text"].startswith("Rechnung")
+    assert d["kdnr_ranked"] == [["1234", 0.9]]
+
+    logic.delete_pending("tok-a")
+    assert logic.read_pending("tok-a") is None
+    assert logic.read_pending_progress("tok-a") is None
+
+
+def test_list_pending_is_owner_scoped_newest_first_without_blobs(pending_dir: Path) -> None:
+    logic.write_pending("tok-old", _payload("alice"))
+    logic.write_pending("tok-bob", _payload("bob"))
+    logic.write_pending("tok-shared", _payload(""))
+    logic.write_pending("tok-new", _payload("alice"))
+
+    items = logic.list_pending(username="alice")
+    assert [i["_token"] for i in items] == ["tok-new", "tok-shared", "tok-old"]
+    assert "extracted_text" not in items[0] and "preview" not in items[0]
+    assert logic.count_pending(username="alice") == 3
+    assert len(logic.list_pending()) == 4
+
+
+def test_legacy_json_files_are_imported(pending_dir: Path) -> None:
+    pending_dir.mkdir(parents=True)
+    (pending_dir / "legacy.json").write_text(
+        json.dumps(_payload("alice", status="READY")), encoding="utf-8"
+    )
+
+    assert logic.read_pending("legacy")["status"] == "READY"
+    assert not (pending_dir / "legacy.json").exists()
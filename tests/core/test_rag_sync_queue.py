@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from app.agents.memory_store import chunk_content_hash, ensure_memory_provenance
+from app.ai import embeddings
+from app.ai.embedding_cache import EmbeddingCache
+from app.core import rag_sync
+
+
+class _FakeResponse:
+    def __init__(self, status_code: int, payload):
+        self.status_code = status_code
+        self._payload = payload
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def json(self):
+        return self._payload
+
+
+class _FakeSession:
+    def __init__(self, *, batch_supported: bool = True):
+        self.batch_supported = batch_supported
+        self.calls = []
+
+    def post(self, url, json, timeout):
+        self.calls.append((url.rsplit("/", 1)[-1], json))
+        if url.endswith("/api/embed"):
+            if not self.batch_supported:
+                return _FakeResponse(404, {})
+            return _FakeResponse(200, {"embeddings": [[float(len(t)), 1.0] for t in json["input"]]})
+        return _FakeResponse(200, {"embedding": [float(len(json["prompt"])), 1.0]})
+
+
+@pytest.fixture()
+def embed_backend(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    session = _FakeSession()
+    monkeypatch.setattr(embeddings, "_SESSION", session)
+    monkeypatch.setattr(embeddings, "_NO_BATCH_HOSTS", set())
+    monkeypatch.setattr(embeddings, "EMBED_BATCH_SIZE", 2)
+    monkeypatch.setattr(
+        embeddings, "_CACHE", EmbeddingCache(tmp_path / "emb.sqlite3", max_bytes=1024 * 1024)
+    )
+    return session
+
+
+def test_embeddings_are_batched_deduplicated_and_cached(embed_backend) -> None:
+    out = embeddings.generate_embeddings(["a", "bb", "a", "ccc"])
+    assert out == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0], [3.0, 1.0]]
+    assert [name for name, _ in embed_backend.calls] == ["embed", "embed"]
+    assert embed_backend.calls[0][1]["input"] == ["a", "bb"]
+
+    embed_backend.calls.clear()
+    assert embeddings.generate_embedding("bb") == [2.0, 1.0]
+    assert embed_backend.calls == []
+
+
+def test_old_ollama_falls_back_to_single_requests(embed_backend) -> None:
+    embed_backend.batch_supported = False
+    assert embeddings.generate_embeddings(["x", "yy"]) == [[1.0, 1.0], [2.0, 1.0]]
+    embed_backend.calls.clear()
+    assert embeddings.generate_embeddings(["zzz"]) == [[3.0, 1.0]]
+    assert [name for name, _ in embed_backend.calls] == ["embeddings"]
+
+
+class _FlakyMemoryManager:
+    failures_left = 0
+    stored: list = []
+
+    def __init__(self, *_args, **_kwargs):
+        pass
+
+    def store_memories(self, *, tenant_id, agent_role, items):
+        results = []
+        for item in items:
+            if _FlakyMemoryManager.failures_left > 0:
+                _FlakyMemoryManager.failures_left -= 1
+                results.append(False)
+            else:
+                _FlakyMemoryManager.stored.append(item["metadata"]["chunk_index"])
+                results.append(True)
+        return results
+
+
+def _plan_unstored(_manager, _tenant, _doc, chunks):
+    return [i for i in range(len(chunks)) if i not in _FlakyMemoryManager.stored]
+
+
+@pytest.fixture()
+def flaky_sync(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    dlq = []
+    monkeypatch.setattr(rag_sync.Config, "AUTH_DB", tmp_path / "auth.sqlite3")
+    monkeypatch.setattr(rag_sync, "_DOC_SYNC_RESUMED", set())
+    monkeypatch.setattr(rag_sync, "MemoryManager", _FlakyMemoryManager)
+    monkeypatch.setattr(rag_sync, "_plan_document_sync", _plan_unstored)
+    monkeypatch.setattr(rag_sync, "RAG_SYNC_RETRY_BASE_SECONDS", 0.01)
+    monkeypatch.setattr(rag_sync, "RAG_SYNC_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(
+        rag_sync, "_write_rag_sync_dlq", lambda **kwargs: dlq.append(kwargs["chunk_index"])
+    )
+    _FlakyMemoryManager.stored = []
+    return dlq
+
+
+def test_queued_sync_retries_only_failed_chunks(flaky_sync) -> None:
+    _FlakyMemoryManager.failures_left = 2
+    rag_sync.enqueue_document_sync(
+        tenant_id="tenant-a", doc_id="doc-1", file_name="a.pdf", text="X" * 3000
+    )
+    assert rag_sync.wait_for_document_sync(timeout=10)
+
+    chunks = len(rag_sync.chunk_text("X" * 3000))
+    assert sorted(_FlakyMemoryManager.stored) == list(range(chunks))
+    assert flaky_sync == []
+
+
+def test_queued_sync_dead_letters_after_last_attempt(flaky_sync) -> None:
+    _FlakyMemoryManager.failures_left = 10_000
+    rag_sync.enqueue_document_sync(
+        tenant_id="tenant-a", doc_id="doc-2", file_name="b.pdf", text="Y" * 1500
+    )
+    assert rag_sync.wait_for_document_sync(timeout=10)
+
+    assert _FlakyMemoryManager.stored == []
+    assert sorted(flaky_sync) == list(range(len(rag_sync.chunk_text("Y" * 1500))))
+    assert _pending_jobs() == []
+
+
+def _pending_jobs() -> list:
+    con = rag_sync._doc_sync_jobs_db()
+    try:
+        return [tuple(r) for r in con.execute("SELECT doc_id, attempt FROM rag_sync_jobs")]
+    finally:
+        con.close()
+
+
+def test_persisted_sync_jobs_resume_after_restart(flaky_sync, monkeypatch) -> None:
+    _FlakyMemoryManager.failures_left = 0
+    submitted = []
+    with monkeypatch.context() as m:
+        # The process exits before the worker picks the job up.
+        m.setattr(rag_sync, "_schedule_document_sync_job", lambda job_id, delay: submitted.append(job_id))
+        rag_sync.enqueue_document_sync(
+            tenant_id="tenant-a", doc_id="doc-3", file_name="c.pdf", text="Z" * 1200
+        )
+    assert len(submitted) == 1
+    assert _pending_jobs() == [("doc-3", 0)]
+
+    monkeypatch.setattr(rag_sync, "_DOC_SYNC_RESUMED", set())
+    assert rag_sync.resume_document_sync_jobs() == 1
+    assert rag_sync.resume_document_sync_jobs() == 0
+    assert rag_sync.wait_for_document_sync(timeout=10)
+
+    assert sorted(_FlakyMemoryManager.stored) == list(range(len(rag_sync.chunk_text("Z" * 1200))))
+    assert _pending_jobs() == []
+
+
+def test_superseded_sync_job_is_dropped(flaky_sync, monkeypatch) -> None:
+    submitted = []
+    with monkeypatch.context() as m:
+        m.setattr(rag_sync, "_schedule_document_sync_job", lambda job_id, delay: submitted.append(job_id))
+        rag_sync.enqueue_document_sync(
+            tenant_id="tenant-a", doc_id="doc-4", file_name="d.pdf", text="alt " * 300
+        )
+        rag_sync.enqueue_document_sync(
+            tenant_id="tenant-a", doc_id="doc-4", file_name="d.pdf", text="neu " * 300
+        )
+    stale, current = submitted
+
+    rag_sync._run_document_sync_job(stale)
+    assert _FlakyMemoryManager.stored == []
+    rag_sync._run_document_sync_job(current)
+    assert _FlakyMemoryManager.stored
+    assert _pending_jobs() == []
+
+
+def _memory_db(path: Path) -> str:
+    con = sqlite3.connect(path)
+    con.execute(
+        """
+        CREATE TABLE agent_memory(
+          id INTEGER PRIMARY KEY AUTOINCREMENT,
+          tenant_id TEXT NOT NULL,
+          timestamp TEXT NOT NULL,
+          agent_role TEXT NOT NULL,
+          content TEXT NOT NULL,
+          embedding BLOB NOT NULL,
+          metadata TEXT,
+          importance_score INTEGER DEFAULT 5,
+          category TEXT DEFAULT 'FAKT'
+        )
+        """
+    )
+    con.commit()
+    con.close()
+    return str(path)
+
+
+def test_reindex_embeds_only_changed_chunks(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, embed_backend
+) -> None:
+    db_path = _memory_db(tmp_path / "auth.sqlite3")
+    monkeypatch.setattr(rag_sync.Config, "AUTH_DB", Path(db_path))
+    text = "".join(f"Abschnitt {i:02d} " + "x" * 690 for i in range(5))
+
+    first = rag_sync.sync_document_to_memory("tenant-a", "doc-1", "a.pdf", text)
+    chunk_count = len(rag_sync.chunk_text(text))
+    assert first == chunk_count
+    assert rag_sync.sync_document_to_memory("tenant-a", "doc-1", "a.pdf", text) == 0
+
+    embed_backend.calls.clear()
+    changed = text[:-200] + "y" * 200
+    assert rag_sync.sync_document_to_memory("tenant-a", "doc-1", "a.pdf", changed) == 1
+    assert sum(len(call["input"]) for _name, call in embed_backend.calls) == 1
+
+    con = sqlite3.connect(db_path)
+    try:
+        rows = con.execute(
+            """
+            SELECT c.chunk_index, json_extract(m.metadata, '$.chunk_index')
+            FROM agent_memory_chunks c JOIN agent_memory m ON m.id = c.memory_id
+            WHERE c.tenant_id = 'tenant-a' AND c.doc_id = 'doc-1' ORDER BY c.chunk_index
+            """
+        ).fetchall()
+        plan = con.execute(
+            "EXPLAIN QUERY PLAN SELECT memory_id FROM agent_memory_chunks WHERE tenant_id=? AND doc_id=?",
+            ("tenant-a", "doc-1"),
+        ).fetchall()
+    finally:
+        con.close()
+    assert [r[0] for r in rows] == list(range(chunk_count))
+    assert all(r[0] == r[1] for r in rows)
+    assert "idx_agent_memory_chunks_doc" in " ".join(str(p[-1]) for p in plan)
+
+
+def test_provenance_is_backfilled_from_metadata(tmp_path: Path) -> None:
+    db_path = _memory_db(tmp_path / "auth.sqlite3")
+    con = sqlite3.connect(db_path)
+    con.execute(
+        "INSERT INTO agent_memory(tenant_id, timestamp, agent_role, content, embedding, metadata) VALUES (?,?,?,?,?,?)",
+        ("t1", "2024-01-01", "document_engine", "Teil zwei", b"\x00" * 4,
+         json.dumps({"doc_id": "d9", "chunk_index": 2})),
+    )
+    con.execute(
+        "INSERT INTO agent_memory(tenant_id, timestamp, agent_role, content, embedding, metadata) VALUES (?,?,?,?,?,?)",
+        ("t1", "2024-01-01", "system", "kein Dokument", b"\x00" * 4, "{}"),
+    )
+    ensure_memory_provenance(con)
+    assert con.execute(
+        "SELECT tenant_id, doc_id, chunk_index, content_hash FROM agent_memory_chunks"
+    ).fetchall() == [("t1", "d9", 2, chunk_content_hash("Teil zwei"))]
+    con.execute("DELETE FROM agent_memory")
+    assert con.execute("SELECT COUNT(*) FROM agent_memory_chunks").fetchone()[0] == 0
+    con.close()
+
+
+def test_chunk_boundaries_survive_an_edit_at_the_start() -> None:
+    words = ["Rechnung", "Angebot", "Kunde", "Baustelle", "Material", "Lieferung",
+             "und", "der", "mit", "für", "Termin", "Dach", "Fenster"]
+    paragraphs = [
+        " ".join(words[(i * 7 + j * 3 + j // 5) % len(words)] for j in range(20 + i % 50))
+        for i in range(40)
+    ]
+    for text in ("\n\n".join(paragraphs), " ".join(paragraphs)):
+        before = {chunk_content_hash(c) for c in rag_sync.chunk_text(text)}
+        after = [
+            chunk_content_hash(c)
+            for c in rag_sync.chunk_text("Neue Einleitung zum Angebot. " + text)
+        ]
+        assert len(before) >= 10
+        assert sum(h in before for h in after) >= len(after) - 2
@@ -103,3 +103,30 @@ def test_background_task_queue_records_failures_without_flakes() -> None:
 
     stopped_stats = q.get_stats()
     assert stopped_stats["workers"] == 0
+
+
+def test_audit_vault_verify_resumes_from_checkpoint(tmp_path) -> None:
+    db_path = tmp_path / "audit.sqlite3"
+    vault = AuditVault(db_path)
+    for i in range(3):
+        vault.store_evidence(f"doc-{i}", "tenant-a", "meta", {"i": i})
+
+    first = vault.verify_report()
+    assert first["ok"] and first["rows_verified"] == 3 and first["checkpoint"] == 3
+
+    vault.store_evidence("doc-3", "tenant-a", "meta", {"i": 3})
+    second = vault.verify_report()
+    assert second["ok"] and second["resumed_from"] == 3 and second["rows_verified"] == 1
+
+    con = sqlite3.connect(str(db_path))
+    try:
+        con.execute("DROP TRIGGER IF EXISTS prevent_vault_update")
+        con.execute("UPDATE evidence_vault SET node_hash=? WHERE id=4", ("x" * 64,))
+        con.commit()
+    finally:
+        con.close()
+
+    ok, errors = vault.verify_chain()
+    assert ok is False
+    assert errors[0] == {"id": 4, "error": "Checkpoint Mismatch (Chain rewritten)"}
+    assert any("Node-Hash Mismatch" in row["error"] for row in errors)
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from app.core import logic
+from app.core.render_cache import RenderCache
+
+fitz = pytest.importorskip("fitz")
+
+
+@pytest.fixture()
+def render_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> RenderCache:
+    cache = RenderCache(tmp_path / "visualizer_cache", max_bytes=10 * 1024 * 1024)
+    monkeypatch.setattr(logic, "RENDER_CACHE", cache)
+    return cache
+
+
+def _pdf(path: Path, pages: int) -> Path:
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"Seite {i + 1}")
+    doc.save(str(path))
+    doc.close()
+    return path
+
+
+def test_payload_and_page_renders_come_from_cache(
+    render_cache: RenderCache, tmp_path: Path
+) -> None:
+    pdf = _pdf(tmp_path / "plan.pdf", 3)
+
+    first = logic.build_visualizer_payload(pdf, page=1)
+    second = logic.build_visualizer_payload(pdf, page=1)
+    assert first["perf"]["cache_hit"] is False
+    assert second["perf"]["cache_hit"] is True
+    assert second["page"]["index"] == 1 and "image_b64" not in second["page"]
+
+    png, key = logic.render_visualizer_page(pdf, page=1)
+    assert png.startswith(b"\x89PNG") and key == second["page"]["image_key"]
+    assert logic.render_visualizer_page(pdf, page=1) == (png, key)
+    assert render_cache.stats()["hits"] == 2
+
+    # Requested DPIs snap to the configured zoom levels.
+    assert logic.visualizer_page_key(pdf, page=1, dpi=140) == key
+    assert logic.visualizer_page_key(pdf, page=1, dpi=300) != key
+
+
+def test_prerender_warms_first_pages(render_cache: RenderCache, tmp_path: Path) -> None:
+    pdf = _pdf(tmp_path / "scan.pdf", 1)
+
+    assert logic.prerender_visualizer_pages(pdf, pages=2) == 1
+    key = logic.visualizer_page_key(pdf, page=0)
+    assert render_cache.get(key, ".png") is not None
+
+
+def test_render_cache_evicts_least_recently_used(tmp_path: Path) -> None:
+    cache = RenderCache(tmp_path / "c", max_bytes=250)
+    cache.put("a", ".png", b"x" * 100)
+    cache.put("b", ".png", b"x" * 100)
+    cache.get("a", ".png")
+    os.utime(tmp_path / "c" / "b.png", (time.time() - 60, time.time() - 60))
+    cache.put("c", ".png", b"x" * 100)
+
+    assert cache.get("b", ".png") is None
+    assert cache.get("a", ".png") is not None
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import sqlite3
+
+from app.eventlog import checkpoints, core
+
+
+def _append(n: int) -> None:
+    for i in range(n):
+        core.event_append(
+            event_type="ticket.updated",
+            entity_type="ticket",
+            entity_id=1 + i % 7,
+            payload={"step": i},
+        )
+
+
+def _exec(db_path, sql: str, params=()) -> None:
+    con = sqlite3.connect(str(db_path))
+    try:
+        con.execute(sql, params)
+        con.commit()
+    finally:
+        con.close()
+
+
+def test_verification_resumes_from_signed_checkpoint(monkeypatch, tmp_path):
+    db_path = tmp_path / "core.sqlite3"
+    monkeypatch.setattr(core.Config, "CORE_DB", db_path)
+    monkeypatch.setattr(core, "CHECKPOINT_INTERVAL", 4)
+    _append(10)
+
+    first = core.event_verify_report()
+    assert first["ok"] and first["rows_verified"] == 10
+    assert first["resumed_from"] == 0 and first["checkpoint"] == 10
+
+    _append(3)
+    second = core.event_verify_report()
+    assert second["ok"] and second["resumed_from"] == 10
+    assert second["rows_verified"] == 3 and second["last_id"] == 13
+    assert second["rows_per_second"] > 0
+
+    full = core.event_verify_report(full=True)
+    assert full["ok"] and full["rows_verified"] == 13
+
+
+def test_forged_checkpoint_is_ignored(monkeypatch, tmp_path):
+    db_path = tmp_path / "core.sqlite3"
+    monkeypatch.setattr(core.Config, "CORE_DB", db_path)
+    _append(5)
+    _exec(db_path, "UPDATE events SET payload_json=? WHERE id=2", ('{"step":99}',))
+    # A checkpoint past the tampered row without a valid signature must not
+    # let verification skip it.
+    con = sqlite3.connect(str(db_path))
+    row_hash = con.execute("SELECT hash FROM events WHERE id=4").fetchone()[0]
+    con.close()
+    _exec(
+        db_path,
+        "INSERT INTO chain_checkpoints(chain, row_id, row_hash, created_at, signature) VALUES (?,?,?,?,?)",
+        ("events", 4, row_hash, "2026-01-01T00:00:00Z", "0" * 64),
+    )
+
+    assert core.event_verify_chain() == (False, 2, "hash_mismatch")
+
+
+def test_rewritten_checkpoint_row_is_reported(monkeypatch, tmp_path):
+    db_path = tmp_path / "core.sqlite3"
+    monkeypatch.setattr(core.Config, "CORE_DB", db_path)
+    _append(4)
+    assert core.event_verify_chain() == (True, None, None)
+    assert checkpoints.latest_checkpoint(sqlite3.connect(str(db_path)), "events")[0] == 4
+
+    _exec(db_path, "UPDATE events SET hash=? WHERE id=4", ("f" * 64,))
+    assert core.event_verify_chain() == (False, 4, "checkpoint_mismatch")
+    assert core.event_verify_chain(full=True) == (False, 4, "hash_mismatch")
+
+
+def test_parallel_segments_match_sequential_result(monkeypatch, tmp_path):
+    db_path = tmp_path / "core.sqlite3"
+    monkeypatch.setattr(core.Config, "CORE_DB", db_path)
+    monkeypatch.setattr(core, "_PARALLEL_MIN_ROWS", 5)
+    _append(30)
+
+    report = core.event_verify_report(full=True, workers=3)
+    assert report["ok"] and report["segments"] == 3 and report["rows_verified"] == 30
+
+    _exec(db_path, "UPDATE events SET payload_json=? WHERE id=17", ('{"step":-1}',))
+    parallel = core.event_verify_report(full=True, workers=3)
+    assert (parallel["ok"], parallel["first_bad_id"], parallel["reason"]) == (
+        False,
+        17,
+        "hash_mismatch",
+    )
+    assert core.event_verify_chain(full=True, workers=1) == (False, 17, "hash_mismatch")
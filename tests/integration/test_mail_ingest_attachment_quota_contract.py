@@ -33,5 +33,5 @@ def test_mail_ingest_attachment_contract_reports_rejected_reason(tmp_path, monke
 
     assert out["processed"] == 1
     assert out["rejected"] == 1
-    assert out["accepted"] == 0
+    assert out["pending"] == 0
     assert refs[0]["reason"] == "tenant_quota_exceeded"
@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+import sqlite3
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from app.eventlog import core as eventlog
+from app.knowledge import ics_source
+
+
+@pytest.fixture()
+def calendar_db(tmp_path, monkeypatch):
+    db_path = tmp_path / "core.sqlite3"
+    con = sqlite3.connect(db_path)
+    con.executescript(
+        """
+        CREATE TABLE knowledge_chunks(
+          id INTEGER PRIMARY KEY AUTOINCREMENT, chunk_id TEXT, tenant_id TEXT,
+          owner_user_id TEXT, source_type TEXT, source_ref TEXT, title TEXT, body TEXT,
+          tags TEXT, content_hash TEXT, is_redacted INTEGER, created_at TEXT, updated_at TEXT
+        );
+        CREATE TABLE knowledge_fts_fallback(rowid INTEGER PRIMARY KEY, title TEXT, body TEXT, tags TEXT);
+        """
+    )
+    con.close()
+
+    def _connect():
+        con = sqlite3.connect(db_path)
+        con.row_factory = sqlite3.Row
+        return con
+
+    def _run_write_txn(fn):
+        con = _connect()
+        try:
+            result = fn(con)
+            con.commit()
+            return result
+        finally:
+            con.close()
+
+    monkeypatch.setattr(ics_source, "_db", _connect)
+    monkeypatch.setattr(ics_source, "_run_write_txn", _run_write_txn)
+    monkeypatch.setattr(ics_source, "_tenant", lambda tenant_id: tenant_id)
+    monkeypatch.setattr(
+        ics_source,
+        "knowledge_policy_get",
+        lambda _tenant_id: {"allow_calendar": 1, "allow_customer_pii": 1},
+    )
+    monkeypatch.setattr(eventlog.Config, "CORE_DB", db_path)
+    eventlog.ensure_eventlog_schema()
+    monkeypatch.setenv("KUKANILEA_ICS_FEED_DIR", str(tmp_path / "feeds"))
+    return _connect
+
+
+def _manual(tenant: str, start: datetime, end: datetime) -> list[dict]:
+    events = ics_source.knowledge_calendar_events_list(
+        tenant,
+        start_iso=start.isoformat(),
+        end_iso=end.isoformat(),
+        include_deadlines=False,
+        include_tasks=False,
+    )
+    assert all(ev["source"] == "manual" for ev in events)
+    return events
+
+
+def test_occurrences_are_materialised_and_match_python_expansion(calendar_db):
+    base = (datetime.now(UTC) + timedelta(days=3)).replace(hour=9, minute=0, second=0, microsecond=0)
+    weekly = ics_source.knowledge_calendar_event_create(
+        "T1",
+        "u1",
+        title="Baustelle",
+        start_at=base.isoformat(),
+        end_at=(base + timedelta(hours=2)).isoformat(),
+        kind="appointment",
+        reminder_minutes=30,
+        recurrence={"freq": "weekly", "interval": 1, "count": 20},
+    )["event_id"]
+    ics_source.knowledge_calendar_event_create(
+        "T1", "u2", title="Urlaub", start_at=base.date().isoformat(), all_day=True, kind="absence"
+    )
+    ics_source.knowledge_calendar_event_create(
+        "T2", "u1", title="Fremd", start_at=base.isoformat(), kind="appointment"
+    )
+
+    window = (base + timedelta(days=20), base + timedelta(days=60))
+    indexed = _manual("T1", *window)
+    expanded = ics_source._expanded_manual_occurrences(
+        "T1", range_start=window[0], range_end=window[1], wanted=set(), owner_user_id=None
+    )
+    assert indexed == sorted(expanded, key=lambda ev: (ev["start_at"], ev["title"]))
+    assert [ev["event_id"] for ev in indexed] == [weekly] * 6
+
+    everything = _manual("T1", base - timedelta(days=1), base + timedelta(days=400))
+    assert len(everything) == 21
+    assert {ev["event_id"] for ev in _manual("T2", *window)} == set()
+    absences = ics_source.knowledge_calendar_events_list(
+        "T1", kinds=["absence"], include_deadlines=False, include_tasks=False
+    )
+    assert [ev["title"] for ev in absences] == ["Urlaub"]
+    assert ics_source.knowledge_calendar_events_list(
+        "T1", owner_user_id="u2", include_deadlines=False, include_tasks=False
+    )[0]["title"] == "Urlaub"
+
+    plan = " ".join(
+        str(row[-1])
+        for row in calendar_db().execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM knowledge_calendar_occurrences "
+            "WHERE tenant_id=? AND occurrence_start >= ? AND occurrence_start <= ?",
+            ("T1", "a", "b"),
+        )
+    )
+    assert "idx_calendar_occ_tenant_start" in plan
+
+
+def test_occurrences_follow_updates_deletes_and_reminders(calendar_db):
+    now = datetime.now(UTC).replace(microsecond=0)
+    start = now + timedelta(minutes=45)
+    event_id = ics_source.knowledge_calendar_event_create(
+        "T1",
+        "u1",
+        title="Abnahme",
+        start_at=start.isoformat(),
+        end_at=(start + timedelta(hours=1)).isoformat(),
+        reminder_minutes=30,
+    )["event_id"]
+
+    due = ics_source.knowledge_calendar_reminders_due("T1", now_iso=now.isoformat(), within_minutes=60)
+    assert [(d["event_id"], d["remind_at"], d["source"]) for d in due] == [
+        (event_id, (start - timedelta(minutes=30)).isoformat(), "manual")
+    ]
+
+    ics_source.knowledge_calendar_event_update(
+        "T1", "u1", event_id=event_id, title="Endabnahme", reminder_minutes=5
+    )
+    assert ics_source.knowledge_calendar_reminders_due("T1", now_iso=now.isoformat(), within_minutes=30) == []
+    assert [ev["title"] for ev in _manual("T1", now, now + timedelta(days=1))] == ["Endabnahme"]
+
+    ics_source.knowledge_calendar_event_delete("T1", "u1", event_id=event_id)
+    assert _manual("T1", now, now + timedelta(days=1)) == []
+    rows = calendar_db().execute("SELECT COUNT(*) FROM knowledge_calendar_occurrences").fetchone()[0]
+    assert rows == 0
+
+
+def test_missing_index_is_rebuilt_and_horizon_rolls(calendar_db, monkeypatch):
+    start = datetime.now(UTC).replace(microsecond=0) + timedelta(days=1)
+    ics_source.knowledge_calendar_event_create(
+        "T1",
+        "u1",
+        title="Wartung",
+        start_at=start.isoformat(),
+        recurrence={"freq": "monthly", "interval": 12},
+    )
+    # Events stored before the index existed are materialised on first use.
+    con = calendar_db()
+    con.execute("DROP TABLE knowledge_calendar_occurrences")
+    con.execute("DROP TABLE knowledge_calendar_occurrence_state")
+    con.commit()
+    monkeypatch.setattr(ics_source, "OCCURRENCE_HORIZON_DAYS", 400)
+    assert len(_manual("T1", start - timedelta(days=1), start + timedelta(days=366))) == 2
+
+    # A range past the materialised horizon extends it.
+    far = _manual("T1", start + timedelta(days=1000), start + timedelta(days=1500))
+    assert len(far) == 2  # years three and four
+    horizon = con.execute("SELECT horizon_end FROM knowledge_calendar_occurrence_state").fetchone()[0]
+    assert horizon >= (start + timedelta(days=1500)).isoformat()
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import threading
+import time
+from unittest.mock import patch
+
+from app.mail import sync_engine
+
+
+def _accounts():
+    return [
+        {"id": f"a{i}", "tenant_id": "tenant_a" if i < 4 else "tenant_b", "imap_host": host}
+        for i, host in enumerate(
+            ["imap.shared.de", "imap.shared.de", "imap.shared.de", "imap.other.de", "imap.b.de"]
+        )
+    ]
+
+
+def test_wave_syncs_concurrently_within_host_limits_and_runs_automation_once(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setattr(sync_engine, "MAIL_SYNC_PER_HOST", 2)
+    monkeypatch.setattr(sync_engine, "_HOST_SLOTS", {})
+    lock = threading.Lock()
+    active: dict[str, int] = {}
+    peak: dict[str, int] = {}
+    overall = {"now": 0, "peak": 0}
+    host_of = {a["id"]: a["imap_host"] for a in _accounts()}
+
+    def _fake_sync(_db, *, tenant_id, account_id, run_automation, **_kwargs):
+        assert run_automation is False
+        host = host_of[account_id]
+        with lock:
+            active[host] = active.get(host, 0) + 1
+            peak[host] = max(peak.get(host, 0), active[host])
+            overall["now"] += 1
+            overall["peak"] = max(overall["peak"], overall["now"])
+        time.sleep(0.05)
+        with lock:
+            active[host] -= 1
+            overall["now"] -= 1
+        imported = 2 if tenant_id == "tenant_a" else 0
+        return {"ok": True, "imported": imported, "duplicates": 0}
+
+    automation_calls: list[str] = []
+    scheduler = sync_engine.MailSyncScheduler(
+        db_path=tmp_path / "core.sqlite3", workers=8, min_interval=60, max_interval=1800, idle=False
+    )
+    with patch(
+        "app.mail.postfach_store.list_accounts_for_sync", return_value=_accounts()
+    ), patch("app.mail.postfach_imap.sync_account", side_effect=_fake_sync), patch(
+        "app.mail.postfach_imap.run_tenant_automation",
+        side_effect=lambda _db, *, tenant_id: automation_calls.append(tenant_id) or {"ok": True},
+    ):
+        scheduler.refresh_accounts()
+        wave = scheduler.run_wave()
+        again = scheduler.run_wave()
+
+    assert wave == {"accounts": 5, "imported": 8, "automation_runs": 1}
+    assert again["accounts"] == 0
+    assert automation_calls == ["tenant_a"]
+    assert peak["imap.shared.de"] == 2
+    assert overall["peak"] >= 3
+
+    status = scheduler.status()
+    assert (status["waves"], status["syncs"], status["imported"]) == (1, 5, 8)
+    assert {a["interval_seconds"] for a in status["accounts"]} == {60}
+
+
+def test_polling_interval_adapts_to_message_rate_and_failures(tmp_path):
+    clock = {"t": 1000.0}
+    scheduler = sync_engine.MailSyncScheduler(
+        db_path=tmp_path / "core.sqlite3",
+        min_interval=60,
+        max_interval=1800,
+        idle=False,
+        clock=lambda: clock["t"],
+    )
+    state = sync_engine._AccountState(
+        tenant_id="t", account_id="a", host="h", interval=60, next_due=0, last_synced=940.0
+    )
+
+    busy = scheduler._next_interval(state, {"ok": True, "imported": 10}, 1000.0)
+    assert busy == 60
+    state.rate_per_min = 0.0
+    quiet = scheduler._next_interval(state, {"ok": True, "imported": 0}, 1000.0)
+    assert quiet == 1800
+    state.rate_per_min = 0.2
+    assert scheduler._next_interval(state, {"ok": True, "imported": 0}, 1000.0) > 300
+
+    assert scheduler._next_interval(state, {"ok": False}, 1000.0) == 120
+    assert scheduler._next_interval(state, {"ok": False}, 1000.0) == 240
+    state.idle = "active"
+    assert scheduler._next_interval(state, {"ok": True, "imported": 5}, 1000.0) == 1800
+
+
+def _wait_until(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def test_idle_watchers_respect_per_host_cap_and_report_active_on_entry(
+    tmp_path, monkeypatch
+):
+    monkeypatch.setattr(sync_engine, "MAIL_SYNC_IDLE_PER_HOST", 2)
+    monkeypatch.setattr(sync_engine, "_IDLE_SLOTS", {})
+    release = threading.Event()
+    lock = threading.Lock()
+    active: dict[str, int] = {}
+    peak: dict[str, int] = {}
+    host_of = {a["id"]: a["imap_host"] for a in _accounts()}
+
+    def _fake_idle(_db, *, account_id, on_idle, **_kwargs):
+        host = host_of[account_id]
+        with lock:
+            active[host] = active.get(host, 0) + 1
+            peak[host] = max(peak.get(host, 0), active[host])
+        on_idle()
+        release.wait(5)
+        with lock:
+            active[host] -= 1
+        return "timeout"
+
+    scheduler = sync_engine.MailSyncScheduler(db_path=tmp_path / "core.sqlite3", idle=True)
+    with patch(
+        "app.mail.postfach_store.list_accounts_for_sync", return_value=_accounts()
+    ), patch("app.mail.postfach_imap.wait_for_new_mail", side_effect=_fake_idle):
+        scheduler.refresh_accounts()
+        scheduler._ensure_idle_watchers()
+        try:
+            # Active as soon as IDLE is entered, before any outcome arrives.
+            assert _wait_until(lambda: scheduler.status()["idle_accounts"] == 4)
+            time.sleep(0.1)
+            assert peak == {"imap.shared.de": 2, "imap.other.de": 1, "imap.b.de": 1}
+            idle = {a["account_id"]: a["idle"] for a in scheduler.status()["accounts"]}
+            assert sorted(idle.values()) == ["", "active", "active", "active", "active"]
+        finally:
+            scheduler._stop_event.set()
+            release.set()
+            for thread in scheduler._idle_threads.values():
+                thread.join(timeout=5)
+    assert peak["imap.shared.de"] == 2
+
+
+def test_idle_new_mail_makes_account_due_and_unsupported_stops_watcher(tmp_path):
+    outcomes = {"a0": ["new_mail"], "a3": ["unsupported"]}
+    scheduler = sync_engine.MailSyncScheduler(db_path=tmp_path / "core.sqlite3", idle=True)
+
+    def _fake_idle(_db, *, account_id, on_idle, **_kwargs):
+        pending = outcomes.get(account_id) or []
+        if pending and pending[0] == "unsupported":
+            return pending.pop(0)
+        on_idle()
+        if pending:
+            return pending.pop(0)
+        scheduler._stop_event.wait(5)
+        return "timeout"
+
+    accounts = [a for a in _accounts() if a["id"] in {"a0", "a3"}]
+    with patch(
+        "app.mail.postfach_store.list_accounts_for_sync", return_value=accounts
+    ), patch("app.mail.postfach_imap.wait_for_new_mail", side_effect=_fake_idle):
+        scheduler.refresh_accounts()
+        for state in scheduler._accounts.values():
+            state.next_due = scheduler._clock() + 3600
+        scheduler._ensure_idle_watchers()
+        try:
+            assert _wait_until(lambda: scheduler.status()["idle_wakeups"] == 1)
+            assert _wait_until(
+                lambda: {a["account_id"]: a["idle"] for a in scheduler.status()["accounts"]}
+                == {"a0": "active", "a3": "unsupported"}
+            )
+            due = {a["account_id"]: a["next_sync_in_seconds"] for a in scheduler.status()["accounts"]}
+            assert due["a0"] == 0 and due["a3"] > 0
+        finally:
+            scheduler._stop_event.set()
+            for thread in scheduler._idle_threads.values():
+                thread.join(timeout=5)
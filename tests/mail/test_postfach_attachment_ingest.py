@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+from email.message import EmailMessage
+
+import pytest
+
+from app.core import malware_scanner, upload_pipeline
+from app.mail import attachment_storage, postfach_store
+from app.mail.postfach_imap import _extract_body_and_attachments
+
+
+def _mail_with_attachment(payload: bytes):
+    msg = EmailMessage()
+    msg["Subject"] = "Rechnung"
+    msg.set_content("Anbei die Rechnung.")
+    msg.add_attachment(
+        payload, maintype="application", subtype="pdf", filename="rechnung.pdf"
+    )
+    return msg
+
+
+def _stored_message(db_path) -> tuple[str, str]:
+    account_id = postfach_store.create_account(
+        db_path,
+        tenant_id="tenant_a",
+        label="Büro",
+        imap_host="imap.example.com",
+        imap_port=993,
+        imap_username="buero@example.com",
+        smtp_host="smtp.example.com",
+        smtp_port=465,
+        smtp_username="buero@example.com",
+        smtp_use_ssl=True,
+        secret_plain="pw",
+    )
+    stored = postfach_store.store_message(
+        db_path,
+        tenant_id="tenant_a",
+        account_id=account_id,
+        direction="inbound",
+        message_id_header="<att@example.com>",
+        in_reply_to=None,
+        references_header=None,
+        from_value="kunde@example.com",
+        to_value="buero@example.com",
+        subject_value="Rechnung",
+        body_value="Anbei",
+        raw_eml=None,
+        has_attachments=True,
+        received_at="2024-03-01T10:00:00+00:00",
+    )
+    return account_id, stored["message_id"]
+
+
+def test_mime_part_is_streamed_to_disk(tmp_path):
+    payload = bytes(range(256)) * 4099
+    _body, attachments = _extract_body_and_attachments(_mail_with_attachment(payload))
+
+    assert "content_bytes" not in attachments[0]
+    assert attachments[0]["size_bytes"] == len(payload)
+
+    target = tmp_path / "rechnung.pdf"
+    size, digest = attachment_storage.write_attachment(
+        attachments[0], target, max_bytes=len(payload)
+    )
+    assert target.read_bytes() == payload
+    assert size == len(payload)
+    assert digest == hashlib.sha256(payload).hexdigest()
+    assert not list(tmp_path.glob(".*.part"))
+
+
+def test_ledger_tracks_usage_and_enforces_quota(tmp_path):
+    existing = tmp_path / "tenant_a" / "acc" / "msg"
+    existing.mkdir(parents=True)
+    (existing / "old.bin").write_bytes(b"x" * 40)
+
+    ledger = attachment_storage.StorageLedger(tmp_path)
+    assert ledger.usage("tenant_a") == {"bytes_used": 40, "files": 1}
+
+    assert ledger.reserve("tenant_a", 50, 100)
+    assert not ledger.reserve("tenant_a", 20, 100)
+    ledger.adjust("tenant_a", -5, 1)
+    # Files added behind the ledger's back are not re-counted.
+    (existing / "new.bin").write_bytes(b"y" * 500)
+    assert ledger.usage("tenant_a") == {"bytes_used": 85, "files": 2}
+
+
+def test_oversized_stream_is_removed(tmp_path):
+    part = _mail_with_attachment(b"z" * 5000).get_payload()[1]
+    target = tmp_path / "big.bin"
+    with pytest.raises(attachment_storage.AttachmentTooLarge):
+        attachment_storage.write_attachment({"part": part}, target, max_bytes=1000)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_scan_queue_finalizes_attachment_refs(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMAIL_ENCRYPTION_KEY", "test-key")
+    monkeypatch.setattr(postfach_store.Config, "USER_DATA_ROOT", tmp_path)
+    monkeypatch.setattr(
+        malware_scanner, "scan_file_stream", lambda path: b"EICAR" not in path.read_bytes()
+    )
+    monkeypatch.setattr(
+        upload_pipeline, "process_upload", lambda path, tenant: (True, "sha-ok")
+    )
+    db_path = tmp_path / "core.sqlite3"
+    account_id, message_id = _stored_message(db_path)
+
+    clean = _mail_with_attachment(b"%PDF-1.4 clean").get_payload()[1]
+    out = postfach_store.ingest_message_attachments(
+        db_path,
+        tenant_id="tenant_a",
+        account_id=account_id,
+        message_id=message_id,
+        attachments=[
+            {"filename": "ok.pdf", "mime_type": "application/pdf", "part": clean},
+            {"filename": "bad.bin", "mime_type": "application/octet-stream",
+             "content_bytes": b"EICAR-test"},
+        ],
+    )
+    assert out["pending"] == 2 and out["rejected"] == 0
+    assert postfach_store.wait_for_attachment_scans(timeout=10)
+
+    con = sqlite3.connect(str(db_path))
+    try:
+        refs = {
+            row[0]: json.loads(row[1])
+            for row in con.execute(
+                "SELECT id, content_ref FROM mailbox_attachments WHERE message_id=?",
+                (message_id,),
+            )
+        }
+    finally:
+        con.close()
+    by_name = {ref["filename"]: ref for ref in refs.values()}
+    assert by_name["ok.pdf"]["status"] == "accepted"
+    assert by_name["ok.pdf"]["sha256"] == "sha-ok"
+    assert by_name["bad.bin"]["status"] == "quarantined"
+    assert "mail_quarantine" in by_name["bad.bin"]["storage_path"]
+
+    ledger = attachment_storage.storage_ledger(tmp_path / "mail_attachments")
+    assert ledger.usage("tenant_a") == {
+        "bytes_used": len(b"%PDF-1.4 clean"),
+        "files": 1,
+    }
+
+
+def test_pending_scans_are_resumed_after_restart(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMAIL_ENCRYPTION_KEY", "test-key")
+    monkeypatch.setattr(postfach_store.Config, "USER_DATA_ROOT", tmp_path)
+    monkeypatch.setattr(malware_scanner, "scan_file_stream", lambda path: True)
+    monkeypatch.setattr(
+        upload_pipeline, "process_upload", lambda path, tenant: (True, "sha-ok")
+    )
+    db_path = tmp_path / "core.sqlite3"
+    account_id, message_id = _stored_message(db_path)
+
+    class _LostQueue:
+        def submit(self, *args, **kwargs):
+            pass
+
+    # The process dies before the scan worker picks the job up.
+    with monkeypatch.context() as m:
+        m.setattr(postfach_store, "_attachment_scan_queue", lambda: _LostQueue())
+        out = postfach_store.ingest_message_attachments(
+            db_path,
+            tenant_id="tenant_a",
+            account_id=account_id,
+            message_id=message_id,
+            attachments=[
+                {"filename": "ok.pdf", "mime_type": "application/pdf",
+                 "content_bytes": b"%PDF-1.4 clean"},
+            ],
+        )
+    assert out["pending"] == 1
+
+    thread_id = postfach_store.list_threads(
+        db_path, tenant_id="tenant_a", account_id=account_id
+    )[0]["id"]
+    thread = postfach_store.get_thread(db_path, tenant_id="tenant_a", thread_id=thread_id)
+    (attachment,) = thread["messages"][0]["attachments"]
+    assert attachment["content_ref_json"]["status"] == "pending"
+    assert "storage_path" not in attachment["content_ref_json"]
+    assert "storage_path" not in attachment["content_ref"]
+
+    # Restart: a new process has not resumed anything for this database yet.
+    monkeypatch.setattr(postfach_store, "_ATTACHMENT_SCANS_RESUMED", set())
+    assert postfach_store.resume_pending_attachment_scans(db_path) == 1
+    assert postfach_store.resume_pending_attachment_scans(db_path) == 0
+    assert postfach_store.wait_for_attachment_scans(timeout=10)
+
+    thread = postfach_store.get_thread(db_path, tenant_id="tenant_a", thread_id=thread_id)
+    (attachment,) = thread["messages"][0]["attachments"]
+    assert attachment["content_ref_json"]["status"] == "accepted"
+    assert attachment["content_ref_json"]["storage_path"].endswith("ok.pdf")
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import re
+from email.message import EmailMessage
+from unittest.mock import patch
+
+from app.mail import postfach_imap, postfach_store
+
+
+def _raw(uid: int) -> bytes:
+    msg = EmailMessage()
+    msg["From"] = "kunde@example.com"
+    msg["To"] = "buero@example.com"
+    msg["Subject"] = f"Anfrage {uid}"
+    msg["Message-ID"] = f"<m{uid}@example.com>"
+    msg.set_content(f"Nachricht {uid}")
+    return msg.as_bytes()
+
+
+class FakeImap:
+    def __init__(self, uids: list[int]):
+        self.messages = {uid: _raw(uid) for uid in uids}
+        self.commands: list[tuple[str, str]] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def login(self, *_args):
+        return "OK", [b""]
+
+    def select(self, *_args, **_kwargs):
+        return "OK", [b""]
+
+    def _expand(self, uid_set: str) -> list[int]:
+        out = []
+        for part in uid_set.split(","):
+            lo, _, hi = part.partition(":")
+            top = max(self.messages) if hi == "*" else int(hi or lo)
+            out.extend(u for u in self.messages if int(lo) <= u <= top)
+        return sorted(set(out))
+
+    def uid(self, command, *args):
+        if command == "search":
+            criteria = args[-1]
+            self.commands.append(("search", criteria))
+            if criteria == "ALL":
+                uids = sorted(self.messages)
+            else:
+                uids = self._expand(criteria.split()[1]) or [max(self.messages)]
+            return "OK", [" ".join(str(u) for u in uids).encode()]
+        uid_set, items = args
+        self.commands.append(("fetch", f"{uid_set} {items}"))
+        data = []
+        for seq, uid in enumerate(self._expand(uid_set), start=1):
+            raw = self.messages[uid]
+            if "HEADER.FIELDS" in items:
+                raw = re.search(rb"Message-ID: [^\r\n]+\r?\n", raw).group(0) + b"\r\n"
+            data.append((f"{seq} (UID {uid} BODY[] {{{len(raw)}}}".encode(), raw))
+            data.append(b")")
+        return "OK", data
+
+
+def _sync(db_path, account_id, fake, **kwargs):
+    with patch("app.mail.postfach_imap.connect", return_value=fake):
+        return postfach_imap.sync_account(
+            db_path, tenant_id="tenant_a", account_id=account_id, **kwargs
+        )
+
+
+def _account(db_path):
+    return postfach_store.create_account(
+        db_path,
+        tenant_id="tenant_a",
+        label="Büro",
+        imap_host="imap.example.com",
+        imap_port=993,
+        imap_username="buero@example.com",
+        smtp_host="smtp.example.com",
+        smtp_port=465,
+        smtp_username="buero@example.com",
+        smtp_use_ssl=True,
+        secret_plain="pw",
+    )
+
+
+def test_sync_batches_fetches_and_resumes_from_uid_cursor(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMAIL_ENCRYPTION_KEY", "test-key")
+    monkeypatch.setattr(postfach_imap, "FETCH_BATCH_SIZE", 4)
+    db_path = tmp_path / "core.sqlite3"
+    account_id = _account(db_path)
+
+    fake = FakeImap([1, 2, 3, 4, 5, 6, 7, 9, 10])
+    first = _sync(db_path, account_id, fake, limit=50, auto_download_attachments=False)
+    assert first["ok"] is True
+    assert (first["imported"], first["duplicates"], first["failed_fetches"]) == (9, 0, 0)
+    assert first["sync_cursor"] == "10"
+    assert {"search", "fetch_headers", "fetch_bodies", "store", "total"} <= set(
+        first["timings_ms"]
+    )
+    fetches = [c for kind, c in fake.commands if kind == "fetch"]
+    assert fetches[:2] == [
+        "1:4 (UID BODY.PEEK[HEADER.FIELDS (MESSAGE-ID)])",
+        "1:4 (UID BODY.PEEK[])",
+    ]
+    assert fetches[3] == "5:7,9 (UID BODY.PEEK[])"
+    assert len(fetches) == 6
+
+    fake.messages[11] = _raw(11)
+    fake.commands.clear()
+    second = _sync(db_path, account_id, fake, limit=50, auto_download_attachments=False)
+    assert fake.commands[0] == ("search", "UID 11:*")
+    assert (second["imported"], second["sync_cursor"]) == (1, "11")
+
+    fake.commands.clear()
+    third = _sync(db_path, account_id, fake, limit=50, auto_download_attachments=False)
+    assert (third["imported"], third["fetched"]) == (0, 0)
+
+    # Re-syncing from scratch only downloads headers; bodies of stored mail are skipped.
+    fake.commands.clear()
+    again = _sync(
+        db_path, account_id, fake, limit=50, since="0", auto_download_attachments=False
+    )
+    assert (again["imported"], again["duplicates"]) == (0, 10)
+    assert not any("BODY.PEEK[])" in c for kind, c in fake.commands if kind == "fetch")
+
+    threads = postfach_store.list_threads(db_path, tenant_id="tenant_a", account_id=account_id)
+    assert len(threads) == 10
+
+
+def test_failed_batch_is_stored_per_message_before_the_cursor_moves(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMAIL_ENCRYPTION_KEY", "test-key")
+    monkeypatch.setattr(postfach_imap, "FETCH_BATCH_SIZE", 3)
+    db_path = tmp_path / "core.sqlite3"
+    account_id = _account(db_path)
+    real_store_messages = postfach_store.store_messages
+    calls = []
+
+    def _first_batch_fails(*args, **kwargs):
+        calls.append(len(kwargs["messages"]))
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+        return real_store_messages(*args, **kwargs)
+
+    monkeypatch.setattr(postfach_store, "store_messages", _first_batch_fails)
+    result = _sync(
+        db_path, account_id, FakeImap([1, 2, 3, 4, 5, 6]), auto_download_attachments=False
+    )
+
+    assert calls == [3, 3]
+    assert (result["imported"], result["failed_fetches"]) == (6, 0)
+    assert result["sync_cursor"] == "6"
+    threads = postfach_store.list_threads(db_path, tenant_id="tenant_a", account_id=account_id)
+    assert len(threads) == 6
@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+import sqlite3
+
+from app.mail import postfach_store
+
+
+def _account(db_path) -> str:
+    return postfach_store.create_account(
+        db_path,
+        tenant_id="tenant_a",
+        label="Büro",
+        imap_host="imap.example.com",
+        imap_port=993,
+        imap_username="buero@example.com",
+        smtp_host="smtp.example.com",
+        smtp_port=465,
+        smtp_username="buero@example.com",
+        smtp_use_ssl=True,
+        secret_plain="pw",
+    )
+
+
+def _store(db_path, account_id, n, subject, body, *, tenant_id="tenant_a"):
+    return postfach_store.store_message(
+        db_path,
+        tenant_id=tenant_id,
+        account_id=account_id,
+        direction="inbound",
+        message_id_header=f"<m{n}@example.com>",
+        in_reply_to=None,
+        references_header=None,
+        from_value="kunde@example.com",
+        to_value="buero@example.com",
+        subject_value=subject,
+        body_value=body,
+        raw_eml=None,
+        has_attachments=False,
+        received_at=f"2024-03-{n:02d}T10:00:00+00:00",
+    )
+
+
+def test_search_is_ranked_with_snippets_and_threads_aggregate(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMAIL_ENCRYPTION_KEY", "test-key")
+    db_path = tmp_path / "core.sqlite3"
+    account_id = _account(db_path)
+    _store(db_path, account_id, 1, "Heizungswartung", "Bitte Termin für die Wartung.")
+    _store(db_path, account_id, 2, "Angebot Dach", "Die Heizung läuft wieder.")
+    third = _store(db_path, account_id, 3, "Re: Heizungswartung", "Danke, passt.")
+
+    hits = postfach_store.search_messages(db_path, tenant_id="tenant_a", query="heizung")
+    assert len(hits) == 3
+    assert "Heizung" in hits[0]["subject_redacted"]
+    assert hits[-1]["subject_redacted"] == "Angebot Dach"
+    assert "Heizung" in hits[-1]["snippet"]
+    assert postfach_store.search_messages(db_path, tenant_id="other", query="heizung") == []
+
+    threads = postfach_store.list_threads(
+        db_path, tenant_id="tenant_a", account_id=account_id, filter_text="heizung"
+    )
+    assert len(threads) == 2
+    assert threads[0]["id"] == third["thread_id"]
+    assert threads[0]["match_count"] == 2
+
+    # Short queries still use the substring scan.
+    short = postfach_store.search_messages(db_path, tenant_id="tenant_a", query="ch")
+    assert [h["subject_redacted"] for h in short] == ["Angebot Dach"]
+
+
+def test_index_is_backfilled_and_rebuildable(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMAIL_ENCRYPTION_KEY", "test-key")
+    db_path = tmp_path / "core.sqlite3"
+    account_id = _account(db_path)
+    _store(db_path, account_id, 1, "Rechnung 4711", "Zahlung offen")
+
+    con = sqlite3.connect(str(db_path))
+    con.executescript(
+        """
+        DROP TRIGGER mailbox_messages_fts_ai;
+        DROP TRIGGER mailbox_messages_fts_ad;
+        DROP TRIGGER mailbox_messages_fts_au;
+        DROP TABLE mailbox_messages_fts;
+        """
+    )
+    con.close()
+    assert postfach_store.rebuild_message_search_index(db_path) == {"ok": True, "indexed": 1}
+
+    # A process that finds the index missing backfills it during schema setup.
+    con = sqlite3.connect(str(db_path))
+    con.execute("DROP TABLE mailbox_messages_fts")
+    con.close()
+    monkeypatch.setattr(postfach_store, "_SCHEMA_READY", set())
+    hits = postfach_store.search_messages(db_path, tenant_id="tenant_a", query="4711")
+    assert [h["subject_redacted"] for h in hits] == ["Rechnung 4711"]
+    assert "snippet" in hits[0]
+
+
+def test_hits_survive_rowid_renumbering_and_legacy_index_is_rebuilt(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMAIL_ENCRYPTION_KEY", "test-key")
+    db_path = tmp_path / "core.sqlite3"
+    account_id = _account(db_path)
+    for n, subject in enumerate(["Fliesen", "Dachrinne", "Estrich"], start=1):
+        _store(db_path, account_id, n, subject, f"Auftrag {subject}")
+
+    # mailbox_messages has no INTEGER PRIMARY KEY, so VACUUM may renumber rowids.
+    con = sqlite3.connect(str(db_path))
+    con.execute("UPDATE mailbox_messages SET rowid = 1000 - rowid")
+    con.commit()
+    con.execute("VACUUM")
+    con.close()
+    for subject in ("Fliesen", "Dachrinne", "Estrich"):
+        hits = postfach_store.search_messages(db_path, tenant_id="tenant_a", query=subject)
+        assert [h["subject_redacted"] for h in hits] == [subject]
+
+    # An index from before search_rowid (keyed on the implicit rowid) is replaced.
+    con = sqlite3.connect(str(db_path))
+    con.executescript(
+        """
+        DROP TRIGGER mailbox_messages_fts_ai;
+        DROP TRIGGER mailbox_messages_fts_ad;
+        DROP TRIGGER mailbox_messages_fts_au;
+        DROP TABLE mailbox_messages_fts;
+        CREATE VIRTUAL TABLE mailbox_messages_fts USING fts5(
+          subject_redacted, from_redacted, to_redacted, redacted_text,
+          content='mailbox_messages', content_rowid='rowid', tokenize='trigram'
+        );
+        """
+    )
+    con.close()
+    monkeypatch.setattr(postfach_store, "_SCHEMA_READY", set())
+    hits = postfach_store.search_messages(db_path, tenant_id="tenant_a", query="Estrich")
+    assert [h["subject_redacted"] for h in hits] == ["Estrich"]
+    _store(db_path, account_id, 4, "Estrich Nachtrag", "Zweiter Auftrag")
+    hits = postfach_store.search_messages(db_path, tenant_id="tenant_a", query="Estrich")
+    assert sorted(h["subject_redacted"] for h in hits) == ["Estrich", "Estrich Nachtrag"]
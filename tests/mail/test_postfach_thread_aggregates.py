@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import sqlite3
+
+from app.mail import postfach_store
+
+
+def _account(db_path) -> str:
+    return postfach_store.create_account(
+        db_path,
+        tenant_id="tenant_a",
+        label="Büro",
+        imap_host="imap.example.com",
+        imap_port=993,
+        imap_username="buero@example.com",
+        smtp_host="smtp.example.com",
+        smtp_port=465,
+        smtp_username="buero@example.com",
+        smtp_use_ssl=True,
+        secret_plain="pw",
+    )
+
+
+def _message(n: int, *, direction="inbound", attachments=False, reply_to=None):
+    return {
+        "direction": direction,
+        "message_id_header": f"<m{n}@example.com>",
+        "in_reply_to": reply_to,
+        "references_header": None,
+        "from_value": "kunde@example.com",
+        "to_value": "buero@example.com",
+        "subject_value": "Angebot Badsanierung",
+        "body_value": f"Nachricht {n}",
+        "raw_eml": None,
+        "has_attachments": attachments,
+        "received_at": f"2024-03-{n:02d}T10:00:00+00:00",
+    }
+
+
+def test_thread_aggregates_are_maintained_incrementally(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMAIL_ENCRYPTION_KEY", "test-key")
+    db_path = tmp_path / "core.sqlite3"
+    account_id = _account(db_path)
+
+    results = postfach_store.store_messages(
+        db_path,
+        tenant_id="tenant_a",
+        account_id=account_id,
+        messages=[
+            _message(5),
+            _message(3, attachments=True, reply_to="<m5@example.com>"),
+            _message(6, direction="outbound", reply_to="<m5@example.com>"),
+            _message(5),
+        ],
+    )
+    assert [r["duplicate"] for r in results] == [False, False, False, True]
+    thread_id = results[0]["thread_id"]
+    assert {r["thread_id"] for r in results} == {thread_id}
+
+    thread = postfach_store.get_thread(db_path, tenant_id="tenant_a", thread_id=thread_id)
+    assert thread is not None
+    (row,) = postfach_store.list_threads(db_path, tenant_id="tenant_a", account_id=account_id)
+    assert row["message_count"] == 3
+    assert row["unread_count"] == 2
+    assert row["has_attachments"] == 1
+    assert row["last_message_at"] == "2024-03-06T10:00:00+00:00"
+
+    assert postfach_store.mark_thread_read(db_path, tenant_id="tenant_a", thread_id=thread_id) == 2
+    (row,) = postfach_store.list_threads(db_path, tenant_id="tenant_a", account_id=account_id)
+    assert row["unread_count"] == 0
+
+    con = sqlite3.connect(str(db_path))
+    con.execute("UPDATE mailbox_threads SET message_count=0, has_attachments=0")
+    con.commit()
+    con.close()
+    assert postfach_store.recompute_thread_aggregates(db_path, tenant_id="tenant_a") == 1
+    (row,) = postfach_store.list_threads(db_path, tenant_id="tenant_a", account_id=account_id)
+    assert (row["message_count"], row["has_attachments"]) == (3, 1)
+
+
+def test_schema_setup_runs_once_per_database(tmp_path, monkeypatch):
+    db_path = tmp_path / "core.sqlite3"
+    calls = []
+    original = postfach_store._create_postfach_schema
+    monkeypatch.setattr(
+        postfach_store,
+        "_create_postfach_schema",
+        lambda path: calls.append(path) or original(path),
+    )
+
+    for _ in range(3):
+        postfach_store.ensure_postfach_schema(db_path)
+    postfach_store.ensure_postfach_schema(tmp_path / "other.sqlite3")
+
+    assert calls == [db_path, tmp_path / "other.sqlite3"]
+
+
+def test_opening_a_thread_marks_it_read(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMAIL_ENCRYPTION_KEY", "test-key")
+    db_path = tmp_path / "core.sqlite3"
+    account_id = _account(db_path)
+
+    results = postfach_store.store_messages(
+        db_path,
+        tenant_id="tenant_a",
+        account_id=account_id,
+        messages=[_message(5), _message(3, reply_to="<m5@example.com>")],
+    )
+    thread_id = results[0]["thread_id"]
+
+    postfach_store.get_thread(db_path, tenant_id="tenant_a", thread_id=thread_id)
+    (row,) = postfach_store.list_threads(db_path, tenant_id="tenant_a", account_id=account_id)
+    assert row["unread_count"] == 2
+
+    opened = postfach_store.get_thread(
+        db_path, tenant_id="tenant_a", thread_id=thread_id, mark_read=True
+    )
+    assert opened is not None
+    assert opened["thread"]["unread_count"] == 0
+    (row,) = postfach_store.list_threads(db_path, tenant_id="tenant_a", account_id=account_id)
+    assert row["unread_count"] == 0
+
+    postfach_store.store_messages(
+        db_path,
+        tenant_id="tenant_a",
+        account_id=account_id,
+        messages=[_message(7, reply_to="<m5@example.com>")],
+    )
+    (row,) = postfach_store.list_threads(db_path, tenant_id="tenant_a", account_id=account_id)
+    assert row["unread_count"] == 1
@@ -32,5 +32,5 @@ def test_tenant_quota_guard_rejects_large_attachment(tmp_path, monkeypatch):
         )
 
     assert out["rejected"] == 1
-    assert out["accepted"] == 0
+    assert out["pending"] == 0
     assert refs[0]["reason"] == "tenant_quota_exceeded"
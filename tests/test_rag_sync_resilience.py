@@ -12,6 +12,9 @@ class _AlwaysFailMemoryManager:
     def store_memory(self, **_kwargs):
         return False
 
+    def store_memories(self, *, items, **_kwargs):
+        return [False] * len(items)
+
 
 def test_sync_document_to_memory_writes_dlq_on_embedding_fail(monkeypatch, tmp_path: Path) -> None:
     captured = []
@@ -171,6 +171,30 @@ class TestVisualizerAPI(unittest.TestCase):
         self.assertEqual(response.status_code, 403)
         self.assertEqual(response.get_json()['error'], 'forbidden_tenant_path')
 
+    @patch('app.routes.visualizer.current_tenant', return_value='tenant-x')
+    @patch('app.routes.visualizer._is_allowed_path', return_value=True)
+    def test_pdf_page_is_served_as_binary_with_etag(self, _mock_allowed, _mock_tenant):
+        fitz = __import__("pytest").importorskip("fitz")
+        pdf = Path(self.tempdir.name) / "tenant-x" / "plan.pdf"
+        pdf.parent.mkdir(parents=True, exist_ok=True)
+        doc = fitz.open()
+        doc.new_page().insert_text((72, 72), "Aufmass Erdgeschoss")
+        doc.save(str(pdf))
+        doc.close()
+        source = base64.b64encode(str(pdf).encode("utf-8")).decode("ascii")
+
+        with patch('app.routes.visualizer.BASE_PATH', Path(self.tempdir.name)):
+            rendered = self.client.get(f'/api/visualizer/render?source={source}&page=0')
+            page = rendered.get_json()['page']
+            self.assertNotIn('image_b64', page)
+            image = self.client.get(page['image_url'])
+            again = self.client.get(page['image_url'], headers={'If-None-Match': image.headers['ETag']})
+
+        self.assertEqual(image.status_code, 200)
+        self.assertEqual(image.mimetype, 'image/png')
+        self.assertTrue(image.data.startswith(b'\x89PNG'))
+        self.assertEqual(again.status_code, 304)
+
     @patch('app.routes.visualizer.current_tenant', return_value='tenant-x')
     def test_markup_endpoints_persist_json_document(self, _mock_tenant):
         self.app.instance_path = self.tempdir.name